@@ -0,0 +1,95 @@
+# PYTHON script
+
+'''
+SmartClip batch
+===============
+
+creates clips for a list of guiding CONs without any user interaction.
+
+Usage
+-----
+
+Job file is a JSON list of clips (or {"clips": [...]}) or a CSV file with a header.
+Each clip is defined by:
+
+* con_id - guiding CON id (required)
+* geom_type - Standard, Reversed, Lock, Flat (default Standard)
+* beam_type - AUDI, SKODA, ... (default AUDI)
+* mirror - create a symmetrical clip (default yes)
+* top_face - guiding top FACE id (required for Flat geom type)
+* cs_elements, ccs_elements - SHELL ids for the clip side/clip contra side beams,
+  nearest elements are used if not given (in JSON also in "nodes" object)
+* search_radius - max. radius of the nearest element search
+* recompute_stops - compute STOP distances even if an identical clip site was computed before (default no)
+* projection - projection backend API, Mesh or Compare (default API)
+
+.. code-block:: none
+
+    ansa -nogui -exec "load_script: batch.py" -exec "main('clips.json', 'clips_report.csv', 'clips_profile.json')"
+
+Status of each clip is written to the report file (CSV or JSON according to its extension).
+Stage times and ANSA API calls of each clip are written to the optional profile file (JSON).
+The model spatial index built in the ANSA session is reused, it must be rebuilt if the mesh was moved
+or edited since (rebuildIndex=True of main or detect).
+
+The job file may be prepared by the clip site detection. Guiding CONs between the small and the large
+face of one PSHELL are searched in the whole model and written ranked by confidence together with
+the suggested geom type, the other columns (confidence, pid, faces, angle, area_ratio) are informative.
+Flat clips are not detected.
+
+.. code-block:: none
+
+    ansa -nogui -exec "load_script: batch.py" -exec "detect('clips.csv', 0.5)" -exec "main('clips.csv')"
+
+'''
+
+import os
+import sys
+
+import ansa
+
+# ==============================================================================
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+ansa.ImportCode(os.path.join(PATH_SELF, 'domain', 'batch_items.py'))
+
+# ==============================================================================
+
+def main(jobFilePath, reportFilePath=None, profileFilePath=None, rebuildIndex=False):
+
+	if reportFilePath is None:
+		reportFilePath = '%s_report.csv' % os.path.splitext(jobFilePath)[0]
+
+	clipBatch = batch_items.ClipBatch.fromFile(jobFilePath, keepSpatialIndex=not rebuildIndex)
+	clipBatch.run()
+	clipBatch.writeReport(reportFilePath)
+	if profileFilePath is not None:
+		clipBatch.writeProfiles(profileFilePath)
+
+	print('%s clips created, %s failed. Report: %s' % (
+		len(clipBatch.report) - len(clipBatch.failedJobs()), len(clipBatch.failedJobs()), reportFilePath))
+
+	return clipBatch.report
+
+# ==============================================================================
+
+def detect(jobFilePath, minConfidence=None, rebuildIndex=False):
+
+	''' Writes the job file of all clip sites found in the model with at least the given confidence. '''
+
+	if minConfidence is None:
+		minConfidence = batch_items.clip_detection.MIN_CONFIDENCE
+
+	clipSites = batch_items.clip_detection.findClipSites(float(minConfidence), rebuildIndex=rebuildIndex)
+	batch_items.writeJobFile([clipSite.toRow() for clipSite in clipSites], jobFilePath)
+
+	print('%s clip sites written to: %s' % (len(clipSites), jobFilePath))
+
+	return clipSites
+
+# ==============================================================================
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+
+	main(*sys.argv[1:4])
@@ -0,0 +1,399 @@
+# PYTHON script
+import os
+import gzip
+import json
+import time
+import functools
+import collections
+
+import numpy as np
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+ansa.ImportCode(os.path.join(PATH_SELF, 'profiling.py'))
+
+# ==============================================================================
+
+TRACE_VERSION = 1
+# directory the traces of interactive sessions are recorded to
+TRACE_DIRECTORY_VARIABLE = 'SMARTCLIP_TRACE_DIR'
+
+BASE_FUNCTIONS = profiling.BASE_FUNCTIONS + [
+	'F11PresParamsOptionsGet', 'F11PresParamsOptionsSet', 'SetCurrentMenu', 'SetViewButton', 'SetViewAngles', 'BestView']
+MESH_FUNCTIONS = profiling.MESH_FUNCTIONS
+
+COLLECTOR_REPORT = 'CollectNewModelEntities.report'
+
+# ==============================================================================
+
+class ApiTraceException(Exception): pass
+
+# ==============================================================================
+
+class TraceRecorder(object):
+
+	''' Records arguments and return values of all ANSA API calls made while active. '''
+
+	_active = None
+
+	def __init__(self):
+
+		self.calls = list()
+		self._depth = 0
+
+	#-------------------------------------------------------------------------
+
+	@classmethod
+	def active(cls):
+		return cls._active
+
+	#-------------------------------------------------------------------------
+
+	def start(self):
+
+		installRecordingWrappers()
+		TraceRecorder._active = self
+
+	#-------------------------------------------------------------------------
+
+	def stop(self):
+
+		if TraceRecorder._active is self:
+			TraceRecorder._active = None
+
+	#-------------------------------------------------------------------------
+
+	def call(self, functionName, function, args, kwargs):
+
+		''' Calls the API function and records the call. Calls made by the API function itself are not recorded. '''
+
+		if self._depth > 0:
+			return function(*args, **kwargs)
+
+		self._depth += 1
+		try:
+			result = function(*args, **kwargs)
+		except Exception as e:
+			self.calls.append([functionName, serialise(args), serialise(kwargs), {'__error__': str(e)}])
+			raise
+		finally:
+			self._depth -= 1
+
+		self.calls.append([functionName, serialise(args), serialise(kwargs), serialise(result)])
+
+		if functionName == 'CollectNewModelEntities':
+			return _RecordedCollector(self, result)
+
+		return result
+
+	#-------------------------------------------------------------------------
+
+	def save(self, fileName, smartClip, mirror):
+
+		''' Saves the trace together with the clip settings needed for its replay. '''
+
+		trace = {'version': TRACE_VERSION,
+			'geom_type': smartClip.geomType().NAME, 'beam_type': smartClip.beamType().NAME,
+			'projection': smartClip.projectionBackend().NAME,
+			'interactive': smartClip.interactive, 'visualize': smartClip.visualize, 'mirror': mirror,
+			'calls': self.calls}
+
+		with gzip.open(fileName, 'wt') as traceFile:
+			json.dump(trace, traceFile, separators=(',', ':'))
+
+# ==============================================================================
+
+class _RecordedCollector(object):
+
+	''' New entities collector recording its report. '''
+
+	def __init__(self, recorder, collector):
+
+		self.recorder = recorder
+		self.collector = collector
+
+	#-------------------------------------------------------------------------
+
+	def report(self):
+
+		return self.recorder.call(COLLECTOR_REPORT, self.collector.report, tuple(), dict())
+
+# ==============================================================================
+
+class ReplayEntity(object):
+
+	''' Entity of a replayed trace identified by its type and id. '''
+
+	def __init__(self, ansaType, entityId):
+
+		self._id = entityId
+		self._ansaType = ansaType
+
+	#-------------------------------------------------------------------------
+
+	def ansa_type(self, deck=None):
+		return self._ansaType
+
+	#-------------------------------------------------------------------------
+
+	def __repr__(self):
+		return '<ReplayEntity %s %s>' % (self._ansaType, self._id)
+
+# ==============================================================================
+
+class TracePlayer(object):
+
+	''' Replaces the ANSA API functions by the recorded calls.
+
+	Calls are matched by the function name and arguments, the last recorded result is returned
+	again for repeated calls. A call not found in the trace (mismatch) means the replayed pipeline
+	diverged from the recorded one and the replay fails. Lenient replay takes the next unused call
+	of the same function instead. '''
+
+	def __init__(self, trace, lenient=False):
+
+		self.trace = trace
+		self.lenient = lenient
+		self.entities = dict()
+		self.statistics = collections.Counter()
+
+		self._calls = collections.defaultdict(collections.deque)
+		self._functionCalls = collections.defaultdict(collections.deque)
+		self._lastResults = dict()
+		self._usedCalls = set()
+		for index, (functionName, args, kwargs, result) in enumerate(trace['calls']):
+			self._calls[_getCallKey(functionName, args, kwargs)].append(index)
+			self._functionCalls[functionName].append(index)
+
+	#-------------------------------------------------------------------------
+
+	def install(self):
+
+		''' Replaces the API functions of ansa.base and ansa.mesh by the trace. '''
+
+		for module, functionNames in ((base, BASE_FUNCTIONS), (ansa.mesh, MESH_FUNCTIONS)):
+			for functionName in functionNames:
+				setattr(module, functionName, self._getReplayFunction(functionName))
+
+	#-------------------------------------------------------------------------
+
+	def _getReplayFunction(self, functionName):
+
+		def replayFunction(*args, **kwargs):
+			return self.call(functionName, args, kwargs)
+
+		replayFunction.__name__ = functionName
+
+		return replayFunction
+
+	#-------------------------------------------------------------------------
+
+	def call(self, functionName, args, kwargs):
+
+		key = _getCallKey(functionName, serialise(args), serialise(kwargs))
+
+		index = self._nextUnused(self._calls[key])
+		if index is not None:
+			self.statistics['matched'] += 1
+		elif key in self._lastResults:
+			self.statistics['repeated'] += 1
+			index = self._lastResults[key]
+		else:
+			if not self.lenient:
+				raise ApiTraceException('Call of %s with different arguments than recorded! (%s. call)' % (
+					functionName, sum(self.statistics.values()) + 1))
+			index = self._nextUnused(self._functionCalls[functionName])
+			if index is None:
+				raise ApiTraceException('Call of %s not found in the trace!' % functionName)
+			self.statistics['mismatched'] += 1
+
+		self._usedCalls.add(index)
+		self._lastResults[key] = index
+
+		result = self.trace['calls'][index][3]
+		if isinstance(result, dict) and '__error__' in result:
+			raise ApiTraceException(result['__error__'])
+		if functionName == 'CollectNewModelEntities':
+			return _ReplayCollector(self)
+
+		return self.deserialise(result)
+
+	#-------------------------------------------------------------------------
+
+	def _nextUnused(self, indexes):
+
+		while len(indexes) > 0:
+			index = indexes.popleft()
+			if index not in self._usedCalls:
+				return index
+
+		return None
+
+	#-------------------------------------------------------------------------
+
+	def getEntity(self, ansaType, entityId):
+
+		key = (ansaType, entityId)
+		if key not in self.entities:
+			self.entities[key] = ReplayEntity(ansaType, entityId)
+
+		return self.entities[key]
+
+	#-------------------------------------------------------------------------
+
+	def deserialise(self, value):
+
+		if isinstance(value, list):
+			return [self.deserialise(item) for item in value]
+		if not isinstance(value, dict):
+			return value
+		if '__entity__' in value:
+			return self.getEntity(*value['__entity__'])
+		if '__object__' in value:
+			return value['__object__']
+
+		return dict((key, self.deserialise(item)) for key, item in value.items())
+
+	#-------------------------------------------------------------------------
+
+	def unusedCalls(self):
+
+		return len(self.trace['calls']) - len(self._usedCalls)
+
+	#-------------------------------------------------------------------------
+
+	def printStatistics(self):
+
+		print('API trace replay: %s calls matched, %s repeated, %s mismatched, %s recorded calls not used.' % (
+			self.statistics['matched'], self.statistics['repeated'], self.statistics['mismatched'], self.unusedCalls()))
+
+# ==============================================================================
+
+class _ReplayCollector(object):
+
+	def __init__(self, player):
+
+		self.player = player
+
+	#-------------------------------------------------------------------------
+
+	def report(self):
+
+		return self.player.call(COLLECTOR_REPORT, tuple(), dict())
+
+# ==============================================================================
+
+def serialise(value):
+
+	''' Converts API arguments and results to JSON compatible values. Entities are stored by their type and id. '''
+
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	if isinstance(value, np.generic):
+		return value.item()
+	if isinstance(value, (list, tuple, np.ndarray)):
+		return [serialise(item) for item in value]
+	if isinstance(value, dict):
+		return dict((str(key), serialise(item)) for key, item in value.items())
+	if hasattr(value, '_id') and hasattr(value, 'ansa_type'):
+		return {'__entity__': [value.ansa_type(constants.ABAQUS), value._id]}
+
+	return {'__object__': repr(value)}
+
+# ==============================================================================
+
+def _getCallKey(functionName, args, kwargs):
+
+	return functionName + json.dumps(_normalised([args, kwargs]), sort_keys=True)
+
+# ==============================================================================
+
+def _normalised(value):
+
+	''' Numbers formatted to be insensitive to round-off of the computed coordinates. '''
+
+	if isinstance(value, float):
+		return '%.9g' % value
+	if isinstance(value, list):
+		return [_normalised(item) for item in value]
+	if isinstance(value, dict):
+		return dict((key, _normalised(item)) for key, item in value.items())
+
+	return value
+
+# ==============================================================================
+
+def installRecordingWrappers():
+
+	''' Replaces ansa.base and ansa.mesh functions by recording wrappers. Calls are passed through
+	if there is no active recorder. '''
+
+	for module, functionNames in ((base, BASE_FUNCTIONS), (ansa.mesh, MESH_FUNCTIONS)):
+		for functionName in functionNames:
+			function = getattr(module, functionName, None)
+			if function is None or hasattr(function, 'recordedFunction'):
+				continue
+			setattr(module, functionName, _wrapApiFunction(functionName, function))
+
+# ==============================================================================
+
+def _wrapApiFunction(functionName, function):
+
+	@functools.wraps(function)
+	def recordedFunction(*args, **kwargs):
+		recorder = TraceRecorder.active()
+		if recorder is None:
+			return function(*args, **kwargs)
+
+		return recorder.call(functionName, function, args, kwargs)
+
+	recordedFunction.recordedFunction = function
+
+	return recordedFunction
+
+# ==============================================================================
+
+def startRecording():
+
+	''' Starts recording of the session if the trace directory is set in the environment. '''
+
+	if not os.environ.get(TRACE_DIRECTORY_VARIABLE):
+		return None
+
+	recorder = TraceRecorder()
+	recorder.start()
+
+	return recorder
+
+# ==============================================================================
+
+def saveRecording(recorder, smartClip, mirror):
+
+	''' Stops recording and saves the trace to the trace directory. Returns the trace file name. '''
+
+	recorder.stop()
+
+	traceDirectory = os.environ.get(TRACE_DIRECTORY_VARIABLE, os.getcwd())
+	fileName = os.path.join(traceDirectory, 'smartClip_%s.trace.json.gz' % time.strftime('%Y%m%d_%H%M%S'))
+	recorder.save(fileName, smartClip, mirror)
+
+	print('SmartClip API trace saved: %s' % fileName)
+
+	return fileName
+
+# ==============================================================================
+
+def loadTrace(fileName):
+
+	with gzip.open(fileName, 'rt') as traceFile:
+		trace = json.load(traceFile)
+
+	if trace.get('version') != TRACE_VERSION:
+		raise ApiTraceException('Unsupported trace version: %s' % trace.get('version'))
+
+	return trace
@@ -10,6 +10,8 @@ from ansa import base, constants, guitk
 
 PATH_SELF = os.path.dirname(os.path.realpath(__file__))
 
+ansa.ImportCode(os.path.join(PATH_SELF, 'redraw.py'))
+
 # ==============================================================================
 
 class SmartClipException(Exception): pass
@@ -62,6 +64,7 @@ class ClipCoorSys(object):
 
 	#-------------------------------------------------------------------------
 
+	@redraw.batched
 	def rotateX(self, direction):
 		
 		self._checkCurrentPosition()
@@ -70,13 +73,15 @@ class ClipCoorSys(object):
 			self.originCoords[0], self.originCoords[1], self.originCoords[2],
 			self.originCoords[0] + self.vectorX[0], self.originCoords[1] + self.vectorX[1], self.originCoords[2] + self.vectorX[2],
 			direction*1.0,
-			[self.coorSysEntity], draw_results=True)
+			[self.coorSysEntity], draw_results=redraw.drawResults())
+		redraw.redrawAll()
 		
 		self._checkCurrentPosition()
 		self.parentClip.geomType().updateVectors()
 
 	#-------------------------------------------------------------------------
 
+	@redraw.batched
 	def rotateY(self, direction):
 		
 		self._checkCurrentPosition()
@@ -85,13 +90,15 @@ class ClipCoorSys(object):
 			self.originCoords[0], self.originCoords[1], self.originCoords[2],
 			self.originCoords[0] + self.vectorY[0], self.originCoords[1] + self.vectorY[1], self.originCoords[2] + self.vectorY[2],
 			direction*1.0,
-			[self.coorSysEntity], draw_results=True)
+			[self.coorSysEntity], draw_results=redraw.drawResults())
+		redraw.redrawAll()
 		
 		self._checkCurrentPosition()
 		self.parentClip.geomType().updateVectors()
 			
 	#-------------------------------------------------------------------------
 
+	@redraw.batched
 	def rotateZ(self, direction):
 
 		self._checkCurrentPosition()
@@ -100,7 +107,8 @@ class ClipCoorSys(object):
 			self.originCoords[0], self.originCoords[1], self.originCoords[2],
 			self.originCoords[0] + self.vectorZ[0], self.originCoords[1] + self.vectorZ[1], self.originCoords[2] + self.vectorZ[2],
 			direction*1.0,
-			[self.coorSysEntity], draw_results=True)
+			[self.coorSysEntity], draw_results=redraw.drawResults())
+		redraw.redrawAll()
 		
 		self._checkCurrentPosition()
 		self.parentClip.geomType().updateVectors()
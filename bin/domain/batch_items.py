@@ -0,0 +1,431 @@
+# PYTHON script
+import os
+import csv
+import json
+import time
+from traceback import format_exc
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+ansa.ImportCode(os.path.join(PATH_SELF, 'base_items.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'comp_items.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'model_data.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'profiling.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'property_registry.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'redraw.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'clip_detection.py'))
+
+# ==============================================================================
+
+STATUS_OK = 'OK'
+STATUS_FAILED = 'FAILED'
+
+STOP_DISTANCE_NAMES = ['xLow', 'xUp', 'yLow', 'yUp', 'zLow', 'zUp']
+REPORT_FIELDS = ['con_id', 'geom_type', 'beam_type', 'projection', 'mirror', 'status', 'message'] + STOP_DISTANCE_NAMES + [
+	'stops_reused', 'cs_nodes', 'ccs_nodes', 'time']
+
+# entity types created by the clip pipeline, entities of failed clips are deleted except
+# the shared definitions still used by other clips
+CLIP_ENTITY_TYPES = ['NODE', 'POINT', 'MEASUREMENT', 'ORIENTATION_R', 'CONNECTOR', 'BEAM', 'CONNECTOR_STOP',
+	'CONNECTOR BEHAVIOR', 'CONNECTOR_SECTION', 'CONNECTOR_ELASTICITY', 'BEAM_SECTION', 'MATERIAL']
+
+# ==============================================================================
+
+class ClipJob(object):
+
+	''' One clip of the batch job file.
+
+	Node selection rules are optional: cs_elements/ccs_elements are SHELL ids used
+	instead of the nearest element heuristics for the clip side/clip contra side beams,
+	search_radius limits the nearest element search. Stop distances of an identical clip site
+	are reused unless recompute_stops is set. '''
+
+	DFT_GEOM_TYPE = 'Standard'
+	DFT_BEAM_TYPE = 'AUDI'
+	DFT_MIRROR = True
+	DFT_PROJECTION = comp_items.SmartClip.PROJECTION_BACKEND
+
+	def __init__(self, conId, geomType=None, beamType=None, mirror=None, topFaceId=None,
+		csElementIds=None, ccsElementIds=None, searchRadius=None, recomputeStops=False, projection=None):
+
+		self.conId = int(conId)
+		self.geomType = self.DFT_GEOM_TYPE if geomType is None else geomType
+		self.beamType = self.DFT_BEAM_TYPE if beamType is None else beamType
+		self.mirror = self.DFT_MIRROR if mirror is None else mirror
+		self.topFaceId = topFaceId
+		self.csElementIds = list() if csElementIds is None else csElementIds
+		self.ccsElementIds = list() if ccsElementIds is None else ccsElementIds
+		self.searchRadius = searchRadius
+		self.recomputeStops = recomputeStops
+		self.projection = self.DFT_PROJECTION if projection is None else projection
+
+	#-------------------------------------------------------------------------
+
+	@classmethod
+	def fromRow(cls, row):
+
+		''' Creates a job from JSON object or CSV row. Empty CSV values are taken as not given. '''
+
+		row = dict((key.strip().lower(), value) for key, value in row.items() if value not in (None, ''))
+		nodeRules = row.get('nodes', dict())
+
+		def getValue(name, default=None):
+			return nodeRules.get(name, row.get(name, default))
+
+		if 'con_id' not in row:
+			raise base_items.SmartClipException('Missing con_id in job definition: %s' % row)
+
+		searchRadius = getValue('search_radius')
+
+		return cls(
+			row['con_id'], row.get('geom_type'), row.get('beam_type'),
+			_toBool(row['mirror']) if 'mirror' in row else None,
+			int(row['top_face']) if 'top_face' in row else None,
+			_toIds(getValue('cs_elements')), _toIds(getValue('ccs_elements')),
+			float(searchRadius) if searchRadius is not None else None,
+			_toBool(row['recompute_stops']) if 'recompute_stops' in row else False,
+			row.get('projection'))
+
+	#-------------------------------------------------------------------------
+
+	def check(self):
+
+		if self.geomType not in comp_items.CLIP_GEOM_TYPES:
+			raise base_items.SmartClipException('No such a geom type "%s" defined.' % self.geomType)
+		if self.beamType not in comp_items.CLIP_BEAM_TYPES:
+			raise base_items.SmartClipException('No such a beam type "%s" defined.' % self.beamType)
+		if self.projection not in comp_items.projection.PROJECTION_BACKENDS:
+			raise base_items.SmartClipException('No such a projection backend "%s" defined.' % self.projection)
+
+# ==============================================================================
+
+class ClipBatch(object):
+
+	''' Creates clips of all jobs without any user interaction and reports status of each clip.
+
+	Clips are mirrored all at once after the last job (batchMirror) or one by one. All the entities
+	created for a failed clip are deleted. If the batch mirror fails, the clips are mirrored
+	one by one again and only the clips failing on their own are deleted.
+
+	Model spatial index built in the session is kept unless disabled (keepSpatialIndex) - it follows
+	the entities created, deleted and remeshed by SmartClip, but it must be rebuilt if the mesh
+	was moved or edited otherwise. It is shared by the clips of more jobs, a single clip indexes
+	its surroundings only. Stop distances computed before the batch are dropped, those of
+	identical clip sites within the batch are reused unless disabled (reuseStopDistances). '''
+
+	def __init__(self, jobs, batchMirror=True, keepSpatialIndex=True, reuseStopDistances=True):
+
+		self.jobs = list(jobs)
+		self.batchMirror = batchMirror
+		self.keepSpatialIndex = keepSpatialIndex
+		self.reuseStopDistances = reuseStopDistances
+		self.report = list()
+		self.profiles = list()
+		self.mirroredClips = list()
+
+	#-------------------------------------------------------------------------
+
+	@classmethod
+	def fromFile(cls, jobFilePath, keepSpatialIndex=True):
+
+		return cls(readJobFile(jobFilePath), keepSpatialIndex=keepSpatialIndex)
+
+	#-------------------------------------------------------------------------
+
+	@classmethod
+	def fromClipSites(cls, clipSites):
+
+		''' Creates the batch of clip sites found by the clip site scanner. The spatial index
+		built by the scan is kept. '''
+
+		return cls([ClipJob.fromRow(clipSite.toRow()) for clipSite in clipSites])
+
+	#-------------------------------------------------------------------------
+
+	def run(self):
+
+		comp_items.invalidateModelCaches(keepSpatialIndex=self.keepSpatialIndex)
+		if len(self.jobs) > 1:
+			model_data.MODEL_INDEX.update()
+
+		self.report = list()
+		self.profiles = list()
+		self.mirroredClips = list()
+		for index, job in enumerate(self.jobs):
+			print('Creating clip %s/%s: CON %s (%s, %s)' % (index + 1, len(self.jobs), job.conId, job.geomType, job.beamType))
+			status = self.runJob(job)
+			print('%s %s' % (status['status'], status['message']))
+			self.report.append(status)
+
+		if len(self.mirroredClips) > 0:
+			self.mirrorClips()
+
+		return self.report
+
+	#-------------------------------------------------------------------------
+
+	def mirrorClips(self):
+
+		''' Mirrors all successfully created clips of the jobs to be mirrored at once. Entities
+		of a failed batch mirror are deleted and the clips are mirrored one by one. '''
+
+		print('Mirroring %s clips' % len(self.mirroredClips))
+
+		profile = profiling.ClipProfile('mirror')
+		profile.activate()
+		self.profiles.append(profile)
+
+		startTime = time.time()
+		collector = base.CollectNewModelEntities(constants.ABAQUS, CLIP_ENTITY_TYPES)
+		try:
+			comp_items.SymmetricalClipBatch([smartClip for smartClip, status, clipEntities in self.mirroredClips]).mirrorClips()
+		except Exception as e:
+			print(format_exc())
+			print('Batch mirror failed: %s, mirroring clips one by one' % str(e))
+			self._deleteEntities(collector.report())
+			for smartClip, status, clipEntities in self.mirroredClips:
+				self._mirrorClip(smartClip, status, clipEntities)
+		finally:
+			profile.deactivate()
+
+		# mirror time is split among the mirrored clips
+		mirrorTime = (time.time() - startTime)/len(self.mirroredClips)
+		for smartClip, status, clipEntities in self.mirroredClips:
+			status['time'] = round(status['time'] + mirrorTime, 3)
+
+	#-------------------------------------------------------------------------
+
+	def _mirrorClip(self, smartClip, status, clipEntities):
+
+		''' Mirrors one clip, the failed clip is deleted with all its mirrored entities. '''
+
+		collector = base.CollectNewModelEntities(constants.ABAQUS, CLIP_ENTITY_TYPES)
+		try:
+			comp_items.SymmetricalClipBatch([smartClip]).mirrorClips()
+		except Exception as e:
+			print(format_exc())
+			status['status'] = STATUS_FAILED
+			status['message'] = 'Mirror failed: %s' % str(e)
+			self._deleteEntities(collector.report() + clipEntities)
+
+	#-------------------------------------------------------------------------
+
+	def runJob(self, job):
+
+		''' Runs the whole SmartClip pipeline for one job. All the entities created by a failed clip are deleted. '''
+
+		status = {'con_id': job.conId, 'geom_type': job.geomType, 'beam_type': job.beamType,
+			'projection': job.projection, 'mirror': job.mirror, 'status': STATUS_FAILED, 'message': ''}
+
+		startTime = time.time()
+		smartClip = None
+		collector = base.CollectNewModelEntities(constants.ABAQUS, CLIP_ENTITY_TYPES)
+		try:
+			job.check()
+
+			smartClip = comp_items.SmartClip(job.geomType, job.beamType)
+			smartClip.setProjectionBackend(job.projection)
+			smartClip.profile.name = 'CON %s' % job.conId
+			self.profiles.append(smartClip.profile)
+			smartClip.interactive = False
+			smartClip.visualize = False
+			self._presetSelections(smartClip, job)
+
+			createClip(smartClip, job.mirror and not self.batchMirror)
+
+			geomType = smartClip.geomType()
+			beamType = smartClip.beamType()
+			status.update(dict((name, getattr(geomType, name)) for name in STOP_DISTANCE_NAMES))
+			status['stops_reused'] = geomType.stopDistancesReused
+			status['cs_nodes'] = len(beamType.beamNodesCs)
+			status['ccs_nodes'] = len(beamType.beamNodesCcs)
+			status['status'] = STATUS_OK
+
+			if job.mirror and self.batchMirror:
+				self.mirroredClips.append((smartClip, status, collector.report()))
+
+		except base_items.SmartClipException as e:
+			status['message'] = str(e)
+		except Exception as e:
+			print(format_exc())
+			status['message'] = '%s: %s' % (e.__class__.__name__, str(e))
+
+		if status['status'] == STATUS_FAILED:
+			self._deleteEntities(collector.report())
+
+		if smartClip is not None:
+			smartClip._restoreF11drawingSettings()
+			smartClip.profile.deactivate()
+
+		status['time'] = round(time.time() - startTime, 3)
+
+		return status
+
+	#-------------------------------------------------------------------------
+
+	def _presetSelections(self, smartClip, job):
+
+		con = base.GetEntity(constants.ABAQUS, 'CONS', job.conId)
+		if con is None:
+			raise base_items.SmartClipException('CON %s not found!' % job.conId)
+		smartClip.geomType().guidingCon = con
+
+		if job.topFaceId is not None:
+			smartClip.geomType().guidingTopFace = _getEntities('FACE', [job.topFaceId])[0]
+
+		beamType = smartClip.beamType()
+		beamType.selectedElementsBeamCs = _getEntities('SHELL', job.csElementIds)
+		beamType.selectedElementsBeamCcs = _getEntities('SHELL', job.ccsElementIds)
+		if job.searchRadius is not None:
+			beamType.NEAREST_ELEMENTS_RADIUS = job.searchRadius
+		smartClip.geomType().reuseStopDistances = self.reuseStopDistances and not job.recomputeStops
+
+	#-------------------------------------------------------------------------
+
+	def _deleteEntities(self, entities):
+
+		''' Deletes entities of the failed clip. Shared definitions of the property registry
+		are deleted only if no other clip uses them. '''
+
+		registry = property_registry.PROPERTY_REGISTRY
+		definitions = [entity for entity in entities if registry.isDefinition(entity)]
+		entities = [entity for entity in entities if not registry.isDefinition(entity)]
+
+		if len(entities) > 0:
+			model_data.deleteEntities(entities, force=True)
+		registry.deleteUnreferenced(definitions)
+
+	#-------------------------------------------------------------------------
+
+	def failedJobs(self):
+
+		return [status for status in self.report if status['status'] != STATUS_OK]
+
+	#-------------------------------------------------------------------------
+
+	def writeProfiles(self, profileFilePath):
+
+		''' Writes stage times and API calls of all clips as JSON. '''
+
+		with open(profileFilePath, 'w') as profileFile:
+			json.dump([profile.toDict() for profile in self.profiles], profileFile, indent=4)
+
+	#-------------------------------------------------------------------------
+
+	def writeReport(self, reportFilePath):
+
+		''' Writes the per clip status report as JSON or CSV according to the file extension. '''
+
+		if os.path.splitext(reportFilePath)[1].lower() == '.json':
+			with open(reportFilePath, 'w') as reportFile:
+				json.dump(self.report, reportFile, indent=4)
+			return
+
+		with open(reportFilePath, 'w') as reportFile:
+			writer = csv.DictWriter(reportFile, fieldnames=REPORT_FIELDS, extrasaction='ignore', lineterminator='\n')
+			writer.writeheader()
+			for status in self.report:
+				writer.writerow(status)
+
+# ==============================================================================
+
+def createClip(smartClip, mirror=True):
+
+	''' Runs the whole SmartClip pipeline in the order of the wizard steps. The model
+	is redrawn once the clip is created. '''
+
+	geomType = smartClip.geomType()
+	beamType = smartClip.beamType()
+
+	with redraw.redrawBatch():
+		geomType.setBaseFaces()
+		geomType.createCoorSystem()
+		geomType.setStopDistances()
+
+		beamType.createNodesForConnector()
+		beamType.createConnector()
+
+		geomType.hideMeasurements()
+		geomType.hidePoints()
+		comp_items.hideAllFaces()
+		beamType.createBeamsConnectorClipSide()
+		beamType.createBeamsConnectorClipContraSide()
+
+		if mirror:
+			comp_items.SymmetricalClip(smartClip)
+
+# ==============================================================================
+
+def readJobFile(jobFilePath):
+
+	''' Returns list of ClipJobs defined in JSON (list of clips or {"clips": [...]}) or CSV file. '''
+
+	with open(jobFilePath) as jobFile:
+		if os.path.splitext(jobFilePath)[1].lower() == '.json':
+			rows = json.load(jobFile)
+			if isinstance(rows, dict):
+				rows = rows.get('clips', list())
+		else:
+			rows = list(csv.DictReader(jobFile))
+
+	return [ClipJob.fromRow(row) for row in rows]
+
+# ==============================================================================
+
+def writeJobFile(rows, jobFilePath, fieldNames=None):
+
+	''' Writes job rows as JSON ({"clips": [...]}) or CSV file according to its extension. '''
+
+	if os.path.splitext(jobFilePath)[1].lower() == '.json':
+		with open(jobFilePath, 'w') as jobFile:
+			json.dump({'clips': rows}, jobFile, indent=4)
+		return
+
+	if fieldNames is None:
+		fieldNames = clip_detection.JOB_FIELDS
+
+	with open(jobFilePath, 'w') as jobFile:
+		writer = csv.DictWriter(jobFile, fieldnames=fieldNames, extrasaction='ignore', lineterminator='\n')
+		writer.writeheader()
+		for row in rows:
+			writer.writerow(row)
+
+# ==============================================================================
+
+def _getEntities(ansaType, ids):
+
+	entities = list()
+	for entityId in ids:
+		entity = base.GetEntity(constants.ABAQUS, ansaType, entityId)
+		if entity is None:
+			raise base_items.SmartClipException('%s %s not found!' % (ansaType, entityId))
+		entities.append(entity)
+
+	return entities
+
+# ==============================================================================
+
+def _toIds(value):
+
+	''' Converts list of ids or string of ids separated by spaces, commas or semicolons. '''
+
+	if value is None:
+		return list()
+	if isinstance(value, (list, tuple)):
+		return [int(item) for item in value]
+
+	return [int(item) for item in str(value).replace(';', ' ').replace(',', ' ').split()]
+
+# ==============================================================================
+
+def _toBool(value):
+
+	if isinstance(value, bool):
+		return value
+
+	return str(value).strip().lower() in ('1', 'yes', 'true', 'y')
@@ -0,0 +1,291 @@
+# PYTHON script
+import os
+import collections
+
+import numpy as np
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+ansa.ImportCode(os.path.join(PATH_SELF, 'model_data.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'comp_items.py'))
+
+# ==============================================================================
+
+JOB_FIELDS = ['con_id', 'geom_type', 'confidence', 'pid', 'small_face', 'large_face', 'angle', 'area_ratio']
+
+MIN_CONFIDENCE = 0.5
+
+# ==============================================================================
+
+class ClipSite(object):
+
+	''' Candidate clip site - guiding CON between the small and the large face of one PSHELL. '''
+
+	def __init__(self, con, smallFace, largeFace, pid, angle, areaRatio, confidence):
+
+		self.con = con
+		self.smallFace = smallFace
+		self.largeFace = largeFace
+		self.pid = pid
+		self.angle = angle
+		self.areaRatio = areaRatio
+		self.confidence = confidence
+
+		self.geomType = None
+		self.conLength = None
+		self.middlePointCoords = None
+
+	#-------------------------------------------------------------------------
+
+	def toRow(self):
+
+		''' Returns the batch job row of the clip site. Fields other than con_id and geom_type
+		are informative only. '''
+
+		return collections.OrderedDict([
+			('con_id', self.con._id), ('geom_type', self.geomType), ('confidence', round(self.confidence, 3)),
+			('pid', self.pid), ('small_face', self.smallFace._id), ('large_face', self.largeFace._id),
+			('angle', round(self.angle, 1)), ('area_ratio', round(self.areaRatio, 2))])
+
+# ==============================================================================
+
+class ClipSiteScanner(object):
+
+	''' Finds candidate clip sites in the whole model.
+
+	CONs shared by two meshed faces of one PSHELL are taken as face pairs. Pairs are scored in batches
+	by vectorised checks of the guiding CON signature: the angle of face normals close to 90 degrees,
+	the large face being larger than the small face and small enough for its clip faces to be found
+	within NEAR_RADIUS. Pairs passing the checks are scored by their neighbourhood in the model spatial
+	index - presence of the mate part and of the opposite clip face, which also suggests the geom type:
+	Standard if the opposite face is found against the large face normal, Reversed otherwise.
+
+	Candidates closer than SITE_RADIUS along one PSHELL are the same clip site, the most confident
+	one is kept. Flat clips are not detected, they need the top face to be selected. '''
+
+	# allowed deviation of the face normals angle from 90 degrees
+	ANGLE_TOLERANCE = 30.0
+	# area ratio of the large and small face getting the full score
+	IDEAL_AREA_RATIO = 2.0
+	# face pairs scored at once
+	PAIR_BATCH = 500
+	SITE_RADIUS = 10.0
+	# angle limit of the opposite face search of the standard geom type
+	OPPOSITE_FACE_ANGLE = 45
+	NO_MATE_SCORE = 0.3
+	NO_OPPOSITE_FACE_SCORE = 0.5
+
+	def __init__(self, minConfidence=MIN_CONFIDENCE):
+
+		self.minConfidence = minConfidence
+		self.nearRadius = comp_items.StandardGeomType.NEAR_RADIUS
+		self.statistics = collections.Counter()
+
+	#-------------------------------------------------------------------------
+
+	def scan(self, faces=None, rebuildIndex=False):
+
+		''' Returns clip sites found among given faces or in the whole model sorted by confidence.
+		The model spatial index built in the session is kept unless rebuildIndex is set
+		(the mesh was moved or edited outside of SmartClip since it was built). '''
+
+		comp_items.invalidateModelCaches(keepSpatialIndex=not rebuildIndex)
+		model_data.MODEL_INDEX.update()
+		if faces is None:
+			faces = base.CollectEntities(constants.ABAQUS, None, "FACE")
+
+		self.statistics = collections.Counter()
+		self.statistics['faces'] = len(faces)
+
+		cons, pairs = self._getFacePairs(faces)
+
+		sites = list()
+		for start in range(0, len(pairs), self.PAIR_BATCH):
+			sites.extend(self._scorePairs(faces, cons[start:start + self.PAIR_BATCH], pairs[start:start + self.PAIR_BATCH]))
+		self.statistics['candidates'] = len(sites)
+
+		for site in sites:
+			self._scoreNeighbourhood(site)
+
+		sites = [site for site in sites if site.confidence >= self.minConfidence]
+		sites = self._removeDuplicateSites(sites)
+		self.statistics['sites'] = len(sites)
+
+		return sites
+
+	#-------------------------------------------------------------------------
+
+	def _getFacePairs(self, faces):
+
+		''' Returns CONs shared by two meshed faces of the same PID and (N, 2) indexes of their faces. '''
+
+		facePids = np.zeros(len(faces), dtype=int)
+		meshed = model_data.MODEL_INDEX.boundingBoxes(faces)[2]
+
+		conFaceIndexes = collections.OrderedDict()
+		for index in np.flatnonzero(meshed):
+			facePids[index] = model_data.MODEL_INDEX.pid(faces[index])
+			for con in base.CollectEntities(constants.ABAQUS, [faces[index]], "CONS"):
+				conFaceIndexes.setdefault(con, list()).append(index)
+
+		cons = [con for con, faceIndexes in conFaceIndexes.items() if len(faceIndexes) == 2]
+		pairs = np.array([conFaceIndexes[con] for con in cons], dtype=int).reshape(-1, 2)
+
+		samePid = facePids[pairs[:, 0]] == facePids[pairs[:, 1]]
+		self.statistics['cons'] = len(conFaceIndexes)
+		self.statistics['pairs'] = int(samePid.sum())
+
+		return [con for con, same in zip(cons, samePid) if same], pairs[samePid]
+
+	#-------------------------------------------------------------------------
+
+	def _scorePairs(self, faces, cons, pairs):
+
+		''' Returns clip site candidates of the face pairs matching the guiding CON signature. '''
+
+		faceIndexes, pairIndexes = np.unique(pairs, return_inverse=True)
+		pairIndexes = pairIndexes.reshape(-1, 2)
+
+		batchFaces = [faces[index] for index in faceIndexes]
+		areas = np.array([model_data.FACE_ATTRIBUTES.area(face) for face in batchFaces], dtype=float)
+		normals = np.array([model_data.FACE_ATTRIBUTES.orientation(face) for face in batchFaces], dtype=float)
+		normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+		boxMins, boxMaxs = model_data.MODEL_INDEX.boundingBoxes(batchFaces)[:2]
+
+		# small face first as in the guiding CON search
+		swapped = areas[pairIndexes[:, 0]] > areas[pairIndexes[:, 1]]
+		pairIndexes[swapped] = pairIndexes[swapped][:, ::-1]
+		smallIndexes, largeIndexes = pairIndexes[:, 0], pairIndexes[:, 1]
+
+		cosines = np.einsum('ij,ij->i', normals[smallIndexes], normals[largeIndexes])
+		angles = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+		areaRatios = areas[largeIndexes]/np.maximum(areas[smallIndexes], 1e-12)
+		diagonals = np.linalg.norm(boxMaxs[largeIndexes] - boxMins[largeIndexes], axis=1)
+
+		angleScores = np.clip(1 - np.abs(angles - 90)/self.ANGLE_TOLERANCE, 0, 1)
+		areaScores = np.clip((areaRatios - 1)/(self.IDEAL_AREA_RATIO - 1), 0, 1)
+		sizeScores = np.clip(2*self.nearRadius/np.maximum(diagonals, 1e-12), 0, 1)
+		confidences = angleScores*areaScores*sizeScores
+
+		sites = list()
+		for index in np.flatnonzero(confidences > 0):
+			sites.append(ClipSite(cons[index], batchFaces[smallIndexes[index]], batchFaces[largeIndexes[index]],
+				model_data.MODEL_INDEX.pid(batchFaces[largeIndexes[index]]), float(angles[index]),
+				float(areaRatios[index]), float(confidences[index])))
+
+		return sites
+
+	#-------------------------------------------------------------------------
+
+	def _scoreNeighbourhood(self, site):
+
+		''' Scores the site by faces around its large face and suggests its geom type. '''
+
+		site.middlePointCoords = comp_items.getConMiddle(site.con)
+		site.conLength = comp_items.getConLength(site.con)
+
+		nearFaces = model_data.MODEL_INDEX.neighbourhood([site.largeFace], self.nearRadius, update=False)[0]
+		clipFaces = [face for face in nearFaces if model_data.MODEL_INDEX.pid(face) == site.pid
+			and face not in (site.smallFace, site.largeFace)]
+
+		mateFaces = [face for face in nearFaces if model_data.MODEL_INDEX.pid(face) != site.pid]
+		if len(mateFaces) == 0:
+			site.confidence *= self.NO_MATE_SCORE
+
+		largeFaceNormal = np.array(model_data.FACE_ATTRIBUTES.orientation(site.largeFace))
+		if self._hasOppositeFace(site, clipFaces, largeFaceNormal):
+			site.geomType = comp_items.StandardGeomType.NAME
+			return
+
+		site.geomType = comp_items.ReversedGeomType.NAME
+		# reversed type flips the large face normal
+		if not self._hasOppositeFace(site, clipFaces, -1*largeFaceNormal):
+			site.confidence *= self.NO_OPPOSITE_FACE_SCORE
+
+	#-------------------------------------------------------------------------
+
+	def _hasOppositeFace(self, site, clipFaces, largeFaceNormal):
+
+		''' Returns True if any clip face facing the large face is hit by the ray from the CON middle
+		against the large face normal. '''
+
+		if len(clipFaces) == 0:
+			return False
+
+		direction = -1*largeFaceNormal/np.linalg.norm(largeFaceNormal)
+		normals = np.array([model_data.FACE_ATTRIBUTES.orientation(face) for face in clipFaces], dtype=float)
+		normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+		facing = np.dot(normals, direction) >= np.cos(np.radians(self.OPPOSITE_FACE_ANGLE))
+
+		boxMins, boxMaxs = model_data.MODEL_INDEX.boundingBoxes(clipFaces)[:2]
+
+		return bool(np.any(facing & _rayHitsBoxes(site.middlePointCoords, direction, boxMins, boxMaxs)))
+
+	#-------------------------------------------------------------------------
+
+	def _removeDuplicateSites(self, sites):
+
+		''' Keeps the most confident (then the longest CON) site of the sites closer than SITE_RADIUS
+		along one PSHELL. '''
+
+		sites = sorted(sites, key=lambda site: (-site.confidence, -site.conLength, site.con._id))
+
+		keptCoords = collections.defaultdict(list)
+		keptSites = list()
+		for site in sites:
+			coords = keptCoords[site.pid]
+			if len(coords) > 0 and np.any(model_data.withinDistanceMask(coords, site.middlePointCoords, self.SITE_RADIUS)):
+				continue
+			coords.append(site.middlePointCoords)
+			keptSites.append(site)
+
+		return keptSites
+
+	#-------------------------------------------------------------------------
+
+	def printStatistics(self):
+
+		print('Clip site scan: %(faces)s faces, %(cons)s CONs, %(pairs)s face pairs of one PID, '
+			'%(candidates)s candidates, %(sites)s clip sites found.' % self.statistics)
+
+# ==============================================================================
+
+def _rayHitsBoxes(origin, direction, boxMins, boxMaxs, tolerance=1e-3):
+
+	''' Returns mask of boxes hit by the ray (slab test). Boxes are inflated by the tolerance
+	as face boxes are flat. '''
+
+	origin = np.asarray(origin, dtype=float)
+	direction = np.asarray(direction, dtype=float)
+	boxMins = boxMins - tolerance
+	boxMaxs = boxMaxs + tolerance
+
+	# axes parallel to the ray must contain the origin
+	parallel = np.abs(direction) < 1e-12
+	lower = (boxMins - origin)/np.where(parallel, 1.0, direction)
+	upper = (boxMaxs - origin)/np.where(parallel, 1.0, direction)
+	inside = (origin >= boxMins) & (origin <= boxMaxs)
+	near = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(lower, upper))
+	far = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(lower, upper))
+
+	entry = near.max(axis=1)
+	exit = far.min(axis=1)
+
+	return (entry <= exit) & (exit >= 0)
+
+# ==============================================================================
+
+def findClipSites(minConfidence=MIN_CONFIDENCE, faces=None, rebuildIndex=False):
+
+	''' Returns clip sites found in the model sorted by confidence. '''
+
+	scanner = ClipSiteScanner(minConfidence)
+	sites = scanner.scan(faces, rebuildIndex)
+	scanner.printStatistics()
+
+	return sites
@@ -1,9 +1,15 @@
 # PYTHON script
 import os
 import sys
+import threading
 import collections
 import numpy as np
 import ansa
+
+try:
+	from concurrent import futures
+except ImportError:
+	futures = None
  
 from ansa import base, constants, guitk
 
@@ -14,6 +20,13 @@ PATH_SELF = os.path.dirname(os.path.realpath(__file__))
 
 ansa.ImportCode(os.path.join(PATH_SELF, 'util.py'))
 ansa.ImportCode(os.path.join(PATH_SELF, 'base_items.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'profiling.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'redraw.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'model_data.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'spatial.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'projection.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'property_registry.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'stop_distance_cache.py'))
 
 # ==============================================================================
 
@@ -30,6 +43,77 @@ def getAnsaVersion():
 
 # ==============================================================================
 
+class StopDistanceCancelledException(base_items.SmartClipException): pass
+
+# ==============================================================================
+
+class StopDistanceProgress(object):
+	
+	''' Progress of the stop distance computation and its cancel token.
+	
+	Callback is called with (stopDistName, value 0..1) after each stop distance and each
+	projected face batch. Being used for the GUI update it is called from the main thread only,
+	face batches projected by worker threads just check the cancel token. '''
+	
+	def __init__(self, callback=None):
+		
+		self.callback = callback
+		self.cancelled = False
+		
+		self.stopDistName = ''
+		self.doneCount = 0
+		self.totalCount = 1
+	
+	#-------------------------------------------------------------------------
+	
+	def cancel(self):
+		
+		self.cancelled = True
+	
+	#-------------------------------------------------------------------------
+	
+	def checkCancelled(self):
+		
+		if self.cancelled:
+			raise StopDistanceCancelledException('STOP distance computation cancelled!')
+	
+	#-------------------------------------------------------------------------
+	
+	def start(self, stopDistNames):
+		
+		self.doneCount = 0
+		self.totalCount = max(len(stopDistNames), 1)
+		self._report(0.0)
+	
+	#-------------------------------------------------------------------------
+	
+	def stopDistanceStarted(self, stopDistName):
+		
+		self.stopDistName = stopDistName
+		self._report(float(self.doneCount)/self.totalCount)
+	
+	#-------------------------------------------------------------------------
+	
+	def stopDistanceDone(self, stopDistName):
+		
+		self.doneCount += 1
+		self._report(float(self.doneCount)/self.totalCount)
+	
+	#-------------------------------------------------------------------------
+	
+	def faceBatchDone(self, batchIndex, batchCount):
+		
+		self._report((self.doneCount + float(batchIndex + 1)/batchCount)/self.totalCount)
+	
+	#-------------------------------------------------------------------------
+	
+	def _report(self, value):
+		
+		if self.callback is not None and isMainThread():
+			self.callback(self.stopDistName, min(value, 1.0))
+
+# ==============================================================================
+
 class BaseGeomType(object):
 	container = CLIP_GEOM_TYPES
 	NAME = ''
@@ -48,6 +132,9 @@ class BaseBeamType(object):
 		
 # ==============================================================================
 
+# beam orientation vector of all clip beams
+BEAM_ORIENTATION = {'Orient': 'With Vector', 'C1' : 0, 'C2' : 1, 'C3' : -1}
+
 COLOURS = {
 	'r' :	[255, 0, 0],
 	'b' :	[0,  0, 255]}
@@ -61,10 +148,19 @@ class SmartClip(object):
 	
 	coordsDrawState = None
 	
+	PROJECTION_BACKEND = 'API'
+	
 	def __init__(self, geomType='Standard', beamType='AUDI'):
 		
+		# stage times and ANSA API calls of this clip
+		self.profile = profiling.ClipProfile()
+		self.profile.activate()
+		
 		self._geomType = None
 		self._beamType = None
+		self._projectionBackend = None
+		# mesh of the clip neighbourhood read at once after the guiding CON selection
+		self.snapshot = None
 		self.coordSystem = base_items.ClipCoorSys(self)
 		
 		self.clipEntities= dict()
@@ -75,8 +171,15 @@ class SmartClip(object):
 		# set default clip types
 		self.setGeomType(geomType)
 		self.setBeamType(beamType)
+		self.setProjectionBackend(self.PROJECTION_BACKEND)
 		
 		self.clipAreaShells = list()
+		self._clipAreaElementIndex = None
+		
+		# user selections are replaced by preset entities and heuristics if not interactive
+		self.interactive = True
+		# stop distance points and measurements are created for display only if visualised
+		self.visualize = True
 	
 	#-------------------------------------------------------------------------
 #
@@ -105,6 +208,41 @@ class SmartClip(object):
 	
 	#-------------------------------------------------------------------------
 	
+	def projectionBackend(self):
+		return self._projectionBackend
+	
+	#-------------------------------------------------------------------------
+	
+	def clipAreaElementIndex(self):
+		
+		''' Nearest element search index of clipAreaShells built on the first use. '''
+		
+		if self._clipAreaElementIndex is None:
+			if self.snapshot is not None and self.snapshot.containsShells(self.clipAreaShells):
+				self._clipAreaElementIndex = projection.ElementIndex(
+					self.clipAreaShells, *self.snapshot.shellsTriangles(self.clipAreaShells))
+			else:
+				self._clipAreaElementIndex = projection.ElementIndex(self.clipAreaShells)
+		
+		return self._clipAreaElementIndex
+	
+	#-------------------------------------------------------------------------
+	
+	def setClipAreaShells(self, shells):
+		
+		self.clipAreaShells = shells
+		self._clipAreaElementIndex = None
+	
+	#-------------------------------------------------------------------------
+	
+	def setSnapshot(self, snapshot):
+		
+		self.snapshot = snapshot
+		self._clipAreaElementIndex = None
+		self._projectionBackend.setSnapshot(snapshot)
+	
+	#-------------------------------------------------------------------------
+	
 	def setBeamType(self, beamType):
 			
 		try:
@@ -130,6 +268,24 @@ class SmartClip(object):
 		except Exception as e:
 			showMessage(str(e))
 		self._geomType  = None
+	
+	#-------------------------------------------------------------------------
+	
+	def setProjectionBackend(self, backendName):
+		
+		''' Face mesh data loaded by the backend are kept for the whole clip. '''
+		
+		try:
+			projectionBackendClass = projection.PROJECTION_BACKENDS[backendName]
+			self._projectionBackend = projectionBackendClass()
+			self._projectionBackend.setSnapshot(self.snapshot)
+			return
+		except KeyError as e:
+			showMessage('No such a projection backend "%s" defined.' % backendName)
+		except Exception as e:
+			showMessage(str(e))
+		self._projectionBackend = projection.ApiProjectionBackend()
+		self._projectionBackend.setSnapshot(self.snapshot)
 			
 	#-------------------------------------------------------------------------
     
@@ -185,17 +341,35 @@ class StandardGeomType(BaseGeomType):
 	NEAR_RADIUS = 10.0
 	CLIP_NODE_DIST = 30
 	FACE_ANGLE_LIMIT = 30
+	FACE_ANGLE_STEP = 10
+	FACE_ANGLE_MAX = 90
+	
+	# number of stop distance searches running in parallel (1 = serial search)
+	STOP_DISTANCE_WORKERS = 6
+	# seconds the parallel search waits for its workers before yielding to the caller
+	SEARCH_POLL_TIMEOUT = 0.05
+	STOP_DISTANCE_NAMES = ['zLow', 'zUp', 'xUp', 'xLow', 'yUp', 'yLow']
+	# neighbour faces projected at once between the progress reports
+	PROJECTION_FACE_BATCH = 20
 	
 	def __init__(self, parentClip):
 		
 		self.parentClip = parentClip
 		
 		self.selectedCon = None
+		self.guidingCon = None
+		self.faceAngles = model_data.FaceAngleTable()
 		self.coordSystem = self.parentClip.coordSystem
 		self.clipEntities= self.parentClip.clipEntities
 		
 		self.stopDistanceMeasurements = dict()
 		self.stopDistanceFaceCouples = dict()
+		self.stopDistanceProgress = None
+		
+		# stop distances of an identical clip site are reused unless recomputation is forced
+		self.reuseStopDistances = True
+		self.stopDistancesReused = False
+		self.foundStopDistancePoints = dict()
 		
 		self.xLow = -1000
 		self.xUp = 1000
@@ -208,34 +382,14 @@ class StandardGeomType(BaseGeomType):
 			    
     #-------------------------------------------------------------------------
     
+	@profiling.stage('projection')
 	def _getPointProjectionCoords(self, faces, pointCoords, vector, tolerance=50, searchedFaceName='face', minDist=True, recSearch=False):
 		    	
     	# check for point projection on opposite face
-		foundProjection = list()
-		foundCoordinates = list()
-		distances = list()
-		for face in faces:
-			projectedPointCoords =ansa.base.ProjectPointDirectional(
-				face, pointCoords[0], pointCoords[1], pointCoords[2],
-				vector[0], vector[1], vector[2], tolerance, project_on="faces")
-			
-			
-			if projectedPointCoords is not None:
-				distances.append(np.linalg.norm(np.array(pointCoords) - np.array(projectedPointCoords)))
-				foundProjection.append(face)
-				foundCoordinates.append(projectedPointCoords)
-				#return face, projectedPointCoords
-		if len(foundProjection) == 1:
-			return foundProjection[0], foundCoordinates[0]
-		elif len(foundProjection) > 1:
-			if minDist:
-				minDistanceIndex = np.argsort(distances)[0]
-			else:
-				minDistanceIndex = np.argsort(distances)[-1]
-			return foundProjection[minDistanceIndex], foundCoordinates[minDistanceIndex]
+		face, projectedPointCoords = self.parentClip.projectionBackend().projectPoint(
+			faces, pointCoords, vector, tolerance, minDist)
 		
-		else:
-		#if projectedPointCoords is None:
+		if projectedPointCoords is None:
 			#showMessage("Projection to given faces not found within given tolerance of %s mm! Please select the %s manually." % (tolerance, searchedFaceName))
 			#print("Projection to given faces not found within given tolerance of %s mm! Please select the %s manually." % (tolerance, searchedFaceName))
 			#face = set(base.PickEntities(constants.ABAQUS, "FACE"))
@@ -265,57 +419,78 @@ class StandardGeomType(BaseGeomType):
 		
 		''' Returns nearest clipPointCoords, neighbourPointCoords'''
 		
-		# check for point projection on opposite face
-		foundProjection = list()
-		facesProjectionFound = list()
-		distances = list()
-		for face in faces:
-			for pointCoords in pointsCoords:
-				projectedPointCoords =ansa.base.ProjectPointDirectional(
-					face, pointCoords[0], pointCoords[1], pointCoords[2],
-					vector[0], vector[1], vector[2], tolerance, project_on="faces")
-				
-				# projection found for given point on face
-				if projectedPointCoords is not None:
-					distances.append(np.linalg.norm(np.array(pointCoords) - np.array(projectedPointCoords)))
-					foundProjection.append([pointCoords, projectedPointCoords])
-					facesProjectionFound.append(face)
+		found = list()
+		for batchIndex in self._iterPointsProjectionCoords(faces, pointsCoords, vector, tolerance, found):
+			pass
 		
-		if len(distances) == 0:
-			print('No projection found')
-			return None, None
+		return found
+	
+	#-------------------------------------------------------------------------
+	
+	def _iterPointsProjectionCoords(self, faces, pointsCoords, vector, tolerance, found):
+		
+		''' Projects the points on the faces batch by batch yielding after each face batch.
+		Nearest clipPointCoords, neighbourPointCoords and the neighbour face fill found. '''
 		
-		minDist = np.argmin(np.array(distances))
-		minDistPoints = foundProjection[minDist]
-		minDistNeighbourFace = facesProjectionFound[minDist]
+		progress = self.stopDistanceProgress
 		
-		return minDistPoints, minDistNeighbourFace
+		# faces are projected in batches to report progress and allow cancel in between
+		faces = list(faces)
+		batchCount = max(int(np.ceil(len(faces)/float(self.PROJECTION_FACE_BATCH))), 1)
+		minDistPoints = None
+		minDistNeighbourFace = None
+		minDistance = None
+		for batchIndex in range(batchCount):
+			if progress is not None:
+				progress.checkCancelled()
+			
+			# check for point projection on opposite face
+			batchFaces = faces[batchIndex*self.PROJECTION_FACE_BATCH:(batchIndex + 1)*self.PROJECTION_FACE_BATCH]
+			with profiling.stageContext('projection'):
+				batchDistPoints, batchDistNeighbourFace = self.parentClip.projectionBackend().projectPoints(
+					batchFaces, pointsCoords, vector, tolerance)
+			
+			if batchDistPoints is not None:
+				distance = np.linalg.norm(np.array(batchDistPoints[0]) - np.array(batchDistPoints[1]))
+				if minDistance is None or distance < minDistance:
+					minDistance = distance
+					minDistPoints = batchDistPoints
+					minDistNeighbourFace = batchDistNeighbourFace
+			
+			if progress is not None:
+				progress.faceBatchDone(batchIndex, batchCount)
+			
+			yield batchIndex
+		
+		if minDistPoints is None:
+			print('No projection found')
+			found[:] = [None, None]
+		else:
+			found[:] = [minDistPoints, minDistNeighbourFace]
 
 	#-------------------------------------------------------------------------
 	
-	def _getStopDistance(self, clipFacePoint, mateFacePoint, measurementDescription, colour='m'):
-
-		# searching for distances
-		mFace2face = ansa.base.CreateMeasurement([clipFacePoint, mateFacePoint], 'DISTANCE')
-		faceDist = getEntityProperty(mFace2face, 'RESULT')
-				
-#		nodeFaceClipDist = np.linalg.norm(np.array(self.centerCoordPointCoords) - np.array(getHotPointCoords(clipFacePoint)))
-#		nodeFaceMateDist = np.linalg.norm(np.array(self.centerCoordPointCoords) - np.array(getHotPointCoords(mateFacePoint)))
+	def _getStopDistance(self, clipPointCoords, matePointCoords, measurementDescription, colour='m', pointNames=('', '')):
+		
+		''' Returns the distance of projected clip and mate points checked for penetration in z direction.
+		Points and measurement are created for display only if the clip is visualised. '''
 		
-		currentMateProjectionVector = np.array(getHotPointCoords(clipFacePoint)) - np.array(getHotPointCoords(mateFacePoint))
-		angle = ansa.calc.CalcAngleOfVectors(currentMateProjectionVector, self.oppositeProjectionVector)
-		angle = angle*180/3.14
+		currentMateProjectionVector = np.array(clipPointCoords, dtype=float) - np.array(matePointCoords, dtype=float)
+		faceDist = float(np.linalg.norm(currentMateProjectionVector))
+		
+		# angle of vectors < 90 degrees for positive dot product
+		orientation = np.dot(currentMateProjectionVector, np.array(self.oppositeProjectionVector, dtype=float))
 		
 		# check penetrations in z direction
 		# check distance location for zUpper limit
 		penetration = ''
 		if measurementDescription == 'zUp':
-			if angle < 90:
+			if orientation > 0:
 				print('Penetration detected! Distance set to: 0.01')
 				penetration = '_penetration_detected'
 				faceDist = 0.01
 		elif measurementDescription == 'zLow':	
-			if angle > 90:
+			if orientation < 0:
 				print('Penetration detected! Distance set to: 0.01')
 				penetration = '_penetration_detected'
 				faceDist = 0.01
@@ -324,7 +499,22 @@ class StandardGeomType(BaseGeomType):
 			faceDist = 0.01
 		else:
 			faceDist = round(faceDist, 2)
-				
+		
+		if self.parentClip.visualize:
+			self._createStopDistanceMeasurement(clipPointCoords, matePointCoords, measurementDescription, penetration,
+				colour, pointNames)
+		
+		return faceDist
+	
+	#-------------------------------------------------------------------------
+	
+	def _createStopDistanceMeasurement(self, clipPointCoords, matePointCoords, measurementDescription, penetration, colour, pointNames):
+		
+		clipFacePoint = createPoint(clipPointCoords, pointNames[0])
+		mateFacePoint = createPoint(matePointCoords, pointNames[1])
+		
+		mFace2face = ansa.base.CreateMeasurement([clipFacePoint, mateFacePoint], 'DISTANCE')
+		
 		# set measurement color
 		if colour in COLOURS:
 			colourRGB = COLOURS[colour]
@@ -334,28 +524,26 @@ class StandardGeomType(BaseGeomType):
 		
 		self.stopDistanceMeasurements[measurementDescription] = mFace2face
 		self.stopDistPoints.extend([clipFacePoint, mateFacePoint])
-		
-		return faceDist
 
 	#-------------------------------------------------------------------------
 
 	def _getAngleSortedFaces(self, faces, sortingVector, excludeFaces=list(), angleLimit=45):
-				
-		# limit max recursion for face search
-		if angleLimit >= 90:
+		
+		''' Returns faces sorted by the angle of their normal and sortingVector within angleLimit.
+		The limit is widened by FACE_ANGLE_STEP up to FACE_ANGLE_MAX if no face found. '''
+		
+		foundAngleLimit = self.faceAngles.minimalAngleLimit(
+			faces, sortingVector, angleLimit, self.FACE_ANGLE_STEP, self.FACE_ANGLE_MAX)
+		
+		# limit max angle for face search
+		if foundAngleLimit is None:
 			print('Angle limit reached. No faces found!')
 			return []
 		
-		def sortFacesFcn(face):
-			angle = ansa.calc.CalcAngleOfVectors(base.GetFaceOrientation(face), sortingVector)
-			return angle*180/3.14
-				
-		sortedFaces = list(sortEntities(faces, sortFacesFcn, angleLimit))
-				
-		if len(sortedFaces) == 0:
-			angleLimit+=10
-			print('Increasing angle value for face searching: %s' % angleLimit)
-			sortedFaces = self._getAngleSortedFaces(faces, sortingVector, excludeFaces, angleLimit)
+		if foundAngleLimit > angleLimit:
+			print('Increasing angle value for face searching: %s' % foundAngleLimit)
+		
+		sortedFaces = self.faceAngles.sortedFaces(faces, sortingVector, foundAngleLimit)
 		
 		for excludeFace in excludeFaces:
 			sortedFaces.remove(excludeFace)
@@ -369,20 +557,27 @@ class StandardGeomType(BaseGeomType):
 		''' Returns coordinetes of nodes created by meshing of given faces.
 		Coords are checked for absolute distance from central clip node. '''
 		
-		nodes = base.CollectEntities(constants.ABAQUS, faces, "NODE")
-		
-		if len(nodes) == 0:
-			ansa.guitk.UserWarning('Clip faces must be meshed prior to use clip tool.\n(E.G. Perimeter length = 0.5)')
+		snapshot = self.parentClip.snapshot
+		if snapshot is not None and snapshot.containsFaces(faces):
+			nodesCoords = snapshot.faceNodeCoords(faces)
+		else:
+			nodes = base.CollectEntities(constants.ABAQUS, faces, "NODE")
+			nodeIds, nodesCoords = model_data.getEntitiesCoords(nodes)
+		
+		if len(nodesCoords) == 0:
+			# GUI and model caches are accessed from the main thread only, failed parallel searches are repeated there
+			if isMainThread():
+				if self.parentClip.interactive:
+					ansa.guitk.UserWarning('Clip faces must be meshed prior to use clip tool.\n(E.G. Perimeter length = 0.5)')
+				# faces are going to be remeshed
+				model_data.FACE_ATTRIBUTES.invalidate(faces)
+				model_data.MODEL_INDEX.invalidateEntities(faces)
 			raise base_items.SmartClipException('Faces must be meshed!')
 		
-		facesNodeCoords = list()
-		for entity in nodes:
-			#if entity._type == Types.NODE:
-			nodeCoords = [getEntityProperty(entity, 'X'), getEntityProperty(entity, 'Y'), getEntityProperty(entity, 'Z')]
-			nodeCenterDistance = np.linalg.norm(np.array(self.parentClip.geomType().centerCoordPointCoords) - np.array(nodeCoords))
-			# check node distance			
-			if nodeCenterDistance < self.CLIP_NODE_DIST:			
-				facesNodeCoords.append(nodeCoords)
+		# check node distance
+		nodesMask = model_data.withinDistanceMask(
+			nodesCoords, self.parentClip.geomType().centerCoordPointCoords, self.CLIP_NODE_DIST)
+		facesNodeCoords = nodesCoords[nodesMask].tolist()
 		
 		return facesNodeCoords
 	
@@ -390,6 +585,18 @@ class StandardGeomType(BaseGeomType):
 
 	def _getStopDistancePoints(self, clipVector, neighbourVector, angleLimit=None, preSelectedFaces=None):
 		
+		found = list()
+		for batchIndex in self._iterStopDistancePoints(clipVector, neighbourVector, found, angleLimit, preSelectedFaces):
+			pass
+		
+		return found
+	
+	#-------------------------------------------------------------------------
+
+	def _iterStopDistancePoints(self, clipVector, neighbourVector, found, angleLimit=None, preSelectedFaces=None):
+		
+		''' Searches minDistPoints, minDistFaces filling found, yields after each projected face batch. '''
+		
 		if angleLimit is None:
 			angleLimit = self.FACE_ANGLE_LIMIT
 		
@@ -402,7 +609,10 @@ class StandardGeomType(BaseGeomType):
 			sideNeighbourFaces = preSelectedFaces[1]
 		
 		sideClipFacePointCoords = self._getFaceNodeCoords(sideClipFaces)
-		minDistPoints, minDistNeighbourFace = self._getPointsProjectionCoords(sideNeighbourFaces, sideClipFacePointCoords, clipVector)
+		projectionFound = list()
+		for batchIndex in self._iterPointsProjectionCoords(sideNeighbourFaces, sideClipFacePointCoords, clipVector, 50, projectionFound):
+			yield batchIndex
+		minDistPoints, minDistNeighbourFace = projectionFound
 		
 		minDistFaces = sideClipFaces
 		minDistFaces.append(minDistNeighbourFace)
@@ -413,17 +623,145 @@ class StandardGeomType(BaseGeomType):
 			#base.PickEntities(constants.ABAQUS, "FACE",  initial_entities = sideClipFaces)
 			#base.PickEntities(constants.ABAQUS, "FACE",  initial_entities = sideNeighbourFaces)
 			
-			minDistPoints, minDistFaces = self._getStopDistancePoints(clipVector, neighbourVector, angleLimit=angleLimit)
+			for batchIndex in self._iterStopDistancePoints(clipVector, neighbourVector, found, angleLimit=angleLimit):
+				yield batchIndex
+			return
+		
+		found[:] = [minDistPoints, minDistFaces]
+	
+	#-------------------------------------------------------------------------
+
+	def _getStopDistanceVectors(self, stopDistName):
+		
+		''' Returns clipVector, neighbourVector of the stop distance search. '''
 		
-		return minDistPoints, minDistFaces
+		stopDistanceVectors = {
+			'zUp': (self.oppositeProjectionVector, self.largeFaceNormal),
+			'zLow': (self.largeFaceNormal, self.oppositeProjectionVector),
+			'xUp': (self.sideProjectionVectorMinus, self.sideProjectionVectorPlus),
+			'xLow': (self.sideProjectionVectorPlus, self.sideProjectionVectorMinus),
+			'yUp': (self.smallFaceNormal, -1*np.array(self.smallFaceNormal)),
+			'yLow': (-1*np.array(self.smallFaceNormal), self.smallFaceNormal)}
+		
+		return stopDistanceVectors[stopDistName]
+	
+	#-------------------------------------------------------------------------
+
+	def _findStopDistancePoints(self, stopDistName, preSelectedFaces=None, stopDistancePoints=None):
+		
+		''' Returns minDistPoints, minDistFaces of the stop distance - found in advance
+		by the parallel search or searched now. '''
+		
+		if stopDistancePoints is None:
+			clipVector, neighbourVector = self._getStopDistanceVectors(stopDistName)
+			stopDistancePoints = self._getStopDistancePoints(clipVector, neighbourVector, preSelectedFaces=preSelectedFaces)
+		
+		# kept for the stop distance cache
+		if stopDistancePoints[0] is not None:
+			self.foundStopDistancePoints[stopDistName] = stopDistancePoints[0]
+		
+		return stopDistancePoints
 	
 	#-------------------------------------------------------------------------
 
+	def _iterSearchStopDistancePoints(self, stopDistName, stopDistancesPoints):
+		
+		''' Searches the stop distance in the main thread filling stopDistancesPoints, yields after
+		each projected face batch so the caller can keep the GUI responsive and cancel the search.
+		Failed search is reported and the stop distance is left out. '''
+		
+		clipVector, neighbourVector = self._getStopDistanceVectors(stopDistName)
+		found = list()
+		searchSteps = self._iterStopDistancePoints(clipVector, neighbourVector, found)
+		try:
+			while True:
+				with profiling.stageContext('setStopDistances'):
+					try:
+						next(searchSteps)
+					except StopIteration:
+						break
+				yield
+		except StopDistanceCancelledException:
+			raise
+		except Exception as e:
+			print(str(e))
+			return
+		
+		stopDistancesPoints[stopDistName] = tuple(found)
+	
+	#-------------------------------------------------------------------------
+
+	def _canSearchInParallel(self):
+		
+		''' Stop distances can be searched in worker threads if clip face nodes are in the snapshot
+		and the projection backend is thread safe - its ANSA API calls run in the main thread. '''
+		
+		if futures is None or self.STOP_DISTANCE_WORKERS < 2:
+			return False
+		
+		snapshot = self.parentClip.snapshot
+		if snapshot is None or not snapshot.containsFaces(self.clipFaces):
+			return False
+		
+		return self.parentClip.projectionBackend().isThreadSafe(self.neighbourFaces)
+	
+	#-------------------------------------------------------------------------
+
+	def _searchStopDistancesPoints(self, stopDistNames, stopDistancesPoints):
+		
+		''' Searches the stop distances in parallel filling {stopDistName: (minDistPoints, minDistFaces)}.
+		ANSA API calls of the workers (API projection) run in the main thread while it polls
+		the running searches. Yields between the polls, so the caller can keep the GUI responsive
+		and cancel the search. Failed searches are reported and left out to be repeated in the main
+		thread, where GUI warnings are shown. '''
+		
+		if not self._canSearchInParallel():
+			return
+		
+		# the face tree and the face angles are prepared in advance and only read by the workers,
+		# API calls still queued fail once the block is left so the workers never wait for the executor
+		faces = list(self.neighbourFaces) + list(self.clipFaces)
+		with self.parentClip.projectionBackend().sharedFaceTree(faces), \
+			futures.ThreadPoolExecutor(max_workers=self.STOP_DISTANCE_WORKERS) as executor, \
+			projection.API_CALLS.served() as apiCalls:
+			searches = collections.OrderedDict()
+			for stopDistName in stopDistNames:
+				clipVector, neighbourVector = self._getStopDistanceVectors(stopDistName)
+				searches[stopDistName] = executor.submit(self._getStopDistancePoints, clipVector, neighbourVector)
+				searches[stopDistName].add_done_callback(lambda search: apiCalls.wake())
+			
+			try:
+				pending = set(searches.values())
+				while len(pending) > 0:
+					with profiling.stageContext('setStopDistances'):
+						apiCalls.serve(self.SEARCH_POLL_TIMEOUT)
+						done, pending = futures.wait(pending, timeout=0)
+					self.stopDistanceProgress.checkCancelled()
+					yield
+			finally:
+				# running searches stop at their next face batch once cancelled
+				for search in searches.values():
+					search.cancel()
+		
+		for stopDistName, search in searches.items():
+			if search.exception() is None:
+				stopDistancesPoints[stopDistName] = search.result()
+			else:
+				print('Parallel search of %s STOP distance failed: %s. Searching again in the main thread.' % (
+					stopDistName, search.exception()))
+	
+	#-------------------------------------------------------------------------
+
+	@profiling.stage('searchClipSurroundingArea')
 	def _searchClipSurroundingArea(self):
 		
 		# selecting base CON defining the clip position
-		print('Select guiding clip edge - CON.')
-		selectedCons = base.PickEntities(constants.ABAQUS, "CONS")
+		if self.guidingCon is not None:
+			selectedCons = [self.guidingCon]
+		else:
+			print('Select guiding clip edge - CON.')
+			with redraw.redrawsResumed():
+				selectedCons = base.PickEntities(constants.ABAQUS, "CONS")
 		
 		if selectedCons is None:
 			self.selectedCon = None
@@ -432,47 +770,62 @@ class StandardGeomType(BaseGeomType):
 		self.selectedCon = selectedCons[0]
 		neighbourFaces = ansa.base.GetFacesOfCons(cons = selectedCons)
 		
-		sortedFaces = sortEntities(neighbourFaces, base.GetFaceArea)
+		sortedFaces = sortEntities(neighbourFaces, model_data.FACE_ATTRIBUTES.area)
 		self.smallFace = sortedFaces[0]
 		self.largeFace = sortedFaces[1]
 		
 		# set clip property
-		self.clipProperty = base.GetEntity(constants.NASTRAN, 'PSHELL', getEntityProperty(self.largeFace, 'PID'))
+		self.clipProperty = base.GetEntity(constants.NASTRAN, 'PSHELL', model_data.FACE_ATTRIBUTES.pid(self.largeFace))
 		
-		# analyse clip surrounding
+		# analyse clip surrounding - faces and shells near the large face are found in the model spatial index
+		# or in a local one if the model is not indexed
+		spatialIndex = model_data.getSpatialIndex([self.largeFace], self.NEAR_RADIUS)
+		nearFaces, nearShells = spatialIndex.neighbourhood([self.largeFace], self.NEAR_RADIUS)
+		if self.smallFace not in nearFaces:
+			nearFaces.append(self.smallFace)
 		
-		# searching for distances
-		# show only relevant entities
-		base.SetEntityVisibilityValues(constants.ABAQUS, {"SHELL":"on"})
-		base.SetViewButton({"FE-Mode":"on"})
-		base.Or(self.smallFace, constants.ABAQUS)
-		base.Near(radius=self.NEAR_RADIUS, dense_search=False, custom_entities=self.largeFace)
+		if self.parentClip.visualize:
+			# show only relevant entities
+			base.SetEntityVisibilityValues(constants.ABAQUS, {"SHELL":"on"})
+			base.SetViewButton({"FE-Mode":"on"})
+			redraw.flushVisibility()
+			base.Or(nearFaces + nearShells, constants.ABAQUS)
 		
-		# find faces on clip mate geometry
-		visibleProps = base.CollectEntities(constants.ABAQUS, None, "SHELL_SECTION", filter_visible=True)
+		clipPid = self.clipProperty._id
 		
-		visibleProps.remove(self.clipProperty)
-		neighbourFaces = base.CollectEntities(constants.ABAQUS, visibleProps, "FACE", filter_visible=True)
-		self.neighbourFaces = sortEntities(neighbourFaces, base.GetFaceArea)
+		# find faces on clip mate geometry
+		neighbourFaces = [face for face in nearFaces if model_data.FACE_ATTRIBUTES.pid(face) != clipPid]
+		self.neighbourFaces = sortEntities(neighbourFaces, model_data.FACE_ATTRIBUTES.area)
 		
 		# clip faces
-		clipFaces = base.CollectEntities(constants.ABAQUS, [self.clipProperty], "FACE", filter_visible=True)
-		self.clipFaces = list(sortEntities(list(clipFaces), base.GetFaceArea))
+		clipFaces = [face for face in nearFaces if model_data.FACE_ATTRIBUTES.pid(face) == clipPid]
+		self.clipFaces = list(sortEntities(clipFaces, model_data.FACE_ATTRIBUTES.area))
 		
+		# FE parts around the clip
 		self.neighbourFaceProperties = base.CollectEntities(constants.NASTRAN, neighbourFaces, 'PSHELL')
-		for neighbourFaceProperty in self.neighbourFaceProperties:
-			if neighbourFaceProperty in visibleProps:
-				visibleProps.remove(neighbourFaceProperty)
-		self.parentClip.clipAreaShells = base.CollectEntities(constants.ABAQUS, visibleProps, "SHELL")#, filter_visible=True)
+		excludedPids = set([clipPid] + [neighbourFaceProperty._id for neighbourFaceProperty in self.neighbourFaceProperties])
+		clipAreaPids = sorted(set(spatialIndex.pid(shell) for shell in nearShells) - excludedPids)
+		clipAreaProps = [base.GetEntity(constants.ABAQUS, 'SHELL_SECTION', pid) for pid in clipAreaPids]
+		clipAreaProps = [prop for prop in clipAreaProps if prop is not None]
+		clipAreaShells = base.CollectEntities(constants.ABAQUS, clipAreaProps, "SHELL") if len(clipAreaProps) > 0 else list()
+		self.parentClip.setClipAreaShells(clipAreaShells)
 		
-		#base.SetViewButton({"FE-Mode":"off"})
+		# all the geometry below is evaluated on the snapshot without further model queries
+		self.parentClip.setSnapshot(model_data.ClipNeighbourhoodSnapshot(
+			list(self.neighbourFaces) + list(self.clipFaces), self.parentClip.clipAreaShells))
+		
+		# face search structures are built once for the whole clip neighbourhood
+		self.parentClip.projectionBackend().prepare(list(self.neighbourFaces) + list(self.clipFaces))
+		self.faceAngles = model_data.FaceAngleTable(list(self.neighbourFaces) + list(self.clipFaces))
 		
 		# guiding face normals
-		self.smallFaceNormal = base.GetFaceOrientation(self.smallFace)
-		self.largeFaceNormal = base.GetFaceOrientation(self.largeFace)
+		self.smallFaceNormal = model_data.FACE_ATTRIBUTES.orientation(self.smallFace)
+		self.largeFaceNormal = model_data.FACE_ATTRIBUTES.orientation(self.largeFace)
 						
 	#-------------------------------------------------------------------------
 
+	@profiling.stage('setBaseFaces')
+	@redraw.batched
 	def setBaseFaces(self):
 						
 		self._searchClipSurroundingArea()
@@ -498,93 +851,190 @@ class StandardGeomType(BaseGeomType):
 						
 	#-------------------------------------------------------------------------
 
-	def setStopDistances(self, hideMeasurements=True):
+	@profiling.stage('setStopDistances')
+	@redraw.batched
+	def setStopDistances(self, hideMeasurements=True, progress=None):
+		
+		for stopDistName in self.iterStopDistances(hideMeasurements, progress):
+			pass
+	
+	#-------------------------------------------------------------------------
+
+	def iterStopDistances(self, hideMeasurements=True, progress=None):
+		
+		''' Sets stop distances one by one yielding the name of each one set, so the caller can
+		keep the GUI responsive in between. None is yielded while the stop distances are searched -
+		between polls of the parallel search or after each face batch searched in the main thread. Computation is stopped by StopDistanceCancelledException if the progress is
+		cancelled, stop distances set so far are kept. '''
 		
 		if not self.parentClip.beamType().hasStopDistance():
 			return
 		
-		stopDistanceMethods = [self.findZlowDist, self.findZupDist, self.findXupDist, self.findXlowDist,
-			self.findYupDist, self.findYlowDist]
-		for stopDistanceMethod in stopDistanceMethods:
-			try:
-				stopDistanceMethod()
-			except Exception as e:
-				print(str(e))
-				continue
+		if progress is None:
+			progress = StopDistanceProgress()
+		
+		self.stopDistanceProgress = progress
+		try:
+			progress.start(self.STOP_DISTANCE_NAMES)
+			
+			with profiling.stageContext('setStopDistances'), redraw.redrawBatch():
+				# angles of all faces to all six clip frame directions at once
+				self.faceAngles.addDirections([self.largeFaceNormal, self.oppositeProjectionVector,
+					self.sideProjectionVectorPlus, self.sideProjectionVectorMinus,
+					self.smallFaceNormal, -1*np.array(self.smallFaceNormal)])
+				
+				clipFrame, fingerprint = self._getClipFingerprint()
+				cachedEntry = None
+				if fingerprint is not None and self.reuseStopDistances:
+					cachedEntry = stop_distance_cache.STOP_DISTANCE_CACHE.find(fingerprint)
+			
+			stopDistancesPoints = dict()
+			if cachedEntry is not None:
+				# points of the identical clip site transformed to this clip frame
+				stopDistancesPoints.update((stopDistName, (points, list()))
+					for stopDistName, points in cachedEntry.getStopDistancesPoints(clipFrame).items())
+			else:
+				# geometrical search runs in parallel, stop distances and measurements are set one by one
+				for searchStep in self._searchStopDistancesPoints(self.STOP_DISTANCE_NAMES, stopDistancesPoints):
+					yield None
+			
+			self.stopDistancesReused = cachedEntry is not None
+			self.foundStopDistancePoints = dict()
+			for stopDistName in self.STOP_DISTANCE_NAMES:
+				progress.stopDistanceStarted(stopDistName)
+				if stopDistName not in stopDistancesPoints:
+					# searched in the main thread - not run in parallel, failed there or missing in the cache
+					for searchStep in self._iterSearchStopDistancePoints(stopDistName, stopDistancesPoints):
+						yield None
+				
+				if stopDistName in stopDistancesPoints:
+					with profiling.stageContext('setStopDistances'), redraw.redrawBatch():
+						self._setStopDistance(stopDistName, stopDistancesPoints[stopDistName])
+				progress.stopDistanceDone(stopDistName)
+				
+				yield stopDistName
+		finally:
+			self.stopDistanceProgress = None
+		
+		if fingerprint is not None and cachedEntry is None:
+			stop_distance_cache.STOP_DISTANCE_CACHE.add(fingerprint, clipFrame,
+				dict((stopDistName, getattr(self, stopDistName)) for stopDistName in self.STOP_DISTANCE_NAMES),
+				self.foundStopDistancePoints)
 		
 		if hideMeasurements:
 			self.hideMeasurements()
 	
 	#-------------------------------------------------------------------------
 
-	def findZupDist(self, preSelectedFaces=None):
+	def _getClipFingerprint(self):
 		
-		# find z minus side = z upper stop distance
-		minDistZminusPoints, minDistFaces = self._getStopDistancePoints(
-			self.oppositeProjectionVector, self.largeFaceNormal, preSelectedFaces=preSelectedFaces)
+		''' Returns the clip frame and the fingerprint of the clip neighbourhood or None
+		if the faces are not in the snapshot. '''
 		
-		self.oppositeFacePoint = createPoint(minDistZminusPoints[0], 'clipZupper')
-		self.oppositeNeighbourFacePoint = createPoint(minDistZminusPoints[1], 'neighbourZupper')	
+		clipFrame = stop_distance_cache.ClipFrame(self.centerCoordPointCoords, self.sideProjectionVectorPlus, self.largeFaceNormal)
 		
-		self.zUp = self.CONNECTOR_LENGTH + self._getStopDistance(self.oppositeFacePoint, self.oppositeNeighbourFacePoint, 'zUp' , colour='r')
+		snapshot = self.parentClip.snapshot
+		if snapshot is None or not snapshot.containsFaces(list(self.clipFaces) + list(self.neighbourFaces)):
+			return clipFrame, None
+		
+		fingerprint = stop_distance_cache.ClipFingerprint(self.NAME, clipFrame,
+			snapshot.faceNodeCoords(self.clipFaces), snapshot.faceNodeCoords(self.neighbourFaces), self.NEAR_RADIUS)
+		
+		return clipFrame, fingerprint
+	
+	#-------------------------------------------------------------------------
+
+	def resetStopDistances(self):
+		
+		''' Deletes stop distance measurements and points and sets all stop distances to their defaults. '''
+		
+		entities = list(self.stopDistanceMeasurements.values()) + list(self.stopDistPoints)
+		if len(entities) > 0:
+			model_data.deleteEntities(entities, force=True)
+		
+		self.stopDistanceMeasurements = dict()
+		self.stopDistanceFaceCouples = dict()
+		self.stopDistPoints = list()
+		self.stopDistancesReused = False
+		
+		self.xLow = -1000
+		self.xUp = 1000
+		self.yLow = -1000
+		self.yUp = 1000
+		self.zLow = -1000
+		self.zUp = 1000
+	
+	#-------------------------------------------------------------------------
+
+	def _setStopDistance(self, stopDistName, stopDistancePoints=None):
+		
+		self.stopDistanceProgress.checkCancelled()
+		
+		stopDistanceMethod = getattr(self, 'find%sDist' % (stopDistName[0].upper()+stopDistName[1:].lower()))
+		try:
+			stopDistanceMethod(stopDistancePoints=stopDistancePoints)
+		except StopDistanceCancelledException:
+			raise
+		except Exception as e:
+			print(str(e))
+	
+	#-------------------------------------------------------------------------
+
+	def findZupDist(self, preSelectedFaces=None, stopDistancePoints=None):
+		
+		# find z minus side = z upper stop distance
+		minDistZminusPoints, minDistFaces = self._findStopDistancePoints('zUp', preSelectedFaces, stopDistancePoints)
+		
+		self.zUp = self.CONNECTOR_LENGTH + self._getStopDistance(minDistZminusPoints[0], minDistZminusPoints[1], 'zUp' , colour='r',
+			pointNames=('clipZupper', 'neighbourZupper'))
 		
 		self.stopDistanceFaceCouples['zUp'] = minDistFaces
 		
 	#-------------------------------------------------------------------------
 
-	def findZlowDist(self, preSelectedFaces=None):
+	def findZlowDist(self, preSelectedFaces=None, stopDistancePoints=None):
 		
 		# find z plus side = z lower stop distance
-		minDistZplusPoints, minDistFaces = self._getStopDistancePoints(
-			self.largeFaceNormal, self.oppositeProjectionVector, preSelectedFaces=preSelectedFaces)
+		minDistZplusPoints, minDistFaces = self._findStopDistancePoints('zLow', preSelectedFaces, stopDistancePoints)
 			
-		self.frontFacePoint = createPoint(minDistZplusPoints[0], 'clipZlower')
-		self.frontNeighbourFacePoint = createPoint(minDistZplusPoints[1], 'neighbourZlower')
-		
-		self.zLow = self.CONNECTOR_LENGTH - 1*self._getStopDistance(self.frontFacePoint, self.frontNeighbourFacePoint, 'zLow', colour='b')
+		self.zLow = self.CONNECTOR_LENGTH - 1*self._getStopDistance(minDistZplusPoints[0], minDistZplusPoints[1], 'zLow', colour='b',
+			pointNames=('clipZlower', 'neighbourZlower'))
 		
 		self.stopDistanceFaceCouples['zLow'] = minDistFaces
 		
 	#-------------------------------------------------------------------------
 
-	def findXupDist(self, preSelectedFaces=None):
+	def findXupDist(self, preSelectedFaces=None, stopDistancePoints=None):
 		
 		# find x minus side = x upper stop distance
-		minDistXminusPoints, minDistFaces = self._getStopDistancePoints(
-			self.sideProjectionVectorMinus, self.sideProjectionVectorPlus, preSelectedFaces=preSelectedFaces)
+		minDistXminusPoints, minDistFaces = self._findStopDistancePoints('xUp', preSelectedFaces, stopDistancePoints)
 
-		self.sideFacePlusPoint = createPoint(minDistXminusPoints[0], 'clipXupper')
-		self.sidePlusNeighbourFacePoint = createPoint(minDistXminusPoints[1], 'neighbourXupper')		
-		
-		self.xUp = self._getStopDistance(self.sideFacePlusPoint, self.sidePlusNeighbourFacePoint, 'xUp', colour='r')
+		self.xUp = self._getStopDistance(minDistXminusPoints[0], minDistXminusPoints[1], 'xUp', colour='r',
+			pointNames=('clipXupper', 'neighbourXupper'))
 		
 		self.stopDistanceFaceCouples['xUp'] = minDistFaces
 		
 	#-------------------------------------------------------------------------
 
-	def findXlowDist(self, preSelectedFaces=None):
+	def findXlowDist(self, preSelectedFaces=None, stopDistancePoints=None):
 		
 		# find x plus side = x lower stop distance
-		minDistXplusPoints, minDistFaces = self._getStopDistancePoints(
-			self.sideProjectionVectorPlus, self.sideProjectionVectorMinus, preSelectedFaces=preSelectedFaces)
+		minDistXplusPoints, minDistFaces = self._findStopDistancePoints('xLow', preSelectedFaces, stopDistancePoints)
 		
-		self.sideFaceMinusPoint = createPoint(minDistXplusPoints[0], 'clipXlower')
-		self.sideMinusNeighbourFacePoint = createPoint(minDistXplusPoints[1], 'neighbourXlower')
-		self.xLow = -1*self._getStopDistance(self.sideFaceMinusPoint, self.sideMinusNeighbourFacePoint, 'xLow', colour='b')
+		self.xLow = -1*self._getStopDistance(minDistXplusPoints[0], minDistXplusPoints[1], 'xLow', colour='b',
+			pointNames=('clipXlower', 'neighbourXlower'))
 		
 		self.stopDistanceFaceCouples['xLow'] = minDistFaces
 
 	#-------------------------------------------------------------------------
 
-	def findYupDist(self, preSelectedFaces=None):		
+	def findYupDist(self, preSelectedFaces=None, stopDistancePoints=None):		
 	
 		# find y plus side = y upper stop distance
-		minDistYPoints, minDistFaces = self._getStopDistancePoints(
-			self.smallFaceNormal, -1*np.array(self.smallFaceNormal), preSelectedFaces=preSelectedFaces)
+		minDistYPoints, minDistFaces = self._findStopDistancePoints('yUp', preSelectedFaces, stopDistancePoints)
 
-		self.topPoint = createPoint(minDistYPoints[0], 'clipYupper')
-		self.topNeighbourFacePoint = createPoint(minDistYPoints[1], 'neighbourYupper')
-		self.yUp = self._getStopDistance(self.topPoint, self.topNeighbourFacePoint, 'yUp', colour='r')
+		self.yUp = self._getStopDistance(minDistYPoints[0], minDistYPoints[1], 'yUp', colour='r',
+			pointNames=('clipYupper', 'neighbourYupper'))
 		
 		self.stopDistanceFaceCouples['yUp'] = minDistFaces
 		
@@ -592,15 +1042,13 @@ class StandardGeomType(BaseGeomType):
 
 #	def findYlowDist(self, preSelectedFaces=None):
 #		self.yLow = -1000
-	def findYlowDist(self, preSelectedFaces=None):
+	def findYlowDist(self, preSelectedFaces=None, stopDistancePoints=None):
 		
 		# find y minu side = y lower stop distance
-		minDistYPoints, minDistFaces = self._getStopDistancePoints(
-			-1*np.array(self.smallFaceNormal), self.smallFaceNormal, preSelectedFaces=preSelectedFaces)
+		minDistYPoints, minDistFaces = self._findStopDistancePoints('yLow', preSelectedFaces, stopDistancePoints)
 
-		topPoint = createPoint(minDistYPoints[0], 'clipYlower')
-		topNeighbourFacePoint = createPoint(minDistYPoints[1], 'neighbourYlower')
-		self.yLow = -1*self._getStopDistance(topPoint, topNeighbourFacePoint, 'ylow', colour='b')
+		self.yLow = -1*self._getStopDistance(minDistYPoints[0], minDistYPoints[1], 'ylow', colour='b',
+			pointNames=('clipYlower', 'neighbourYlower'))
 		
 		self.stopDistanceFaceCouples['yLow'] = minDistFaces
 	
@@ -624,9 +1072,10 @@ class StandardGeomType(BaseGeomType):
 			initialFaces = list()
 		
 		if stopDistName in self.stopDistanceMeasurements:
-			base.And(self.stopDistanceMeasurements[stopDistName], constants.ABAQUS)
+			redraw.show([self.stopDistanceMeasurements[stopDistName]])
 		
-		selectedFaces = base.PickEntities(constants.ABAQUS, 'FACE', initial_entities=initialFaces)
+		with redraw.redrawsResumed():
+			selectedFaces = base.PickEntities(constants.ABAQUS, 'FACE', initial_entities=initialFaces)
 		
 		if selectedFaces is None:
 			self.showMeasurements()
@@ -640,7 +1089,7 @@ class StandardGeomType(BaseGeomType):
 		selectedClipFaces = list()
 		selectedNeighbourFaces = list()
 		for face in selectedFaces:
-			faceProperty = base.GetEntity(constants.NASTRAN, 'PSHELL', getEntityProperty(face, 'PID'))
+			faceProperty = base.GetEntity(constants.NASTRAN, 'PSHELL', model_data.FACE_ATTRIBUTES.pid(face))
 			if faceProperty == self.clipProperty:
 				selectedClipFaces.append(face)
 			else:
@@ -657,7 +1106,7 @@ class StandardGeomType(BaseGeomType):
 			stopDistName = alterName
 		
 		if stopDistName in self.stopDistanceMeasurements:
-			base.DeleteEntity(self.stopDistanceMeasurements[stopDistName])
+			model_data.deleteEntities(self.stopDistanceMeasurements[stopDistName])
 		
 		stopDistName = stopDistName[0].upper()+stopDistName[1:].lower()
 		
@@ -672,7 +1121,7 @@ class StandardGeomType(BaseGeomType):
 		
 		stopDistanceMeasurements = [v for v in self.stopDistanceMeasurements.values()]
 
-		status = base.Not(stopDistanceMeasurements, constants.ABAQUS)
+		redraw.hide(stopDistanceMeasurements)
 	
 	#-------------------------------------------------------------------------
 
@@ -680,7 +1129,7 @@ class StandardGeomType(BaseGeomType):
 		
 		stopDistanceMeasurements = [v for v in self.stopDistanceMeasurements.values()]
 
-		status = base.And(stopDistanceMeasurements, constants.ABAQUS)
+		redraw.show(stopDistanceMeasurements)
 	
 	#-------------------------------------------------------------------------
 
@@ -690,7 +1139,7 @@ class StandardGeomType(BaseGeomType):
 		for point in self.stopDistPoints:
 			entities.append(point)
 		
-		status = base.Not(entities, constants.ABAQUS)
+		redraw.hide(entities)
 	
 	#-------------------------------------------------------------------------
 
@@ -738,6 +1187,8 @@ class ReversedGeomType(StandardGeomType):
 	
 	#-------------------------------------------------------------------------
     
+	@profiling.stage('setBaseFaces')
+	@redraw.batched
 	def setBaseFaces(self):
 												
 		self._searchClipSurroundingArea()
@@ -775,16 +1226,30 @@ class FlatGeomType(StandardGeomType):
 	ICON = os.path.join(util.PATH_RES, 'icons', 'clip_geom_flat.png')
 	
 	NEAR_RADIUS = 15.0
+	
+	def __init__(self, parentClip):
+		
+		super(FlatGeomType, self).__init__(parentClip)
+		
+		self.guidingTopFace = None
 						
 	#-------------------------------------------------------------------------
 
+	@profiling.stage('setBaseFaces')
+	@redraw.batched
 	def setBaseFaces(self):
 						
 		self._searchClipSurroundingArea()
 		
 		# selecting base CON defining the clip position
-		print('Select guiding clip top face.')
-		selectedFaces = base.PickEntities(constants.ABAQUS, "FACE")
+		if self.guidingTopFace is not None:
+			selectedFaces = [self.guidingTopFace]
+		elif not self.parentClip.interactive:
+			raise base_items.SmartClipException('Guiding top FACE must be given for non interactive %s clip!' % self.NAME)
+		else:
+			print('Select guiding clip top face.')
+			with redraw.redrawsResumed():
+				selectedFaces = base.PickEntities(constants.ABAQUS, "FACE")
 		
 		if selectedFaces is None:
 			raise base_items.SmartClipException('No guiding FACE selected!')
@@ -792,7 +1257,7 @@ class FlatGeomType(StandardGeomType):
 			raise base_items.SmartClipException('Please select just one face.')
 		
 		self.smallFace = selectedFaces[0]
-		self.smallFaceNormal = -1*np.array(base.GetFaceOrientation(self.smallFace))
+		self.smallFaceNormal = -1*np.array(model_data.FACE_ATTRIBUTES.orientation(self.smallFace))
 		
 		self.sideProjectionVectorPlus = np.cross(self.largeFaceNormal, self.smallFaceNormal)
 		self.sideProjectionVectorMinus = np.cross(self.smallFaceNormal, self.largeFaceNormal)
@@ -800,7 +1265,7 @@ class FlatGeomType(StandardGeomType):
 		# fix local coor sys orintation according to selected CON
 		conPointCoords = getConsHotPointCoords(self.selectedCon)
 		baseSideVector = np.array(conPointCoords[0]) - np.array(conPointCoords[1])
-		angle = (ansa.calc.CalcAngleOfVectors(self.sideProjectionVectorPlus, baseSideVector))*180/3.14
+		angle = np.degrees(ansa.calc.CalcAngleOfVectors(self.sideProjectionVectorPlus, baseSideVector))
 		if angle < 90:
 			self.sideProjectionVectorPlus = baseSideVector
 			self.sideProjectionVectorMinus = -1*baseSideVector
@@ -821,11 +1286,73 @@ class FlatGeomType(StandardGeomType):
 		
 	#-------------------------------------------------------------------------
 
-	def findYupDist(self, preSelectedFaces=None):		
+	def findYupDist(self, preSelectedFaces=None, stopDistancePoints=None):		
 		
 		self.yUp = 1000
 		
 		
+# ==============================================================================
+
+class ElementPropertyResolver(object):
+	
+	''' Resolves the property of the selected elements the clip beams are attached to.
+	Elements are tallied in a single pass, the snapshot is used if it contains the elements. '''
+	
+	def __init__(self, snapshot=None):
+		
+		self.snapshot = snapshot
+	
+	#-------------------------------------------------------------------------
+	
+	def dominantPid(self, elements, nodes):
+		
+		''' Returns PID of the element sharing the most of the selected nodes or None if there
+		is no element attached to the nodes. Node to element incidences are tallied in the snapshot
+		if it contains the selected elements and nodes. '''
+		
+		elementCounts = None
+		if self.snapshot is not None and self.snapshot.containsShells(elements):
+			elementCounts = self.snapshot.shellNodeCounts(nodes)
+			getElementPid = self.snapshot.shellPid
+		
+		if elementCounts is None:
+			elementCounts = collections.Counter()
+			for nodeElements in base.NodesToElements(nodes).values():
+				elementCounts.update(nodeElements)
+			getElementPid = lambda element: getEntityProperty(element, 'PID')
+		
+		if len(elementCounts) == 0:
+			return None
+		
+		return getElementPid(elementCounts.most_common(1)[0][0])
+	
+	#-------------------------------------------------------------------------
+	
+	def pidCounts(self, elements):
+		
+		''' Returns Counter of the elements per PID. '''
+		
+		elements = list(collections.OrderedDict.fromkeys(elements))
+		if self.snapshot is not None:
+			pidCounts = self.snapshot.shellPidCounts(elements)
+			if pidCounts is not None:
+				return pidCounts
+		
+		return collections.Counter(getEntityProperty(element, 'PID') for element in elements)
+	
+	#-------------------------------------------------------------------------
+	
+	def reportProperties(self, elements, selectionName):
+		
+		''' Prints all properties of the selected elements if there is more than one. Returns the PID counts. '''
+		
+		pidCounts = self.pidCounts(elements)
+		if len(pidCounts) > 1:
+			print('Selected nodes for %s belong to %s properties: %s. The dominant one is used.' % (selectionName,
+				len(pidCounts), ', '.join('PID %s (%s elements)' % (pid, count) for pid, count in pidCounts.most_common())))
+		
+		return pidCounts
+	
 # ==============================================================================
 @util.registerClass
 class AudiBeamType(BaseBeamType):
@@ -836,6 +1363,7 @@ class AudiBeamType(BaseBeamType):
 	
 	CONNECTOR_ELASTICITY = [50, 50, 50]
 	CONNECTOR_LENGTH = 1.0
+	NEAREST_ELEMENTS_RADIUS = 5.0
 	
 	def __init__(self, parentClip):
 		
@@ -882,21 +1410,54 @@ class AudiBeamType(BaseBeamType):
 	def checkClipSideNodeRedefinition(self):
 		
 		if 'connector' in self.clipEntities:
-			base.DeleteEntity(self.clipEntities['connector'], force=True)
+			model_data.deleteEntities(self.clipEntities['connector'], force=True)
 		if 'beams_cs' in self.clipEntities:
-			base.DeleteEntity(self.clipEntities['beams_cs'], force=True)
+			model_data.deleteEntities(self.clipEntities['beams_cs'], force=True)
 		if 'connector_beams' in self.clipEntities:
-			base.DeleteEntity(self.clipEntities['connector_beams'], force=True)
+			model_data.deleteEntities(self.clipEntities['connector_beams'], force=True)
 
 	#-------------------------------------------------------------------------
 
 	def checkClipContraSideNodeRedefinition(self):
 
 		if 'beams_ccs' in self.clipEntities:
-			base.DeleteEntity(self.clipEntities['beams_ccs'], force=True)
+			model_data.deleteEntities(self.clipEntities['beams_ccs'], force=True)
 
 	#-------------------------------------------------------------------------
 	
+	def _selectElements(self, nearestElements):
+		
+		''' Lets user confirm the preselected elements. Preselection is taken as it is
+		if the clip is not interactive. '''
+		
+		if self.parentClip.interactive:
+			with redraw.redrawsResumed():
+				return base.PickEntities(constants.ABAQUS, "SHELL", initial_entities=nearestElements)
+		
+		nearestElements = list(collections.OrderedDict.fromkeys(nearestElements))
+		if len(nearestElements) == 0:
+			return None
+		
+		return nearestElements
+	
+	#-------------------------------------------------------------------------
+	
+	def _getDominantPid(self, elements, nodes, selectionName):
+		
+		''' Returns PID of the element sharing the most of the selected nodes. Selected elements
+		belonging to more properties are reported. '''
+		
+		propertyResolver = ElementPropertyResolver(self.parentClip.snapshot)
+		propertyResolver.reportProperties(elements, selectionName)
+		
+		elementPid = propertyResolver.dominantPid(elements, nodes)
+		if elementPid is None:
+			raise base_items.SmartClipException('No elements selected for %s!' % selectionName)
+		
+		return elementPid
+	
+	#-------------------------------------------------------------------------
+	
 	def _checkNodeUniqueSelection(self):
 		
 		''' Check that there are no common nodes for clip side and clip contra side.
@@ -917,6 +1478,8 @@ class AudiBeamType(BaseBeamType):
 
 	#-------------------------------------------------------------------------
 
+	@profiling.stage('createConnector')
+	@redraw.batched
 	def createConnector(self):
 		
 		# create connector elasticity
@@ -926,7 +1489,7 @@ class AudiBeamType(BaseBeamType):
 			 'COMP(2)': 'YES', 'El.Stiff.(2)': self.CONNECTOR_ELASTICITY[1],
 			 'COMP(3)': 'YES', 'El.Stiff.(3)': self.CONNECTOR_ELASTICITY[2],
 			}
-		self.connectorElasticity = base.CreateEntity(constants.ABAQUS, "CONNECTOR_ELASTICITY", vals)
+		self.connectorElasticity = property_registry.PROPERTY_REGISTRY.getEntity("CONNECTOR_ELASTICITY", vals)
 	
 		# create connector stop
 		vals = {'Name': 'CONNECTOR STOP',
@@ -956,8 +1519,8 @@ class AudiBeamType(BaseBeamType):
 			'G1':  self.connectingBeamsCenterNode1._id, 'G2': self.connectingBeamsCenterNode2._id}
 		self.connector = base.CreateEntity(constants.ABAQUS, "CONNECTOR", vals)
 		
+		# shared connector elasticity is not a part of the clip
 		self.clipEntities['connector'] = [
-			self.connectorElasticity,
 			self.connectorStop,
 			self.connectorBehavior,
 			self.connectorSection,
@@ -976,6 +1539,8 @@ class AudiBeamType(BaseBeamType):
 	
 	#-------------------------------------------------------------------------
     
+	@profiling.stage('createBeams')
+	@redraw.batched
 	def createBeamsConnectorClipContraSide(self):
 		
 		# parent attributes 
@@ -989,7 +1554,8 @@ class AudiBeamType(BaseBeamType):
 			# some points may not be defined because of non standard clip shape
 			try:
 				nearestElements = findNearestElements(
-					np.array(getHotPointCoords(self.parentClip.geomType().centerCoordNode)) + 3*np.array(largeFaceNormal), self.parentClip.clipAreaShells)
+					np.array(getHotPointCoords(self.parentClip.geomType().centerCoordNode)) + 3*np.array(largeFaceNormal),
+					maxRadius=self.NEAREST_ELEMENTS_RADIUS, elementIndex=self.parentClip.clipAreaElementIndex())
 			except Exception as e:
 				print(str(e))
 				nearestElements = list()
@@ -999,7 +1565,7 @@ class AudiBeamType(BaseBeamType):
 			nearestElements = self.selectedElementsBeamCcs
 		
 		print('Select nodes for beam definition: CONNECTOR - CLIP contra side.')
-		selectedElements = base.PickEntities(constants.ABAQUS, "SHELL", initial_entities=nearestElements)
+		selectedElements = self._selectElements(nearestElements)
 		
 		if selectedElements is None:
 			raise base_items.SmartClipException('No NODES selected for CONNECTOR - CLIP contra side!')
@@ -1017,17 +1583,12 @@ class AudiBeamType(BaseBeamType):
 		# check that there are no common nodes for clip side and clip contra side
 		self._checkNodeUniqueSelection()
 		
-		elements = base.NodesToElements(self.beamNodesCcs)
-	#TODO: check if all nodes belong to the one property!!
-		allElements = list()
-		for elements in list(elements.values()):
-			allElements.extend(elements)
-		element = sortEntities(allElements, allElements.count)[-1]
+		elementPid = self._getDominantPid(selectedElements, self.beamNodesCcs, 'CONNECTOR - CLIP contra side')
 		
 		# beam properties
-		self.beamPropCcs = base.GetEntity(constants.NASTRAN, 'PSHELL', getEntityProperty(element, 'PID'))
+		self.beamPropCcs = base.GetEntity(constants.NASTRAN, 'PSHELL', elementPid)
 		if self.beamPropCcs is None:
-			self.beamPropCcs = base.GetEntity(constants.ABAQUS, 'LAMINATE', getEntityProperty(element, 'PID'))
+			self.beamPropCcs = base.GetEntity(constants.ABAQUS, 'LAMINATE', elementPid)
 			# create dummy material
 			vals = {
 				'Name': 'ABS_BEAMS_NO_CREEP',
@@ -1042,7 +1603,7 @@ class AudiBeamType(BaseBeamType):
 				 'YOUNG' : 210000, 'POISSON' : 0.3
 				 }
 								
-			beamMaterial = base.CreateEntity(constants.ABAQUS, "MATERIAL", vals)
+			beamMaterial = property_registry.PROPERTY_REGISTRY.getEntity("MATERIAL", vals)
 			self.beamCcsMID = beamMaterial._id
 		else:
 			self.beamCcsMID = getEntityProperty(self.beamPropCcs, 'MID')
@@ -1057,25 +1618,18 @@ class AudiBeamType(BaseBeamType):
 			#'E' : getEntityProperty(material, 'YOUNG'),
 			#'G' :  getEntityProperty(material, 'YOUNG')/(2*(1+getEntityProperty(material, 'POISSON')))
 				}
-		self.beamSectionCcs = base.CreateEntity(constants.ABAQUS, "BEAM_SECTION", vals)
-		
-		self.beamsCcs = list()
-		for node in self.beamNodesCcs:
-			vals = {'Name': 'BEAM_CLIP_CONTRA_SIDE',
-				'PID': self.beamSectionCcs._id,
-				'NODE1': self.connectingBeamsCenterNode2._id,
-				'NODE2': node._id,
-				'Orient': 'With Vector', 'C1' : 0, 'C2' : 1, 'C3' : -1,}
-			beam = base.CreateEntity(constants.ABAQUS, "BEAM", vals)
-			self.beamsCcs.append(beam)
+		self.beamSectionCcs = property_registry.PROPERTY_REGISTRY.getEntity("BEAM_SECTION", vals)
 		
-		self.clipEntities['beams_ccs'] = self.beamsCcs
-		self.clipEntities['beams_ccs'].append(self.beamSectionCcs)
+		self.beamsCcs = createBeamsFromNode('BEAM_CLIP_CONTRA_SIDE', self.beamSectionCcs,
+			self.connectingBeamsCenterNode2._id, [node._id for node in self.beamNodesCcs])
 		
-		base.RedrawAll()
+		# shared beam section is not a part of the clip
+		self.clipEntities['beams_ccs'] = self.beamsCcs
 			
 	#-------------------------------------------------------------------------
     
+	@profiling.stage('createBeams')
+	@redraw.batched
 	def createBeamsConnectorClipSide(self):
 		
 		# parent attributes
@@ -1087,7 +1641,7 @@ class AudiBeamType(BaseBeamType):
 		centerCoordNode = self.parentClip.geomType().centerCoordNode
 		
 		# find nodes for initial selection
-		searchEntities = self.parentClip.clipAreaShells#base.CollectEntities(constants.ABAQUS, None, "SHELL")
+		elementIndex = self.parentClip.clipAreaElementIndex()#base.CollectEntities(constants.ABAQUS, None, "SHELL")
 		
 		# if no elements were selected before try to find the nearest ones
 		if len(self.selectedElementsBeamCs) == 0:
@@ -1098,7 +1652,8 @@ class AudiBeamType(BaseBeamType):
 				coords.append(np.array(getHotPointCoords(centerCoordNode)) + 4*np.array(sideProjectionVectorPlus))
 				coords.append(np.array(getHotPointCoords(centerCoordNode)) + 4*np.array(sideProjectionVectorMinus))
 				for coord in coords:
-					nearestElements.extend(findNearestElements(coord, searchEntities))
+					nearestElements.extend(findNearestElements(
+						coord, maxRadius=self.NEAREST_ELEMENTS_RADIUS, elementIndex=elementIndex))
 			except Exception as e:
 				pass
 		else:
@@ -1107,7 +1662,7 @@ class AudiBeamType(BaseBeamType):
 			nearestElements = self.selectedElementsBeamCs
 		
 		print('Select nodes for beam definition: CONNECTOR - CLIP.')
-		selectedElements = base.PickEntities(constants.ABAQUS, "SHELL", initial_entities=nearestElements)
+		selectedElements = self._selectElements(nearestElements)
 		
 		if selectedElements is None:
 			raise base_items.SmartClipException('No NODES selected for CONNECTOR - CLIP side!')
@@ -1132,17 +1687,12 @@ class AudiBeamType(BaseBeamType):
 		self.selectedElementsBeamCs = selectedElements
 		self.beamsCsDefined = True
 		
-		elements = base.NodesToElements(self.beamNodesCs)
-	#TODO: check if all nodes belong to the one property!!
-		allElements = list()
-		for elements in list(elements.values()):
-			allElements.extend(elements)
-		element = sortEntities(allElements, allElements.count)[-1]
+		elementPid = self._getDominantPid(selectedElements, self.beamNodesCs, 'CONNECTOR - CLIP')
 		
 		# beam properties
-		self.beamPropCs = base.GetEntity(constants.ABAQUS, 'SHELL_SECTION', getEntityProperty(element, 'PID'))
+		self.beamPropCs = base.GetEntity(constants.ABAQUS, 'SHELL_SECTION', elementPid)
 		if self.beamPropCs is None:
-			self.beamPropCs = base.GetEntity(constants.ABAQUS, 'LAMINATE', getEntityProperty(element, 'PID'))
+			self.beamPropCs = base.GetEntity(constants.ABAQUS, 'LAMINATE', elementPid)
 			# create dummy material
 			vals = {
 				'Name': 'ABS_BEAMS_NO_CREEP',
@@ -1157,7 +1707,7 @@ class AudiBeamType(BaseBeamType):
 				 'YOUNG' : 210000, 'POISSON' : 0.3
 				 }
 								
-			beamMaterial = base.CreateEntity(constants.ABAQUS, "MATERIAL", vals)
+			beamMaterial = property_registry.PROPERTY_REGISTRY.getEntity("MATERIAL", vals)
 			self.beamCsMID = beamMaterial._id
 		else:
 			self.beamCsMID = getEntityProperty(self.beamPropCs, 'MID')
@@ -1172,22 +1722,13 @@ class AudiBeamType(BaseBeamType):
 			#'E' : getEntityProperty(material, 'YOUNG'),
 			#'G' :  getEntityProperty(material, 'YOUNG')/(2*(1+getEntityProperty(material, 'POISSON')))
 				}
-		self.beamSectionCs = base.CreateEntity(constants.ABAQUS, "BEAM_SECTION", vals)
-		
-		self.beamsCs = list()
-		for node in self.beamNodesCs:
-			vals = {'Name': 'BEAM_CLIP_SIDE',
-				'PID': self.beamSectionCs._id,
-				'NODE1': self.connectingBeamsCenterNode1._id,
-				'NODE2': node._id,
-				'Orient': 'With Vector', 'C1' : 0, 'C2' : 1, 'C3' : -1,}
-			beam = base.CreateEntity(constants.ABAQUS, "BEAM", vals)
-			self.beamsCs.append(beam)
+		self.beamSectionCs = property_registry.PROPERTY_REGISTRY.getEntity("BEAM_SECTION", vals)
 		
-		self.clipEntities['beams_cs'] = self.beamsCs
-		self.clipEntities['beams_cs'].append(self.beamSectionCs)
+		self.beamsCs = createBeamsFromNode('BEAM_CLIP_SIDE', self.beamSectionCs,
+			self.connectingBeamsCenterNode1._id, [node._id for node in self.beamNodesCs])
 		
-		base.RedrawAll()
+		# shared beam section is not a part of the clip
+		self.clipEntities['beams_cs'] = self.beamsCs
 		
 
 # ==============================================================================
@@ -1252,6 +1793,8 @@ class SkodaBeamType(AudiBeamType):
 					 
 	#-------------------------------------------------------------------------
 	
+	@profiling.stage('createConnector')
+	@redraw.batched
 	def createConnector(self):
 				
 		# create connector elasticity
@@ -1264,7 +1807,7 @@ class SkodaBeamType(AudiBeamType):
 			 'COMP(5)': 'YES', 'El.Stiff.(5)': self.CONNECTOR_ELASTICITY[4],
 			 'COMP(6)': 'YES', 'El.Stiff.(6)': self.CONNECTOR_ELASTICITY[5]
 			}
-		self.connectorElasticity = base.CreateEntity(constants.ABAQUS, "CONNECTOR_ELASTICITY", vals)
+		self.connectorElasticity = property_registry.PROPERTY_REGISTRY.getEntity("CONNECTOR_ELASTICITY", vals)
 	
 		# create connector stop
 		vals = {'Name': 'CONNECTOR_STOP_C1_C2',
@@ -1328,8 +1871,8 @@ class SkodaBeamType(AudiBeamType):
 			'G1':  self.con3Node1._id, 'G2': self.con3Node2._id}
 		self.connectorC3 = base.CreateEntity(constants.ABAQUS, "CONNECTOR", vals)
 		
+		# shared connector elasticity is not a part of the clip
 		self.clipEntities['connector'] = [
-			self.connectorElasticity,
 			self.connectorStop,
 			self.connectorBehavior,
 			self.connectorSection,
@@ -1367,7 +1910,7 @@ class SkodaBeamType(AudiBeamType):
 					 'YOUNG' : 210000, 'POISSON' : 0.3
 					 }
 									
-				beamMaterial = base.CreateEntity(constants.ABAQUS, "MATERIAL", vals)
+				beamMaterial = property_registry.PROPERTY_REGISTRY.getEntity("MATERIAL", vals)
 						
 				# create a new beam section for connecting beams
 				vals = {'Name': 'CONNECTOR_BODY_BEAM_SECTION',
@@ -1382,23 +1925,12 @@ class SkodaBeamType(AudiBeamType):
 		self.connectingBeamsSection = getBeamSection()
 		
 		# create connecting beams
-		self.connectingBeams = list()
-		for node in [self.con1Node1, self.con2Node1, self.con3Node1]:
-			vals = {'Name': 'BEAM_CONNECTOR_CLIP_SIDE',
-				'PID': self.connectingBeamsSection._id,
-				'NODE1': self.connectingBeamsCenterNode1._id,
-				'NODE2': node._id,
-				'Orient': 'With Vector', 'C1' : 0, 'C2' : 1, 'C3' : -1,}
-			beam = base.CreateEntity(constants.ABAQUS, "BEAM", vals)
-			self.connectingBeams.append(beam)
-		for node in [self.con1Node2, self.con2Node2, self.con3Node2]:
-			vals = {'Name': 'BEAM_CONNECTOR_CLIP_CONTRA_SIDE',
-				'PID': self.connectingBeamsSection._id,
-				'NODE1': self.connectingBeamsCenterNode2._id,
-				'NODE2': node._id,
-				'Orient': 'With Vector', 'C1' : 0, 'C2' : 1, 'C3' : -1,}
-			beam = base.CreateEntity(constants.ABAQUS, "BEAM", vals)
-			self.connectingBeams.append(beam)
+		self.connectingBeams = createBeamsFromNode('BEAM_CONNECTOR_CLIP_SIDE', self.connectingBeamsSection,
+			self.connectingBeamsCenterNode1._id, [node._id for node in [self.con1Node1, self.con2Node1, self.con3Node1]],
+			redrawModel=False)
+		self.connectingBeams.extend(createBeamsFromNode('BEAM_CONNECTOR_CLIP_CONTRA_SIDE', self.connectingBeamsSection,
+			self.connectingBeamsCenterNode2._id, [node._id for node in [self.con1Node2, self.con2Node2, self.con3Node2]],
+			redrawModel=False))
 		
 		self.clipEntities['connector_beams'] = self.connectingBeams
 
@@ -1422,6 +1954,8 @@ class DaimlerSoloBeamType(AudiBeamType):
 			
 	#-------------------------------------------------------------------------
 
+	@profiling.stage('createConnector')
+	@redraw.batched
 	def createConnector(self):
 		
 		# create connector elasticity
@@ -1431,7 +1965,7 @@ class DaimlerSoloBeamType(AudiBeamType):
 			 'COMP(2)': 'YES', 'RIGID(2)': 'YES',
 			 'COMP(3)': 'YES', 'RIGID(3)': 'YES',
 			}
-		self.connectorElasticity = base.CreateEntity(constants.ABAQUS, "CONNECTOR_ELASTICITY", vals)
+		self.connectorElasticity = property_registry.PROPERTY_REGISTRY.getEntity("CONNECTOR_ELASTICITY", vals)
 	
 		# create connector behavior
 		vals = {'Name': 'CONNECTOR BEHAVIOR',
@@ -1453,8 +1987,8 @@ class DaimlerSoloBeamType(AudiBeamType):
 			'G1':  self.connectingBeamsCenterNode1._id, 'G2': self.connectingBeamsCenterNode2._id}
 		self.connector = base.CreateEntity(constants.ABAQUS, "CONNECTOR", vals)
 		
+		# shared connector elasticity is not a part of the clip
 		self.clipEntities['connector'] = [
-			self.connectorElasticity,
 			self.connectorBehavior,
 			self.connectorSection,
 			self.connector]
@@ -1469,6 +2003,8 @@ class DaimlerChannelBeamType(DaimlerSoloBeamType):
 		
 	#-------------------------------------------------------------------------
 
+	@profiling.stage('createConnector')
+	@redraw.batched
 	def createConnector(self):
 		
 		# create connector elasticity
@@ -1479,7 +2015,7 @@ class DaimlerChannelBeamType(DaimlerSoloBeamType):
 			 'COMP(3)': 'YES', 'RIGID(3)': 'YES',
 			 'COMP(4)': 'YES', 'RIGID(4)': 'YES',
 			}
-		self.connectorElasticity = base.CreateEntity(constants.ABAQUS, "CONNECTOR_ELASTICITY", vals)
+		self.connectorElasticity = property_registry.PROPERTY_REGISTRY.getEntity("CONNECTOR_ELASTICITY", vals)
 	
 		# create connector behavior
 		vals = {'Name': 'CONNECTOR BEHAVIOR',
@@ -1501,8 +2037,8 @@ class DaimlerChannelBeamType(DaimlerSoloBeamType):
 			'G1':  self.connectingBeamsCenterNode1._id, 'G2': self.connectingBeamsCenterNode2._id}
 		self.connector = base.CreateEntity(constants.ABAQUS, "CONNECTOR", vals)
 		
+		# shared connector elasticity is not a part of the clip
 		self.clipEntities['connector'] = [
-			self.connectorElasticity,
 			self.connectorBehavior,
 			self.connectorSection,
 			self.connector]
@@ -1513,6 +2049,14 @@ class SymmetricalClip(object):
 	
 	PASTE_TOLERANCE = 0.2
 	
+	PASTE_MODE_REGION = 'region'
+	PASTE_MODE_VISIBLE = 'visible'
+	# region - end nodes of the mirrored elements and shell nodes around them only
+	# visible - all visible entities after showing the mirrored clip neighbourhood
+	PASTE_MODE = PASTE_MODE_REGION
+	
+	@profiling.stage('mirror')
+	@redraw.batched
 	def __init__(self, parentClip):
 		
 		self.parentClip = parentClip
@@ -1520,22 +2064,25 @@ class SymmetricalClip(object):
 		self.parentClip.geomType().createSymmetricalCoorSys()
 		self.mirrorClip()
 		self.updateConnectorOrienation()
-		self.showNearElements()
+		
+		if self.PASTE_MODE == self.PASTE_MODE_VISIBLE:
+			self.showNearElements()
+		else:
+			pasteElementsEndNodes(self.newBeams, self.newConnectors, self.PASTE_TOLERANCE)
 	
 	#-------------------------------------------------------------------------
 	
 	def mirrorClip(self):
 		
-		entities = list()
-		for ents in self.parentClip.clipEntities.values(): 
-			if type(ents) is list:
-				entities.extend(ents)
-			else:
-				entities.append(ents)
+		entities = getClipEntitiesList(self.parentClip.clipEntities)
 		
-		collector = base.CollectNewModelEntities(constants.ABAQUS, "CONNECTOR")
-		base.GeoSymmetry("COPY", "AUTO_OFFSET", "SAME PART", "NONE", entities, keep_connectivity=True)
-		self.newConnectors = collector.report()
+		collector = base.CollectNewModelEntities(constants.ABAQUS, ["CONNECTOR", "BEAM"])
+		with model_data.MODEL_INDEX.trackChanges():
+			base.GeoSymmetry("COPY", "AUTO_OFFSET", "SAME PART", "NONE", entities, keep_connectivity=True)
+		newEntities = collector.report()
+		
+		self.newConnectors = [entity for entity in newEntities if entity.ansa_type(constants.ABAQUS) == 'CONNECTOR']
+		self.newBeams = [entity for entity in newEntities if entity.ansa_type(constants.ABAQUS) == 'BEAM']
 	
 	#-------------------------------------------------------------------------
 	
@@ -1547,51 +2094,17 @@ class SymmetricalClip(object):
 		# update individually each connector section
 		for newConnectorSection in newConnectorSections:
 			newConnectorBehaviorID = getEntityProperty(newConnectorSection, 'MID')
-			newConnectorBehavior = base.GetEntity(constants.ABAQUS, "CONNECTOR BEHAVIOR", newConnectorBehaviorID)
-			
-			# symmetry stp sidtance if applicable
-			if self.parentClip.beamType().hasStopDistance():
-				connectorStopID =  getEntityProperty(newConnectorBehavior, 'STP>data')
-				connectorStop = base.GetEntity(constants.ABAQUS, "CONNECTOR_STOP", connectorStopID)
-				
-				vals = dict()
-				vals['Name'] = getEntityProperty(connectorStop, 'Name')
-				xLow = getEntityProperty(connectorStop, 'COMP (1)')
-				if xLow == 'YES':
-					vals.update({'COMP (1)': 'YES', 'Low.Lim.(1)': -1*self.parentClip.geomType().xUp, 'Up.Lim.(1)': -1*self.parentClip.geomType().xLow,
-					 'COMP (2)': 'YES', 'Low.Lim.(2)': self.parentClip.geomType().yLow, 'Up.Lim.(2)': self.parentClip.geomType().yUp})
-				
-				vals.update({ 'COMP (3)': 'YES', 'Low.Lim.(3)': self.parentClip.geomType().zLow, 'Up.Lim.(3)': self.parentClip.geomType().zUp})
-				
-				# create the new connector stop
-				newConnectorStop = base.CreateEntity(constants.ABAQUS, "CONNECTOR_STOP", vals)
-			
-				# create the new connector behavior
-				vals = {'Name': getEntityProperty(newConnectorBehavior, 'Name'),
-					'*ELASTICITY': 'YES', 'EL>data': self.parentClip.beamType().connectorElasticity._id,
-					'*STOP':'YES', 'STP>data': newConnectorStop._id,
-					}
-			else:
-				vals = {'Name': getEntityProperty(newConnectorBehavior, 'Name'),
-					'*ELASTICITY': 'YES', 'EL>data': self.parentClip.beamType().connectorElasticity._id,
-					'*STOP':'NO'
-					}
-			newConnectorBehavior = base.CreateEntity(constants.ABAQUS, "CONNECTOR BEHAVIOR", vals)
-			
-			# update coor sys and connector behaviour
-			vals = {
-				'ORIENT_1': self.parentClip.geomType().symmCoordSystem._id,
-				'MID' : newConnectorBehavior._id}
-			base.SetEntityCardValues(constants.ABAQUS, newConnectorSection, vals)
+			updateMirroredConnectorSection(self.parentClip, newConnectorSection, newConnectorBehaviorID)
 	
 	#-------------------------------------------------------------------------
 	
 	def showNearElements(self):
 		
+		redraw.flushVisibility()
 		base.Near(radius=10., dense_search=True, custom_entities=self.newConnectors)
 		# hide geometry
 		ent = base.CollectEntities(constants.ABAQUS, None, "FACE", filter_visible=True )
-		status = base.Not(ent, constants.ABAQUS)
+		redraw.hide(ent)
 		
 		#entities = self.parentClip.clipEntities
 		#entities.extend(self.newConnectors)
@@ -1599,12 +2112,236 @@ class SymmetricalClip(object):
 		
 		base.SetViewAngles(f_key="F5")
 		
-		# autopaste
+		# autopaste of the visible entities only - hidden faces must be applied first
+		redraw.flushVisibility()
 		ansa.mesh.AutoPaste(visible = True, project_on_geometry=False, project_2nd_order_nodes=False, move_to="FE pos", distance=self.PASTE_TOLERANCE, preserve_id = 'min')
 		
 
 # ==============================================================================
 
+class SymmetricalClipBatch(object):
+	
+	''' Mirrors many clips at once: one GeoSymmetry of all clip entities, connector sections
+	of all mirrored clips updated in one pass and one AutoPaste of the mirrored elements.
+	
+	Mirrored connector sections are assigned back to their clips by the clip coordinate system
+	they still refer to. '''
+	
+	PASTE_TOLERANCE = SymmetricalClip.PASTE_TOLERANCE
+	
+	def __init__(self, smartClips=()):
+		
+		self.smartClips = list(smartClips)
+		
+		self.newConnectors = list()
+		self.newBeams = list()
+	
+	#-------------------------------------------------------------------------
+	
+	def add(self, smartClip):
+		
+		self.smartClips.append(smartClip)
+	
+	#-------------------------------------------------------------------------
+	
+	@profiling.stage('mirror')
+	@redraw.batched
+	def mirrorClips(self):
+		
+		if len(self.smartClips) == 0:
+			return
+		
+		for smartClip in self.smartClips:
+			smartClip.geomType().createSymmetricalCoorSys()
+		
+		self.mirror()
+		self.updateConnectorOrienations()
+		self.pasteNodes()
+	
+	#-------------------------------------------------------------------------
+	
+	def mirror(self):
+		
+		entities = list()
+		for smartClip in self.smartClips:
+			entities.extend(getClipEntitiesList(smartClip.clipEntities))
+		
+		collector = base.CollectNewModelEntities(constants.ABAQUS, ["CONNECTOR", "BEAM"])
+		with model_data.MODEL_INDEX.trackChanges():
+			base.GeoSymmetry("COPY", "AUTO_OFFSET", "SAME PART", "NONE", entities, keep_connectivity=True)
+		newEntities = collector.report()
+		
+		self.newConnectors = [entity for entity in newEntities if entity.ansa_type(constants.ABAQUS) == 'CONNECTOR']
+		self.newBeams = [entity for entity in newEntities if entity.ansa_type(constants.ABAQUS) == 'BEAM']
+	
+	#-------------------------------------------------------------------------
+	
+	def updateConnectorOrienations(self):
+		
+		clipsByCoordSystem = dict((smartClip.geomType().coordSystem.id, smartClip) for smartClip in self.smartClips)
+		
+		newConnectorSections = base.CollectEntities(constants.ABAQUS, self.newConnectors, "CONNECTOR_SECTION", recursive=True)
+		for newConnectorSection in newConnectorSections:
+			card = base.GetEntityCardValues(constants.ABAQUS, newConnectorSection, ('MID', 'ORIENT_1'))
+			smartClip = clipsByCoordSystem.get(card['ORIENT_1'])
+			if smartClip is None:
+				raise base_items.SmartClipException(
+					'Mirrored connector section %s does not belong to any clip!' % newConnectorSection._id)
+			
+			updateMirroredConnectorSection(smartClip, newConnectorSection, card['MID'])
+	
+	#-------------------------------------------------------------------------
+	
+	def pasteNodes(self):
+		
+		''' Pastes the mirrored elements of all clips to the shells around them in one AutoPaste. '''
+		
+		pasteElementsEndNodes(self.newBeams, self.newConnectors, self.PASTE_TOLERANCE)
+
+# ==============================================================================
+
+def updateMirroredConnectorSection(smartClip, newConnectorSection, newConnectorBehaviorID):
+	
+	''' Creates a new connector behavior (and stop) of the mirrored connector section with the stop
+	limits mirrored and sets the symmetrical coordinate system of the clip to the section. '''
+	
+	geomType = smartClip.geomType()
+	newConnectorBehavior = base.GetEntity(constants.ABAQUS, "CONNECTOR BEHAVIOR", newConnectorBehaviorID)
+	
+	# symmetry stp sidtance if applicable
+	if smartClip.beamType().hasStopDistance():
+		connectorStopID =  getEntityProperty(newConnectorBehavior, 'STP>data')
+		connectorStop = base.GetEntity(constants.ABAQUS, "CONNECTOR_STOP", connectorStopID)
+		
+		vals = dict()
+		vals['Name'] = getEntityProperty(connectorStop, 'Name')
+		xLow = getEntityProperty(connectorStop, 'COMP (1)')
+		if xLow == 'YES':
+			vals.update({'COMP (1)': 'YES', 'Low.Lim.(1)': -1*geomType.xUp, 'Up.Lim.(1)': -1*geomType.xLow,
+			 'COMP (2)': 'YES', 'Low.Lim.(2)': geomType.yLow, 'Up.Lim.(2)': geomType.yUp})
+		
+		vals.update({ 'COMP (3)': 'YES', 'Low.Lim.(3)': geomType.zLow, 'Up.Lim.(3)': geomType.zUp})
+		
+		# create the new connector stop
+		newConnectorStop = base.CreateEntity(constants.ABAQUS, "CONNECTOR_STOP", vals)
+	
+		# create the new connector behavior
+		vals = {'Name': getEntityProperty(newConnectorBehavior, 'Name'),
+			'*ELASTICITY': 'YES', 'EL>data': smartClip.beamType().connectorElasticity._id,
+			'*STOP':'YES', 'STP>data': newConnectorStop._id,
+			}
+	else:
+		vals = {'Name': getEntityProperty(newConnectorBehavior, 'Name'),
+			'*ELASTICITY': 'YES', 'EL>data': smartClip.beamType().connectorElasticity._id,
+			'*STOP':'NO'
+			}
+	newConnectorBehavior = base.CreateEntity(constants.ABAQUS, "CONNECTOR BEHAVIOR", vals)
+	
+	# update coor sys and connector behaviour
+	vals = {
+		'ORIENT_1': geomType.symmCoordSystem._id,
+		'MID' : newConnectorBehavior._id}
+	base.SetEntityCardValues(constants.ABAQUS, newConnectorSection, vals)
+
+# ==============================================================================
+
+def createBeamsFromNode(name, beamSection, centerNodeId, nodeIds, orientation=BEAM_ORIENTATION, redrawModel=True):
+	
+	''' Creates beams from the center node to each of the given nodes, all of them sharing
+	the beam section and orientation. Beams are created in a redraw batch, the model
+	is redrawn once at its end. Returns the created beams in the order of nodeIds. '''
+	
+	vals = {'Name': name, 'PID': beamSection._id, 'NODE1': int(centerNodeId)}
+	vals.update(orientation)
+	
+	beams = list()
+	with redraw.redrawBatch():
+		for nodeId in nodeIds:
+			vals['NODE2'] = int(nodeId)
+			beams.append(base.CreateEntity(constants.ABAQUS, "BEAM", vals))
+		
+		if redrawModel:
+			redraw.redrawAll()
+	
+	return beams
+
+# ==============================================================================
+
+def pasteElementsEndNodes(beams, connectors, tolerance):
+	
+	''' Pastes end nodes of the given beams to the shell nodes within the tolerance.
+	
+	End nodes are the beam nodes not shared with the connectors. Shells around them are found
+	by NearElements and their nodes within the tolerance by the KD-tree, only these nodes are given
+	to AutoPaste. The cost depends on the number of the elements, not on the model size or its
+	visibility state. Returns number of the end nodes having a shell node to be pasted to. '''
+	
+	if len(beams) == 0:
+		return 0
+	
+	connectorNodes = set(base.CollectEntities(constants.ABAQUS, connectors, "NODE")) if len(connectors) > 0 else set()
+	endNodes = [node for node in base.CollectEntities(constants.ABAQUS, beams, "NODE") if node not in connectorNodes]
+	if len(endNodes) == 0:
+		return 0
+	endNodeIds, endNodesCoords = model_data.getEntitiesCoords(endNodes)
+	
+	nearElements = base.NearElements(coordinates=endNodesCoords.tolist(), tolerance=tolerance)
+	if nearElements is None:
+		return 0
+	
+	# beams and connectors around the end nodes are not paste targets
+	nearShells = collections.OrderedDict()
+	for pointElements in nearElements:
+		for element in pointElements:
+			if element.ansa_type(constants.ABAQUS) == 'SHELL':
+				nearShells[element] = None
+	endNodeSet = set(endNodes)
+	shellNodes = [node for node in base.CollectEntities(constants.ABAQUS, list(nearShells), "NODE")
+		if node not in endNodeSet]
+	if len(shellNodes) == 0:
+		return 0
+	shellNodeIds, shellNodesCoords = model_data.getEntitiesCoords(shellNodes)
+	
+	shellNodesTree = spatial.KdTree(shellNodesCoords)
+	pastedNodes = list()
+	targetNodeIndexes = set()
+	for endNode, endNodeCoords in zip(endNodes, endNodesCoords):
+		indexes = shellNodesTree.queryRadius(endNodeCoords, tolerance)
+		if len(indexes) > 0:
+			pastedNodes.append(endNode)
+			targetNodeIndexes.update(indexes.tolist())
+	
+	if len(pastedNodes) == 0:
+		return 0
+	
+	ansa.mesh.AutoPaste(entities=pastedNodes + [shellNodes[index] for index in sorted(targetNodeIndexes)],
+		project_on_geometry=False, project_2nd_order_nodes=False, move_to="FE pos", distance=tolerance, preserve_id='min')
+	
+	return len(pastedNodes)
+
+# ==============================================================================
+
+def getClipEntitiesList(clipEntities):
+	
+	''' Returns all entities of the clip entities dictionary as one list. '''
+	
+	entities = list()
+	for ents in clipEntities.values(): 
+		if type(ents) is list:
+			entities.extend(ents)
+		else:
+			entities.append(ents)
+	
+	return entities
+
+# ==============================================================================
+
+def isMainThread():
+	
+	return threading.current_thread() is threading.main_thread()
+
+# ==============================================================================
+
 def createPoint(pointCoords, name=''):
 	
 	try:
@@ -1663,8 +2400,8 @@ def getStopDistance(clipFace, mateFace, centerCoordNode, direction=1):
 	else:
 		faceDist = round(faceDist, 2)
 	
-	base.DeleteEntity(mNodeClipFace)
-	base.DeleteEntity(mNodeMateFace)
+	model_data.deleteEntities(mNodeClipFace)
+	model_data.deleteEntities(mNodeMateFace)
 	
 	return faceDist*direction
 '''	
@@ -1730,21 +2467,13 @@ def getConsHotPointCoords(conEntity):
 		# hot points of the first con
 		hotPoints = base.CollectEntities(constants.ABAQUS, conEntity, "HOT POINT")
 		
-		coords = list()
-		for hotPoint in hotPoints:	
-				coords.append(getHotPointCoords(hotPoint))
-		
-		return coords
+		return model_data.getEntitiesCoords(hotPoints)[1].tolist()
 
 # ==============================================================================
 
 def getHotPointCoords(hotPoint):
-		coord = list()
-		coord.append(getEntityProperty(hotPoint, 'X'))
-		coord.append(getEntityProperty(hotPoint, 'Y'))
-		coord.append(getEntityProperty(hotPoint, 'Z'))
-				
-		return coord
+		
+		return model_data.getEntityCoords(hotPoint)
 
 #==============================================================================
 
@@ -1755,31 +2484,51 @@ def getEntityProperty(entity, propertyName):
 
 #==============================================================================
 
-def findNearestElements(coords, searchEntities=None, maxIter=50):
+def findNearestElements(coords, searchEntities=None, maxRadius=5.0, elementIndex=None):
+	
+	''' Returns elements within the smallest tolerance step (0.1 increments) containing
+	any element or None if there is no element within maxRadius.
+	
+	elementIndex built for the searchEntities may be given to reuse its spatial index. '''
 	
-	if searchEntities is None:
-		searchEntities = base.CollectEntities(constants.ABAQUS, None, "SHELL")
-		
-	tolerance = 0.1
 	increment = 0.1
-	i = 0
-	nearElements = None
-	while nearElements is None: #len(nearElements) == 0:#
-		nearElements = base.NearElements(search_entities=searchEntities, coordinates=coords, tolerance=tolerance)
-		tolerance += increment
-		
-		if i > maxIter:
-			return None
-			break
-		i += 1	
+	
+	if elementIndex is None:
+		if searchEntities is None:
+			searchEntities = base.CollectEntities(constants.ABAQUS, None, "SHELL")
+		elementIndex = projection.ElementIndex(searchEntities)
+	
+	distance = elementIndex.nearestDistance(coords, maxRadius)
+	if distance is None:
+		return None
+	
+	# the same tolerance as reached by the incremental NearElements search
+	tolerance = max(1, np.ceil(distance/increment - 1e-9))*increment
 			
-	return nearElements[0]
+	return elementIndex.elementsWithin(coords, tolerance + 1e-9)
+
+#==============================================================================
+
+def invalidateModelCaches(keepSpatialIndex=False, keepStopDistances=False):
+	
+	''' Drops model data cached in the session. Must be called when the geometry is edited or remeshed.
+	Model spatial index may be kept if the model was changed by SmartClip only since the index was built,
+	it follows faces and shells created and deleted by SmartClip by itself. Stop distances of computed
+	clip sites may be kept as they are matched by the clip neighbourhood mesh. '''
+	
+	model_data.FACE_ATTRIBUTES.invalidate()
+	if not keepSpatialIndex:
+		model_data.MODEL_INDEX.invalidate()
+	if not keepStopDistances:
+		stop_distance_cache.STOP_DISTANCE_CACHE.invalidate()
+	property_registry.PROPERTY_REGISTRY.invalidate()
 
 #==============================================================================
     
 def hideAllFaces():
+	redraw.flushVisibility()
 	ent = base.CollectEntities(constants.ABAQUS, None, "FACE", filter_visible=True )
-	status = base.Not(ent, constants.ABAQUS)
+	redraw.hide(ent)
 		
 
 # ==============================================================================
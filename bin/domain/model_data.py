@@ -0,0 +1,964 @@
+# PYTHON script
+import os
+import contextlib
+import collections
+
+import numpy as np
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+ansa.ImportCode(os.path.join(PATH_SELF, 'spatial.py'))
+
+# ==============================================================================
+
+COORD_FIELDS = ('X', 'Y', 'Z')
+
+# ==============================================================================
+
+def getEntitiesCoords(entities, deck=constants.ABAQUS):
+
+	''' Returns ids and (N, 3) float array of coordinates of given nodes or hot points.
+
+	All the coordinates of an entity are read by a single card call and stored
+	in one contiguous array, ids are kept in the parallel array. '''
+
+	entities = list(entities)
+
+	ids = np.empty(len(entities), dtype=int)
+	coords = np.empty((len(entities), 3), dtype=float)
+	for index, entity in enumerate(entities):
+		card = base.GetEntityCardValues(deck, entity, COORD_FIELDS)
+		ids[index] = entity._id
+		coords[index] = card['X'], card['Y'], card['Z']
+
+	return ids, coords
+
+# ==============================================================================
+
+def getEntityCoords(entity, deck=constants.ABAQUS):
+
+	''' Returns [x, y, z] coordinates of a single node or hot point. '''
+
+	return getEntitiesCoords([entity], deck)[1][0].tolist()
+
+# ==============================================================================
+
+def withinDistanceMask(coords, pointCoords, distance):
+
+	''' Returns boolean mask of coords closer to the point than the given distance. '''
+
+	offsets = np.asarray(coords, dtype=float).reshape(-1, 3) - np.asarray(pointCoords, dtype=float)
+
+	return np.einsum('ij,ij->i', offsets, offsets) < distance**2
+
+# ==============================================================================
+
+class FaceAttributeCache(object):
+
+	''' Session wide cache of face attributes keyed by the face id.
+
+	Attributes are read from ANSA on the first request only. The cache must be
+	invalidated when the geometry is edited or remeshed. '''
+
+	def __init__(self):
+
+		self.attributes = dict()
+		self.hits = 0
+		self.misses = 0
+
+	#-------------------------------------------------------------------------
+
+	def _getAttribute(self, face, name, getter):
+
+		faceAttributes = self.attributes.setdefault(face._id, dict())
+		if name in faceAttributes:
+			self.hits += 1
+		else:
+			self.misses += 1
+			faceAttributes[name] = getter(face)
+
+		return faceAttributes[name]
+
+	#-------------------------------------------------------------------------
+
+	def _getMeshData(self, face):
+
+		nodes = base.CollectEntities(constants.ABAQUS, [face], "NODE")
+		if len(nodes) == 0:
+			return None, None
+
+		nodeIds, nodesCoords = getEntitiesCoords(nodes)
+
+		return nodeIds, (nodesCoords.min(axis=0), nodesCoords.max(axis=0))
+
+	#-------------------------------------------------------------------------
+
+	def orientation(self, face):
+
+		return list(self._getAttribute(face, 'orientation', base.GetFaceOrientation))
+
+	#-------------------------------------------------------------------------
+
+	def area(self, face):
+
+		return self._getAttribute(face, 'area', base.GetFaceArea)
+
+	#-------------------------------------------------------------------------
+
+	def pid(self, face):
+
+		return self._getAttribute(face, 'pid',
+			lambda face: base.GetEntityCardValues(constants.ABAQUS, face, ['PID'])['PID'])
+
+	#-------------------------------------------------------------------------
+
+	def boundingBox(self, face):
+
+		''' Returns boxMin, boxMax of face mesh nodes or None for not meshed face. '''
+
+		return self._getAttribute(face, 'meshData', self._getMeshData)[1]
+
+	#-------------------------------------------------------------------------
+
+	def nodeIds(self, face):
+
+		''' Returns ids of face mesh nodes or None for not meshed face. '''
+
+		return self._getAttribute(face, 'meshData', self._getMeshData)[0]
+
+	#-------------------------------------------------------------------------
+
+	def invalidate(self, faces=None):
+
+		''' Drops cached attributes of given faces or of all faces. '''
+
+		if faces is None:
+			self.attributes.clear()
+			return
+
+		for face in faces:
+			self.attributes.pop(face._id, None)
+
+	#-------------------------------------------------------------------------
+
+	def statistics(self):
+
+		return {'hits': self.hits, 'misses': self.misses, 'faces': len(self.attributes)}
+
+	#-------------------------------------------------------------------------
+
+	def printStatistics(self):
+
+		print('Face attribute cache: %(hits)s hits, %(misses)s misses, %(faces)s faces cached.' % self.statistics())
+
+# ==============================================================================
+
+FACE_ATTRIBUTES = FaceAttributeCache()
+
+# ==============================================================================
+
+class ModelSpatialIndex(object):
+
+	''' Session wide spatial index of model faces and shells by their bounding boxes.
+
+	Built on the first query and kept for the whole session, neighbourhood queries are answered
+	by the bounding volume tree without any visibility change. Face boxes are given by their mesh,
+	not meshed faces are only flagged. Shell corner coordinates are stored as well, candidates found
+	by their boxes are refined by the exact distance of their triangles.
+
+	The whole model is collected only when the index is built or marked as modified. Otherwise changes
+	are tracked explicitly - faces and shells created in the trackChanges block and deleted by
+	deleteEntities. Boxes of created entities are kept aside of the tree, deleted ones are masked.
+	The tree is rebuilt from the stored boxes (without any API call) once there are too many of them.
+	Faces of deleted shells are indexed again with the next synchronisation. The index must be
+	invalidated (rebuilt) when the existing mesh is moved or edited outside of SmartClip. '''
+
+	SHELL_FIELDS = ('PID', 'G1', 'G2', 'G3', 'G4')
+	# entities added aside of the tree triggering its rebuild - absolute and relative to the tree size
+	REBUILD_MIN_SIZE = 1000
+	REBUILD_RATIO = 0.2
+
+	def __init__(self):
+
+		self.invalidate()
+
+	#-------------------------------------------------------------------------
+
+	def isBuilt(self):
+
+		return self.tree is not None
+
+	#-------------------------------------------------------------------------
+
+	def update(self):
+
+		''' Builds the index or synchronises it with the whole model if marked as modified.
+		The tree is rebuilt if there are too many entities kept aside of it. '''
+
+		if not self.isBuilt() or self.modified:
+			self._synchronise()
+
+		pendingCount = len(self.entities) - self.treeSize
+		if not self.isBuilt() or pendingCount > max(self.REBUILD_MIN_SIZE, self.REBUILD_RATIO*self.treeSize):
+			self._rebuildTree()
+
+	#-------------------------------------------------------------------------
+
+	def _synchronise(self):
+
+		''' Collects all faces and shells of the model, indexes new ones and drops deleted ones. '''
+
+		shells = base.CollectEntities(constants.ABAQUS, None, "SHELL")
+		faces = base.CollectEntities(constants.ABAQUS, None, "FACE")
+
+		deletedEntities = set(self.entityIndexes)
+		deletedEntities.difference_update(shells)
+		deletedEntities.difference_update(faces)
+		self.notMeshedFaces.intersection_update(faces)
+		remeshedFaces = self._getRemeshedFaces(deletedEntities)
+		self._removeEntities(deletedEntities)
+		self._removeEntities(remeshedFaces)
+
+		newShells = [shell for shell in shells if shell not in self.entityIndexes]
+		# faces not meshed so far may be meshed by the new shells
+		if len(newShells) > 0:
+			self.notMeshedFaces.clear()
+		newFaces = [face for face in faces if face not in self.entityIndexes and face not in self.notMeshedFaces]
+		self._addEntities(newShells, newFaces)
+
+		self.modified = False
+		self.counts['updates'] += 1
+
+	#-------------------------------------------------------------------------
+
+	def _addEntities(self, shells, faces):
+
+		''' Indexes given shells and faces, shells first as face boxes are given by them. '''
+
+		if len(shells) > 0:
+			self._addShells(shells)
+		if len(faces) > 0:
+			self._addFaces(faces)
+
+		self.counts['added'] += len(shells) + len(faces)
+
+	#-------------------------------------------------------------------------
+
+	def _removeEntities(self, entities):
+
+		''' Masks given entities, they are dropped with the next tree rebuild. '''
+
+		removedCount = 0
+		for entity in entities:
+			index = self.entityIndexes.pop(entity, None)
+			self.notMeshedFaces.discard(entity)
+			if index is not None:
+				self.alive[index] = False
+				removedCount += 1
+
+		self.counts['deleted'] += removedCount
+
+	#-------------------------------------------------------------------------
+
+	@contextlib.contextmanager
+	def trackChanges(self):
+
+		''' Indexes faces and shells created in the block. '''
+
+		collector = base.CollectNewModelEntities(constants.ABAQUS, ["SHELL", "FACE"])
+		try:
+			yield
+		finally:
+			newEntities = collector.report()
+			# the whole model is read with the next update anyway
+			if self.isBuilt() and not self.modified:
+				self._addEntities(
+					[entity for entity in newEntities if entity.ansa_type(constants.ABAQUS) == 'SHELL'],
+					[entity for entity in newEntities if entity.ansa_type(constants.ABAQUS) == 'FACE'])
+
+	#-------------------------------------------------------------------------
+
+	def entitiesDeleted(self, entities):
+
+		''' Drops deleted entities from the index. Mesh of deleted faces may be deleted with them
+		and faces of deleted shells are remeshed, the whole model is synchronised with the next update then. '''
+
+		entities = [entity for entity in entities if entity in self.entityIndexes or entity in self.notMeshedFaces]
+		remeshedFaces = self._getRemeshedFaces(entities)
+		if len(remeshedFaces) > 0 or any(entity.ansa_type(constants.ABAQUS) == 'FACE' for entity in entities):
+			self.modified = True
+
+		self._removeEntities(entities)
+		self._removeEntities(remeshedFaces)
+
+	#-------------------------------------------------------------------------
+
+	def _getRemeshedFaces(self, deletedEntities):
+
+		''' Returns indexed faces having any of the deleted shells, they are indexed again with their new mesh. '''
+
+		deletedShells = set(entity for entity in deletedEntities
+			if entity in self.entityIndexes and not self.isFace[self.entityIndexes[entity]])
+		if len(deletedShells) == 0:
+			return list()
+
+		return [face for face, shells in self.faceShells.items()
+			if face in self.entityIndexes and not deletedShells.isdisjoint(shells)]
+
+	#-------------------------------------------------------------------------
+
+	def invalidateEntities(self, faces):
+
+		''' Drops faces going to be remeshed, they are indexed with their new mesh with the next update. '''
+
+		self._removeEntities(faces)
+		self.modified = True
+
+	#-------------------------------------------------------------------------
+
+	def markModified(self):
+
+		''' The model was changed outside of the tracked operations, the whole model is synchronised
+		with the next update. '''
+
+		self.modified = True
+
+	#-------------------------------------------------------------------------
+
+	def _addEntity(self, entity, isFace, pid, boxMin, boxMax, corners=None):
+
+		self.entityIndexes[entity] = len(self.entities)
+		self.entities.append(entity)
+		self._appendRows(isFace, pid, boxMin, boxMax, corners)
+
+	#-------------------------------------------------------------------------
+
+	def _appendRows(self, isFace, pid, boxMin, boxMax, corners):
+
+		index = len(self.entities) - 1
+		if index >= len(self.pids):
+			capacity = max(2*len(self.pids), 1024)
+			self.isFace = np.resize(self.isFace, capacity)
+			self.alive = np.resize(self.alive, capacity)
+			self.pids = np.resize(self.pids, capacity)
+			self.boxMins = np.resize(self.boxMins, (capacity, 3))
+			self.boxMaxs = np.resize(self.boxMaxs, (capacity, 3))
+			self.shellCorners = np.resize(self.shellCorners, (capacity, 4, 3))
+
+		self.isFace[index] = isFace
+		self.alive[index] = True
+		self.pids[index] = pid
+		self.boxMins[index] = boxMin
+		self.boxMaxs[index] = boxMax
+		# the fourth corner of trias is NaN
+		self.shellCorners[index] = np.nan
+		if corners is not None:
+			self.shellCorners[index, :len(corners)] = corners
+
+	#-------------------------------------------------------------------------
+
+	def _addShells(self, shells):
+
+		nodes = base.CollectEntities(constants.ABAQUS, shells, "NODE")
+		nodeIds, nodeCoords = getEntitiesCoords(nodes)
+		nodeIndexes = dict((nodeId, index) for index, nodeId in enumerate(nodeIds.tolist()))
+
+		for shell in shells:
+			card = base.GetEntityCardValues(constants.NASTRAN, shell, self.SHELL_FIELDS)
+			shellNodeIndexes = [nodeIndexes[card.get(field)] for field in self.SHELL_FIELDS[1:]
+				if card.get(field) in nodeIndexes]
+			if len(shellNodeIndexes) == 0:
+				continue
+			shellNodeCoords = nodeCoords[shellNodeIndexes]
+			self._addEntity(shell, False, card.get('PID') or 0, shellNodeCoords.min(axis=0), shellNodeCoords.max(axis=0),
+				shellNodeCoords if len(shellNodeCoords) >= 3 else None)
+
+	#-------------------------------------------------------------------------
+
+	def _addFaces(self, faces):
+
+		for face in faces:
+			faceShells = [shell for shell in base.CollectEntities(constants.ABAQUS, [face], "SHELL")
+				if shell in self.entityIndexes]
+			if len(faceShells) == 0:
+				# not meshed faces are not read again with each synchronisation
+				self.notMeshedFaces.add(face)
+				continue
+			faceShellIndexes = [self.entityIndexes[shell] for shell in faceShells]
+			self.faceShells[face] = faceShells
+			self._addEntity(face, True, FACE_ATTRIBUTES.pid(face),
+				self.boxMins[faceShellIndexes].min(axis=0), self.boxMaxs[faceShellIndexes].max(axis=0))
+
+	#-------------------------------------------------------------------------
+
+	def _rebuildTree(self):
+
+		''' Builds the tree of all stored entities, deleted ones are dropped. '''
+
+		liveIndexes = np.flatnonzero(self.alive[:len(self.entities)])
+
+		self.entities = [self.entities[index] for index in liveIndexes]
+		self.entityIndexes = dict((entity, index) for index, entity in enumerate(self.entities))
+		self.isFace = self.isFace[liveIndexes]
+		self.alive = self.alive[liveIndexes]
+		self.pids = self.pids[liveIndexes]
+		self.boxMins = self.boxMins[liveIndexes]
+		self.boxMaxs = self.boxMaxs[liveIndexes]
+		self.shellCorners = self.shellCorners[liveIndexes]
+		self.faceShells = dict((face, shells) for face, shells in self.faceShells.items() if face in self.entityIndexes)
+
+		self.tree = spatial.AabbTree(self.boxMins, self.boxMaxs)
+		self.treeSize = len(self.entities)
+		self.counts['builds'] += 1
+
+	#-------------------------------------------------------------------------
+
+	def _queryBox(self, boxMin, boxMax):
+
+		''' Returns sorted indexes of live entities which boxes overlap the given box. '''
+
+		found = self.tree.queryBox(boxMin, boxMax)
+
+		pendingMins = self.boxMins[self.treeSize:len(self.entities)]
+		pendingMaxs = self.boxMaxs[self.treeSize:len(self.entities)]
+		overlaps = np.all(pendingMins <= boxMax, axis=1) & np.all(pendingMaxs >= boxMin, axis=1)
+		found = np.concatenate([found, self.treeSize + np.flatnonzero(overlaps)])
+
+		return np.sort(found[self.alive[found]])
+
+	#-------------------------------------------------------------------------
+
+	def neighbourhood(self, entities, radius, update=True):
+
+		''' Returns faces and shells within the radius from given faces or shells. Entities are returned
+		in the order they were indexed.
+
+		Candidates are found by their boxes overlapping the bounding box of given entities grown by
+		the radius and refined by the exact distance of their shell triangles, faces are within the radius
+		if any of their shells is.
+
+		The update may be skipped for many queries of an unchanged model following an explicit update. '''
+
+		if update or not self.isBuilt():
+			self.update()
+
+		indexes = [self.entityIndexes[entity] for entity in entities if entity in self.entityIndexes]
+		if len(indexes) == 0:
+			return list(), list()
+
+		boxMin = self.boxMins[indexes].min(axis=0) - radius
+		boxMax = self.boxMaxs[indexes].max(axis=0) + radius
+		found = self._withinDistance(indexes, self._queryBox(boxMin, boxMax), radius)
+
+		faces = [self.entities[index] for index in found[self.isFace[found]]]
+		shells = [self.entities[index] for index in found[~self.isFace[found]]]
+
+		return faces, shells
+
+	#-------------------------------------------------------------------------
+
+	def _shellIndexes(self, indexes):
+
+		''' Returns indexes of the given shells and the shells of the given faces. '''
+
+		shellIndexes = list()
+		for index in indexes:
+			if self.isFace[index]:
+				shellIndexes.extend(self.entityIndexes[shell] for shell in self.faceShells[self.entities[index]]
+					if shell in self.entityIndexes)
+			else:
+				shellIndexes.append(index)
+
+		return np.array(shellIndexes, dtype=int)
+
+	#-------------------------------------------------------------------------
+
+	def _shellTriangles(self, shellIndexes):
+
+		''' Returns (N, 3, 3) triangles of the indexed shells and indexes of their shells, quads are split. '''
+
+		corners = self.shellCorners[shellIndexes]
+		triangles = np.concatenate([corners[:, [0, 1, 2]], corners[:, [0, 2, 3]]])
+		triangleShellIndexes = np.concatenate([shellIndexes, shellIndexes])
+
+		valid = ~np.isnan(triangles).any(axis=(1, 2))
+
+		return triangles[valid], triangleShellIndexes[valid]
+
+	#-------------------------------------------------------------------------
+
+	def _withinDistance(self, indexes, candidates, radius):
+
+		''' Returns the candidates within the radius from the entities by the exact distance
+		of their shell triangles. '''
+
+		queryTriangles = self._shellTriangles(self._shellIndexes(indexes))[0]
+		candidateShellIndexes = candidates[~self.isFace[candidates]]
+		triangles, triangleShellIndexes = self._shellTriangles(candidateShellIndexes)
+
+		within = spatial.trianglesWithinDistance(triangles, queryTriangles, radius)
+		withinShells = set(triangleShellIndexes[within].tolist())
+
+		found = list()
+		for index in candidates:
+			if self.isFace[index]:
+				shells = self.faceShells[self.entities[index]]
+				isWithin = any(self.entityIndexes.get(shell) in withinShells for shell in shells)
+			else:
+				isWithin = index in withinShells
+			if isWithin:
+				found.append(index)
+
+		return np.array(found, dtype=int)
+
+	#-------------------------------------------------------------------------
+
+	def pid(self, entity):
+
+		''' Returns PID of the indexed face or shell. '''
+
+		return int(self.pids[self.entityIndexes[entity]])
+
+	#-------------------------------------------------------------------------
+
+	def boundingBoxes(self, entities):
+
+		''' Returns (N, 3) box minima and maxima of given faces or shells and the mask of the indexed ones.
+		Boxes of entities not indexed (not meshed faces) are NaN. '''
+
+		indexes = np.array([self.entityIndexes.get(entity, -1) for entity in entities], dtype=int)
+		indexed = indexes >= 0
+
+		boxMins = np.full((len(indexes), 3), np.nan)
+		boxMaxs = np.full((len(indexes), 3), np.nan)
+		boxMins[indexed] = self.boxMins[indexes[indexed]]
+		boxMaxs[indexed] = self.boxMaxs[indexes[indexed]]
+
+		return boxMins, boxMaxs, indexed
+
+	#-------------------------------------------------------------------------
+
+	def invalidate(self):
+
+		''' Drops the whole index, it is built from scratch on the next query. '''
+
+		self.entities = list()
+		self.entityIndexes = dict()
+		self.isFace = np.zeros(0, dtype=bool)
+		self.alive = np.zeros(0, dtype=bool)
+		self.pids = np.zeros(0, dtype=int)
+		self.boxMins = np.zeros((0, 3), dtype=float)
+		self.boxMaxs = np.zeros((0, 3), dtype=float)
+		self.shellCorners = np.zeros((0, 4, 3), dtype=float)
+		self.faceShells = dict()
+		self.notMeshedFaces = set()
+		self.tree = None
+		self.treeSize = 0
+		self.modified = True
+		self.counts = collections.Counter()
+
+	#-------------------------------------------------------------------------
+
+	def statistics(self):
+
+		return {'entities': len(self.entityIndexes), 'notMeshed': len(self.notMeshedFaces), 'builds': self.counts['builds'], 'updates': self.counts['updates'],
+			'added': self.counts['added'], 'deleted': self.counts['deleted']}
+
+	#-------------------------------------------------------------------------
+
+	def printStatistics(self):
+
+		print('Model spatial index: %(entities)s entities, %(notMeshed)s not meshed faces, %(builds)s builds, %(updates)s updates, '
+			'%(added)s added, %(deleted)s deleted.' % self.statistics())
+
+# ==============================================================================
+
+class LocalSpatialIndex(ModelSpatialIndex):
+
+	''' Spatial index of the faces and shells around given faces only.
+
+	Used for a single clip while the model spatial index is not built, so the clip does not pay
+	for indexing the whole model. Candidate shells are found by one NearElements query around
+	the face nodes grown by the shell size, faces are the faces of the candidate properties.
+	The index is never synchronised with the model, it is queried right after it was built. '''
+
+	def __init__(self, faces, radius):
+
+		ModelSpatialIndex.__init__(self)
+
+		self._build(faces, radius)
+
+	#-------------------------------------------------------------------------
+
+	def update(self):
+
+		pass
+
+	#-------------------------------------------------------------------------
+
+	def _build(self, faces, radius):
+
+		self._addShells(base.CollectEntities(constants.ABAQUS, faces, "SHELL"))
+		faceShellCount = len(self.entities)
+		if faceShellCount > 0:
+			# any point of a face shell is within the shell box diagonal from its nodes
+			shellSize = np.linalg.norm(self.boxMaxs[:faceShellCount] - self.boxMins[:faceShellCount], axis=1).max()
+			corners = self.shellCorners[:faceShellCount].reshape(-1, 3)
+			nodeCoords = np.unique(corners[~np.isnan(corners).any(axis=1)], axis=0)
+
+			nearElements = base.NearElements(coordinates=nodeCoords.tolist(), tolerance=radius + shellSize)
+			nearShells = collections.OrderedDict()
+			for elements in nearElements or list():
+				nearShells.update((element, None) for element in elements
+					if element not in self.entityIndexes and element.ansa_type(constants.ABAQUS) == 'SHELL')
+			self._addShells(list(nearShells))
+
+			properties = base.CollectEntities(constants.ABAQUS, self.entities, "__PROPERTIES__")
+			self._addFaces(base.CollectEntities(constants.ABAQUS, properties, "FACE"))
+
+		self._rebuildTree()
+		self.modified = False
+
+# ==============================================================================
+
+MODEL_INDEX = ModelSpatialIndex()
+
+# ==============================================================================
+
+def getSpatialIndex(faces, radius):
+
+	''' Returns the model spatial index if it is built, otherwise a local index of the faces
+	and shells within the radius from given faces. '''
+
+	if MODEL_INDEX.isBuilt():
+		return MODEL_INDEX
+
+	return LocalSpatialIndex(faces, radius)
+
+# ==============================================================================
+
+def deleteEntities(entities, force=False):
+
+	''' Deletes given entities and drops them from the model spatial index. '''
+
+	if not isinstance(entities, (list, tuple, set)):
+		entities = [entities]
+
+	base.DeleteEntity(entities, force=force)
+	MODEL_INDEX.entitiesDeleted(entities)
+
+# ==============================================================================
+
+class FaceAngleTable(object):
+
+	''' Angles between face normals and clip frame directions.
+
+	Face normals are stacked into one (F, 3) matrix and angles to all directions are
+	computed in one step giving (F, D) table in degrees. Directions and faces not known yet
+	are added on their first use. '''
+
+	def __init__(self, faces=(), directions=()):
+
+		self.faces = list()
+		self.faceIndexes = dict()
+		self.normals = np.empty((0, 3))
+		self.directions = np.empty((0, 3))
+		self.table = np.empty((0, 0))
+
+		self.addFaces(faces)
+		self.addDirections(directions)
+
+	#-------------------------------------------------------------------------
+
+	def addFaces(self, faces):
+
+		faces = [face for face in faces if face not in self.faceIndexes]
+		if len(faces) == 0:
+			return
+
+		normals = _normalisedRows([FACE_ATTRIBUTES.orientation(face) for face in faces])
+		for face in faces:
+			self.faceIndexes[face] = len(self.faces)
+			self.faces.append(face)
+
+		self.normals = np.vstack([self.normals, normals])
+		self.table = np.vstack([self.table, _anglesTable(normals, self.directions)])
+
+	#-------------------------------------------------------------------------
+
+	def addDirections(self, directions):
+
+		directions = _normalisedRows(directions)
+		directions = np.array([direction for direction in directions if self._directionIndex(direction) is None]).reshape(-1, 3)
+		if len(directions) == 0:
+			return
+
+		self.directions = np.vstack([self.directions, directions])
+		self.table = np.hstack([self.table, _anglesTable(self.normals, directions)])
+
+	#-------------------------------------------------------------------------
+
+	def _directionIndex(self, direction):
+
+		if len(self.directions) == 0:
+			return None
+
+		indexes = np.flatnonzero(np.all(np.abs(self.directions - direction) < 1e-9, axis=1))
+		if len(indexes) == 0:
+			return None
+
+		return indexes[0]
+
+	#-------------------------------------------------------------------------
+
+	def angles(self, faces, direction):
+
+		''' Returns angles in degrees between normals of given faces and the direction. '''
+
+		self.addFaces(faces)
+		direction = _normalisedRows([direction])[0]
+		self.addDirections([direction])
+
+		rows = np.array([self.faceIndexes[face] for face in faces], dtype=int)
+
+		return self.table[rows, self._directionIndex(direction)]
+
+	#-------------------------------------------------------------------------
+
+	def sortedFaces(self, faces, direction, angleLimit):
+
+		''' Returns faces with the angle not exceeding the limit sorted by the angle. '''
+
+		faces = list(faces)
+		if len(faces) == 0:
+			return list()
+
+		angles = self.angles(faces, direction)
+		indexes = np.flatnonzero(angles <= angleLimit)
+		indexes = indexes[np.argsort(angles[indexes], kind='stable')]
+
+		return [faces[index] for index in indexes]
+
+	#-------------------------------------------------------------------------
+
+	def minimalAngleLimit(self, faces, direction, angleLimit, angleStep, maxAngleLimit):
+
+		''' Returns the first limit of angleLimit + n*angleStep (< maxAngleLimit) that
+		contains any of the faces or None. '''
+
+		faces = list(faces)
+		if len(faces) == 0 or angleLimit >= maxAngleLimit:
+			return None
+
+		minAngle = self.angles(faces, direction).min()
+		if minAngle <= angleLimit:
+			return angleLimit
+
+		limit = angleLimit + int(np.ceil((minAngle - angleLimit)/angleStep))*angleStep
+		if limit >= maxAngleLimit:
+			return None
+
+		return limit
+
+# ==============================================================================
+
+class ClipNeighbourhoodSnapshot(object):
+
+	''' Mesh of the clip neighbourhood read from the model at once.
+
+	Nodes, shells and faces are kept in contiguous arrays: node ids and coordinates,
+	shell connectivity as node indexes (-1 for the missing 4th node of triangles), shell PIDs,
+	face of each shell (-1 for FE shells) and face normals, areas and PIDs. Shells of a face
+	are stored in a row, so face shells are given by the face offsets.
+	Each node and shell card is read only once, all geometry queries are answered without
+	any further API call. '''
+
+	SHELL_FIELDS = ('PID', 'G1', 'G2', 'G3', 'G4')
+
+	def __init__(self, faces, shells=()):
+
+		self.faces = list(faces)
+		self.faceIndexes = dict((face, index) for index, face in enumerate(self.faces))
+
+		# face shells first, FE shells without face follow
+		self.shells = list()
+		self.shellIndexes = dict()
+		self.faceShellOffsets = np.zeros(len(self.faces) + 1, dtype=int)
+		for index, face in enumerate(self.faces):
+			self._addShells(base.CollectEntities(constants.ABAQUS, [face], "SHELL"))
+			self.faceShellOffsets[index + 1] = len(self.shells)
+		self._addShells(shells)
+
+		self.shellFaceIndexes = np.full(len(self.shells), -1, dtype=int)
+		for index in range(len(self.faces)):
+			self.shellFaceIndexes[self.faceShellOffsets[index]:self.faceShellOffsets[index + 1]] = index
+
+		self._readMesh()
+
+		self.faceNormals = _normalisedRows([FACE_ATTRIBUTES.orientation(face) for face in self.faces])
+		self.faceAreas = np.array([FACE_ATTRIBUTES.area(face) for face in self.faces], dtype=float)
+		self.facePids = np.array([FACE_ATTRIBUTES.pid(face) for face in self.faces], dtype=int)
+
+	#-------------------------------------------------------------------------
+
+	def _addShells(self, shells):
+
+		for shell in shells:
+			if shell not in self.shellIndexes:
+				self.shellIndexes[shell] = len(self.shells)
+				self.shells.append(shell)
+
+	#-------------------------------------------------------------------------
+
+	def _readMesh(self):
+
+		nodes = base.CollectEntities(constants.ABAQUS, self.shells, "NODE") if len(self.shells) > 0 else list()
+		self.nodeIds, self.nodeCoords = getEntitiesCoords(nodes)
+		self.nodeIndexes = nodeIndexes = dict((nodeId, index) for index, nodeId in enumerate(self.nodeIds.tolist()))
+
+		self.shellPids = np.zeros(len(self.shells), dtype=int)
+		self.connectivity = np.full((len(self.shells), 4), -1, dtype=int)
+		for index, shell in enumerate(self.shells):
+			card = base.GetEntityCardValues(constants.NASTRAN, shell, self.SHELL_FIELDS)
+			self.shellPids[index] = card.get('PID') or 0
+
+			shellNodeIds = [card.get(field) for field in self.SHELL_FIELDS[1:]]
+			shellNodeIds = [nodeId for nodeId in shellNodeIds if nodeId not in (None, '', 0)]
+			# incomplete shells have no triangles
+			if len(shellNodeIds) < 3 or any(nodeId not in nodeIndexes for nodeId in shellNodeIds):
+				continue
+			self.connectivity[index, :len(shellNodeIds)] = [nodeIndexes[nodeId] for nodeId in shellNodeIds[:4]]
+
+	#-------------------------------------------------------------------------
+
+	def containsFaces(self, faces):
+
+		for face in faces:
+			if face not in self.faceIndexes:
+				return False
+
+		return True
+
+	#-------------------------------------------------------------------------
+
+	def containsShells(self, shells):
+
+		for shell in shells:
+			if shell not in self.shellIndexes:
+				return False
+
+		return True
+
+	#-------------------------------------------------------------------------
+
+	def faceShellIndexes(self, faces):
+
+		return np.concatenate([np.arange(self.faceShellOffsets[self.faceIndexes[face]],
+			self.faceShellOffsets[self.faceIndexes[face] + 1]) for face in faces] + [np.empty(0, dtype=int)])
+
+	#-------------------------------------------------------------------------
+
+	def shellsTriangles(self, shells):
+
+		''' Returns (N, 3, 3) array of triangles of given shells and indexes of their shells in the given list.
+		Quads are split into two triangles. '''
+
+		return self._triangles(np.array([self.shellIndexes[shell] for shell in shells], dtype=int))
+
+	#-------------------------------------------------------------------------
+
+	def _triangles(self, shellIndexes):
+
+		connectivity = self.connectivity[shellIndexes].reshape(-1, 4)
+		complete = connectivity[:, 2] >= 0
+		triangleNodes = np.stack([connectivity[:, [0, 1, 2]], connectivity[:, [0, 2, 3]]], axis=1)
+		triangleMask = np.stack([complete, complete & (connectivity[:, 3] >= 0)], axis=1)
+
+		listIndexes = np.repeat(np.arange(len(connectivity))[:, None], 2, axis=1)
+
+		return self.nodeCoords[triangleNodes[triangleMask]].reshape(-1, 3, 3), listIndexes[triangleMask]
+
+	#-------------------------------------------------------------------------
+
+	def faceTriangles(self, face):
+
+		''' Returns (N, 3, 3) array of face shell triangles or None for not meshed face. '''
+
+		triangles = self._triangles(self.faceShellIndexes([face]))[0]
+
+		return triangles if len(triangles) > 0 else None
+
+	#-------------------------------------------------------------------------
+
+	def faceNodeCoords(self, faces):
+
+		''' Returns (N, 3) coordinates of the nodes meshing given faces. '''
+
+		connectivity = self.connectivity[self.faceShellIndexes(faces)]
+
+		return self.nodeCoords[np.unique(connectivity[connectivity >= 0])]
+
+	#-------------------------------------------------------------------------
+
+	def shellPidCounts(self, shells):
+
+		''' Returns Counter of given shells per PID or None if any of the shells is not in the snapshot. '''
+
+		if not self.containsShells(shells):
+			return None
+
+		pids = self.shellPids[[self.shellIndexes[shell] for shell in shells]]
+
+		return collections.Counter(int(pid) for pid in pids)
+
+	#-------------------------------------------------------------------------
+
+	def shellPid(self, shell):
+
+		return int(self.shellPids[self.shellIndexes[shell]])
+
+	#-------------------------------------------------------------------------
+
+	def shellNodeCounts(self, nodes):
+
+		''' Returns Counter of the snapshot shells per number of given nodes they are attached to
+		(node to element incidences) or None if any of the nodes is not in the snapshot. '''
+
+		nodeIndexes = list()
+		for node in nodes:
+			if node._id not in self.nodeIndexes:
+				return None
+			nodeIndexes.append(self.nodeIndexes[node._id])
+
+		nodeCounts = np.isin(self.connectivity, nodeIndexes).sum(axis=1)
+
+		return collections.Counter(dict((self.shells[index], int(nodeCounts[index])) for index in np.flatnonzero(nodeCounts)))
+
+	#-------------------------------------------------------------------------
+
+	def statistics(self):
+
+		return {'faces': len(self.faces), 'shells': len(self.shells), 'nodes': len(self.nodeIds)}
+
+# ==============================================================================
+
+def _normalisedRows(vectors):
+
+	vectors = np.array(vectors, dtype=float).reshape(-1, 3)
+	lengths = np.linalg.norm(vectors, axis=1)
+	lengths[lengths == 0] = 1.0
+
+	return vectors/lengths[:, None]
+
+# ==============================================================================
+
+def _anglesTable(normals, directions):
+
+	''' Returns (F, D) angles in degrees of unit normals and directions. '''
+
+	return np.degrees(np.arccos(np.clip(np.dot(normals, directions.T), -1.0, 1.0)))
@@ -0,0 +1,252 @@
+# PYTHON script
+import json
+import time
+import functools
+import threading
+import contextlib
+import collections
+
+import ansa
+from ansa import base
+
+# ==============================================================================
+
+BASE_FUNCTIONS = [
+	'ProjectPointDirectional', 'GetEntityCardValues', 'SetEntityCardValues', 'CreateEntity', 'DeleteEntity',
+	'CollectEntities', 'GetEntity', 'PickEntities', 'Near', 'NearElements', 'NodesToElements',
+	'Or', 'And', 'Not', 'SetEntityVisibilityValues', 'GetFacesOfCons', 'GetFaceArea', 'GetFaceOrientation',
+	'Newpoint', 'CreateMeasurement', 'GeoSymmetry', 'GeoRotate', 'CollectNewModelEntities',
+	'BlockRedraws', 'RedrawAll']
+MESH_FUNCTIONS = ['AutoPaste']
+
+OTHER_STAGE = 'other'
+TOTAL_BUDGET = 'total'
+
+# ==============================================================================
+
+class ClipProfile(object):
+
+	''' Wall time and ANSA API calls of one clip accumulated per pipeline stage.
+
+	Stages may be nested, the time and calls are always assigned to the innermost stage only.
+	Total time and total calls of a stage include its nested stages. Stages are recorded only in the thread
+	the profile was activated in, stages of worker threads are part of the stage running them. '''
+
+	_active = None
+
+	def __init__(self, name=''):
+
+		self.name = name
+		self.stages = collections.OrderedDict()
+		self._stageStack = list()
+		self._stageStartTimes = list()
+		self._lastTime = time.time()
+		self._thread = threading.current_thread()
+
+	#-------------------------------------------------------------------------
+
+	@classmethod
+	def active(cls):
+		return cls._active
+
+	#-------------------------------------------------------------------------
+
+	def activate(self):
+
+		''' Makes the profile the one recording API calls and stages. '''
+
+		installApiWrappers()
+		ClipProfile._active = self
+		self._lastTime = time.time()
+		self._thread = threading.current_thread()
+
+	#-------------------------------------------------------------------------
+
+	def deactivate(self):
+
+		if ClipProfile._active is self:
+			ClipProfile._active = None
+
+	#-------------------------------------------------------------------------
+
+	def _getStage(self, name):
+
+		if name not in self.stages:
+			self.stages[name] = {'time': 0.0, 'totalTime': 0.0, 'calls': collections.Counter(), 'totalCalls': 0,
+				'apiTime': collections.Counter()}
+
+		return self.stages[name]
+
+	#-------------------------------------------------------------------------
+
+	def _accumulateTime(self):
+
+		currentTime = time.time()
+		if len(self._stageStack) > 0:
+			self._getStage(self._stageStack[-1])['time'] += currentTime - self._lastTime
+		self._lastTime = currentTime
+
+	#-------------------------------------------------------------------------
+
+	def isOwnThread(self):
+
+		return threading.current_thread() is self._thread
+
+	#-------------------------------------------------------------------------
+
+	def enterStage(self, name):
+
+		self._accumulateTime()
+		self._stageStack.append(name)
+		self._stageStartTimes.append(self._lastTime)
+		self._getStage(name)
+
+	#-------------------------------------------------------------------------
+
+	def exitStage(self):
+
+		self._accumulateTime()
+		name = self._stageStack.pop()
+		startTime = self._stageStartTimes.pop()
+		# recursive stage is accounted by its outermost call
+		if name not in self._stageStack:
+			self._getStage(name)['totalTime'] += self._lastTime - startTime
+
+	#-------------------------------------------------------------------------
+
+	def addApiCall(self, functionName, duration):
+
+		stageName = self._stageStack[-1] if len(self._stageStack) > 0 else OTHER_STAGE
+		stage = self._getStage(stageName)
+		stage['calls'][functionName] += 1
+		stage['apiTime'][functionName] += duration
+		for name in set(self._stageStack):
+			self._getStage(name)['totalCalls'] += 1
+
+	#-------------------------------------------------------------------------
+
+	def callCounts(self):
+
+		''' Returns number of calls of each API function in all stages. '''
+
+		callCounts = collections.Counter()
+		for stage in self.stages.values():
+			callCounts.update(stage['calls'])
+
+		return callCounts
+
+	#-------------------------------------------------------------------------
+
+	def exceededBudget(self, budget):
+
+		''' Returns (function name, calls, limit) of all API functions called more times than allowed
+		by the budget {function name: limit}. The *total* limit applies to all calls. '''
+
+		callCounts = self.callCounts()
+		callCounts[TOTAL_BUDGET] = sum(callCounts.values())
+
+		return [(functionName, callCounts[functionName], limit) for functionName, limit in budget.items()
+			if callCounts[functionName] > limit]
+
+	#-------------------------------------------------------------------------
+
+	def toDict(self):
+
+		stages = collections.OrderedDict()
+		for name, stage in self.stages.items():
+			stages[name] = {
+				'time': round(stage['time'], 4),
+				'totalTime': round(stage['totalTime'], 4),
+				'calls': dict(stage['calls']),
+				'totalCalls': stage['totalCalls'],
+				'apiTime': dict((functionName, round(value, 4)) for functionName, value in stage['apiTime'].items())}
+
+		return {'name': self.name,
+			'time': round(sum(stage['time'] for stage in self.stages.values()), 4),
+			'calls': sum(sum(stage['calls'].values()) for stage in self.stages.values()),
+			'stages': stages}
+
+	#-------------------------------------------------------------------------
+
+	def dump(self, fileName):
+
+		with open(fileName, 'w') as profileFile:
+			json.dump(self.toDict(), profileFile, indent=4)
+
+	#-------------------------------------------------------------------------
+
+	def printReport(self):
+
+		profile = self.toDict()
+		print('SmartClip profile %s: %.3fs, %s API calls' % (profile['name'], profile['time'], profile['calls']))
+		for name, stage in profile['stages'].items():
+			print('    %-30s %8.3fs %6s calls' % (name, stage['time'], sum(stage['calls'].values())))
+			for functionName, calls in sorted(stage['calls'].items(), key=lambda item: -stage['apiTime'][item[0]]):
+				print('        %-26s %8.3fs %6s' % (functionName, stage['apiTime'][functionName], calls))
+
+# ==============================================================================
+
+@contextlib.contextmanager
+def stageContext(name):
+
+	''' Accumulates time and API calls of the block to the given stage of the active profile. '''
+
+	profile = ClipProfile.active()
+	if profile is None or not profile.isOwnThread():
+		yield
+		return
+
+	profile.enterStage(name)
+	try:
+		yield
+	finally:
+		profile.exitStage()
+
+# ==============================================================================
+
+def stage(name):
+
+	''' Method decorator profiling the method as the given pipeline stage. '''
+
+	def decorator(method):
+		@functools.wraps(method)
+		def profiledMethod(*args, **kwargs):
+			with stageContext(name):
+				return method(*args, **kwargs)
+		return profiledMethod
+
+	return decorator
+
+# ==============================================================================
+
+def installApiWrappers():
+
+	''' Replaces ansa.base and ansa.mesh functions by counting wrappers. Calls are passed through
+	without any recording if there is no active profile. '''
+
+	for module, functionNames in ((base, BASE_FUNCTIONS), (ansa.mesh, MESH_FUNCTIONS)):
+		for functionName in functionNames:
+			function = getattr(module, functionName, None)
+			if function is None or hasattr(function, 'profiledFunction'):
+				continue
+			setattr(module, functionName, _wrapApiFunction(functionName, function))
+
+# ==============================================================================
+
+def _wrapApiFunction(functionName, function):
+
+	@functools.wraps(function)
+	def profiledFunction(*args, **kwargs):
+		profile = ClipProfile.active()
+		if profile is None:
+			return function(*args, **kwargs)
+
+		startTime = time.time()
+		try:
+			return function(*args, **kwargs)
+		finally:
+			profile.addApiCall(functionName, time.time() - startTime)
+
+	profiledFunction.profiledFunction = function
+
+	return profiledFunction
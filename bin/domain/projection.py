@@ -0,0 +1,868 @@
+# PYTHON script
+import os
+import abc
+import time
+import inspect
+import threading
+import contextlib
+import collections
+import numpy as np
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+ansa.ImportCode(os.path.join(PATH_SELF, 'util.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'spatial.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'model_data.py'))
+
+# ==============================================================================
+
+PROJECTION_BACKENDS = collections.OrderedDict()
+
+# abstract base class compatible with both python 2 and 3
+_AbstractBase = abc.ABCMeta('_AbstractBase', (object,), {})
+
+# ==============================================================================
+
+class ProjectionBackendException(Exception): pass
+
+# ==============================================================================
+
+class MainThreadApiCalls(object):
+
+	''' ANSA API calls of worker threads run by the main thread.
+
+	The ANSA API may be used from the main thread only. A worker thread queues its call and waits
+	for the result while the main thread runs the queued calls (serve) in between its polls of
+	the workers. Calls of the main thread run directly, calls of worker threads out of the served
+	block fail. '''
+
+	def __init__(self):
+
+		self.calls = queue.Queue()
+		self.lock = threading.Lock()
+		self.serving = False
+
+	#-------------------------------------------------------------------------
+
+	def call(self, function, *args, **kwargs):
+
+		if threading.current_thread() is threading.main_thread():
+			return function(*args, **kwargs)
+
+		apiCall = _ApiCall(function, args, kwargs)
+		with self.lock:
+			if not self.serving:
+				raise ProjectionBackendException('ANSA API called from a worker thread out of the served block!')
+			self.calls.put(apiCall)
+
+		return apiCall.result()
+
+	#-------------------------------------------------------------------------
+
+	@contextlib.contextmanager
+	def served(self):
+
+		''' Calls of worker threads are queued for serve in the block. Calls still queued at
+		its end fail, so no worker keeps waiting for the main thread. '''
+
+		with self.lock:
+			self.serving = True
+		try:
+			yield self
+		finally:
+			with self.lock:
+				self.serving = False
+			while True:
+				try:
+					apiCall = self.calls.get_nowait()
+				except queue.Empty:
+					break
+				if apiCall is not None:
+					apiCall.fail(ProjectionBackendException('ANSA API calls of worker threads are not served any more!'))
+
+	#-------------------------------------------------------------------------
+
+	def serve(self, timeout):
+
+		''' Runs the queued calls in the main thread until the timeout elapses or wake is called. '''
+
+		endTime = time.time() + timeout
+		while True:
+			remaining = endTime - time.time()
+			if remaining <= 0:
+				return
+			try:
+				apiCall = self.calls.get(timeout=remaining)
+			except queue.Empty:
+				return
+
+			if apiCall is None:
+				return
+			apiCall.run()
+
+	#-------------------------------------------------------------------------
+
+	def wake(self):
+
+		''' Ends the running serve before its timeout (e.g. a worker has finished). '''
+
+		self.calls.put(None)
+
+# ==============================================================================
+
+class _ApiCall(object):
+
+	def __init__(self, function, args, kwargs):
+
+		self.function = function
+		self.args = args
+		self.kwargs = kwargs
+
+		self.done = threading.Event()
+		self.value = None
+		self.exception = None
+
+	#-------------------------------------------------------------------------
+
+	def run(self):
+
+		try:
+			self.value = self.function(*self.args, **self.kwargs)
+		except Exception as e:
+			self.exception = e
+		self.done.set()
+
+	#-------------------------------------------------------------------------
+
+	def fail(self, exception):
+
+		self.exception = exception
+		self.done.set()
+
+	#-------------------------------------------------------------------------
+
+	def result(self):
+
+		self.done.wait()
+		if self.exception is not None:
+			raise self.exception
+
+		return self.value
+
+# ==============================================================================
+
+def registerBackend(cls):
+
+	''' Registers the projection backend. Backends not implementing all the abstract methods are refused. '''
+
+	if inspect.isabstract(cls):
+		raise TypeError('Projection backend "%s" does not implement: %s' % (
+			cls.NAME, ', '.join(sorted(cls.__abstractmethods__))))
+
+	return util.registerClass(cls)
+
+# ==============================================================================
+
+class BaseProjectionBackend(_AbstractBase):
+
+	''' Directional projection of clip points to the given faces.
+
+	Backends are selectable by NAME via SmartClip.setProjectionBackend. Face meshes are loaded
+	only once per backend instance (= per clip) and kept in the ClipFaceTree used to cull
+	the candidate faces/triangles before any exact projection. '''
+
+	container = PROJECTION_BACKENDS
+	NAME = ''
+	INFO = ''
+
+	def __init__(self):
+
+		self.faceTriangles = dict()
+		self.faceTree = None
+		self.faceTreeShared = False
+		self.snapshot = None
+
+	#-------------------------------------------------------------------------
+
+	def setSnapshot(self, snapshot):
+
+		''' Face meshes are taken from the clip neighbourhood snapshot instead of the model. '''
+
+		self.snapshot = snapshot
+		self.faceTriangles.clear()
+		self.faceTree = None
+
+	#-------------------------------------------------------------------------
+
+	def prepare(self, faces):
+
+		''' Builds the face tree over all faces of the clip neighbourhood. '''
+
+		self.faceTree = ClipFaceTree(faces, [self._getFaceTriangles(face) for face in faces])
+
+	#-------------------------------------------------------------------------
+
+	def _getFaceTriangles(self, face):
+
+		''' Returns (N, 3, 3) array of face shell triangles or None for not meshed face. '''
+
+		if face not in self.faceTriangles:
+			if self.snapshot is not None and self.snapshot.containsFaces([face]):
+				self.faceTriangles[face] = self.snapshot.faceTriangles(face)
+			else:
+				triangles = getFacesTriangles([face])
+				self.faceTriangles[face] = triangles if len(triangles) > 0 else None
+
+		return self.faceTriangles[face]
+
+	#-------------------------------------------------------------------------
+
+	def _getFaceTree(self, faces):
+
+		''' Returns the face tree containing all given faces. The tree is rebuilt only if a face
+		out of the clip neighbourhood is requested (e.g. manually selected STOP faces). '''
+
+		if self.faceTreeShared and (self.faceTree is None or not self.faceTree.contains(faces)):
+			raise ProjectionBackendException('Faces out of the face tree shared by worker threads requested!')
+
+		if self.faceTree is None:
+			self.prepare(list(faces))
+		elif not self.faceTree.contains(faces):
+			newFaces = [face for face in faces if face not in self.faceTree.faceIndexes]
+			self.prepare(self.faceTree.faces + newFaces)
+
+		return self.faceTree
+
+	#-------------------------------------------------------------------------
+
+	@contextlib.contextmanager
+	def sharedFaceTree(self, faces):
+
+		''' Builds the face tree of given faces in advance and keeps it unchanged in the block,
+		so it may be read by worker threads. Requests of other faces fail in the block. '''
+
+		self._getFaceTree(faces)
+		self.faceTreeShared = True
+		try:
+			yield self.faceTree
+		finally:
+			self.faceTreeShared = False
+
+	#-------------------------------------------------------------------------
+
+	def isThreadSafe(self, faces):
+
+		''' Returns True if the projection to the given faces may run in a worker thread - it makes
+		no ANSA API call or its calls run in the main thread (API_CALLS). '''
+
+		return False
+
+	#-------------------------------------------------------------------------
+
+	@abc.abstractmethod
+	def projectPoint(self, faces, pointCoords, vector, tolerance=50, minDist=True):
+
+		''' Returns face, projectedPointCoords of the nearest (minDist=True) or the farthest
+		face projection of the given point. None, None if no projection found. '''
+
+	#-------------------------------------------------------------------------
+
+	@abc.abstractmethod
+	def projectPoints(self, faces, pointsCoords, vector, tolerance=50):
+
+		''' Returns [clipPointCoords, projectedPointCoords], face of the shortest projection
+		of all given points. None, None if no projection found. '''
+
+# ==============================================================================
+@registerBackend
+class ApiProjectionBackend(BaseProjectionBackend):
+
+	''' ansa.base.ProjectPointDirectional is called only for the faces which bounding box
+	is crossed by the projection ray. Face boxes are enlarged by a margin as the face geometry
+	may differ from its mesh (curved or coarsely meshed faces), not meshed faces are never culled. '''
+
+	NAME = 'API'
+	INFO = 'ansa.base.ProjectPointDirectional called for each candidate face and point.'
+
+	#-------------------------------------------------------------------------
+
+	def isThreadSafe(self, faces):
+
+		return True
+
+	#-------------------------------------------------------------------------
+
+	def _project(self, face, pointCoords, vector, tolerance):
+
+		# called from a worker thread the projection runs in the main thread
+		return API_CALLS.call(ansa.base.ProjectPointDirectional,
+			face, pointCoords[0], pointCoords[1], pointCoords[2],
+			vector[0], vector[1], vector[2], tolerance, project_on="faces")
+
+	#-------------------------------------------------------------------------
+
+	def projectPoint(self, faces, pointCoords, vector, tolerance=50, minDist=True):
+
+		pointIndexes, candidateFaces = self._getFaceTree(faces).rayFaces(
+			[pointCoords], vector, tolerance, faces)
+
+		foundProjection = list()
+		foundCoordinates = list()
+		distances = list()
+		for face in candidateFaces:
+			projectedPointCoords = self._project(face, pointCoords, vector, tolerance)
+
+			if projectedPointCoords is not None:
+				distances.append(np.linalg.norm(np.array(pointCoords) - np.array(projectedPointCoords)))
+				foundProjection.append(face)
+				foundCoordinates.append(projectedPointCoords)
+
+		if len(foundProjection) == 0:
+			return None, None
+
+		if minDist:
+			index = np.argsort(distances)[0]
+		else:
+			index = np.argsort(distances)[-1]
+
+		return foundProjection[index], foundCoordinates[index]
+
+	#-------------------------------------------------------------------------
+
+	def projectPoints(self, faces, pointsCoords, vector, tolerance=50):
+
+		pointIndexes, candidateFaces = self._getFaceTree(faces).rayFaces(
+			pointsCoords, vector, tolerance, faces)
+
+		foundProjection = list()
+		facesProjectionFound = list()
+		distances = list()
+		for pointIndex, face in zip(pointIndexes, candidateFaces):
+			pointCoords = pointsCoords[pointIndex]
+			projectedPointCoords = self._project(face, pointCoords, vector, tolerance)
+
+			# projection found for given point on face
+			if projectedPointCoords is not None:
+				distances.append(np.linalg.norm(np.array(pointCoords) - np.array(projectedPointCoords)))
+				foundProjection.append([pointCoords, projectedPointCoords])
+				facesProjectionFound.append(face)
+
+		if len(distances) == 0:
+			return None, None
+
+		minDist = np.argmin(np.array(distances))
+
+		return foundProjection[minDist], facesProjectionFound[minDist]
+
+# ==============================================================================
+@registerBackend
+class MeshProjectionBackend(BaseProjectionBackend):
+
+	''' Ray casting of all points against the face shell mesh at once.
+
+	Projection is searched in both directions of the given vector as ProjectPointDirectional does
+	(projections "behind" the point are used for the penetration detection).
+	Faces without mesh are projected by the API backend. '''
+
+	NAME = 'Mesh'
+	INFO = 'Vectorised ray - triangle intersection on face shell mesh.'
+
+	def __init__(self):
+
+		super(MeshProjectionBackend, self).__init__()
+
+		self.apiBackend = ApiProjectionBackend()
+
+	#-------------------------------------------------------------------------
+
+	def setSnapshot(self, snapshot):
+
+		super(MeshProjectionBackend, self).setSnapshot(snapshot)
+
+		self.apiBackend.setSnapshot(snapshot)
+
+	#-------------------------------------------------------------------------
+
+	def prepare(self, faces):
+
+		super(MeshProjectionBackend, self).prepare(faces)
+
+		# not meshed faces share the same face data
+		self.apiBackend.faceTriangles = self.faceTriangles
+		self.apiBackend.faceTree = self.faceTree
+
+	#-------------------------------------------------------------------------
+
+	def isThreadSafe(self, faces):
+
+		# not meshed faces are projected by the API backend
+		return True
+
+	#-------------------------------------------------------------------------
+
+	def projectPoint(self, faces, pointCoords, vector, tolerance=50, minDist=True):
+
+		faceTree = self._getFaceTree(faces)
+		pointIndexes, triangleIndexes, params = faceTree.intersect([pointCoords], vector, tolerance, faces)
+
+		# the nearest projection on each face as ProjectPointDirectional returns
+		distances = list()
+		foundProjection = list()
+		foundCoordinates = list()
+		faceIndexes = faceTree.triangleFaceIndexes[triangleIndexes]
+		for faceIndex in np.unique(faceIndexes):
+			faceParams = params[faceIndexes == faceIndex]
+			param = faceParams[np.argmin(np.abs(faceParams))]
+			distances.append(abs(param))
+			foundProjection.append(faceTree.faces[faceIndex])
+			foundCoordinates.append(list(np.array(pointCoords, dtype=float) + param*_normalised(vector)))
+
+		notMeshedFaces = faceTree.notMeshedFaces(faces)
+		if len(notMeshedFaces) > 0:
+			face, projectedPointCoords = self.apiBackend.projectPoint(
+				notMeshedFaces, pointCoords, vector, tolerance, minDist)
+			if face is not None:
+				distances.append(np.linalg.norm(np.array(pointCoords) - np.array(projectedPointCoords)))
+				foundProjection.append(face)
+				foundCoordinates.append(projectedPointCoords)
+
+		if len(distances) == 0:
+			return None, None
+
+		if minDist:
+			index = np.argmin(distances)
+		else:
+			index = np.argmax(distances)
+
+		return foundProjection[index], foundCoordinates[index]
+
+	#-------------------------------------------------------------------------
+
+	def projectPoints(self, faces, pointsCoords, vector, tolerance=50):
+
+		faceTree = self._getFaceTree(faces)
+
+		minDistPoints = None
+		minDistFace = None
+		minDistance = None
+		if len(pointsCoords) > 0:
+			points = np.array(pointsCoords, dtype=float).reshape(-1, 3)
+			pointIndexes, triangleIndexes, params = faceTree.intersect(points, vector, tolerance, faces)
+
+			if len(params) > 0:
+				index = np.argmin(np.abs(params))
+				pointCoords = pointsCoords[pointIndexes[index]]
+				projectedPointCoords = points[pointIndexes[index]] + params[index]*_normalised(vector)
+
+				minDistance = abs(params[index])
+				minDistPoints = [pointCoords, list(projectedPointCoords)]
+				minDistFace = faceTree.faces[faceTree.triangleFaceIndexes[triangleIndexes[index]]]
+
+		notMeshedFaces = faceTree.notMeshedFaces(faces)
+		if len(notMeshedFaces) > 0:
+			apiDistPoints, apiDistFace = self.apiBackend.projectPoints(
+				notMeshedFaces, pointsCoords, vector, tolerance)
+			if apiDistPoints is not None:
+				apiDistance = np.linalg.norm(np.array(apiDistPoints[0]) - np.array(apiDistPoints[1]))
+				if minDistance is None or apiDistance < minDistance:
+					minDistPoints = apiDistPoints
+					minDistFace = apiDistFace
+
+		return minDistPoints, minDistFace
+
+# ==============================================================================
+@registerBackend
+class CompareProjectionBackend(BaseProjectionBackend):
+
+	''' Runs both API and Mesh backends, prints timing and differences and returns the API result. '''
+
+	NAME = 'Compare'
+	INFO = 'API and Mesh backends comparison.'
+
+	def __init__(self):
+
+		super(CompareProjectionBackend, self).__init__()
+
+		self.apiBackend = ApiProjectionBackend()
+		self.meshBackend = MeshProjectionBackend()
+
+	#-------------------------------------------------------------------------
+
+	def setSnapshot(self, snapshot):
+
+		super(CompareProjectionBackend, self).setSnapshot(snapshot)
+
+		self.meshBackend.setSnapshot(snapshot)
+		self.apiBackend.setSnapshot(snapshot)
+
+	#-------------------------------------------------------------------------
+
+	def prepare(self, faces):
+
+		self.meshBackend.prepare(faces)
+		self.apiBackend.faceTriangles = self.faceTriangles = self.meshBackend.faceTriangles
+		self.apiBackend.faceTree = self.faceTree = self.meshBackend.faceTree
+
+	#-------------------------------------------------------------------------
+
+	def isThreadSafe(self, faces):
+
+		return True
+
+	#-------------------------------------------------------------------------
+
+	def _compare(self, methodName, *args):
+
+		results = list()
+		for backend in [self.apiBackend, self.meshBackend]:
+			startTime = time.time()
+			result = getattr(backend, methodName)(*args)
+			results.append(result)
+			print('%s.%s: %.3fs' % (backend.NAME, methodName, time.time() - startTime))
+
+		apiResult, meshResult = results
+		if (apiResult[0] is None) != (meshResult[0] is None):
+			print('%s: projection found only by one backend! (API: %s, Mesh: %s)' % (
+				methodName, apiResult[0] is not None, meshResult[0] is not None))
+		elif apiResult[0] is not None:
+			# different points of the same distance may be found
+			if methodName == 'projectPoints':
+				apiDistance, meshDistance = [np.linalg.norm(np.array(points[0]) - np.array(points[1]))
+					for points, face in results]
+			else:
+				apiDistance, meshDistance = [np.linalg.norm(np.array(args[1]) - np.array(coords))
+					for face, coords in results]
+			print('%s: projection distance difference %.4f' % (methodName, abs(apiDistance - meshDistance)))
+
+		return apiResult
+
+	#-------------------------------------------------------------------------
+
+	def projectPoint(self, faces, pointCoords, vector, tolerance=50, minDist=True):
+
+		return self._compare('projectPoint', faces, pointCoords, vector, tolerance, minDist)
+
+	#-------------------------------------------------------------------------
+
+	def projectPoints(self, faces, pointsCoords, vector, tolerance=50):
+
+		return self._compare('projectPoints', faces, pointsCoords, vector, tolerance)
+
+# ==============================================================================
+
+class ClipFaceTree(object):
+
+	''' Bounding volume hierarchies of the clip neighbourhood faces and of their mesh triangles.
+
+	Face boxes are used to cull faces for the API projection, triangle boxes to cull
+	the point - triangle couples for the mesh projection. Not meshed faces have no box
+	and are always the projection candidates. '''
+
+	# face boxes are enlarged as the face geometry may differ from its mesh, the margin grows
+	# with the face size as the mesh of large curved faces deviates more
+	FACE_BOX_MARGIN = 2.0
+	FACE_BOX_RELATIVE_MARGIN = 0.05
+
+	def __init__(self, faces, facesTriangles):
+
+		self.faces = list(faces)
+		self.faceIndexes = dict((face, index) for index, face in enumerate(self.faces))
+		self.meshed = np.array([triangles is not None for triangles in facesTriangles], dtype=bool)
+
+		triangles = [triangles for triangles in facesTriangles if triangles is not None]
+		triangleFaceIndexes = [np.full(len(faceTriangles), index, dtype=int)
+			for index, faceTriangles in enumerate(facesTriangles) if faceTriangles is not None]
+		if len(triangles) > 0:
+			triangles = np.concatenate(triangles)
+			self.triangleFaceIndexes = np.concatenate(triangleFaceIndexes)
+		else:
+			triangles = np.empty((0, 3, 3))
+			self.triangleFaceIndexes = np.empty(0, dtype=int)
+
+		self.triangles = TriangleSet(triangles)
+		self.triangleTree = spatial.AabbTree(*spatial.trianglesBoxes(triangles))
+
+		# face boxes of meshed faces
+		self.meshedFaceIndexes = np.nonzero(self.meshed)[0]
+		faceBoxMins = np.empty((len(self.meshedFaceIndexes), 3))
+		faceBoxMaxs = np.empty((len(self.meshedFaceIndexes), 3))
+		for boxIndex, faceIndex in enumerate(self.meshedFaceIndexes):
+			faceCoords = facesTriangles[faceIndex].reshape(-1, 3)
+			faceBoxMins[boxIndex] = faceCoords.min(axis=0)
+			faceBoxMaxs[boxIndex] = faceCoords.max(axis=0)
+		margins = self.FACE_BOX_MARGIN + self.FACE_BOX_RELATIVE_MARGIN*np.linalg.norm(faceBoxMaxs - faceBoxMins, axis=1)
+		self.faceTree = spatial.AabbTree(faceBoxMins - margins[:, None], faceBoxMaxs + margins[:, None])
+
+	#-------------------------------------------------------------------------
+
+	def contains(self, faces):
+
+		for face in faces:
+			if face not in self.faceIndexes:
+				return False
+
+		return True
+
+	#-------------------------------------------------------------------------
+
+	def _faceMask(self, faces):
+
+		mask = np.zeros(len(self.faces), dtype=bool)
+		mask[[self.faceIndexes[face] for face in faces]] = True
+
+		return mask
+
+	#-------------------------------------------------------------------------
+
+	def notMeshedFaces(self, faces):
+
+		return [face for face in faces if not self.meshed[self.faceIndexes[face]]]
+
+	#-------------------------------------------------------------------------
+
+	def rayFaces(self, pointsCoords, vector, tolerance, faces):
+
+		''' Returns pointIndexes, faces of candidate couples for the projection: meshed faces
+		which box is crossed by the point projection ray and all not meshed faces. Couples are
+		ordered by the given faces and then by the points. '''
+
+		points = np.array(pointsCoords, dtype=float).reshape(-1, 3)
+		facePositions = np.full(len(self.faces), -1, dtype=int)
+		facePositions[[self.faceIndexes[face] for face in faces]] = np.arange(len(faces))
+
+		rayIndexes, boxIndexes = self.faceTree.queryRays(points, vector, tolerance)
+		positions = facePositions[self.meshedFaceIndexes[boxIndexes]]
+
+		# not meshed faces with all points
+		notMeshedPositions = np.array([position for position, face in enumerate(faces)
+			if not self.meshed[self.faceIndexes[face]]], dtype=int)
+		rayIndexes = np.concatenate([rayIndexes, np.tile(np.arange(len(points)), len(notMeshedPositions))])
+		positions = np.concatenate([positions, np.repeat(notMeshedPositions, len(points))])
+
+		valid = positions >= 0
+		rayIndexes = rayIndexes[valid]
+		positions = positions[valid]
+		order = np.lexsort((rayIndexes, positions))
+
+		return rayIndexes[order].tolist(), [faces[position] for position in positions[order]]
+
+	#-------------------------------------------------------------------------
+
+	def intersect(self, pointsCoords, vector, tolerance, faces):
+
+		''' Returns pointIndexes, triangleIndexes, params of intersections with the mesh of given faces. '''
+
+		points = np.array(pointsCoords, dtype=float).reshape(-1, 3)
+		mask = self._faceMask(faces)
+
+		pointIndexes, triangleIndexes = self.triangleTree.queryRays(points, vector, tolerance)
+		valid = mask[self.triangleFaceIndexes[triangleIndexes]]
+
+		return self.triangles.intersectPairs(points, pointIndexes[valid], triangleIndexes[valid], vector, tolerance)
+
+# ==============================================================================
+
+class TriangleSet(object):
+
+	''' Triangles prepared for the ray intersection.
+
+	Intersection of the ray (origin O, direction d) with the triangle (v0, e1, e2) is solved
+	by the Moller-Trumbore algorithm. As all rays share the same direction, all its terms reduce
+	to the dot products of (O - v0) with per-triangle vectors, so all point - triangle couples
+	are solved at once by row-wise dot products. '''
+
+	EPSILON = 1e-9
+
+	def __init__(self, triangles):
+
+		self.triangles = triangles
+
+		self.v0 = triangles[:, 0]
+		self.e1 = triangles[:, 1] - triangles[:, 0]
+		self.e2 = triangles[:, 2] - triangles[:, 0]
+		self.normals = np.cross(self.e1, self.e2)
+
+	#-------------------------------------------------------------------------
+
+	def __len__(self):
+
+		return len(self.v0)
+
+	#-------------------------------------------------------------------------
+
+	def intersectPairs(self, points, pointIndexes, triangleIndexes, vector, tolerance):
+
+		''' Returns pointIndexes, triangleIndexes, params of all intersecting couples within the tolerance.
+
+		params are signed distances along the normalised vector. '''
+
+		direction = _normalised(vector)
+
+		pVectors = np.cross(direction, self.e2)
+		qVectors = np.cross(self.e1, direction)
+		determinants = np.einsum('ij,ij->i', self.e1, pVectors)
+
+		valid = np.abs(determinants[triangleIndexes]) > self.EPSILON
+		pointIndexes = pointIndexes[valid]
+		triangleIndexes = triangleIndexes[valid]
+
+		inverseDets = 1.0/determinants[triangleIndexes]
+		offsets = points[pointIndexes] - self.v0[triangleIndexes]
+
+		u = np.einsum('ij,ij->i', offsets, pVectors[triangleIndexes])*inverseDets
+		v = np.einsum('ij,ij->i', offsets, qVectors[triangleIndexes])*inverseDets
+		t = np.einsum('ij,ij->i', offsets, self.normals[triangleIndexes])*inverseDets
+
+		hits = ((u >= -self.EPSILON) & (v >= -self.EPSILON) & (u + v <= 1 + self.EPSILON) &
+			(np.abs(t) <= tolerance))
+
+		return pointIndexes[hits], triangleIndexes[hits], t[hits]
+
+# ==============================================================================
+
+class ElementIndex(object):
+
+	''' Nearest shell element search built once over the element centroids (KD-tree).
+
+	Centroids only collect the candidates, distances are measured exactly to the element
+	triangles the same way as base.NearElements does. Triangles of the shells are read
+	from the model unless given (e.g. by the clip neighbourhood snapshot). '''
+
+	def __init__(self, shells, triangles=None, shellIndexes=None):
+
+		self.shells = list(shells)
+		if triangles is None:
+			self.triangles, self.shellIndexes = getShellsTriangles(self.shells)
+		else:
+			self.triangles, self.shellIndexes = triangles, shellIndexes
+
+		counts = np.bincount(self.shellIndexes, minlength=len(self.shells))
+		centroids = np.zeros((len(self.shells), 3))
+		np.add.at(centroids, self.shellIndexes, self.triangles.mean(axis=1))
+		centroids[counts > 0] /= counts[counts > 0][:, None]
+
+		# the largest distance of an element point from its centroid
+		radii = np.zeros(len(self.shells))
+		vertexDistances = np.linalg.norm(self.triangles - centroids[self.shellIndexes][:, None, :], axis=2).max(axis=1)
+		np.maximum.at(radii, self.shellIndexes, vertexDistances)
+		self.elementRadius = radii.max() if len(radii) > 0 else 0.0
+
+		self.meshed = np.flatnonzero(counts > 0)
+		self.tree = spatial.KdTree(centroids[self.meshed])
+
+	#-------------------------------------------------------------------------
+
+	def __len__(self):
+
+		return len(self.meshed)
+
+	#-------------------------------------------------------------------------
+
+	def distances(self, pointCoords, indexes):
+
+		''' Returns exact distances of the point to the elements of given tree indexes. '''
+
+		shellIndexes = self.meshed[indexes]
+		triangleMask = np.isin(self.shellIndexes, shellIndexes)
+
+		shellDistances = np.full(len(self.shells), np.inf)
+		np.minimum.at(shellDistances, self.shellIndexes[triangleMask],
+			spatial.pointTrianglesDistances(pointCoords, self.triangles[triangleMask]))
+
+		return shellDistances[shellIndexes]
+
+	#-------------------------------------------------------------------------
+
+	def nearestDistance(self, pointCoords, maxDistance=np.inf):
+
+		''' Returns the distance of the nearest element or None if there is no element within maxDistance. '''
+
+		indexes, centroidDistances = self.tree.queryKNearest(pointCoords, 1, maxDistance + self.elementRadius)
+		if len(indexes) == 0:
+			return None
+
+		# the nearest element is not further than the element of the nearest centroid
+		bound = self.distances(pointCoords, indexes)[0]
+		candidates = self.tree.queryRadius(pointCoords, min(bound, maxDistance) + self.elementRadius)
+		distance = self.distances(pointCoords, candidates).min()
+
+		if distance > maxDistance:
+			return None
+
+		return distance
+
+	#-------------------------------------------------------------------------
+
+	def elementsWithin(self, pointCoords, radius):
+
+		''' Returns elements within the radius from the point. '''
+
+		candidates = self.tree.queryRadius(pointCoords, radius + self.elementRadius)
+		distances = self.distances(pointCoords, candidates)
+
+		return [self.shells[self.meshed[index]] for index in candidates[distances <= radius]]
+
+# ==============================================================================
+
+def getFacesTriangles(faces):
+
+	''' Returns (N, 3, 3) array of triangles of the shells meshing given faces.
+	Quads are split into two triangles. '''
+
+	shells = base.CollectEntities(constants.ABAQUS, faces, "SHELL")
+
+	return getShellsTriangles(shells)[0]
+
+# ==============================================================================
+
+def getShellsTriangles(shells):
+
+	''' Returns (N, 3, 3) array of triangles of given shells and indexes of their shells.
+	Quads are split into two triangles. '''
+
+	nodes = base.CollectEntities(constants.ABAQUS, shells, "NODE")
+
+	if len(nodes) == 0 or len(shells) == 0:
+		return np.empty((0, 3, 3)), np.empty(0, dtype=int)
+
+	nodeIds, nodesCoords = model_data.getEntitiesCoords(nodes)
+	nodeCoords = dict(zip(nodeIds.tolist(), nodesCoords.tolist()))
+
+	triangles = list()
+	shellIndexes = list()
+	for shellIndex, shell in enumerate(shells):
+		card = base.GetEntityCardValues(constants.NASTRAN, shell, ('G1', 'G2', 'G3', 'G4'))
+		nodeIds = [card.get(field) for field in ('G1', 'G2', 'G3', 'G4')]
+		nodeIds = [nodeId for nodeId in nodeIds if nodeId not in (None, '', 0)]
+		if len(nodeIds) < 3 or any(nodeId not in nodeCoords for nodeId in nodeIds):
+			continue
+
+		triangles.append([nodeCoords[nodeIds[0]], nodeCoords[nodeIds[1]], nodeCoords[nodeIds[2]]])
+		shellIndexes.append(shellIndex)
+		if len(nodeIds) == 4:
+			triangles.append([nodeCoords[nodeIds[0]], nodeCoords[nodeIds[2]], nodeCoords[nodeIds[3]]])
+			shellIndexes.append(shellIndex)
+
+	return np.array(triangles, dtype=float).reshape(-1, 3, 3), np.array(shellIndexes, dtype=int)
+
+# ==============================================================================
+
+def _normalised(vector):
+
+	vector = np.array(vector, dtype=float)
+
+	return vector/np.linalg.norm(vector)
+
+# ==============================================================================
+
+API_CALLS = MainThreadApiCalls()
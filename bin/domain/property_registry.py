@@ -0,0 +1,137 @@
+# PYTHON script
+import hashlib
+import collections
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+# definitions created by the registry are marked, other entities of the model are never reused
+MARK_FIELD = 'Comment'
+MARK = 'SmartClip shared definition'
+
+# ==============================================================================
+
+class PropertyRegistry(object):
+
+	''' Shared definitions (properties, materials, ...) reused by all clips.
+
+	Definitions are keyed by a hash of their card values. Entities already present in the model
+	are indexed on the first request of the given type and card fields, so matching definitions
+	created by former sessions are reused as well. Only the entities marked by the registry
+	are reused - an entity defined by the user may differ in any other field of its card. '''
+
+	def __init__(self):
+
+		self.entities = dict()
+		self.indexedKeys = set()
+		# definitions handed out by the registry in the order of their first use
+		self.definitions = collections.OrderedDict()
+		self.statistics = collections.Counter()
+
+	#-------------------------------------------------------------------------
+
+	def getEntity(self, ansaType, vals, deck=constants.ABAQUS):
+
+		''' Returns an existing entity with the same card values or creates a new one. '''
+
+		vals = dict(vals)
+		vals[MARK_FIELD] = MARK
+
+		fields = tuple(sorted(vals.keys()))
+		key = (deck, ansaType, fields)
+		if key not in self.indexedKeys:
+			self._indexModelEntities(deck, ansaType, fields)
+
+		cardHash = getCardHash(vals)
+		entity = self.entities.get((key, cardHash))
+		if entity is not None and self._isValid(entity, deck, ansaType, fields, cardHash):
+			self.statistics['reused'] += 1
+			self.definitions.setdefault(entity, len(self.definitions))
+			return entity
+
+		entity = base.CreateEntity(deck, ansaType, vals)
+		self.entities[(key, cardHash)] = entity
+		self.definitions[entity] = len(self.definitions)
+		self.statistics['created'] += 1
+
+		return entity
+
+	#-------------------------------------------------------------------------
+
+	def _indexModelEntities(self, deck, ansaType, fields):
+
+		key = (deck, ansaType, fields)
+		for entity in base.CollectEntities(deck, None, ansaType):
+			cardHash = getCardHash(base.GetEntityCardValues(deck, entity, fields))
+			# keep the first (oldest) definition
+			self.entities.setdefault((key, cardHash), entity)
+
+		self.indexedKeys.add(key)
+
+	#-------------------------------------------------------------------------
+
+	def _isValid(self, entity, deck, ansaType, fields, cardHash):
+
+		''' Entity may be deleted or modified since it was registered. '''
+
+		if base.GetEntity(deck, ansaType, entity._id) != entity:
+			return False
+
+		return getCardHash(base.GetEntityCardValues(deck, entity, fields)) == cardHash
+
+	#-------------------------------------------------------------------------
+
+	def isDefinition(self, entity):
+
+		return entity in self.definitions
+
+	#-------------------------------------------------------------------------
+
+	def deleteUnreferenced(self, entities):
+
+		''' Deletes given definitions which are not referenced by any entity, definitions still
+		used by other clips are kept. Definitions are deleted in the reverse order of their creation,
+		so definitions referencing others (sections) go before the referenced ones (materials). '''
+
+		for entity in sorted(entities, key=lambda entity: self.definitions.get(entity, 0), reverse=True):
+			base.DeleteEntity(entity, force=False)
+
+	#-------------------------------------------------------------------------
+
+	def invalidate(self):
+
+		self.entities.clear()
+		self.indexedKeys.clear()
+		self.definitions.clear()
+
+	#-------------------------------------------------------------------------
+
+	def printStatistics(self):
+
+		print('Property registry: %s definitions reused, %s created.' % (
+			self.statistics['reused'], self.statistics['created']))
+
+# ==============================================================================
+
+def getCardHash(vals):
+
+	''' Returns hash of card values independent on the field order and number formatting. '''
+
+	items = sorted((str(field), _normalisedValue(value)) for field, value in vals.items())
+
+	return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()
+
+# ==============================================================================
+
+def _normalisedValue(value):
+
+	try:
+		return '%.9g' % float(value)
+	except (TypeError, ValueError):
+		return str(value).strip()
+
+# ==============================================================================
+
+PROPERTY_REGISTRY = PropertyRegistry()
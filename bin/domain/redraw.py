@@ -0,0 +1,189 @@
+# PYTHON script
+import functools
+import contextlib
+import collections
+
+import ansa
+from ansa import base, constants
+
+# ==============================================================================
+
+class RedrawBatch(object):
+
+	''' Visibility changes and redraws collected while the redraws are blocked.
+
+	Changes are replayed in the requested order - consecutive hides are merged into one Not call,
+	each show is one And call (And sets the visibility as a whole). The model is redrawn once
+	at the end of the batch. '''
+
+	_active = None
+
+	def __init__(self):
+
+		# [(visible, entities)], entities hidden in a row are kept in one OrderedDict
+		self.visibilityChanges = list()
+		self.redrawRequested = False
+
+	#-------------------------------------------------------------------------
+
+	@classmethod
+	def active(cls):
+		return cls._active
+
+	#-------------------------------------------------------------------------
+
+	def setVisible(self, entities, visible):
+
+		if visible:
+			self.visibilityChanges.append((True, list(entities)))
+		else:
+			if len(self.visibilityChanges) == 0 or self.visibilityChanges[-1][0]:
+				self.visibilityChanges.append((False, collections.OrderedDict()))
+			self.visibilityChanges[-1][1].update((entity, None) for entity in entities)
+		self.redrawRequested = True
+
+	#-------------------------------------------------------------------------
+
+	def requestRedraw(self):
+
+		self.redrawRequested = True
+
+	#-------------------------------------------------------------------------
+
+	def applyVisibility(self):
+
+		''' Applies the collected visibility changes. '''
+
+		visibilityChanges = self.visibilityChanges
+		self.visibilityChanges = list()
+
+		for visible, entities in visibilityChanges:
+			if len(entities) == 0:
+				continue
+			if visible:
+				base.And(entities, constants.ABAQUS)
+			else:
+				base.Not(list(entities), constants.ABAQUS)
+
+	#-------------------------------------------------------------------------
+
+	def flush(self):
+
+		''' Applies the collected changes and redraws the model if requested. Redraws must not be blocked. '''
+
+		self.applyVisibility()
+		if self.redrawRequested:
+			self.redrawRequested = False
+			base.RedrawAll()
+
+# ==============================================================================
+
+@contextlib.contextmanager
+def redrawBatch():
+
+	''' Blocks redraws in the block, visibility changes and redraws are applied at its end.
+	A nested block joins the outer one. '''
+
+	if RedrawBatch.active() is not None:
+		yield RedrawBatch.active()
+		return
+
+	batch = RedrawBatch()
+	RedrawBatch._active = batch
+	base.BlockRedraws(True)
+	try:
+		yield batch
+	finally:
+		RedrawBatch._active = None
+		try:
+			batch.applyVisibility()
+		finally:
+			base.BlockRedraws(False)
+		if batch.redrawRequested:
+			base.RedrawAll()
+
+# ==============================================================================
+
+def batched(method):
+
+	''' Method decorator running the method in a redraw batch. '''
+
+	@functools.wraps(method)
+	def batchedMethod(*args, **kwargs):
+		with redrawBatch():
+			return method(*args, **kwargs)
+
+	return batchedMethod
+
+# ==============================================================================
+
+@contextlib.contextmanager
+def redrawsResumed():
+
+	''' Shows the current state of the model for the user interaction in the block (picking)
+	of an active redraw batch. '''
+
+	batch = RedrawBatch.active()
+	if batch is None:
+		yield
+		return
+
+	base.BlockRedraws(False)
+	batch.requestRedraw()
+	batch.flush()
+	try:
+		yield
+	finally:
+		base.BlockRedraws(True)
+
+# ==============================================================================
+
+def flushVisibility():
+
+	''' Applies visibility changes collected by the active redraw batch so far, redraws stay blocked.
+	Must be called before API calls depending on the visibility (filter_visible, visible=True)
+	or setting it as a whole (Near, Or). '''
+
+	batch = RedrawBatch.active()
+	if batch is not None:
+		batch.applyVisibility()
+
+# ==============================================================================
+
+def show(entities):
+
+	batch = RedrawBatch.active()
+	if batch is None:
+		return base.And(entities, constants.ABAQUS)
+
+	batch.setVisible(entities, True)
+
+# ==============================================================================
+
+def hide(entities):
+
+	batch = RedrawBatch.active()
+	if batch is None:
+		return base.Not(entities, constants.ABAQUS)
+
+	batch.setVisible(entities, False)
+
+# ==============================================================================
+
+def redrawAll():
+
+	''' Redraws the model or at the end of the active redraw batch. '''
+
+	batch = RedrawBatch.active()
+	if batch is None:
+		return base.RedrawAll()
+
+	batch.requestRedraw()
+
+# ==============================================================================
+
+def drawResults():
+
+	''' Returns True if results of the API functions (draw_results) are to be drawn immediately. '''
+
+	return RedrawBatch.active() is None
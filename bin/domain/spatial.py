@@ -0,0 +1,439 @@
+# PYTHON script
+import heapq
+import numpy as np
+
+# ==============================================================================
+
+class AabbTree(object):
+
+	''' Bounding volume hierarchy of axis aligned bounding boxes.
+
+	Built once by median splits along the longest axis of box centres and stored in flat arrays.
+	Primitives are referred by their index in the given box arrays. '''
+
+	LEAF_SIZE = 8
+
+	def __init__(self, boxMins, boxMaxs, leafSize=None):
+
+		self.boxMins = np.array(boxMins, dtype=float).reshape(-1, 3)
+		self.boxMaxs = np.array(boxMaxs, dtype=float).reshape(-1, 3)
+
+		if leafSize is not None:
+			self.LEAF_SIZE = leafSize
+
+		self._build()
+
+	#-------------------------------------------------------------------------
+
+	def __len__(self):
+
+		return len(self.boxMins)
+
+	#-------------------------------------------------------------------------
+
+	def _build(self):
+
+		centers = 0.5*(self.boxMins + self.boxMaxs)
+		self.order = np.arange(len(self))
+
+		nodeMins = list()
+		nodeMaxs = list()
+		self._starts = list()
+		self._ends = list()
+		self._children = list()
+
+		def addNode(start, end):
+			indexes = self.order[start:end]
+			if len(indexes) > 0:
+				nodeMins.append(self.boxMins[indexes].min(axis=0))
+				nodeMaxs.append(self.boxMaxs[indexes].max(axis=0))
+			else:
+				nodeMins.append(np.full(3, np.inf))
+				nodeMaxs.append(np.full(3, -np.inf))
+			self._starts.append(start)
+			self._ends.append(end)
+			self._children.append(None)
+			return len(self._starts) - 1
+
+		stack = [addNode(0, len(self))]
+		while len(stack) > 0:
+			node = stack.pop()
+			start, end = self._starts[node], self._ends[node]
+			if end - start <= self.LEAF_SIZE:
+				continue
+
+			indexes = self.order[start:end]
+			nodeCenters = centers[indexes]
+			extents = nodeCenters.max(axis=0) - nodeCenters.min(axis=0)
+			axis = np.argmax(extents)
+			if extents[axis] <= 0:
+				continue
+
+			middle = (end - start)//2
+			partition = np.argpartition(nodeCenters[:, axis], middle)
+			self.order[start:end] = indexes[partition]
+
+			self._children[node] = (addNode(start, start + middle), addNode(start + middle, end))
+			stack.extend(self._children[node])
+
+		self.nodeMins = np.array(nodeMins).reshape(-1, 3)
+		self.nodeMaxs = np.array(nodeMaxs).reshape(-1, 3)
+
+	#-------------------------------------------------------------------------
+
+	def queryRays(self, origins, vector, maxDistance):
+
+		''' Returns rayIndexes, primitiveIndexes of primitive boxes crossed by the segments
+		origin +- maxDistance*normalised(vector) of all given origins. '''
+
+		origins = np.array(origins, dtype=float).reshape(-1, 3)
+		direction = np.array(vector, dtype=float)
+		direction = direction/np.linalg.norm(direction)
+
+		rayIndexes = list()
+		primitiveIndexes = list()
+
+		stack = [(0, np.arange(len(origins)))]
+		while len(stack) > 0 and len(self) > 0:
+			node, rays = stack.pop()
+
+			hits = _segmentsBoxesHits(origins[rays], direction, maxDistance,
+				self.nodeMins[node:node + 1], self.nodeMaxs[node:node + 1])[:, 0]
+			rays = rays[hits]
+			if len(rays) == 0:
+				continue
+
+			if self._children[node] is None:
+				primitives = self.order[self._starts[node]:self._ends[node]]
+				hits = _segmentsBoxesHits(origins[rays], direction, maxDistance,
+					self.boxMins[primitives], self.boxMaxs[primitives])
+				hitRays, hitPrimitives = np.nonzero(hits)
+				rayIndexes.append(rays[hitRays])
+				primitiveIndexes.append(primitives[hitPrimitives])
+			else:
+				for child in self._children[node]:
+					stack.append((child, rays))
+
+		if len(rayIndexes) == 0:
+			return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+		return np.concatenate(rayIndexes), np.concatenate(primitiveIndexes)
+
+	#-------------------------------------------------------------------------
+
+	def queryBox(self, boxMin, boxMax):
+
+		''' Returns indexes of primitives which boxes overlap the given box. '''
+
+		boxMin = np.array(boxMin, dtype=float)
+		boxMax = np.array(boxMax, dtype=float)
+
+		found = list()
+		stack = [0]
+		while len(stack) > 0 and len(self) > 0:
+			node = stack.pop()
+			if np.any(self.nodeMins[node] > boxMax) or np.any(self.nodeMaxs[node] < boxMin):
+				continue
+
+			if self._children[node] is None:
+				primitives = self.order[self._starts[node]:self._ends[node]]
+				overlaps = np.all(self.boxMins[primitives] <= boxMax, axis=1) & np.all(self.boxMaxs[primitives] >= boxMin, axis=1)
+				found.append(primitives[overlaps])
+			else:
+				stack.extend(self._children[node])
+
+		if len(found) == 0:
+			return np.empty(0, dtype=int)
+
+		return np.concatenate(found)
+
+	#-------------------------------------------------------------------------
+
+	def queryRadius(self, point, radius):
+
+		''' Returns indexes of primitives which boxes are within the radius from the point. '''
+
+		point = np.array(point, dtype=float)
+		candidates = self.queryBox(point - radius, point + radius)
+
+		distances = _pointBoxesDistances(point, self.boxMins[candidates], self.boxMaxs[candidates])
+
+		return candidates[distances <= radius]
+
+	#-------------------------------------------------------------------------
+
+	def queryNearest(self, point, distanceFunction=None, maxDistance=np.inf):
+
+		''' Returns primitiveIndex, distance of the nearest primitive or None, None.
+
+		distanceFunction(primitiveIndexes) returns exact distances of primitives to the point,
+		box distances are used if not given. Subtrees are pruned by their box distance. '''
+
+		point = np.array(point, dtype=float)
+		if distanceFunction is None:
+			distanceFunction = lambda indexes: _pointBoxesDistances(point, self.boxMins[indexes], self.boxMaxs[indexes])
+
+		bestIndex = None
+		bestDistance = maxDistance
+
+		heap = [(0.0, 0)]
+		while len(heap) > 0 and len(self) > 0:
+			boxDistance, node = heapq.heappop(heap)
+			if boxDistance > bestDistance:
+				break
+
+			if self._children[node] is None:
+				primitives = self.order[self._starts[node]:self._ends[node]]
+				distances = distanceFunction(primitives)
+				index = np.argmin(distances)
+				if distances[index] <= bestDistance:
+					bestIndex = primitives[index]
+					bestDistance = distances[index]
+			else:
+				for child in self._children[node]:
+					childDistance = _pointBoxesDistances(point, self.nodeMins[child:child + 1], self.nodeMaxs[child:child + 1])[0]
+					if childDistance <= bestDistance:
+						heapq.heappush(heap, (childDistance, child))
+
+		if bestIndex is None:
+			return None, None
+
+		return bestIndex, bestDistance
+
+# ==============================================================================
+
+class KdTree(AabbTree):
+
+	''' KD-tree of points - the bounding volume hierarchy of degenerated point boxes. '''
+
+	LEAF_SIZE = 16
+
+	def __init__(self, points, leafSize=None):
+
+		self.points = np.array(points, dtype=float).reshape(-1, 3)
+
+		super(KdTree, self).__init__(self.points, self.points, leafSize)
+
+	#-------------------------------------------------------------------------
+
+	def queryKNearest(self, point, k=1, maxDistance=np.inf):
+
+		''' Returns indexes, distances of up to k nearest points within maxDistance sorted by distance. '''
+
+		point = np.array(point, dtype=float)
+
+		# max heap of the best points found so far
+		best = list()
+		bestDistance = maxDistance
+
+		heap = [(0.0, 0)]
+		while len(heap) > 0 and len(self) > 0:
+			boxDistance, node = heapq.heappop(heap)
+			if boxDistance > bestDistance:
+				break
+
+			if self._children[node] is None:
+				indexes = self.order[self._starts[node]:self._ends[node]]
+				distances = np.linalg.norm(self.points[indexes] - point, axis=1)
+				for index, distance in zip(indexes, distances):
+					if distance > bestDistance:
+						continue
+					heapq.heappush(best, (-distance, index))
+					if len(best) > k:
+						heapq.heappop(best)
+					if len(best) == k:
+						bestDistance = -best[0][0]
+			else:
+				for child in self._children[node]:
+					childDistance = _pointBoxesDistances(point, self.nodeMins[child:child + 1], self.nodeMaxs[child:child + 1])[0]
+					if childDistance <= bestDistance:
+						heapq.heappush(heap, (childDistance, child))
+
+		best = sorted([(-distance, index) for distance, index in best])
+
+		return np.array([index for distance, index in best], dtype=int), np.array([distance for distance, index in best])
+
+# ==============================================================================
+
+def _segmentsBoxesHits(origins, direction, maxDistance, boxMins, boxMaxs):
+
+	''' Slab test of segments origin + t*direction, |t| <= maxDistance against boxes.
+
+	Returns (origins, boxes) boolean matrix. '''
+
+	tNear = np.full((len(origins), len(boxMins)), -maxDistance)
+	tFar = np.full((len(origins), len(boxMins)), maxDistance)
+	for axis in range(3):
+		coords = origins[:, axis][:, None]
+		if direction[axis] == 0:
+			inside = (coords >= boxMins[:, axis]) & (coords <= boxMaxs[:, axis])
+			tNear = np.where(inside, tNear, np.inf)
+			continue
+
+		t1 = (boxMins[:, axis] - coords)/direction[axis]
+		t2 = (boxMaxs[:, axis] - coords)/direction[axis]
+		tNear = np.maximum(tNear, np.minimum(t1, t2))
+		tFar = np.minimum(tFar, np.maximum(t1, t2))
+
+	return tNear <= tFar
+
+# ==============================================================================
+
+def _pointBoxesDistances(point, boxMins, boxMaxs):
+
+	offsets = np.maximum(np.maximum(boxMins - point, point - boxMaxs), 0.0)
+
+	return np.linalg.norm(offsets, axis=1)
+
+# ==============================================================================
+
+def trianglesBoxes(triangles):
+
+	''' Returns boxMins, boxMaxs of (N, 3, 3) triangles. '''
+
+	return triangles.min(axis=1), triangles.max(axis=1)
+
+# ==============================================================================
+
+def pointTrianglesDistances(point, triangles):
+
+	''' Returns distances of the point to the given (N, 3, 3) triangles. '''
+
+	point = np.array(point, dtype=float)
+	a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+
+	normals = np.cross(b - a, c - a)
+	lengths = np.linalg.norm(normals, axis=1)
+	lengths[lengths == 0] = 1.0
+	normals = normals/lengths[:, None]
+
+	# the point projected to the triangle plane lies inside the triangle
+	planeDistances = np.einsum('ij,ij->i', point - a, normals)
+	projected = point - planeDistances[:, None]*normals
+
+	def edgeSide(p0, p1):
+		return np.einsum('ij,ij->i', np.cross(p1 - p0, projected - p0), normals) >= 0
+
+	# degenerated triangles have no inside
+	inside = edgeSide(a, b) & edgeSide(b, c) & edgeSide(c, a) & (np.linalg.norm(np.cross(b - a, c - a), axis=1) > 0)
+
+	# otherwise the nearest point lies on the triangle edge
+	def segmentDistances(p0, p1):
+		segments = p1 - p0
+		segmentLengths = np.einsum('ij,ij->i', segments, segments)
+		segmentLengths[segmentLengths == 0] = 1.0
+		params = np.clip(np.einsum('ij,ij->i', point - p0, segments)/segmentLengths, 0.0, 1.0)
+		return np.linalg.norm(point - (p0 + params[:, None]*segments), axis=1)
+
+	edgeDistances = np.minimum(np.minimum(segmentDistances(a, b), segmentDistances(b, c)), segmentDistances(c, a))
+
+	return np.where(inside, np.abs(planeDistances), edgeDistances)
+
+# ==============================================================================
+
+def segmentsDistances(p0, p1, q0, q1):
+
+	''' Returns distances of the paired (N, 3) segments p0-p1 and q0-q1 (closest points clamped to the segments). '''
+
+	d1 = p1 - p0
+	d2 = q1 - q0
+	r = p0 - q0
+	a = np.einsum('ij,ij->i', d1, d1)
+	e = np.einsum('ij,ij->i', d2, d2)
+	b = np.einsum('ij,ij->i', d1, d2)
+	c = np.einsum('ij,ij->i', d1, r)
+	f = np.einsum('ij,ij->i', d2, r)
+
+	safeA = np.where(a > 0, a, 1.0)
+	safeE = np.where(e > 0, e, 1.0)
+	denominators = a*e - b*b
+
+	# closest point of the infinite lines clamped to the first segment, parallel segments start at p0
+	s = np.where(denominators > 1e-12*a*e, np.clip((b*f - c*e)/np.where(denominators > 0, denominators, 1.0), 0.0, 1.0), 0.0)
+	t = np.where(e > 0, (b*s + f)/safeE, 0.0)
+
+	# the second segment parameter clamped, the first one recomputed for it
+	s = np.where(t < 0, np.clip(-c/safeA, 0.0, 1.0), np.where(t > 1, np.clip((b - c)/safeA, 0.0, 1.0), s))
+	t = np.clip(t, 0.0, 1.0)
+	s = np.where(a > 0, s, 0.0)
+
+	return np.linalg.norm((p0 + s[:, None]*d1) - (q0 + t[:, None]*d2), axis=1)
+
+# ==============================================================================
+
+def trianglesDistances(triangles, otherTriangles):
+
+	''' Returns distances of the paired (N, 3, 3) triangles. Intersecting triangles have zero distance,
+	otherwise the closest points lie on an edge of one triangle and a vertex or an edge of the other one. '''
+
+	distances = np.full(len(triangles), np.inf)
+	for first, second in ((triangles, otherTriangles), (otherTriangles, triangles)):
+		for vertex in range(3):
+			distances = np.minimum(distances, pointTrianglesDistances(first[:, vertex], second))
+
+		# edge piercing the other triangle
+		a, b, c = second[:, 0], second[:, 1], second[:, 2]
+		normals = np.cross(b - a, c - a)
+		for start, end in ((0, 1), (1, 2), (2, 0)):
+			startSides = np.einsum('ij,ij->i', first[:, start] - a, normals)
+			endSides = np.einsum('ij,ij->i', first[:, end] - a, normals)
+			crossing = (startSides*endSides < 0)
+			params = startSides/np.where(crossing, startSides - endSides, 1.0)
+			points = first[:, start] + params[:, None]*(first[:, end] - first[:, start])
+			pierced = crossing & (pointTrianglesDistances(points, second) <= 1e-9)
+			distances[pierced] = 0.0
+
+	for firstEdge in ((0, 1), (1, 2), (2, 0)):
+		for secondEdge in ((0, 1), (1, 2), (2, 0)):
+			distances = np.minimum(distances, segmentsDistances(triangles[:, firstEdge[0]], triangles[:, firstEdge[1]],
+				otherTriangles[:, secondEdge[0]], otherTriangles[:, secondEdge[1]]))
+
+	return distances
+
+# ==============================================================================
+
+def trianglesWithinDistance(triangles, otherTriangles, distance, chunkSize=2**20):
+
+	''' Returns mask of (N, 3, 3) triangles within the distance from any of the (M, 3, 3) other triangles.
+
+	Triangles having a vertex within the distance from a vertex of the other triangles are accepted
+	at once, exact distances are computed only for the rest and the other triangles which boxes
+	are within the distance. Pairs are processed in chunks of limited size. '''
+
+	triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+	otherTriangles = np.asarray(otherTriangles, dtype=float).reshape(-1, 3, 3)
+	within = np.zeros(len(triangles), dtype=bool)
+	if len(triangles) == 0 or len(otherTriangles) == 0:
+		return within
+
+	# vertex to vertex distances as |a|^2 + |b|^2 - 2ab of the vertices shared by the mesh triangles once
+	vertices, vertexIndexes = np.unique(triangles.reshape(-1, 3), axis=0, return_inverse=True)
+	otherVertices = np.unique(otherTriangles.reshape(-1, 3), axis=0)
+	otherSquares = np.einsum('ij,ij->i', otherVertices, otherVertices)
+	nearVertices = np.zeros(len(vertices), dtype=bool)
+	step = max(chunkSize//len(otherVertices), 1)
+	for start in range(0, len(vertices), step):
+		chunk = vertices[start:start + step]
+		squares = np.einsum('ij,ij->i', chunk, chunk)[:, None] + otherSquares - 2*np.dot(chunk, otherVertices.T)
+		nearVertices[start:start + step] = squares.min(axis=1) <= distance**2
+	within |= nearVertices[vertexIndexes.reshape(-1)].reshape(-1, 3).any(axis=1)
+
+	undecided = np.flatnonzero(~within)
+	if len(undecided) == 0:
+		return within
+
+	boxMins, boxMaxs = trianglesBoxes(triangles[undecided])
+	otherBoxMins, otherBoxMaxs = trianglesBoxes(otherTriangles)
+	step = max(chunkSize//len(otherTriangles), 1)
+	for start in range(0, len(undecided), step):
+		indexes = undecided[start:start + step]
+		chunkMins = boxMins[start:start + step]
+		chunkMaxs = boxMaxs[start:start + step]
+		gaps = np.maximum(np.maximum(chunkMins[:, None] - otherBoxMaxs[None], otherBoxMins[None] - chunkMaxs[:, None]), 0.0)
+		pairs, otherIndexes = np.nonzero(np.einsum('ijk,ijk->ij', gaps, gaps) <= distance**2)
+		if len(pairs) == 0:
+			continue
+		distances = trianglesDistances(triangles[indexes[pairs]], otherTriangles[otherIndexes])
+		within[np.unique(indexes[pairs[distances <= distance]])] = True
+
+	return within
@@ -0,0 +1,193 @@
+# PYTHON script
+import collections
+
+import numpy as np
+
+# ==============================================================================
+
+FINGERPRINT_TOLERANCE = 0.01
+# clouds are compared along a direction not aligned with any mesh line
+COMPARISON_DIRECTION = np.array([0.5773, 0.3183, 0.7519])/np.linalg.norm([0.5773, 0.3183, 0.7519])
+
+# ==============================================================================
+
+class ClipFrame(object):
+
+	''' Orthonormal clip frame - origin and rows of x, y, z axes. '''
+
+	def __init__(self, origin, xVector, zVector):
+
+		self.origin = np.array(origin, dtype=float)
+
+		zAxis = np.array(zVector, dtype=float)
+		zAxis /= np.linalg.norm(zAxis)
+		xAxis = np.array(xVector, dtype=float)
+		xAxis -= np.dot(xAxis, zAxis)*zAxis
+		xAxis /= np.linalg.norm(xAxis)
+
+		self.axes = np.array([xAxis, np.cross(zAxis, xAxis), zAxis])
+
+	#-------------------------------------------------------------------------
+
+	def toLocal(self, coords):
+
+		return np.dot(np.asarray(coords, dtype=float).reshape(-1, 3) - self.origin, self.axes.T)
+
+	#-------------------------------------------------------------------------
+
+	def toGlobal(self, localCoords):
+
+		return self.origin + np.dot(np.asarray(localCoords, dtype=float).reshape(-1, 3), self.axes)
+
+# ==============================================================================
+
+class ClipFingerprint(object):
+
+	''' Rotation and translation invariant fingerprint of the clip neighbourhood.
+
+	Nodes of clip faces and contra faces (within the radius around the clip) expressed
+	in the clip frame. Fingerprints match if their node clouds are within the tolerance
+	(symmetric Hausdorff distance). '''
+
+	def __init__(self, geomTypeName, frame, clipCoords, contraCoords, radius):
+
+		self.geomTypeName = geomTypeName
+		self.clipCoords = frame.toLocal(clipCoords)
+
+		contraCoords = frame.toLocal(contraCoords)
+		clipRadius = np.linalg.norm(self.clipCoords, axis=1).max() if len(self.clipCoords) > 0 else 0.0
+		self.contraCoords = contraCoords[np.linalg.norm(contraCoords, axis=1) <= clipRadius + radius]
+
+	#-------------------------------------------------------------------------
+
+	def key(self):
+
+		return (self.geomTypeName, len(self.clipCoords), len(self.contraCoords))
+
+	#-------------------------------------------------------------------------
+
+	def matches(self, other, tolerance=FINGERPRINT_TOLERANCE):
+
+		if self.key() != other.key():
+			return False
+
+		for coords, otherCoords in ((self.clipCoords, other.clipCoords), (self.contraCoords, other.contraCoords)):
+			if len(coords) == 0:
+				continue
+			if np.any(np.abs(coords.min(axis=0) - otherCoords.min(axis=0)) > tolerance) or \
+				np.any(np.abs(coords.max(axis=0) - otherCoords.max(axis=0)) > tolerance):
+				return False
+			if not _isCloudWithin(coords, otherCoords, tolerance) or not _isCloudWithin(otherCoords, coords, tolerance):
+				return False
+
+		return True
+
+# ==============================================================================
+
+class StopDistanceCache(object):
+
+	''' Session wide cache of stop distances of clip sites keyed by their fingerprint.
+
+	Stop distance points are stored in the clip frame, so they can be transformed
+	to the frame of any clip with a matching fingerprint. '''
+
+	def __init__(self):
+
+		self.entries = collections.defaultdict(list)
+		self.statistics = collections.Counter()
+
+	#-------------------------------------------------------------------------
+
+	def find(self, fingerprint):
+
+		''' Returns the cache entry matching the fingerprint or None. '''
+
+		for entry in self.entries.get(fingerprint.key(), list()):
+			if entry.fingerprint.matches(fingerprint):
+				self.statistics['hits'] += 1
+				return entry
+
+		self.statistics['misses'] += 1
+
+		return None
+
+	#-------------------------------------------------------------------------
+
+	def add(self, fingerprint, frame, stopDistances, stopDistancesPoints):
+
+		''' Stores stop distance values and points {stopDistName: (clipPointCoords, matePointCoords)}
+		found in the given frame. '''
+
+		entry = StopDistanceCacheEntry(fingerprint, frame, stopDistances, stopDistancesPoints)
+		entries = self.entries[fingerprint.key()]
+		entries[:] = [cachedEntry for cachedEntry in entries if not cachedEntry.fingerprint.matches(fingerprint)]
+		entries.append(entry)
+
+		return entry
+
+	#-------------------------------------------------------------------------
+
+	def invalidate(self):
+
+		self.entries.clear()
+
+	#-------------------------------------------------------------------------
+
+	def printStatistics(self):
+
+		print('Stop distance cache: %s clip sites reused, %s computed.' % (
+			self.statistics['hits'], self.statistics['misses']))
+
+# ==============================================================================
+
+class StopDistanceCacheEntry(object):
+
+	def __init__(self, fingerprint, frame, stopDistances, stopDistancesPoints):
+
+		self.fingerprint = fingerprint
+		self.frame = frame
+		self.stopDistances = dict(stopDistances)
+		self.localPoints = dict((stopDistName, frame.toLocal(points))
+			for stopDistName, points in stopDistancesPoints.items())
+
+	#-------------------------------------------------------------------------
+
+	def getStopDistancesPoints(self, frame):
+
+		''' Returns {stopDistName: (clipPointCoords, matePointCoords)} transformed to the given frame. '''
+
+		return dict((stopDistName, [coords.tolist() for coords in frame.toGlobal(localPoints)])
+			for stopDistName, localPoints in self.localPoints.items())
+
+# ==============================================================================
+
+def _isCloudWithin(coords, otherCoords, tolerance):
+
+	''' Returns True if each point of coords has a point of otherCoords within the tolerance.
+
+	Other points are sorted along the comparison direction, so just the points of the slab
+	of 2*tolerance width around each point are checked. '''
+
+	otherProjections = np.dot(otherCoords, COMPARISON_DIRECTION)
+	order = np.argsort(otherProjections)
+	otherProjections = otherProjections[order]
+	otherCoords = otherCoords[order]
+
+	projections = np.dot(coords, COMPARISON_DIRECTION)
+	starts = np.searchsorted(otherProjections, projections - tolerance, side='left')
+	ends = np.searchsorted(otherProjections, projections + tolerance, side='right')
+
+	found = np.zeros(len(coords), dtype=bool)
+	for offset in range(int((ends - starts).max()) if len(coords) > 0 else 0):
+		indexes = starts + offset
+		candidates = (indexes < ends) & ~found
+		if not np.any(candidates):
+			break
+		offsets = coords[candidates] - otherCoords[indexes[candidates]]
+		found[candidates] = np.einsum('ij,ij->i', offsets, offsets) <= tolerance**2
+
+	return bool(np.all(found))
+
+# ==============================================================================
+
+STOP_DISTANCE_CACHE = StopDistanceCache()
@@ -41,6 +41,8 @@ Best practice
     
 * Keep FEM model visible (visib switch on) in the time of guiding CON selection.
 * Try to reduce model geometry and avoid large faces (cut them if necessary). That will significantly reduce the time for clip creation.
+* Slow clip creation can be reported with an API trace: set the *SMARTCLIP_TRACE_DIR* environment variable before starting ANSA
+  and the ANSA API calls of each created clip are saved to the given directory (replayed offline by *offline/replay_trace.py*).
 	
 '''
 
@@ -65,6 +67,7 @@ PATH_SELF = os.path.dirname(os.path.realpath(__file__))
 
 ansa.ImportCode(os.path.join(PATH_SELF, 'domain', 'util.py'))
 ansa.ImportCode(os.path.join(PATH_SELF, 'domain', 'comp_items.py'))
+ansa.ImportCode(os.path.join(PATH_SELF, 'domain', 'api_trace.py'))
 ansa.ImportCode(os.path.join(PATH_SELF, 'presentation', 'page_selectCon.py'))
 ansa.ImportCode(os.path.join(PATH_SELF, 'presentation', 'page_clipType.py'))
 ansa.ImportCode(os.path.join(PATH_SELF, 'presentation', 'page_connectorStop.py'))
@@ -105,6 +108,8 @@ class SmartClipDialog(object):
 	DFT_TYPE_BEAM = 1
 	DFT_TYPE_GEOM = 0
 	DFT_MIRROR_CLIP = True
+	# index of the projection backend
+	DFT_PROJECTION_BACKEND = 0
 	
 	def __init__(self):
 		
@@ -112,6 +117,13 @@ class SmartClipDialog(object):
 		
 		self.mainWizard = guitk.BCWizardCreate("%s (%s)" % (self.TITLE, revision), guitk.constants.BCOnExitDestroy)
 		
+		# API calls are recorded for offline replay if SMARTCLIP_TRACE_DIR is set
+		self.apiTrace = api_trace.startRecording()
+		# the model spatial index follows the entities created, deleted and remeshed by SmartClip,
+		# it is rebuilt on demand (Select CON page) if the mesh was moved or edited in between.
+		# Stop distances are reused for identical clip sites of the whole session unless the trace
+		# has to contain their computation
+		comp_items.invalidateModelCaches(keepSpatialIndex=True, keepStopDistances=self.apiTrace is None)
 		self.smartClip = comp_items.SmartClip()
 		
 		self._setupPages()
@@ -206,6 +218,14 @@ class SmartClipDialog(object):
 		self.setDftTypeBeam(index)
 		
 		self.smartClip.setBeamType(beamType)
+	
+	#-------------------------------------------------------------------------
+	
+	def setProjectionBackend(self, index, backendName):
+			
+		self.setDftProjectionBackend(index)
+		
+		self.smartClip.setProjectionBackend(backendName)
 		
 	#-------------------------------------------------------------------------
 	@classmethod
@@ -222,6 +242,11 @@ class SmartClipDialog(object):
 	def setDftMirrorClipState(cls, state):
 		cls.DFT_MIRROR_CLIP = state
 	
+	#-------------------------------------------------------------------------
+	@classmethod
+	def setDftProjectionBackend(cls, value):
+		cls.DFT_PROJECTION_BACKEND = value
+	
 	#-------------------------------------------------------------------------
     
 	def showStatusBarMessage(self, message):
@@ -262,6 +287,8 @@ def _reject(window, application):
 #	if answer == guitk.constants.BCRetKey or answer == 1:
 		
 	application.getSmartClip()._restoreF11drawingSettings()
+	if application.apiTrace is not None:
+		application.apiTrace.stop()
 #	guitk.BCDestroyLater(window)
 	guitk.BCDestroy(window)
 
@@ -275,6 +302,9 @@ def newClip(window, parent):
 			comp_items.SymmetricalClip(parent.smartClip)
 		
 		parent.getSmartClip()._restoreF11drawingSettings()
+		parent.getSmartClip().profile.printReport()
+		if parent.apiTrace is not None:
+			api_trace.saveRecording(parent.apiTrace, parent.getSmartClip(), parent.DFT_MIRROR_CLIP)
 		guitk.BCDestroyLater(window)
 		
 #		print('Initialising a new CLIP')
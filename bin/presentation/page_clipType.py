@@ -13,6 +13,7 @@ PATH_BIN = os.path.dirname(PATH_SELF)
 
 ansa.ImportCode(os.path.join(PATH_BIN, 'domain', 'util.py'))
 ansa.ImportCode(os.path.join(PATH_BIN, 'domain', 'comp_items.py'))
+ansa.ImportCode(os.path.join(PATH_BIN, 'domain', 'projection.py'))
 ansa.ImportCode(os.path.join(PATH_SELF, 'base_widgets.py'))
 
 
@@ -38,6 +39,7 @@ class SelectClipTypePage(base_widgets.BasePage):
 		
 		guitk.BCSetEnabled(self.clipBeamTypeComboBox, False)
 		guitk.BCSetEnabled(self.clipGeomTypeComboBox, False)
+		guitk.BCSetEnabled(self.projectionBackendComboBox, False)
 		
 	#-------------------------------------------------------------------------
     		
@@ -67,17 +69,32 @@ class SelectClipTypePage(base_widgets.BasePage):
 		# entity info
 		self._addContentLine( 'Beam type Info:', 'beamTypeInfo')
 		
+		# projection backend selector
+		rowCount = guitk.BCGridLayoutRows(self.contentLayout)
+		label = guitk.BCLabelCreate(self.contentLayout, 'Select projection backend')
+		backendOptions = list(projection.PROJECTION_BACKENDS.keys())
+		self.projectionBackendComboBox = guitk.BCComboBoxCreate(self.contentLayout, backendOptions)
+		
+		guitk.BCGridLayoutAddWidget(self.contentLayout, label, rowCount, 0, guitk.constants.BCAlignLeft)
+		guitk.BCGridLayoutAddWidget(self.contentLayout, self.projectionBackendComboBox, rowCount, 1, guitk.constants.BCAlignLeft)
+		
+		# entity info
+		self._addContentLine( 'Projection backend Info:', 'projectionBackendInfo')
+		
 		# setup connections
 		guitk.BCComboBoxSetCurrentIndexChangedFunction(self.clipBeamTypeComboBox, self.beamTypeChanged, None)
 		guitk.BCComboBoxSetCurrentIndexChangedFunction(self.clipGeomTypeComboBox, self.geomTypeChanged, None)
+		guitk.BCComboBoxSetCurrentIndexChangedFunction(self.projectionBackendComboBox, self.projectionBackendChanged, None)
 				
 		# set initial values
 		guitk.BCComboBoxSetCurrentItem(self.clipBeamTypeComboBox, self.parentApplication.DFT_TYPE_BEAM)
 		guitk.BCComboBoxSetCurrentItem(self.clipGeomTypeComboBox, self.parentApplication.DFT_TYPE_GEOM)
+		guitk.BCComboBoxSetCurrentItem(self.projectionBackendComboBox, self.parentApplication.DFT_PROJECTION_BACKEND)
 
 #TODO: this will be replaced with other geometrical types loaded from comp_items		
 		self.geomTypeChanged(self.clipGeomTypeComboBox, self.parentApplication.DFT_TYPE_GEOM, None)
 		self.beamTypeChanged(self.clipBeamTypeComboBox, self.parentApplication.DFT_TYPE_BEAM, None)
+		self.projectionBackendChanged(self.projectionBackendComboBox, self.parentApplication.DFT_PROJECTION_BACKEND, None)
 	
 	#-------------------------------------------------------------------------
 
@@ -100,4 +117,13 @@ class SelectClipTypePage(base_widgets.BasePage):
 		self._setInfoAttributeValue('beamTypeInfo', self.smartClip().beamType().INFO)
 				
 		guitk.BCLabelSetIconFileName(self.beamTypeInfo_label, self.smartClip().beamType().ICON)
-	
\ No newline at end of file
+	
+	
+	#-------------------------------------------------------------------------
+
+	def projectionBackendChanged(self, comboBox, index, data):
+		
+		backendName = guitk.BCComboBoxGetText(comboBox, index)
+		self.parentApplication.setProjectionBackend(index, backendName)
+		
+		self._setInfoAttributeValue('projectionBackendInfo', self.smartClip().projectionBackend().INFO)
@@ -13,6 +13,7 @@ PATH_BIN = os.path.dirname(PATH_SELF)
 ansa.ImportCode(os.path.join(PATH_SELF, 'base_widgets.py'))
 ansa.ImportCode(os.path.join(PATH_BIN, 'domain', 'util.py'))
 ansa.ImportCode(os.path.join(PATH_BIN, 'domain', 'base_items.py'))
+ansa.ImportCode(os.path.join(PATH_BIN, 'domain', 'comp_items.py'))
 
 # ==============================================================================
 
@@ -32,6 +33,10 @@ class ConnectorStopPage(base_widgets.BasePage):
 		
 		self.selectButtons = dict()
 		self.editButtons = dict()
+		
+		# running computation - stop distances set one by one by the timer
+		self.stopDistanceSteps = None
+		self.stopDistanceProgress = None
 			
 	#-------------------------------------------------------------------------
 
@@ -39,20 +44,115 @@ class ConnectorStopPage(base_widgets.BasePage):
 		
 		''' This is a space for the code that will be activated when page becomes active'''
 		
-		if not self.isDefined:
-			guitk.BCSetApplicationOverrideCursor(guitk.constants.BCCursorWait)
-			
-			if not self.smartClip().beamType().hasStopDistance():
-				self.optionsEnabled(False)
-			else:
-				self.optionsEnabled(True)
-				
-			self.smartClip().geomType().setStopDistances(hideMeasurements=False)
-			
-			guitk.BCRestoreApplicationOverrideCursor()
-						
-			self.isDefined = True
-			self.stepFinished()
+		if not self.isDefined and self.stopDistanceSteps is None:
+			self.startComputation()
+	
+	#-------------------------------------------------------------------------
+    
+	def startComputation(self):
+		
+		self.optionsEnabled(False)
+		self.stepFinished(False)
+		
+		# computed step by step in the GUI event loop to keep it responsive
+		self.stopDistanceProgress = comp_items.StopDistanceProgress(self.showProgress)
+		self.stopDistanceSteps = self.smartClip().geomType().iterStopDistances(
+			hideMeasurements=False, progress=self.stopDistanceProgress)
+		
+		guitk.BCSetEnabled(self.cancelButton, True)
+		guitk.BCSetEnabled(self.recomputeButton, False)
+		guitk.BCTimerStart(self.stopDistanceTimer, 0)
+	
+	#-------------------------------------------------------------------------
+    
+	def recomputeStopDistances(self, buttonWidget=None, data=None):
+		
+		''' Computes all stop distances again even if they were reused from an identical clip site. '''
+		
+		if self.stopDistanceSteps is not None:
+			return
+		
+		geomType = self.smartClip().geomType()
+		geomType.resetStopDistances()
+		geomType.reuseStopDistances = False
+		
+		self.isDefined = False
+		self.startComputation()
+	
+	#-------------------------------------------------------------------------
+    
+	def computeNextStopDistance(self, timer=None, data=None):
+		
+		# computation stopped by leaving the page
+		if self.stopDistanceSteps is None:
+			return
+		
+		try:
+			next(self.stopDistanceSteps)
+		except StopIteration:
+			self._stopDistancesComputed()
+		except comp_items.StopDistanceCancelledException as e:
+			self._stopDistancesComputed()
+			self.showMessage('%s\nRemaining STOP distances can be defined using Select or Edit.' % str(e))
+		except Exception as e:
+			self._stopDistancesComputed()
+			self.showMessage(str(e), critical=True)
+		else:
+			self.updateInfo()
+			guitk.BCTimerStart(self.stopDistanceTimer, 0)
+	
+	#-------------------------------------------------------------------------
+    
+	def _stopDistancesComputed(self):
+		
+		self._computationStopped()
+		
+		self.isDefined = True
+		self.stepFinished()
+	
+	#-------------------------------------------------------------------------
+    
+	def _computationStopped(self):
+		
+		self.stopDistanceSteps = None
+		self.stopDistanceProgress = None
+		guitk.BCSetEnabled(self.cancelButton, False)
+		guitk.BCSetEnabled(self.recomputeButton, self.smartClip().beamType().hasStopDistance())
+		if self.smartClip().geomType().stopDistancesReused:
+			guitk.BCLabelSetText(self.progressLabel, 'Reused from an identical clip site')
+		
+		self.optionsEnabled(self.smartClip().beamType().hasStopDistance())
+		self.updateInfo()
+	
+	#-------------------------------------------------------------------------
+    
+	def cancelComputation(self, buttonWidget=None, data=None):
+		
+		if self.stopDistanceProgress is not None:
+			self.stopDistanceProgress.cancel()
+	
+	#-------------------------------------------------------------------------
+    
+	def showProgress(self, stopDistName, value):
+		
+		guitk.BCProgressBarSetProgress(self.progressBar, int(round(100*value)))
+		guitk.BCLabelSetText(self.progressLabel, 'Computing %s' % stopDistName if value < 1 else 'Done')
+	
+	#-------------------------------------------------------------------------
+    
+	def deactivatedBack(self):
+		
+		''' Running computation is stopped without finishing the step, stop distances set so far
+		are reset and computed again once the page is activated. '''
+		
+		if self.stopDistanceSteps is None:
+			return
+		
+		# workers stop at their next check
+		self.cancelComputation()
+		self.stopDistanceSteps.close()
+		self.smartClip().geomType().resetStopDistances()
+		self._computationStopped()
 	
 	#-------------------------------------------------------------------------
     
@@ -94,6 +194,25 @@ class ConnectorStopPage(base_widgets.BasePage):
 			
 			guitk.BCGridLayoutAddWidget(self.contentLayout, button, 1+i, 2, guitk.constants.BCAlignLeft)
 			guitk.BCGridLayoutAddWidget(self.contentLayout, editButton, 1+i, 3, guitk.constants.BCAlignLeft)
+		
+		# computation progress
+		rowCount = guitk.BCGridLayoutRows(self.contentLayout)
+		
+		self.progressLabel = guitk.BCLabelCreate(self.contentLayout, '')
+		self.progressBar = guitk.BCProgressBarCreate(self.contentLayout, 100)
+		self.cancelButton = guitk.BCPushButtonCreate(self.contentLayout, "Cancel", self.cancelComputation, None)
+		guitk.BCSetEnabled(self.cancelButton, False)
+		self.recomputeButton = guitk.BCPushButtonCreate(self.contentLayout, "Recompute", self.recomputeStopDistances, None)
+		guitk.BCSetEnabled(self.recomputeButton, False)
+		
+		guitk.BCGridLayoutAddWidget(self.contentLayout, self.progressLabel, rowCount, 0, guitk.constants.BCAlignLeft)
+		guitk.BCGridLayoutAddWidget(self.contentLayout, self.progressBar, rowCount, 1, guitk.constants.BCAlignLeft)
+		guitk.BCGridLayoutAddWidget(self.contentLayout, self.cancelButton, rowCount, 2, guitk.constants.BCAlignLeft)
+		guitk.BCGridLayoutAddWidget(self.contentLayout, self.recomputeButton, rowCount, 3, guitk.constants.BCAlignLeft)
+		
+		self.stopDistanceTimer = guitk.BCTimerCreate()
+		guitk.BCTimerSetSingleShot(self.stopDistanceTimer, True)
+		guitk.BCTimerSetTimeoutFunction(self.stopDistanceTimer, self.computeNextStopDistance, None)
 	
 	#-------------------------------------------------------------------------
     
@@ -13,6 +13,7 @@ PATH_RES = os.path.join(PATH_BIN, 'res')
 
 ansa.ImportCode(os.path.join(PATH_SELF, 'base_widgets.py'))
 ansa.ImportCode(os.path.join(PATH_MAIN, 'domain', 'base_items.py'))
+ansa.ImportCode(os.path.join(PATH_MAIN, 'domain', 'comp_items.py'))
 
 # ==============================================================================
 
@@ -45,6 +46,7 @@ class SelectConPage(base_widgets.BasePage):
 		''' Once deactivated is should not be possible to modify selected CON '''
 		
 		guitk.BCSetEnabled(self.pushButtonSelectCon, False)
+		guitk.BCSetEnabled(self.pushButtonReloadModel, False)
 		self._setRotationButtonsEnabled(False)
 			
 	#-------------------------------------------------------------------------
@@ -63,6 +65,9 @@ class SelectConPage(base_widgets.BasePage):
 		self.pushButtonSelectCon = guitk.BCPushButtonCreate(self.contentLayout, "Select", self.conSelect, None)
 		guitk.BCGridLayoutAddWidget(self.contentLayout, self.pushButtonSelectCon, 1, 2, guitk.constants.BCAlignLeft)
 		
+		self.pushButtonReloadModel = guitk.BCPushButtonCreate(self.contentLayout, "Reload model", self.reloadModel, None)
+		guitk.BCGridLayoutAddWidget(self.contentLayout, self.pushButtonReloadModel, 1, 3, guitk.constants.BCAlignLeft)
+		
 		# rotate coor sys
 		labelWidget = guitk.BCLabelCreate(self.contentLayout, 'Rotate coor sys')
 		guitk.BCGridLayoutAddWidget(self.contentLayout, labelWidget, 2, 0, guitk.constants.BCAlignLeft)
@@ -130,6 +135,15 @@ class SelectConPage(base_widgets.BasePage):
 		
 	#-------------------------------------------------------------------------
 	
+	def reloadModel(self, buttonWidget=None, data=None):
+		
+		''' Drops the model spatial index and face attributes, the mesh was moved or edited
+		outside of SmartClip. Stop distances are kept as they are matched by the mesh. '''
+		
+		comp_items.invalidateModelCaches(keepStopDistances=True)
+	
+	#-------------------------------------------------------------------------
+	
 	def _setRotationButtonsEnabled(self, state):
 		
 		ansa.guitk.BCSetEnabled(self.pushButtonRotXminus, state)
@@ -0,0 +1,46 @@
+# PYTHON script
+
+'''
+In-memory stand-in of the ANSA scripting API
+============================================
+
+Implements the subset of *ansa.base*, *ansa.calc*, *ansa.mesh*, *ansa.guitk* and *ansa.constants*
+used by SmartClip on top of an in-memory model loaded from a JSON model file (see :mod:`ansa.model`).
+Put the *offline* directory on *sys.path* to use it instead of a real ANSA session.
+'''
+
+import os
+import sys
+import importlib.util
+
+from . import constants
+from . import model
+from . import base
+from . import calc
+from . import mesh
+from . import guitk
+from . import session
+
+# ==============================================================================
+
+def ImportCode(filePath):
+
+	''' Imports the given script as a module named by its file name and
+	makes it available in the caller namespace as ANSA does. '''
+
+	moduleName = os.path.splitext(os.path.basename(filePath))[0]
+
+	module = sys.modules.get(moduleName)
+	if module is None or os.path.realpath(getattr(module, '__file__', '')) != os.path.realpath(filePath):
+		spec = importlib.util.spec_from_file_location(moduleName, filePath)
+		module = importlib.util.module_from_spec(spec)
+		sys.modules[moduleName] = module
+		try:
+			spec.loader.exec_module(module)
+		except Exception:
+			del sys.modules[moduleName]
+			raise
+
+	sys._getframe(1).f_globals[moduleName] = module
+
+	return module
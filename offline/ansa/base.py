@@ -0,0 +1,600 @@
+# PYTHON script
+
+''' Subset of ansa.base working on the in-memory model. '''
+
+import collections
+import numpy as np
+
+from . import model as _model
+from .model import Entity, getModel
+
+# ==============================================================================
+
+_PICK_RESPONDER = None
+_F11_OPTIONS = {'Coords': {'value': 50.0, 'status': 'Relative to screen (%)'}}
+
+# ==============================================================================
+
+def setPickResponder(responder):
+
+	''' Stand-in only: responder(deck, types, initial_entities) replaces the interactive selection.
+
+	Without a responder, PickEntities confirms the initial entities. '''
+
+	global _PICK_RESPONDER
+	_PICK_RESPONDER = responder
+
+# ==============================================================================
+
+def _asList(entities):
+
+	if entities is None:
+		return list()
+	if isinstance(entities, Entity):
+		return [entities]
+	if isinstance(entities, dict):
+		return list(entities.values())
+
+	return list(entities)
+
+# ==============================================================================
+
+def _uniqueList(entities):
+
+	return list(collections.OrderedDict.fromkeys(entities))
+
+# ==============================================================================
+
+def _isVisible(model, entity):
+
+	if entity._ansaType in ('FACE', 'SHELL'):
+		return entity in model.visible
+	elif entity._ansaType in _model.PROPERTY_TYPES:
+		for candidate in model.visible:
+			if candidate._ansaType in ('FACE', 'SHELL') and candidate.card.get('PID') == entity._id:
+				return True
+		return False
+
+	return entity not in model.hidden
+
+# ==============================================================================
+
+def _related(model, container, searchType):
+
+	containerType = container._ansaType
+	if containerType == searchType:
+		return [container]
+
+	if containerType in _model.PROPERTY_TYPES:
+		if searchType == 'FACE':
+			return [face for face in model.getEntities('FACE') if face.card.get('PID') == container._id]
+		elif searchType in ('SHELL', 'NODE'):
+			shells = [shell for shell in model.getEntities('SHELL') if shell.card.get('PID') == container._id]
+			if searchType == 'SHELL':
+				return shells
+			return _uniqueList(node for shell in shells for node in model.elementNodes(shell))
+
+	elif containerType == 'FACE':
+		if searchType == 'SHELL':
+			return list(model.faceShells[container])
+		elif searchType == 'NODE':
+			return _uniqueList(node for shell in model.faceShells[container] for node in model.elementNodes(shell))
+		elif searchType == 'CONS':
+			return list(model.faceCons[container])
+		elif searchType == 'HOT POINT':
+			return _uniqueList(hotPoint for con in model.faceCons[container] for hotPoint in model.conHotPoints[con])
+		elif searchType in _model.PROPERTY_TYPES or searchType == '__PROPERTIES__':
+			prop = model.entityProperty(container)
+			return [] if prop is None or (searchType != '__PROPERTIES__' and prop._ansaType != searchType) else [prop]
+
+	elif containerType == 'CONS':
+		if searchType == 'HOT POINT':
+			return list(model.conHotPoints[container])
+		elif searchType == 'FACE':
+			return list(model.conFaces[container])
+
+	elif containerType in _model.ELEMENT_TYPES:
+		if searchType == 'NODE':
+			return model.elementNodes(container)
+		elif searchType in _model.PROPERTY_TYPES or searchType == '__PROPERTIES__':
+			prop = model.entityProperty(container)
+			return [] if prop is None or (searchType != '__PROPERTIES__' and prop._ansaType != searchType) else [prop]
+
+	return list()
+
+# ==============================================================================
+
+def CollectEntities(deck, containers, search_types, filter_visible=False, recursive=False, **kwargs):
+
+	model = getModel()
+	model.statistics['CollectEntities'] += 1
+
+	if isinstance(search_types, str):
+		search_types = [search_types]
+	search_types = [_model.canonicalType(searchType) for searchType in search_types]
+
+	entities = list()
+	if containers is None:
+		for searchType in search_types:
+			if searchType == '__PROPERTIES__':
+				for propertyType in _model.PROPERTY_TYPES:
+					entities.extend(model.getEntities(propertyType))
+			else:
+				entities.extend(model.getEntities(searchType))
+	else:
+		for container in _asList(containers):
+			for searchType in search_types:
+				entities.extend(_related(model, container, searchType))
+
+	entities = _uniqueList(entities)
+	if filter_visible:
+		entities = [entity for entity in entities if _isVisible(model, entity)]
+
+	return entities
+
+# ==============================================================================
+
+def GetEntity(deck, ansaType, entityId):
+
+	return getModel().getEntity(ansaType, entityId)
+
+# ==============================================================================
+
+def GetEntityCardValues(deck, entity, fields):
+
+	model = getModel()
+	model.statistics['GetEntityCardValues'] += 1
+
+	values = dict()
+	for field in fields:
+		if entity._ansaType == 'MEASUREMENT' and field == 'RESULT':
+			points = [model.nodeCoords(point) for point in entity.measuredEntities]
+			values[field] = float(np.linalg.norm(points[0] - points[1]))
+		elif entity._ansaType == 'SHELL' and field in ('N1', 'N2', 'N3', 'N4'):
+			values[field] = entity.card.get('G' + field[1])
+		elif field in ('ID', 'EID') and field not in entity.card:
+			values[field] = entity._id
+		else:
+			values[field] = entity.card.get(field)
+
+	return values
+
+# ==============================================================================
+
+def SetEntityCardValues(deck, entity, values):
+
+	model = getModel()
+	entity.card.update(values)
+	if entity._ansaType == 'NODE' and any(field in values for field in ('X', 'Y', 'Z')):
+		model.geometryChanged()
+
+	return 0
+
+# ==============================================================================
+
+def CreateEntity(deck, ansaType, values=None):
+
+	model = getModel()
+	model.statistics['CreateEntity'] += 1
+
+	values = dict() if values is None else dict(values)
+	ansaType = _model.canonicalType(ansaType)
+
+	entityId = None
+	if ansaType in _model.PROPERTY_TYPES and 'PID' in values:
+		entityId = int(values['PID'])
+	elif 'ID' in values:
+		entityId = int(values['ID'])
+	if entityId is not None and model.getEntity(ansaType, entityId) is not None:
+		return None
+
+	return model.addEntity(ansaType, values, entityId)
+
+# ==============================================================================
+
+def DeleteEntity(entities, force=False):
+
+	''' Entities referenced by others (properties, materials, ...) are deleted only if forced. '''
+
+	model = getModel()
+	for entity in _asList(entities):
+		if not force and _isReferenced(model, entity):
+			continue
+		model.deleteEntity(entity)
+
+	return 0
+
+# ==============================================================================
+
+def _isReferenced(model, entity):
+
+	for typeEntities in model.entities.values():
+		for candidate in typeEntities.values():
+			for field in _REFERENCE_FIELDS:
+				if candidate.card.get(field) == entity._id and _isReferencedType(candidate._ansaType, field, entity._ansaType):
+					return True
+
+	return False
+
+# ==============================================================================
+
+def PickEntities(deck, search_types, initial_entities=None, **kwargs):
+
+	getModel().statistics['PickEntities'] += 1
+
+	if _PICK_RESPONDER is not None:
+		return _PICK_RESPONDER(deck, search_types, initial_entities)
+
+	initialEntities = _asList(initial_entities)
+	if len(initialEntities) == 0:
+		return None
+
+	return initialEntities
+
+# ==============================================================================
+
+def GetFacesOfCons(cons):
+
+	faces = list()
+	for con in _asList(cons):
+		faces.extend(getModel().conFaces[con])
+
+	return _uniqueList(faces)
+
+# ==============================================================================
+
+def GetFaceArea(face):
+
+	triangles = getModel().faceTriangles(face)
+	areas = 0.5*np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1)
+
+	return float(areas.sum())
+
+# ==============================================================================
+
+def GetFaceOrientation(face):
+
+	triangles = getModel().faceTriangles(face)
+	normal = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]).sum(axis=0)
+
+	return list(normal/np.linalg.norm(normal))
+
+# ==============================================================================
+
+def ProjectPointDirectional(target, point_x, point_y, point_z, vec_x, vec_y, vec_z, tolerance, project_on='faces', **kwargs):
+
+	model = getModel()
+	model.statistics['ProjectPointDirectional'] += 1
+
+	direction = np.array([vec_x, vec_y, vec_z], dtype=float)
+	direction = direction/np.linalg.norm(direction)
+	origin = np.array([point_x, point_y, point_z], dtype=float)
+
+	triangles = list()
+	for face in _asList(target):
+		triangles.append(model.faceTriangles(face))
+	triangles = np.concatenate(triangles)
+	if len(triangles) == 0:
+		return None
+
+	params = _model.rayTrianglesParams(origin, direction, triangles)
+	params = params[~np.isnan(params)]
+	params = params[np.abs(params) <= tolerance]
+	if len(params) == 0:
+		return None
+
+	param = params[np.argmin(np.abs(params))]
+
+	return list(origin + param*direction)
+
+# ==============================================================================
+
+def Newpoint(x, y, z):
+
+	return getModel().addEntity('POINT', {'X': float(x), 'Y': float(y), 'Z': float(z)})
+
+# ==============================================================================
+
+def CreateMeasurement(entities, measurementType):
+
+	model = getModel()
+	measurement = model.addEntity('MEASUREMENT', {'TYPE': measurementType})
+	measurement.measuredEntities = list(entities)
+
+	return measurement
+
+# ==============================================================================
+
+def NodesToElements(nodes):
+
+	model = getModel()
+	nodes = _asList(nodes)
+	nodeSet = set(nodes)
+
+	nodeElements = collections.OrderedDict((node, list()) for node in nodes)
+	for elementType in _model.ELEMENT_TYPES:
+		for element in model.getEntities(elementType):
+			for node in model.elementNodes(element):
+				if node in nodeSet:
+					nodeElements[node].append(element)
+
+	return nodeElements
+
+# ==============================================================================
+
+def NearElements(search_entities=None, coordinates=None, tolerance=0.1, **kwargs):
+
+	model = getModel()
+	model.statistics['NearElements'] += 1
+
+	if search_entities is None:
+		search_entities = model.getEntities('SHELL')
+	elements = [element for element in _asList(search_entities) if element._ansaType == 'SHELL']
+
+	coordinates = np.array(coordinates, dtype=float).reshape(-1, 3)
+
+	# triangles of all elements at once, culled by their boxes for each point
+	elementsTriangles = [model.elementTriangles(element) for element in elements]
+	triangles = np.concatenate(elementsTriangles) if len(elements) > 0 else np.empty((0, 3, 3))
+	triangleElements = np.repeat(np.arange(len(elements)), [len(item) for item in elementsTriangles])
+	boxMins = triangles.min(axis=1)
+	boxMaxs = triangles.max(axis=1)
+
+	result = list()
+	found = False
+	for point in coordinates:
+		candidates = np.nonzero(np.all(boxMins <= point + tolerance, axis=1) & np.all(boxMaxs >= point - tolerance, axis=1))[0]
+		distances = _model.pointTrianglesDistances(point, triangles[candidates])
+		nearIndexes = np.unique(triangleElements[candidates[distances <= tolerance]])
+		nearElements = [elements[index] for index in nearIndexes]
+		found = found or len(nearElements) > 0
+		result.append(nearElements)
+
+	if not found:
+		return None
+
+	return result
+
+# ==============================================================================
+
+def Near(radius=10.0, dense_search=False, custom_entities=None, **kwargs):
+
+	''' Shows faces and shells within the radius of the bounding box of given entities. '''
+
+	model = getModel()
+	model.statistics['Near'] += 1
+
+	customEntities = _asList(custom_entities)
+	box = model.boundingBox(customEntities)
+	if box is None:
+		return 0
+	boxMin = box[0] - radius
+	boxMax = box[1] + radius
+
+	for entity in model.getEntities('FACE') + model.getEntities('SHELL'):
+		points = model.entityPoints(entity)
+		if len(points) == 0:
+			continue
+		if np.all(points.min(axis=0) <= boxMax) and np.all(points.max(axis=0) >= boxMin):
+			model.visible.add(entity)
+
+	for entity in customEntities:
+		if entity._ansaType in ('FACE', 'SHELL'):
+			model.visible.add(entity)
+
+	return 0
+
+# ==============================================================================
+
+def Or(entities, deck=None):
+
+	model = getModel()
+	model.statistics['Or'] += 1
+
+	entities = _asList(entities)
+	model.visible = set(entity for entity in entities if entity._ansaType in ('FACE', 'SHELL'))
+	model.hidden.difference_update(entities)
+
+	return 0
+
+# ==============================================================================
+
+def And(entities, deck=None):
+
+	model = getModel()
+	model.statistics['And'] += 1
+
+	entities = _asList(entities)
+	model.visible = set(entity for entity in entities if entity._ansaType in ('FACE', 'SHELL'))
+	model.hidden.difference_update(entities)
+
+	return 0
+
+# ==============================================================================
+
+def Not(entities, deck=None):
+
+	model = getModel()
+	model.statistics['Not'] += 1
+
+	for entity in _asList(entities):
+		model.visible.discard(entity)
+		model.hidden.add(entity)
+
+	return 0
+
+# ==============================================================================
+
+def SetEntityVisibilityValues(deck, values):
+
+	model = getModel()
+	if values.get('SHELL') == 'on':
+		model.visible.update(model.getEntities('SHELL'))
+
+	return 0
+
+# ==============================================================================
+
+def GeoRotate(operation, copies, part, pid, x1, y1, z1, x2, y2, z2, angle, entities, draw_results=False, **kwargs):
+
+	model = getModel()
+	if draw_results and not model.redrawsBlocked:
+		model.statistics['redraws'] += 1
+
+	origin = np.array([x1, y1, z1], dtype=float)
+	axis = np.array([x2, y2, z2], dtype=float) - origin
+	axis = axis/np.linalg.norm(axis)
+	angle = np.radians(angle)
+
+	def rotate(point):
+		vector = np.array(point, dtype=float) - origin
+		rotated = (vector*np.cos(angle) + np.cross(axis, vector)*np.sin(angle) +
+			axis*np.dot(axis, vector)*(1 - np.cos(angle)))
+		return origin + rotated
+
+	for entity in _asList(entities):
+		if entity._ansaType == 'ORIENTATION_R':
+			for pointName in ('A', 'B', 'C'):
+				fields = ['%s%s' % (pointName, i) for i in (1, 2, 3)]
+				point = rotate([float(entity.card[field]) for field in fields])
+				entity.card.update(dict(zip(fields, point)))
+		elif entity._ansaType == 'NODE':
+			point = rotate(model.nodeCoords(entity))
+			entity.card.update({'X': point[0], 'Y': point[1], 'Z': point[2]})
+			model.geometryChanged()
+
+	return 0
+
+# ==============================================================================
+
+_REFERENCE_FIELDS = ('PID', 'MID', 'EL>data', 'STP>data')
+# types referenced by the fields other than the properties (PID) and materials (MID)
+_REFERENCE_TYPES = {'EL>data': 'CONNECTOR_ELASTICITY', 'STP>data': 'CONNECTOR_STOP',
+	('CONNECTOR_SECTION', 'MID'): 'CONNECTOR BEHAVIOR'}
+
+def _isReferencedType(ansaType, field, referencedType):
+
+	if field == 'PID':
+		return referencedType in _model.PROPERTY_TYPES
+
+	return referencedType == _REFERENCE_TYPES.get((ansaType, field), _REFERENCE_TYPES.get(field, 'MATERIAL'))
+
+def GeoSymmetry(operation, offset, part, pid, entities, keep_connectivity=False, **kwargs):
+
+	''' Copies given entities mirrored by the XZ plane (y = 0). '''
+
+	model = getModel()
+	model.statistics['GeoSymmetry'] += 1
+
+	entities = _asList(entities)
+	copies = dict()
+	nodeCopies = dict()
+
+	def copyNode(node):
+		if node not in nodeCopies:
+			coords = model.nodeCoords(node)
+			nodeCopies[node] = model.addEntity('NODE', {'X': coords[0], 'Y': -coords[1], 'Z': coords[2]})
+		return nodeCopies[node]
+
+	for entity in entities:
+		if entity._ansaType in ('NODE', 'FACE', 'CONS', 'HOT POINT'):
+			continue
+		card = dict(entity.card)
+		if entity._ansaType in _model.PROPERTY_TYPES:
+			card.pop('PID', None)
+		copies[entity] = (card, model.addEntity(entity._ansaType, card))
+
+	# update references
+	typeCopies = dict(((entity._ansaType, entity._id), copy) for entity, (card, copy) in copies.items())
+	for entity, (card, copy) in copies.items():
+		for field in _model.ELEMENT_NODE_FIELDS.get(entity._ansaType, ()):
+			node = model.getEntity('NODE', card.get(field))
+			if node is not None:
+				copy.card[field] = copyNode(node)._id
+		for field in _REFERENCE_FIELDS:
+			if field not in card:
+				continue
+			for (copiedType, copiedId), copied in typeCopies.items():
+				if copiedId == card[field] and _isReferencedType(entity._ansaType, field, copiedType):
+					copy.card[field] = copied._id
+					break
+
+	return 0
+
+# ==============================================================================
+
+class _NewEntitiesCollector(object):
+
+	def __init__(self, searchTypes):
+
+		self.model = getModel()
+		self.searchTypes = searchTypes
+		self.counter = self.model.creationCounter
+
+	#-------------------------------------------------------------------------
+
+	def report(self):
+
+		entities = list()
+		for searchType in self.searchTypes:
+			for entity in self.model.getEntities(searchType):
+				if self.model.creationOrder.get(entity, 0) > self.counter:
+					entities.append(entity)
+
+		return entities
+
+# ==============================================================================
+
+def CollectNewModelEntities(deck, search_types, **kwargs):
+
+	if isinstance(search_types, str):
+		search_types = [search_types]
+
+	return _NewEntitiesCollector([_model.canonicalType(searchType) for searchType in search_types])
+
+# ==============================================================================
+
+def BlockRedraws(state):
+
+	getModel().redrawsBlocked = bool(state)
+
+	return 0
+
+# ==============================================================================
+
+def RedrawAll():
+
+	model = getModel()
+	if not model.redrawsBlocked:
+		model.statistics['redraws'] += 1
+
+	return 0
+
+# ==============================================================================
+
+def F11PresParamsOptionsGet(name):
+
+	return dict(_F11_OPTIONS.get(name, {'value': 0.0, 'status': ''}))
+
+# ==============================================================================
+
+def F11PresParamsOptionsSet(name, status, value):
+
+	_F11_OPTIONS[name] = {'value': value, 'status': status}
+
+	return 0
+
+# ==============================================================================
+
+def SetCurrentMenu(menu):
+	return 0
+
+# ==============================================================================
+
+def SetViewButton(values):
+	return 0
+
+# ==============================================================================
+
+def SetViewAngles(**kwargs):
+	return 0
@@ -0,0 +1,14 @@
+# PYTHON script
+import numpy as np
+
+# ==============================================================================
+
+def CalcAngleOfVectors(vector1, vector2):
+
+	''' Returns the angle between given vectors in radians. '''
+
+	vector1 = np.array(vector1, dtype=float)
+	vector2 = np.array(vector2, dtype=float)
+	cosine = np.dot(vector1, vector2)/(np.linalg.norm(vector1)*np.linalg.norm(vector2))
+
+	return float(np.arccos(np.clip(cosine, -1.0, 1.0)))
@@ -0,0 +1,7 @@
+# PYTHON script
+
+ABAQUS = 'ABAQUS'
+NASTRAN = 'NASTRAN'
+LSDYNA = 'LSDYNA'
+
+app_version = '21.0.0'
@@ -0,0 +1,51 @@
+# PYTHON script
+
+''' Non-interactive guitk: widget functions are accepted and ignored, message windows print. '''
+
+# ==============================================================================
+
+class _Constants(object):
+
+	def __getattr__(self, name):
+		return name
+
+constants = _Constants()
+
+# ==============================================================================
+
+def UserWarning(message):
+	print('WARNING: %s' % message)
+
+# ==============================================================================
+
+def UserError(message):
+	print('ERROR: %s' % message)
+
+# ==============================================================================
+
+def UserInput(message, defaultValue=''):
+	return defaultValue
+
+# ==============================================================================
+
+def BCMessageWindowCreate(messageType, message, *args):
+	print('%s: %s' % (messageType, message))
+	return message
+
+# ==============================================================================
+
+def BCMessageWindowExecute(window):
+	return 1
+
+# ==============================================================================
+
+def _noOperation(*args, **kwargs):
+	return None
+
+# ==============================================================================
+
+def __getattr__(name):
+
+	if name.startswith('BC'):
+		return _noOperation
+	raise AttributeError(name)
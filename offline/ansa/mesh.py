@@ -0,0 +1,67 @@
+# PYTHON script
+
+''' Subset of ansa.mesh working on the in-memory model. '''
+
+import numpy as np
+
+from . import model as _model
+from .model import getModel
+
+# ==============================================================================
+
+def AutoPaste(visible=False, entities=None, project_on_geometry=False, project_2nd_order_nodes=False,
+	move_to='FE pos', distance=0.2, preserve_id='min', **kwargs):
+
+	''' Pastes free nodes of BEAM and CONNECTOR elements to the nearest shell node within the distance.
+
+	Candidate nodes are the nodes of given entities, or all nodes of visible elements. '''
+
+	model = getModel()
+	model.statistics['AutoPaste'] += 1
+
+	if entities is not None:
+		candidates = list()
+		for entity in entities:
+			if entity._ansaType == 'NODE':
+				candidates.append(entity)
+			else:
+				candidates.extend(model.elementNodes(entity))
+		candidates = set(candidates)
+	else:
+		candidates = set()
+		for element in model.visible:
+			candidates.update(model.elementNodes(element))
+		for elementType in ('BEAM', 'CONNECTOR'):
+			for element in model.getEntities(elementType):
+				candidates.update(model.elementNodes(element))
+
+	shellNodes = set()
+	for shell in model.getEntities('SHELL'):
+		shellNodes.update(model.elementNodes(shell))
+
+	targets = [node for node in candidates if node in shellNodes]
+	sources = [node for node in candidates if node not in shellNodes]
+	if len(targets) == 0 or len(sources) == 0:
+		return 0
+
+	targetCoords = np.array([model.nodeCoords(node) for node in targets])
+
+	replacements = dict()
+	for node in sources:
+		distances = np.linalg.norm(targetCoords - model.nodeCoords(node), axis=1)
+		index = np.argmin(distances)
+		if distances[index] <= distance:
+			replacements[node._id] = targets[index]._id
+
+	for elementType in ('BEAM', 'CONNECTOR'):
+		for element in model.getEntities(elementType):
+			for field in _model.ELEMENT_NODE_FIELDS[elementType]:
+				if element.card.get(field) in replacements:
+					element.card[field] = replacements[element.card[field]]
+
+	for nodeId in replacements:
+		model.deleteEntity(model.getEntity('NODE', nodeId))
+
+	model.statistics['pasted'] += len(replacements)
+
+	return len(replacements)
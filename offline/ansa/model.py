@@ -0,0 +1,440 @@
+# PYTHON script
+
+'''
+In-memory model
+===============
+
+Model file format (JSON, optionally gzip compressed when the file name ends with *.gz*)::
+
+	{
+	"nodes": [[id, x, y, z], ...],
+	"properties": [{"type": "SHELL_SECTION", "id": 1, "card": {"Name": "clip", "MID": 1}}, ...],
+	"entities": [{"type": "MATERIAL", "id": 1, "card": {"Name": "steel"}}, ...],
+	"faces": [{"id": 1, "pid": 1, "shells": [[id, n1, n2, n3, n4], ...], "geometry": [[[x, y, z], [x, y, z], [x, y, z]], ...]}, ...],
+	"shells": [[id, pid, n1, n2, n3, n4], ...],
+	"cons": [{"id": 1, "faces": [1, 2], "points": [[x, y, z], [x, y, z]]}, ...]
+	}
+
+Face *geometry* triangles are optional, the face shells are used as the face geometry if not given.
+Shells in *shells* are FE-only shells not assigned to any face. The last node of a shell is omitted for triangles.
+'''
+
+import os
+import gzip
+import json
+import collections
+import numpy as np
+
+# ==============================================================================
+
+TYPE_ALIASES = {
+	'PSHELL': 'SHELL_SECTION',
+	'GRID': 'NODE',
+	'CQUAD4': 'SHELL',
+	'CTRIA3': 'SHELL',
+	'CONS': 'CONS',
+	}
+
+ID_GROUPS = {
+	'SHELL': 'ELEMENT', 'BEAM': 'ELEMENT', 'CONNECTOR': 'ELEMENT',
+	'SHELL_SECTION': 'PROPERTY', 'LAMINATE': 'PROPERTY', 'BEAM_SECTION': 'PROPERTY',
+	'CONNECTOR_SECTION': 'PROPERTY',
+	}
+
+PROPERTY_TYPES = ['SHELL_SECTION', 'LAMINATE', 'BEAM_SECTION', 'CONNECTOR_SECTION']
+ELEMENT_TYPES = ['SHELL', 'BEAM', 'CONNECTOR']
+
+ELEMENT_NODE_FIELDS = {
+	'SHELL': ('G1', 'G2', 'G3', 'G4'),
+	'BEAM': ('NODE1', 'NODE2'),
+	'CONNECTOR': ('G1', 'G2'),
+	}
+
+CURRENT = None
+
+# ==============================================================================
+
+def canonicalType(ansaType):
+
+	return TYPE_ALIASES.get(ansaType, ansaType)
+
+# ==============================================================================
+
+class Entity(object):
+
+	def __init__(self, ansaType, entityId, card=None):
+
+		self._id = entityId
+		self._ansaType = ansaType
+		self.card = dict() if card is None else dict(card)
+
+	#-------------------------------------------------------------------------
+
+	@property
+	def _name(self):
+
+		return self.card.get('Name', '')
+
+	#-------------------------------------------------------------------------
+
+	def ansa_type(self, deck=None):
+
+		return self._ansaType
+
+	#-------------------------------------------------------------------------
+
+	def __repr__(self):
+
+		return '<Entity: %s id:%s>' % (self._ansaType, self._id)
+
+# ==============================================================================
+
+class Model(object):
+
+	def __init__(self):
+
+		self.entities = collections.OrderedDict()
+		self.lastIds = collections.defaultdict(int)
+		self.creationCounter = 0
+		self.creationOrder = dict()
+
+		# geometry topology
+		self.faceShells = collections.defaultdict(list)
+		self.faceCons = collections.defaultdict(list)
+		self.faceGeometry = dict()
+		self.shellFace = dict()
+		self.conFaces = dict()
+		self.conHotPoints = dict()
+
+		# display state
+		self.visible = set()
+		self.hidden = set()
+		self.redrawsBlocked = False
+		self.statistics = collections.Counter()
+
+		self.geometryVersion = 0
+		self._cache = dict()
+
+	#-------------------------------------------------------------------------
+
+	def _nextId(self, ansaType, requestedId=None):
+
+		group = ID_GROUPS.get(ansaType, ansaType)
+		if requestedId is None:
+			requestedId = self.lastIds[group] + 1
+		self.lastIds[group] = max(self.lastIds[group], requestedId)
+
+		return requestedId
+
+	#-------------------------------------------------------------------------
+
+	def addEntity(self, ansaType, card=None, entityId=None):
+
+		ansaType = canonicalType(ansaType)
+		entityId = self._nextId(ansaType, entityId)
+
+		entity = Entity(ansaType, entityId, card)
+		self.entities.setdefault(ansaType, collections.OrderedDict())[entityId] = entity
+
+		self.creationCounter += 1
+		self.creationOrder[entity] = self.creationCounter
+
+		if ansaType in ('FACE', 'SHELL', 'BEAM', 'CONNECTOR'):
+			self.visible.add(entity)
+		self.statistics['created'] += 1
+
+		return entity
+
+	#-------------------------------------------------------------------------
+
+	def getEntity(self, ansaType, entityId):
+
+		try:
+			entityId = int(entityId)
+		except (TypeError, ValueError):
+			return None
+
+		return self.entities.get(canonicalType(ansaType), dict()).get(entityId)
+
+	#-------------------------------------------------------------------------
+
+	def getEntities(self, ansaType):
+
+		return list(self.entities.get(canonicalType(ansaType), dict()).values())
+
+	#-------------------------------------------------------------------------
+
+	def deleteEntity(self, entity):
+
+		typeEntities = self.entities.get(entity._ansaType, dict())
+		if typeEntities.get(entity._id) is not entity:
+			return
+
+		del typeEntities[entity._id]
+		self.visible.discard(entity)
+		self.hidden.discard(entity)
+		self.creationOrder.pop(entity, None)
+
+		if entity in self.shellFace:
+			face = self.shellFace.pop(entity)
+			self.faceShells[face].remove(entity)
+		self.geometryChanged()
+
+	#-------------------------------------------------------------------------
+
+	def isAlive(self, entity):
+
+		return self.entities.get(entity._ansaType, dict()).get(entity._id) is entity
+
+	#-------------------------------------------------------------------------
+
+	def geometryChanged(self):
+
+		self.geometryVersion += 1
+		self._cache = dict()
+
+	#-------------------------------------------------------------------------
+
+	def nodeCoords(self, node):
+
+		return np.array([node.card['X'], node.card['Y'], node.card['Z']], dtype=float)
+
+	#-------------------------------------------------------------------------
+
+	def elementNodes(self, element):
+
+		nodes = list()
+		for field in ELEMENT_NODE_FIELDS.get(element._ansaType, ()):
+			node = self.getEntity('NODE', element.card.get(field))
+			if node is not None:
+				nodes.append(node)
+
+		return nodes
+
+	#-------------------------------------------------------------------------
+
+	def elementTriangles(self, element):
+
+		key = ('elementTriangles', element)
+		if key not in self._cache:
+			coords = [self.nodeCoords(node) for node in self.elementNodes(element)]
+			if len(coords) < 3:
+				triangles = np.array(coords, dtype=float).reshape(-1, 2, 3)
+			else:
+				triangles = [[coords[0], coords[1], coords[2]]]
+				if len(coords) == 4:
+					triangles.append([coords[0], coords[2], coords[3]])
+				triangles = np.array(triangles, dtype=float)
+			self._cache[key] = triangles
+
+		return self._cache[key]
+
+	#-------------------------------------------------------------------------
+
+	def faceTriangles(self, face):
+
+		if face in self.faceGeometry:
+			return self.faceGeometry[face]
+
+		key = ('faceTriangles', face)
+		if key not in self._cache:
+			triangles = [self.elementTriangles(shell) for shell in self.faceShells[face]]
+			if len(triangles) > 0:
+				self._cache[key] = np.concatenate(triangles)
+			else:
+				self._cache[key] = np.empty((0, 3, 3))
+
+		return self._cache[key]
+
+	#-------------------------------------------------------------------------
+
+	def entityPoints(self, entity):
+
+		''' Returns (N, 3) array of points defining the entity position. '''
+
+		ansaType = entity._ansaType
+		if ansaType == 'FACE':
+			return self.faceTriangles(entity).reshape(-1, 3)
+		elif ansaType in ELEMENT_TYPES:
+			return np.array([self.nodeCoords(node) for node in self.elementNodes(entity)]).reshape(-1, 3)
+		elif ansaType in ('NODE', 'HOT POINT', 'POINT'):
+			return self.nodeCoords(entity).reshape(-1, 3)
+		elif ansaType == 'CONS':
+			return np.array([self.nodeCoords(hotPoint) for hotPoint in self.conHotPoints[entity]])
+
+		return np.empty((0, 3))
+
+	#-------------------------------------------------------------------------
+
+	def boundingBox(self, entities):
+
+		points = [self.entityPoints(entity) for entity in entities]
+		points = [p for p in points if len(p) > 0]
+		if len(points) == 0:
+			return None
+		points = np.concatenate(points)
+
+		return points.min(axis=0), points.max(axis=0)
+
+	#-------------------------------------------------------------------------
+
+	def entityProperty(self, entity):
+
+		for propertyType in PROPERTY_TYPES:
+			prop = self.getEntity(propertyType, entity.card.get('PID'))
+			if prop is not None:
+				return prop
+
+		return None
+
+# ==============================================================================
+
+def pointTrianglesDistances(point, triangles):
+
+	''' Returns distances of the point to the given (N, 3, 3) triangles. '''
+
+	point = np.asarray(point, dtype=float)
+	a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+
+	ab = b - a
+	ac = c - a
+	normals = np.cross(ab, ac)
+	normalLengths = np.linalg.norm(normals, axis=1)
+	normalLengths[normalLengths == 0] = 1.0
+	normals = normals/normalLengths[:, None]
+
+	# projection to the triangle plane inside the triangle
+	planeDistances = np.einsum('ij,ij->i', point - a, normals)
+	projected = point - planeDistances[:, None]*normals
+
+	def edgeSign(p0, p1):
+		return np.einsum('ij,ij->i', np.cross(p1 - p0, projected - p0), normals)
+
+	inside = (edgeSign(a, b) >= 0) & (edgeSign(b, c) >= 0) & (edgeSign(c, a) >= 0)
+
+	def segmentDistances(p0, p1):
+		segment = p1 - p0
+		lengths = np.einsum('ij,ij->i', segment, segment)
+		lengths[lengths == 0] = 1.0
+		params = np.clip(np.einsum('ij,ij->i', point - p0, segment)/lengths, 0.0, 1.0)
+		return np.linalg.norm(point - (p0 + params[:, None]*segment), axis=1)
+
+	edgeDistances = np.min([segmentDistances(a, b), segmentDistances(b, c), segmentDistances(c, a)], axis=0)
+
+	return np.where(inside, np.abs(planeDistances), edgeDistances)
+
+# ==============================================================================
+
+def rayTrianglesParams(origin, direction, triangles):
+
+	''' Returns signed ray parameters of intersections with given triangles (NaN for misses). '''
+
+	origin = np.asarray(origin, dtype=float)
+	direction = np.asarray(direction, dtype=float)
+
+	v0 = triangles[:, 0]
+	e1 = triangles[:, 1] - v0
+	e2 = triangles[:, 2] - v0
+
+	p = np.cross(direction, e2)
+	determinants = np.einsum('ij,ij->i', e1, p)
+	valid = np.abs(determinants) > 1e-12
+	determinants[~valid] = 1.0
+
+	s = origin - v0
+	u = np.einsum('ij,ij->i', s, p)/determinants
+	q = np.cross(s, e1)
+	v = np.einsum('j,ij->i', direction, q)/determinants
+	t = np.einsum('ij,ij->i', e2, q)/determinants
+
+	hits = valid & (u >= -1e-9) & (v >= -1e-9) & (u + v <= 1 + 1e-9)
+
+	return np.where(hits, t, np.nan)
+
+# ==============================================================================
+
+def loadModel(filePath):
+
+	''' Loads the model file and makes it the current model. '''
+
+	if filePath.endswith('.gz'):
+		with gzip.open(filePath, 'rt') as f:
+			data = json.load(f)
+	else:
+		with open(filePath) as f:
+			data = json.load(f)
+
+	return setModel(buildModel(data))
+
+# ==============================================================================
+
+def saveModel(data, filePath):
+
+	if filePath.endswith('.gz'):
+		with gzip.open(filePath, 'wt') as f:
+			json.dump(data, f)
+	else:
+		with open(filePath, 'w') as f:
+			json.dump(data, f)
+
+# ==============================================================================
+
+def buildModel(data):
+
+	model = Model()
+
+	for nodeId, x, y, z in data.get('nodes', []):
+		model.addEntity('NODE', {'X': x, 'Y': y, 'Z': z}, nodeId)
+
+	for record in data.get('properties', []) + data.get('entities', []):
+		model.addEntity(record['type'], record.get('card'), record['id'])
+
+	def addShell(shellId, pid, nodeIds):
+		card = {'PID': pid}
+		for field, nodeId in zip(ELEMENT_NODE_FIELDS['SHELL'], nodeIds):
+			card[field] = nodeId
+		card['type'] = 'S4' if len(nodeIds) == 4 else 'S3'
+		return model.addEntity('SHELL', card, shellId)
+
+	for record in data.get('faces', []):
+		face = model.addEntity('FACE', {'PID': record['pid']}, record['id'])
+		for shellRecord in record.get('shells', []):
+			shell = addShell(shellRecord[0], record['pid'], shellRecord[1:])
+			model.faceShells[face].append(shell)
+			model.shellFace[shell] = face
+		if 'geometry' in record:
+			model.faceGeometry[face] = np.array(record['geometry'], dtype=float).reshape(-1, 3, 3)
+
+	for shellRecord in data.get('shells', []):
+		addShell(shellRecord[0], shellRecord[1], shellRecord[2:])
+
+	for record in data.get('cons', []):
+		points = np.array(record['points'], dtype=float)
+		con = model.addEntity('CONS', {'Length': float(np.linalg.norm(points[1] - points[0])), 'Num. of Nodes': 0}, record['id'])
+		faces = [model.getEntity('FACE', faceId) for faceId in record['faces']]
+		model.conFaces[con] = faces
+		for face in faces:
+			model.faceCons[face].append(con)
+		model.conHotPoints[con] = [
+			model.addEntity('HOT POINT', {'X': p[0], 'Y': p[1], 'Z': p[2]}) for p in points]
+
+	return model
+
+# ==============================================================================
+
+def setModel(model):
+
+	global CURRENT
+	CURRENT = model
+
+	return model
+
+# ==============================================================================
+
+def getModel():
+
+	global CURRENT
+	if CURRENT is None:
+		CURRENT = Model()
+
+	return CURRENT
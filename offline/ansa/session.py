@@ -0,0 +1,13 @@
+# PYTHON script
+
+BUTTONS = dict()
+
+# ==============================================================================
+
+def defbutton(group, name, doc=''):
+
+	def registerButton(function):
+		BUTTONS[(group, name)] = function
+		return function
+
+	return registerButton
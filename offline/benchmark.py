@@ -0,0 +1,287 @@
+# PYTHON script
+
+'''
+SmartClip benchmark
+===================
+
+Times the SmartClip pipeline on synthetic clip geometries (see :mod:`clip_geometry`) using
+the in-memory ANSA stand-in. All geom types are combined with all beam types and each geometry
+parameter is swept separately while the others keep their default value. Every point of the
+resulting scaling curves is written as a row of the output CSV file.
+
+Usage
+-----
+
+.. code-block:: none
+
+    python benchmark.py [-o benchmark.csv] [-b baseline.csv] [-r 3] [-g Standard] [-t AUDI] [-p mesh_size]
+
+Rows are compared to the baseline file (output of the former release) if given and the points
+slower than the tolerance are reported. API calls of the stages independent of the swept parameter
+(e.g. the clip neighbourhood search of the model size) must not grow along the scaling curve,
+violations are reported as well.
+
+'''
+
+import os
+import sys
+import csv
+import argparse
+import collections
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.insert(0, PATH_SELF)
+
+import ansa
+
+import clip_geometry
+
+batch_items = ansa.ImportCode(os.path.join(PATH_SELF, '..', 'bin', 'domain', 'batch_items.py'))
+
+# ==============================================================================
+
+BENCHMARK_STAGES = ['setBaseFaces', 'setStopDistances', 'createConnector', 'createBeams', 'mirror']
+
+DFT_PARAMETERS = collections.OrderedDict([
+	('mesh_size', 1.0), ('face_size', 1.0), ('face_count', 1), ('clutter', 0), ('far_parts', 0)])
+
+SWEEPS = collections.OrderedDict([
+	('mesh_size', [2.0, 1.0, 0.5]),
+	('face_size', [0.5, 1.0, 1.5, 2.0]),
+	('face_count', [1, 2, 4, 8]),
+	('clutter', [0, 20, 100]),
+	('far_parts', [0, 10, 40])])
+
+KEY_FIELDS = ['geom_type', 'beam_type', 'parameter', 'value']
+CALL_FIELDS = ['%s_calls' % stageName for stageName in BENCHMARK_STAGES]
+RESULT_FIELDS = KEY_FIELDS + ['elements', 'faces', 'status'] + BENCHMARK_STAGES + ['total', 'api_calls'] + CALL_FIELDS
+
+# {parameter: stages which API calls must not grow with the parameter}
+CONSTANT_CALL_STAGES = {
+	'far_parts': ['setBaseFaces']}
+
+REGRESSION_TOLERANCE = 1.25
+# differences of very short stages are just noise
+REGRESSION_MIN_TIME = 0.01
+
+# ==============================================================================
+
+class BenchmarkCase(object):
+
+	''' One point of a scaling curve - clip of the given geom and beam type built with the given parameters. '''
+
+	def __init__(self, geomType, beamType, parameter, value):
+
+		self.geomType = geomType
+		self.beamType = beamType
+		self.parameter = parameter
+		self.value = value
+
+	#-------------------------------------------------------------------------
+
+	def geometry(self):
+
+		parameters = dict(DFT_PARAMETERS)
+		parameters[self.parameter] = self.value
+
+		return clip_geometry.CLIP_GEOMETRIES[self.geomType](
+			meshSize=parameters['mesh_size'], faceSize=parameters['face_size'],
+			faceCount=parameters['face_count'], clutter=parameters['clutter'], farParts=parameters['far_parts'])
+
+	#-------------------------------------------------------------------------
+
+	def run(self, repeat=1):
+
+		''' Returns the fastest of the repeated runs, each on a fresh model. '''
+
+		data, job = self.geometry().build()
+		job['beam_type'] = self.beamType
+
+		result = None
+		for i in range(repeat):
+			ansa.model.setModel(ansa.model.buildModel(data))
+			# each repeat runs on a new model and computes the stop distances again
+			clipBatch = batch_items.ClipBatch([batch_items.ClipJob.fromRow(job)], keepSpatialIndex=False,
+				reuseStopDistances=False)
+			status = clipBatch.run()[0]
+
+			currentResult = self._getResult(data, status, clipBatch.profiles)
+			if result is None or currentResult['total'] < result['total']:
+				result = currentResult
+
+		return result
+
+	#-------------------------------------------------------------------------
+
+	def _getResult(self, data, status, profiles):
+
+		result = {'geom_type': self.geomType, 'beam_type': self.beamType, 'parameter': self.parameter,
+			'value': self.value, 'status': status['status'],
+			'elements': len(data['shells']) + sum(len(face['shells']) for face in data['faces']),
+			'faces': len(data['faces'])}
+
+		# clip profile and profile of the batch mirror
+		profiles = [profile.toDict() for profile in profiles]
+		for stageName in BENCHMARK_STAGES:
+			result[stageName] = sum(profile['stages'].get(stageName, {'totalTime': 0.0})['totalTime'] for profile in profiles)
+		result['total'] = round(sum(result[stageName] for stageName in BENCHMARK_STAGES), 4)
+		result['api_calls'] = sum(profile['calls'] for profile in profiles)
+		for stageName in BENCHMARK_STAGES:
+			result['%s_calls' % stageName] = sum(profile['stages'].get(stageName, {'totalCalls': 0})['totalCalls']
+				for profile in profiles)
+
+		return result
+
+# ==============================================================================
+
+def getCases(geomTypes=None, beamTypes=None, parameters=None):
+
+	geomTypes = list(clip_geometry.CLIP_GEOMETRIES) if not geomTypes else geomTypes
+	beamTypes = list(batch_items.comp_items.CLIP_BEAM_TYPES) if not beamTypes else beamTypes
+	parameters = list(SWEEPS) if not parameters else parameters
+
+	cases = list()
+	for geomType in geomTypes:
+		for beamType in beamTypes:
+			for parameter in parameters:
+				for value in SWEEPS[parameter]:
+					cases.append(BenchmarkCase(geomType, beamType, parameter, value))
+
+	return cases
+
+# ==============================================================================
+
+def runBenchmark(cases, repeat=1):
+
+	results = list()
+	for index, case in enumerate(cases):
+		result = case.run(repeat)
+		print('%4s/%s %-10s %-16s %-10s %8s: %8.3fs %s' % (index + 1, len(cases), case.geomType, case.beamType,
+			case.parameter, case.value, result['total'], result['status']))
+		results.append(result)
+
+	return results
+
+# ==============================================================================
+
+def writeResults(results, fileName):
+
+	with open(fileName, 'w') as resultFile:
+		writer = csv.DictWriter(resultFile, fieldnames=RESULT_FIELDS, extrasaction='ignore', lineterminator='\n')
+		writer.writeheader()
+		for result in results:
+			writer.writerow(result)
+
+# ==============================================================================
+
+def readResults(fileName):
+
+	with open(fileName) as resultFile:
+		return list(csv.DictReader(resultFile))
+
+# ==============================================================================
+
+def _getKey(result):
+
+	return tuple(str(result[field]) for field in KEY_FIELDS)
+
+# ==============================================================================
+
+def findRegressions(results, baselineResults, tolerance=REGRESSION_TOLERANCE):
+
+	''' Returns (result, stage name, baseline time) of all stages slower than the baseline. '''
+
+	baseline = dict((_getKey(result), result) for result in baselineResults)
+
+	regressions = list()
+	for result in results:
+		baselineResult = baseline.get(_getKey(result))
+		if baselineResult is None:
+			continue
+		for stageName in BENCHMARK_STAGES + ['total']:
+			baselineTime = float(baselineResult[stageName])
+			if result[stageName] > max(baselineTime*tolerance, REGRESSION_MIN_TIME):
+				regressions.append((result, stageName, baselineTime))
+
+	return regressions
+
+# ==============================================================================
+
+def findScalingViolations(results):
+
+	''' Returns (result, stage name, calls of the first point) of all points of the scaling curves
+	calling the API more times than the first point in the stages independent of the swept parameter. '''
+
+	firstResults = dict()
+	violations = list()
+	for result in results:
+		if result['parameter'] not in CONSTANT_CALL_STAGES:
+			continue
+		curveKey = (result['geom_type'], result['beam_type'], result['parameter'])
+		firstResult = firstResults.setdefault(curveKey, result)
+		for stageName in CONSTANT_CALL_STAGES[result['parameter']]:
+			callsField = '%s_calls' % stageName
+			if int(result[callsField]) > int(firstResult[callsField]):
+				violations.append((result, stageName, int(firstResult[callsField])))
+
+	return violations
+
+# ==============================================================================
+
+def printScalingCurves(results):
+
+	''' Prints total time of each geom/beam type combination along all swept parameters. '''
+
+	curves = collections.OrderedDict()
+	for result in results:
+		curves.setdefault(result['parameter'], collections.OrderedDict()).setdefault(
+			(result['geom_type'], result['beam_type']), list()).append(result)
+
+	for parameter, parameterCurves in curves.items():
+		print('\nScaling with %s: %s' % (parameter, ', '.join(str(value) for value in SWEEPS[parameter])))
+		for (geomType, beamType), curve in parameterCurves.items():
+			print('    %-10s %-16s %s' % (geomType, beamType, ' '.join('%8.3f' % result['total'] for result in curve)))
+
+# ==============================================================================
+
+def main(arguments=None):
+
+	parser = argparse.ArgumentParser(description='SmartClip pipeline benchmark on synthetic clip geometries.')
+	parser.add_argument('-o', '--output', default='benchmark.csv', help='output CSV file')
+	parser.add_argument('-b', '--baseline', help='CSV file of the former benchmark run to compare with')
+	parser.add_argument('-r', '--repeat', type=int, default=1, help='number of runs of each case, the fastest is taken')
+	parser.add_argument('-g', '--geom-type', action='append', choices=list(clip_geometry.CLIP_GEOMETRIES))
+	parser.add_argument('-t', '--beam-type', action='append', choices=list(batch_items.comp_items.CLIP_BEAM_TYPES))
+	parser.add_argument('-p', '--parameter', action='append', choices=list(SWEEPS))
+	options = parser.parse_args(arguments)
+
+	results = runBenchmark(getCases(options.geom_type, options.beam_type, options.parameter), options.repeat)
+	writeResults(results, options.output)
+	printScalingCurves(results)
+
+	failedResults = [result for result in results if result['status'] != batch_items.STATUS_OK]
+	if len(failedResults) > 0:
+		print('\n%s cases failed!' % len(failedResults))
+
+	violations = findScalingViolations(results)
+	if len(violations) > 0:
+		print('\n%s points call the API more with the swept parameter' % len(violations))
+		for result, stageName, firstCalls in violations:
+			print('    %-10s %-16s %s=%s %-16s %6s -> %6s calls' % (result['geom_type'], result['beam_type'],
+				result['parameter'], result['value'], stageName, firstCalls, result['%s_calls' % stageName]))
+
+	if options.baseline is not None:
+		regressions = findRegressions(results, readResults(options.baseline))
+		print('\n%s regressions found compared to %s' % (len(regressions), options.baseline))
+		for result, stageName, baselineTime in regressions:
+			print('    %-10s %-16s %s=%s %-16s %8.3fs -> %8.3fs' % (result['geom_type'], result['beam_type'],
+				result['parameter'], result['value'], stageName, baselineTime, result[stageName]))
+
+	return results
+
+# ==============================================================================
+
+if __name__ == '__main__':
+
+	main()
@@ -0,0 +1,371 @@
+# PYTHON script
+
+'''
+Synthetic clip geometry
+=======================
+
+Procedurally generated clip models for the in-memory ANSA stand-in (see :mod:`ansa.model`).
+
+The clip is a box (PSHELL 1) guided by the CON between its top (large) and front (small) face,
+reversed clips are guided by the bottom edge. The box is enclosed by the contra part (PSHELL 2) -
+six walls facing the clip in the given gaps. FE-only parts (PSHELL 11, 12) are the parts the clip
+beams are connected to.
+
+Parameters:
+
+* mesh_size - element size of all parts
+* face_size - scale of the clip box (10 x 8 x 4 for the face size 1.0), the clip faces
+  must stay within the neighbourhood search radius of the clip large face
+* face_count - contra part walls are split into face_count x face_count faces
+* clutter - number of additional contra part faces and FE plates placed behind the walls
+* far_parts - number of additional parts far out of the clip neighbourhood (the model size)
+
+'''
+
+import collections
+
+import numpy as np
+
+# ==============================================================================
+
+CLIP_PID = 1
+CONTRA_PID = 2
+FE_PIDS = [11, 12]
+CLUTTER_PID = 21
+FAR_PID = 31
+
+CLIP_DIMENSIONS = np.array([10.0, 8.0, 4.0])
+CONTRA_SIZE = 30.0
+FAR_DISTANCE = 100.0
+
+# clip side beam nodes are searched 4 mm around the origin, contra side 3 mm above it
+FE_CS_HALF_LENGTH = 5.0
+FE_CCS_OFFSET = 3.0
+
+# xLow, xUp, yLow, yUp, zLow, zUp
+DFT_GAPS = (1.0, 1.5, 2.0, 2.5, 0.5, 0.8)
+
+CLIP_GEOMETRIES = collections.OrderedDict()
+
+# ==============================================================================
+
+def registerGeometry(builder):
+
+	CLIP_GEOMETRIES[builder.NAME] = builder
+
+	return builder
+
+# ==============================================================================
+
+class ModelBuilder(object):
+
+	''' Collects nodes, faces and shells in the model file format. '''
+
+	def __init__(self):
+
+		self.nodes = list()
+		self.faces = list()
+		self.shells = list()
+		self.cons = list()
+		self.properties = list()
+		self.entities = list()
+
+	#-------------------------------------------------------------------------
+
+	def addNode(self, coords):
+
+		nodeId = len(self.nodes) + 1
+		self.nodes.append([nodeId] + [float(value) for value in coords])
+
+		return nodeId
+
+	#-------------------------------------------------------------------------
+
+	def addPlate(self, origin, uVector, vVector, meshSize, pid, faceCount=1):
+
+		''' Adds plate spanned by the uVector and vVector (normal = uVector x vVector) meshed by quads.
+
+		The plate is split into faceCount x faceCount faces, FE-only shells are created for faceCount 0.
+		Returns ids of the created faces. '''
+
+		origin, uVector, vVector = [np.array(vector, dtype=float) for vector in (origin, uVector, vVector)]
+		patchCount = max(faceCount, 1)
+		uDivisions = _getDivisions(np.linalg.norm(uVector)/patchCount, meshSize)
+		vDivisions = _getDivisions(np.linalg.norm(vVector)/patchCount, meshSize)
+
+		faceIds = list()
+		for i in range(patchCount):
+			for j in range(patchCount):
+				patchOrigin = origin + uVector*i/patchCount + vVector*j/patchCount
+				quads = self._meshPatch(patchOrigin, uVector/patchCount, vVector/patchCount, uDivisions, vDivisions)
+				if faceCount == 0:
+					self.shells.extend([[quad[0], pid] + quad[1:] for quad in quads])
+					continue
+
+				faceId = len(self.faces) + 1
+				self.faces.append({'id': faceId, 'pid': pid, 'shells': quads})
+				faceIds.append(faceId)
+
+		return faceIds
+
+	#-------------------------------------------------------------------------
+
+	def _meshPatch(self, origin, uVector, vVector, uDivisions, vDivisions):
+
+		nodeIds = [[self.addNode(origin + uVector*i/uDivisions + vVector*j/vDivisions)
+			for j in range(vDivisions + 1)] for i in range(uDivisions + 1)]
+
+		quads = list()
+		for i in range(uDivisions):
+			for j in range(vDivisions):
+				shellId = self._nextShellId() + len(quads)
+				quads.append([shellId, nodeIds[i][j], nodeIds[i + 1][j], nodeIds[i + 1][j + 1], nodeIds[i][j + 1]])
+
+		return quads
+
+	#-------------------------------------------------------------------------
+
+	def _nextShellId(self):
+
+		return len(self.shells) + sum(len(face['shells']) for face in self.faces) + 1
+
+	#-------------------------------------------------------------------------
+
+	def addCon(self, faceIds, points):
+
+		conId = len(self.cons) + 1
+		self.cons.append({'id': conId, 'faces': list(faceIds), 'points': [list(map(float, point)) for point in points]})
+
+		return conId
+
+	#-------------------------------------------------------------------------
+
+	def addProperty(self, pid, name):
+
+		self.properties.append({'type': 'SHELL_SECTION', 'id': pid, 'card': {'Name': name, 'MID': 1}})
+
+	#-------------------------------------------------------------------------
+
+	def toData(self):
+
+		return {'nodes': self.nodes, 'faces': self.faces, 'shells': self.shells, 'cons': self.cons,
+			'properties': self.properties,
+			'entities': self.entities + [{'type': 'MATERIAL', 'id': 1, 'card': {'Name': 'steel'}}]}
+
+# ==============================================================================
+
+class ClipGeometry(object):
+
+	''' Standard clip - outward oriented clip box. '''
+
+	NAME = 'Standard'
+	# guiding CON large and small face
+	CON_FACES = ('top', 'front')
+
+	def __init__(self, meshSize=1.0, faceSize=1.0, faceCount=1, clutter=0, farParts=0, gaps=DFT_GAPS, seed=0):
+
+		self.meshSize = meshSize
+		self.faceSize = faceSize
+		self.faceCount = faceCount
+		self.clutter = clutter
+		self.farParts = farParts
+		self.gaps = gaps
+		self.seed = seed
+
+	#-------------------------------------------------------------------------
+
+	def build(self):
+
+		''' Returns the model data and the batch job of the clip. '''
+
+		builder = ModelBuilder()
+		for pid, name in [(CLIP_PID, 'clip'), (CONTRA_PID, 'contra')] + [(pid, 'part_%s' % pid) for pid in FE_PIDS]:
+			builder.addProperty(pid, name)
+
+		faces = self._addClip(builder)
+		self._addContraPart(builder)
+		self._addFeParts(builder)
+		if self.clutter > 0:
+			builder.addProperty(CLUTTER_PID, 'clutter')
+			self._addClutter(builder)
+		if self.farParts > 0:
+			builder.addProperty(FAR_PID, 'far')
+			self._addFarParts(builder)
+
+		length, width, height = self.dimensions()
+		conHeight = height/2 if self.CON_FACES[0] == 'top' else -height/2
+		conId = builder.addCon([faces[name] for name in self.CON_FACES],
+			[[-length/2, width/2, conHeight], [length/2, width/2, conHeight]])
+
+		return builder.toData(), self.getJob(conId, faces)
+
+	#-------------------------------------------------------------------------
+
+	def dimensions(self):
+
+		return CLIP_DIMENSIONS*self.faceSize
+
+	#-------------------------------------------------------------------------
+
+	def centerHeight(self):
+
+		''' Returns z coordinate of the clip coordinate system origin. '''
+
+		return 0.0
+
+	#-------------------------------------------------------------------------
+
+	def getJob(self, conId, faces):
+
+		return {'con_id': conId, 'geom_type': self.NAME}
+
+	#-------------------------------------------------------------------------
+
+	def _clipSides(self):
+
+		''' Returns origin, u and v vector of all clip box sides with outward normals. '''
+
+		length, width, height = self.dimensions()
+		x0, y0, z0 = -length/2, -width/2, -height/2
+
+		return collections.OrderedDict([
+			('top', ([x0, y0, -z0], [length, 0, 0], [0, width, 0])),
+			('bottom', ([x0, y0, z0], [0, width, 0], [length, 0, 0])),
+			('front', ([x0, -y0, z0], [0, 0, height], [length, 0, 0])),
+			('back', ([x0, y0, z0], [length, 0, 0], [0, 0, height])),
+			('right', ([-x0, y0, z0], [0, width, 0], [0, 0, height])),
+			('left', ([x0, y0, z0], [0, 0, height], [0, width, 0]))])
+
+	#-------------------------------------------------------------------------
+
+	def _addClip(self, builder):
+
+		faces = dict()
+		for name, (origin, uVector, vVector) in self._clipSides().items():
+			faces[name] = builder.addPlate(origin, uVector, vVector, self.meshSize, CLIP_PID)[0]
+
+		return faces
+
+	#-------------------------------------------------------------------------
+
+	def _contraWalls(self):
+
+		''' Returns origin, u and v vector of all contra part walls with normals facing the clip. '''
+
+		length, width, height = self.dimensions()
+		xLow, xUp, yLow, yUp, zLow, zUp = self.gaps
+		size = CONTRA_SIZE*self.faceSize
+		half = size/2
+
+		return [
+			([-half, -half, -height/2 - zUp], [size, 0, 0], [0, size, 0]),
+			([-half, -half, height/2 + zLow], [0, size, 0], [size, 0, 0]),
+			([length/2 + xLow, -half, -half], [0, 0, size], [0, size, 0]),
+			([-length/2 - xUp, -half, -half], [0, size, 0], [0, 0, size]),
+			([-half, width/2 + yUp, -half], [size, 0, 0], [0, 0, size]),
+			([-half, -width/2 - yLow, -half], [0, 0, size], [size, 0, 0])]
+
+	#-------------------------------------------------------------------------
+
+	def _addContraPart(self, builder):
+
+		for origin, uVector, vVector in self._contraWalls():
+			builder.addPlate(origin, uVector, vVector, self.meshSize, CONTRA_PID, self.faceCount)
+
+	#-------------------------------------------------------------------------
+
+	def _addFeParts(self, builder):
+
+		''' Clip side part in the clip coordinate system origin plane and the contra side part
+		above it, placed where the nearest element search of the beam types looks for them. '''
+
+		length, width, height = self.dimensions()
+		centerHeight = self.centerHeight()
+		csLength = max(length, 2*FE_CS_HALF_LENGTH)
+		builder.addPlate([-csLength/2, -width/2, centerHeight], [csLength, 0, 0], [0, width, 0],
+			self.meshSize, FE_PIDS[0], 0)
+		builder.addPlate([-0.8*length, -width/4, centerHeight + FE_CCS_OFFSET], [1.6*length, 0, 0], [0, 1.5*width, 0],
+			self.meshSize, FE_PIDS[1], 0)
+
+	#-------------------------------------------------------------------------
+
+	def _addClutter(self, builder):
+
+		''' Small plates behind the contra part walls - in the clip neighbourhood, but never hit. '''
+
+		random = np.random.RandomState(self.seed)
+		walls = self._contraWalls()
+		plateSize = 2.0*self.faceSize
+		for index in range(self.clutter):
+			origin, uVector, vVector = [np.array(vector, dtype=float) for vector in walls[index % len(walls)]]
+			normal = np.cross(uVector, vVector)
+			normal /= np.linalg.norm(normal)
+			u, v = random.uniform(0.1, 0.9, 2)
+			plateOrigin = origin + u*uVector + v*vVector - random.uniform(0.2, 2.0)*normal
+			plateU = plateSize*uVector/np.linalg.norm(uVector)
+			plateV = plateSize*vVector/np.linalg.norm(vVector)
+			builder.addPlate(plateOrigin, plateU, plateV, self.meshSize, CLUTTER_PID, index % 2)
+
+	#-------------------------------------------------------------------------
+
+	def _addFarParts(self, builder):
+
+		''' Plates of the contra part size in a row far from the clip - FE plates and faces in turns. '''
+
+		size = CONTRA_SIZE*self.faceSize
+		for index in range(self.farParts):
+			origin = [(index + 1)*(FAR_DISTANCE + size), -size/2, 0.0]
+			builder.addPlate(origin, [size, 0, 0], [0, size, 0], self.meshSize, FAR_PID, index % 2)
+
+# ==============================================================================
+
+@registerGeometry
+class StandardClipGeometry(ClipGeometry):
+
+	NAME = 'Standard'
+
+# ==============================================================================
+
+@registerGeometry
+class ReversedClipGeometry(ClipGeometry):
+
+	''' Reversed clip - guided by the bottom edge, the clip body is above the CON. '''
+
+	NAME = 'Reversed'
+	CON_FACES = ('bottom', 'front')
+
+	def centerHeight(self):
+
+		return -self.dimensions()[2]/2 + 1.0
+
+# ==============================================================================
+
+@registerGeometry
+class LockClipGeometry(ReversedClipGeometry):
+
+	NAME = 'Lock'
+
+# ==============================================================================
+
+@registerGeometry
+class FlatClipGeometry(ClipGeometry):
+
+	''' Flat clip - the front face is the guiding top face. '''
+
+	NAME = 'Flat'
+
+	def centerHeight(self):
+
+		return self.dimensions()[2]/2 - 1.0
+
+	#-------------------------------------------------------------------------
+
+	def getJob(self, conId, faces):
+
+		return {'con_id': conId, 'geom_type': self.NAME, 'top_face': faces['front']}
+
+# ==============================================================================
+
+def _getDivisions(length, meshSize):
+
+	return max(1, int(round(length/meshSize)))
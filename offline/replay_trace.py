@@ -0,0 +1,103 @@
+# PYTHON script
+
+'''
+SmartClip API trace replay
+==========================
+
+Re-executes the SmartClip pipeline against an ANSA API trace recorded in an interactive session
+(ANSA started with the *SMARTCLIP_TRACE_DIR* environment variable set). No model is needed,
+all API calls are answered by the trace.
+
+Usage
+-----
+
+.. code-block:: none
+
+    python replay_trace.py smartClip_20260101_120000.trace.json.gz [budget.json] [--lenient]
+
+Replay fails (exit status 1) on the first API call not found in the trace - the pipeline diverged
+from the recorded session. Lenient replay answers such calls by the next unused call of the same
+function and just counts them as mismatched.
+
+Budget file limits the number of API calls of the clip: {"total": 2000, "GetEntityCardValues": 1500}.
+The exit status is 1 if any limit is exceeded.
+
+'''
+
+import os
+import sys
+import json
+import argparse
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.insert(0, PATH_SELF)
+
+import ansa
+
+batch_items = ansa.ImportCode(os.path.join(PATH_SELF, '..', 'bin', 'domain', 'batch_items.py'))
+api_trace = ansa.ImportCode(os.path.join(PATH_SELF, '..', 'bin', 'domain', 'api_trace.py'))
+
+# ==============================================================================
+
+def replayTrace(trace, lenient=False):
+
+	''' Runs the SmartClip pipeline against the trace. Returns the clip profile. '''
+
+	player = api_trace.TracePlayer(trace, lenient)
+	player.install()
+
+	batch_items.comp_items.invalidateModelCaches()
+	smartClip = batch_items.comp_items.SmartClip(trace['geom_type'], trace['beam_type'])
+	# traces of older versions were recorded with the default backend
+	smartClip.setProjectionBackend(trace.get('projection', smartClip.PROJECTION_BACKEND))
+	smartClip.profile.name = os.path.basename(trace.get('name', ''))
+	smartClip.interactive = trace['interactive']
+	smartClip.visualize = trace['visualize']
+	try:
+		batch_items.createClip(smartClip, trace['mirror'])
+		smartClip._restoreF11drawingSettings()
+	finally:
+		smartClip.profile.deactivate()
+
+	player.printStatistics()
+
+	return smartClip.profile
+
+# ==============================================================================
+
+def main(traceFilePath, budgetFilePath=None, lenient=False):
+
+	trace = api_trace.loadTrace(traceFilePath)
+	trace['name'] = traceFilePath
+
+	try:
+		profile = replayTrace(trace, lenient)
+	except api_trace.ApiTraceException as e:
+		print('API trace replay failed: %s' % e)
+		return 1
+	profile.printReport()
+
+	if budgetFilePath is None:
+		return 0
+
+	with open(budgetFilePath) as budgetFile:
+		budget = json.load(budgetFile)
+
+	exceededBudget = profile.exceededBudget(budget)
+	for functionName, calls, limit in exceededBudget:
+		print('API call budget exceeded: %s %s calls (limit %s)' % (functionName, calls, limit))
+
+	return 1 if len(exceededBudget) > 0 else 0
+
+# ==============================================================================
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Replays the SmartClip pipeline against a recorded ANSA API trace.')
+	parser.add_argument('trace', help='recorded trace file')
+	parser.add_argument('budget', nargs='?', help='JSON file of API call limits')
+	parser.add_argument('--lenient', action='store_true', help='answer calls not found in the trace by other calls of the same function')
+	options = parser.parse_args()
+
+	sys.exit(main(options.trace, options.budget, options.lenient))
@@ -0,0 +1,45 @@
+# PYTHON script
+
+'''
+Offline SmartClip batch
+=======================
+
+Runs SmartClip batch mode (see :mod:`batch`) on a model file using the in-memory ANSA stand-in.
+
+Usage
+-----
+
+.. code-block:: none
+
+    python run_batch.py model.json clips.json [clips_report.csv] [clips_profile.json]
+
+'''
+
+import os
+import sys
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.insert(0, PATH_SELF)
+
+import ansa
+
+# ==============================================================================
+
+def main(modelFilePath, jobFilePath, reportFilePath=None, profileFilePath=None):
+
+	ansa.model.loadModel(modelFilePath)
+
+	batch = ansa.ImportCode(os.path.join(PATH_SELF, '..', 'bin', 'batch.py'))
+
+	return batch.main(jobFilePath, reportFilePath, profileFilePath)
+
+# ==============================================================================
+
+if __name__ == '__main__':
+
+	if len(sys.argv) < 3:
+		print(__doc__)
+		sys.exit(1)
+
+	main(*sys.argv[1:5])
@@ -0,0 +1,190 @@
+# PYTHON script
+
+'''
+SmartClip tests
+===============
+
+Tests run on top of the in-memory ANSA stand-in (see *offline/ansa*) and the synthetic clip
+geometries (see *offline/clip_geometry.py*)::
+
+	python -m pytest -q tests
+
+Domain modules are loaded by ansa.ImportCode as in ANSA, so they are shared by all tests.
+Session caches are dropped before each test.
+'''
+
+import os
+import sys
+import copy
+
+import pytest
+
+PATH_SELF = os.path.dirname(os.path.realpath(__file__))
+PATH_ROOT = os.path.dirname(PATH_SELF)
+PATH_DOMAIN = os.path.join(PATH_ROOT, 'bin', 'domain')
+
+sys.path.insert(0, os.path.join(PATH_ROOT, 'offline'))
+
+import ansa
+from ansa import base
+
+import clip_geometry
+
+batch_items = ansa.ImportCode(os.path.join(PATH_DOMAIN, 'batch_items.py'))
+comp_items = batch_items.comp_items
+
+# ==============================================================================
+
+class Modules(object):
+
+	''' Domain modules as loaded by ansa.ImportCode. '''
+
+	batch_items = batch_items
+	comp_items = comp_items
+	clip_detection = batch_items.clip_detection
+	model_data = comp_items.model_data
+	projection = comp_items.projection
+	redraw = comp_items.redraw
+	spatial = comp_items.spatial
+	stop_distance_cache = comp_items.stop_distance_cache
+
+# ==============================================================================
+
+def loadModel(data):
+
+	''' Loads the model and drops data cached for the previous one. '''
+
+	model = ansa.model.buildModel(data)
+	ansa.model.setModel(model)
+	comp_items.invalidateModelCaches()
+
+	return model
+
+# ==============================================================================
+
+def shiftedModelData(data, offset):
+
+	''' Returns a copy of the model data moved by the offset, entity ids follow the original ones. '''
+
+	nodeOffset = max(node[0] for node in data['nodes'])
+	faceOffset = max(face['id'] for face in data['faces'])
+	shellOffset = max([shell[0] for shell in data['shells']] +
+		[shell[0] for face in data['faces'] for shell in face['shells']])
+	conOffset = max(con['id'] for con in data['cons'])
+
+	shifted = copy.deepcopy(data)
+	for node in shifted['nodes']:
+		node[0] += nodeOffset
+		node[1:] = [coord + offsetCoord for coord, offsetCoord in zip(node[1:], offset)]
+	for face in shifted['faces']:
+		face['id'] += faceOffset
+		face['shells'] = [[shell[0] + shellOffset] + [nodeId + nodeOffset for nodeId in shell[1:]] for shell in face['shells']]
+	shifted['shells'] = [[shell[0] + shellOffset, shell[1]] + [nodeId + nodeOffset for nodeId in shell[2:]]
+		for shell in shifted['shells']]
+	for con in shifted['cons']:
+		con['id'] += conOffset
+		con['faces'] = [faceId + faceOffset for faceId in con['faces']]
+		con['points'] = [[coord + offsetCoord for coord, offsetCoord in zip(point, offset)] for point in con['points']]
+
+	return shifted, conOffset
+
+# ==============================================================================
+
+@pytest.fixture
+def modules():
+
+	return Modules
+
+# ==============================================================================
+
+@pytest.fixture(autouse=True)
+def cleanSession():
+
+	''' Each test starts with empty session caches and the default projection backend. '''
+
+	comp_items.invalidateModelCaches()
+	projectionBackend = comp_items.SmartClip.PROJECTION_BACKEND
+	base.setPickResponder(None)
+
+	yield
+
+	comp_items.SmartClip.PROJECTION_BACKEND = projectionBackend
+	base.setPickResponder(None)
+	comp_items.invalidateModelCaches()
+
+# ==============================================================================
+
+class ClipModelFactory(object):
+
+	''' Loads the synthetic clip models, all of them are built by the same geometry parameters.
+	Copies of the clip are placed side by side, each copy has its own batch job row. '''
+
+	COPY_OFFSET = (200.0, 0.0, 0.0)
+
+	#-------------------------------------------------------------------------
+
+	def data(self, geomTypeName='Standard', copies=1, offset=COPY_OFFSET, **parameters):
+
+		''' Returns the model data and the batch job rows of the clip copies. '''
+
+		data, job = clip_geometry.CLIP_GEOMETRIES[geomTypeName](**parameters).build()
+
+		merged = dict(data)
+		jobs = [job]
+		# each copy is shifted from the previous one, its ids follow those of the previous one
+		for copyIndex in range(1, copies):
+			data, conOffset = shiftedModelData(data, offset)
+			for name in ('nodes', 'faces', 'shells', 'cons'):
+				merged[name] = merged[name] + data[name]
+			job = dict(job)
+			job['con_id'] += conOffset
+			jobs.append(job)
+
+		return merged, jobs
+
+	#-------------------------------------------------------------------------
+
+	def load(self, geomTypeName='Standard', **parameters):
+
+		''' Loads the clip model, returns the model and the batch job row. '''
+
+		data, jobs = self.data(geomTypeName, **parameters)
+
+		return loadModel(data), jobs[0]
+
+	#-------------------------------------------------------------------------
+
+	def loadCopies(self, geomTypeName='Standard', copies=2, **parameters):
+
+		''' Loads copies of the clip model, returns the model and the batch job rows of all copies. '''
+
+		data, jobs = self.data(geomTypeName, copies, **parameters)
+
+		return loadModel(data), jobs
+
+	#-------------------------------------------------------------------------
+
+	def geomType(self, geomTypeName='Standard', backendName=None, **parameters):
+
+		''' Loads the clip model and creates its clip up to the base faces. '''
+
+		model, job = self.load(geomTypeName, **parameters)
+		if backendName is not None:
+			comp_items.SmartClip.PROJECTION_BACKEND = backendName
+
+		smartClip = comp_items.SmartClip(job['geom_type'], 'AUDI')
+		smartClip.interactive = False
+		smartClip.visualize = False
+
+		geomType = smartClip.geomType()
+		geomType.guidingCon = base.GetEntity(0, 'CONS', job['con_id'])
+		geomType.setBaseFaces()
+
+		return geomType
+
+# ==============================================================================
+
+@pytest.fixture
+def clipModel():
+
+	return ClipModelFactory()
@@ -0,0 +1,123 @@
+# PYTHON script
+
+'''
+Headless batch - clip job reports and the rollback of failed clips.
+'''
+
+import collections
+
+import ansa
+from ansa import base, constants
+
+from conftest import Modules
+
+batch_items = Modules.batch_items
+comp_items = Modules.comp_items
+
+# ==============================================================================
+
+def entityCounts():
+
+	model = ansa.model.getModel()
+
+	return collections.Counter(dict((ansaType, len(model.getEntities(ansaType))) for ansaType in batch_items.CLIP_ENTITY_TYPES))
+
+# ==============================================================================
+
+def clipJobs(jobs, **values):
+
+	return [batch_items.ClipJob.fromRow(dict(job, beam_type='AUDI', **values)) for job in jobs]
+
+# ==============================================================================
+
+def testFailedBatchMirrorFallsBackToSingleClips(clipModel, monkeypatch):
+
+	''' Only the clip failing on its own is rolled back, the other clips are mirrored one by one. '''
+
+	model, jobs = clipModel.loadCopies('Standard', copies=3)
+	failingConId = jobs[1]['con_id']
+
+	mirror = comp_items.SymmetricalClipBatch.mirror
+	batchSizes = list()
+	def failingMirror(self):
+		batchSizes.append(len(self.smartClips))
+		mirror(self)
+		if failingConId in [smartClip.geomType().guidingCon._id for smartClip in self.smartClips]:
+			raise RuntimeError('Mirror failed')
+	monkeypatch.setattr(comp_items.SymmetricalClipBatch, 'mirror', failingMirror)
+
+	before = entityCounts()
+	reports = batch_items.ClipBatch(clipJobs(jobs, mirror=True)).run()
+
+	assert batchSizes == [3, 1, 1, 1]
+	assert [report['status'] for report in reports] == ['OK', 'FAILED', 'OK']
+	assert reports[1]['message'] == 'Mirror failed: Mirror failed'
+
+	# both remaining clips and their mirrored copies
+	created = entityCounts() - before
+	assert created['CONNECTOR'] == 4
+	assert created['BEAM'] % 4 == 0
+
+	# the same clips created without mirror have half of the entities
+	comp_items.invalidateModelCaches()
+	model, jobs = clipModel.loadCopies('Standard', copies=2)
+	before = entityCounts()
+	batch_items.ClipBatch(clipJobs(jobs, mirror=False)).run()
+	assert 2*(entityCounts() - before)['BEAM'] == created['BEAM']
+
+# ==============================================================================
+
+def testSharedDefinitionsKeptOnRollback(clipModel, monkeypatch):
+
+	''' Definitions created by the failed clip and reused by other clips are kept, definitions
+	used by the failed clip only are deleted. '''
+
+	model, jobs = clipModel.loadCopies('Standard', copies=2)
+	failingConId = jobs[0]['con_id']
+
+	mirrorClips = comp_items.SymmetricalClipBatch.mirrorClips
+	def failingMirrorClips(self):
+		if failingConId in [smartClip.geomType().guidingCon._id for smartClip in self.smartClips]:
+			raise RuntimeError('Mirror failed')
+		mirrorClips(self)
+	monkeypatch.setattr(comp_items.SymmetricalClipBatch, 'mirrorClips', failingMirrorClips)
+
+	before = entityCounts()
+	reports = batch_items.ClipBatch(clipJobs(jobs, mirror=True)).run()
+	assert [report['status'] for report in reports] == ['FAILED', 'OK']
+
+	# definitions of the first clip reused by the second one
+	registry = comp_items.property_registry.PROPERTY_REGISTRY
+	assert registry.statistics['reused'] > 0
+	assert all(model.isAlive(entity) for entity in registry.definitions)
+	created = entityCounts() - before
+	assert created['CONNECTOR'] == 2
+
+	# nothing is left by the failed clip alone
+	comp_items.invalidateModelCaches()
+	model, jobs = clipModel.loadCopies('Standard', copies=2)
+	before = entityCounts()
+	reports = batch_items.ClipBatch(clipJobs(jobs[:1], mirror=True)).run()
+	assert [report['status'] for report in reports] == ['FAILED']
+	assert entityCounts() == before
+
+# ==============================================================================
+
+def testSpatialIndexKept(clipModel):
+
+	''' Model spatial index built in the session is kept by the next batch, it is built again on demand. '''
+
+	model_data = Modules.model_data
+
+	model, jobs = clipModel.loadCopies('Standard', copies=2)
+	batch_items.ClipBatch(clipJobs(jobs[:1])).run()
+	model_data.MODEL_INDEX.update()
+	statistics = model_data.MODEL_INDEX.statistics()
+
+	reports = batch_items.ClipBatch(clipJobs(jobs[1:])).run()
+	assert [report['status'] for report in reports] == ['OK']
+	assert model_data.MODEL_INDEX.isBuilt()
+	assert model_data.MODEL_INDEX.statistics()['updates'] == statistics['updates']
+
+	batch_items.ClipBatch(clipJobs(jobs), keepSpatialIndex=False).run()
+	assert model_data.MODEL_INDEX.statistics()['updates'] == 1
@@ -0,0 +1,28 @@
+# PYTHON script
+
+'''
+Benchmark - API calls of the clip neighbourhood search independent of the model size.
+'''
+
+import benchmark
+
+# ==============================================================================
+
+def testSetBaseFacesCallsIndependentOfModelSize():
+
+	results = benchmark.runBenchmark([benchmark.BenchmarkCase('Standard', 'AUDI', 'far_parts', value) for value in [0, 10]])
+
+	assert [result['status'] for result in results] == ['OK', 'OK']
+	assert results[1]['elements'] > 2*results[0]['elements']
+	assert results[0]['setBaseFaces_calls'] > 0
+	assert benchmark.findScalingViolations(results) == []
+
+# ==============================================================================
+
+def testScalingViolationsFound():
+
+	results = [{'geom_type': 'Standard', 'beam_type': 'AUDI', 'parameter': parameter, 'value': value,
+		'setBaseFaces_calls': calls} for parameter, value, calls in [
+			('far_parts', 0, 100), ('far_parts', 10, 100), ('far_parts', 40, 120), ('clutter', 0, 100), ('clutter', 20, 150)]]
+
+	assert benchmark.findScalingViolations(results) == [(results[2], 'setBaseFaces', 100)]
@@ -0,0 +1,200 @@
+# PYTHON script
+
+'''
+Clip site scoring and the geom type suggestion on the synthetic clip models.
+'''
+
+import itertools
+
+import numpy as np
+import pytest
+
+import clip_geometry
+from conftest import Modules, loadModel, shiftedModelData
+
+clip_detection = Modules.clip_detection
+batch_items = Modules.batch_items
+
+# clip box faces are created first in the order of the clip sides
+CLIP_FACE_IDS = dict((name, index + 1) for index, name in enumerate(['top', 'bottom', 'front', 'back', 'right', 'left']))
+
+# ==============================================================================
+
+def clipModelData(geomTypeName='Standard', removedFaceIds=(), allEdges=False, withContraPart=True):
+
+	''' Returns the model data of the synthetic clip and its guiding CON id. The clip box may have
+	CONs on all its edges, the contra part or clip faces may be removed. '''
+
+	geometry = clip_geometry.CLIP_GEOMETRIES[geomTypeName]()
+	data, job = geometry.build()
+
+	if allEdges:
+		guidingConFaces = set(data['cons'][0]['faces'])
+		sideCorners = list()
+		for origin, uVector, vVector in geometry._clipSides().values():
+			origin, uVector, vVector = np.array(origin), np.array(uVector), np.array(vVector)
+			sideCorners.append(set(tuple(np.round(point, 6)) for point in (origin, origin + uVector, origin + vVector, origin + uVector + vVector)))
+
+		data['cons'] = list()
+		for (faceIndex, corners), (otherFaceIndex, otherCorners) in itertools.combinations(enumerate(sideCorners), 2):
+			edgeCorners = sorted(corners & otherCorners)
+			if len(edgeCorners) != 2:
+				continue
+			conId = len(data['cons']) + 1
+			data['cons'].append({'id': conId, 'faces': [faceIndex + 1, otherFaceIndex + 1], 'points': [list(point) for point in edgeCorners]})
+			if set([faceIndex + 1, otherFaceIndex + 1]) == guidingConFaces:
+				job['con_id'] = conId
+
+	if not withContraPart:
+		data['faces'] = [face for face in data['faces'] if face['pid'] != clip_geometry.CONTRA_PID]
+	data['faces'] = [face for face in data['faces'] if face['id'] not in removedFaceIds]
+
+	return data, job
+
+# ==============================================================================
+
+def siteRows(sites):
+
+	return [dict(site.toRow()) for site in sites]
+
+# ==============================================================================
+
+def testClipSiteFound():
+
+	data, job = clipModelData()
+	loadModel(data)
+
+	scanner = clip_detection.ClipSiteScanner()
+	sites = scanner.scan()
+
+	assert siteRows(sites) == [{'con_id': job['con_id'], 'geom_type': 'Standard', 'confidence': 1.0, 'pid': clip_geometry.CLIP_PID,
+		'small_face': CLIP_FACE_IDS['front'], 'large_face': CLIP_FACE_IDS['top'], 'angle': 90.0, 'area_ratio': 2.0}]
+	assert list(sites[0].toRow().keys()) == clip_detection.JOB_FIELDS
+	assert scanner.statistics['sites'] == 1
+
+# ==============================================================================
+
+def testDuplicateSitesRemoved():
+
+	''' Each edge of the clip box is a candidate, just one site is kept. '''
+
+	data, job = clipModelData(allEdges=True)
+	loadModel(data)
+
+	scanner = clip_detection.ClipSiteScanner()
+	sites = scanner.scan()
+
+	assert scanner.statistics['pairs'] == 12
+	assert scanner.statistics['candidates'] > 1
+	assert len(sites) == 1
+	assert sites[0].confidence == 1.0
+
+	# clip sites of the same PID far from each other
+	shifted, conOffset = shiftedModelData(data, (200.0, 0.0, 0.0))
+	for name in ('nodes', 'faces', 'shells', 'cons'):
+		data[name] = data[name] + shifted[name]
+	loadModel(data)
+
+	sites = clip_detection.ClipSiteScanner().scan()
+	assert len(sites) == 2
+	assert sorted(site.con._id > conOffset for site in sites) == [False, True]
+
+# ==============================================================================
+
+def testNotClipPairsIgnored():
+
+	''' Face pairs of other PIDs or with parallel faces are no candidates. '''
+
+	data, job = clipModelData()
+	contraFaceIds = [face['id'] for face in data['faces'] if face['pid'] == clip_geometry.CONTRA_PID]
+	clipFaceIds = [CLIP_FACE_IDS['top'], CLIP_FACE_IDS['bottom']]
+	for faceIds in (contraFaceIds[:2], [CLIP_FACE_IDS['top'], contraFaceIds[0]], clipFaceIds):
+		data['cons'].append({'id': len(data['cons']) + 1, 'faces': faceIds, 'points': [[0, 0, 0], [1, 0, 0]]})
+	loadModel(data)
+
+	scanner = clip_detection.ClipSiteScanner()
+	sites = scanner.scan()
+
+	assert scanner.statistics['pairs'] == 3
+	assert scanner.statistics['candidates'] == 1
+	assert [site.con._id for site in sites] == [job['con_id']]
+
+# ==============================================================================
+
+def testNoMateScore():
+
+	data, job = clipModelData(withContraPart=False)
+	loadModel(data)
+
+	assert clip_detection.ClipSiteScanner().scan() == []
+
+	sites = clip_detection.ClipSiteScanner(minConfidence=0.0).scan()
+	assert [site.confidence for site in sites] == [pytest.approx(clip_detection.ClipSiteScanner.NO_MATE_SCORE)]
+
+# ==============================================================================
+
+def testReversedGeomTypeSuggested():
+
+	''' No clip face is found against the large face normal. '''
+
+	data, job = clipModelData(removedFaceIds=[CLIP_FACE_IDS['bottom']])
+	loadModel(data)
+
+	sites = clip_detection.ClipSiteScanner(minConfidence=0.0).scan()
+
+	assert [site.geomType for site in sites] == ['Reversed']
+	assert sites[0].confidence == pytest.approx(clip_detection.ClipSiteScanner.NO_OPPOSITE_FACE_SCORE)
+
+# ==============================================================================
+
+def testRayHitsBoxes():
+
+	boxMins = np.array([[0, 0, 0], [0, 0, 5], [10, 10, 10], [-1, -1, -10]], dtype=float)
+	boxMaxs = np.array([[1, 1, 1], [1, 1, 5], [11, 11, 11], [1, 1, -8]], dtype=float)
+
+	# the flat box is hit thanks to the tolerance, the box behind the origin is not
+	hits = clip_detection._rayHitsBoxes([0.5, 0.5, -1], [0, 0, 1], boxMins, boxMaxs)
+	assert hits.tolist() == [True, True, False, False]
+
+	# the ray starting inside the box
+	hits = clip_detection._rayHitsBoxes([0.5, 0.5, 0.5], [1, 1, 1], boxMins, boxMaxs)
+	assert hits.tolist() == [True, False, True, False]
+
+# ==============================================================================
+
+def testClipSitesBatch():
+
+	data, job = clipModelData()
+	loadModel(data)
+
+	sites = clip_detection.findClipSites()
+	batch = batch_items.ClipBatch.fromClipSites(sites)
+	for clipJob in batch.jobs:
+		clipJob.beamType = 'AUDI'
+		clipJob.mirror = False
+
+	reports = batch.run()
+	assert [report['status'] for report in reports] == ['OK']
+	assert [reports[0][stopDistName] for stopDistName in batch_items.STOP_DISTANCE_NAMES] == [-1.5, 1.0, -2.0, 2.5, 0.5, 1.8]
+
+# ==============================================================================
+
+def testSpatialIndexKept():
+
+	''' Model spatial index is kept by the next scan unless it is rebuilt on demand. '''
+
+	model_data = Modules.model_data
+
+	data, job = clipModelData()
+	loadModel(data)
+
+	sites = clip_detection.ClipSiteScanner().scan()
+	updates = model_data.MODEL_INDEX.statistics()['updates']
+	assert clip_detection.ClipSiteScanner().scan()[0].con == sites[0].con
+	assert model_data.MODEL_INDEX.statistics()['updates'] == updates
+
+	model_data.MODEL_INDEX.markModified()
+	model_data.MODEL_INDEX.update()
+	assert model_data.MODEL_INDEX.statistics()['updates'] == updates + 1
+	clip_detection.ClipSiteScanner().scan(rebuildIndex=True)
+	assert model_data.MODEL_INDEX.statistics()['updates'] == 1
@@ -0,0 +1,284 @@
+# PYTHON script
+
+'''
+Clip creation steps - stop distances of the projection backends, the parallel and the serial search,
+the clip property and pasting of the beam end nodes.
+'''
+
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from ansa import base, constants
+
+import clip_geometry
+from conftest import Modules
+
+comp_items = Modules.comp_items
+model_data = Modules.model_data
+
+STOP_DISTANCE_NAMES = ['xLow', 'xUp', 'yLow', 'yUp', 'zLow', 'zUp']
+STANDARD_STOP_DISTANCES = [-1.5, 1.0, -2.0, 2.5, 0.5, 1.8]
+
+# ==============================================================================
+
+def getShells(pid):
+
+	shells = sorted(base.CollectEntities(constants.ABAQUS, None, "SHELL"), key=lambda shell: shell._id)
+
+	return [shell for shell in shells if base.GetEntityCardValues(constants.ABAQUS, shell, ('PID',))['PID'] == pid]
+
+# ==============================================================================
+
+def createNode(coords):
+
+	return base.CreateEntity(constants.ABAQUS, "NODE", {'X': coords[0], 'Y': coords[1], 'Z': coords[2]})
+
+# ==============================================================================
+
+@pytest.mark.parametrize('backendName', ['API', 'Mesh'])
+def testStopDistances(clipModel, backendName):
+
+	geomType = clipModel.geomType('Standard', backendName)
+	assert geomType.parentClip.projectionBackend().NAME == backendName
+
+	geomType.setStopDistances()
+
+	assert [getattr(geomType, stopDistName) for stopDistName in STOP_DISTANCE_NAMES] == STANDARD_STOP_DISTANCES
+
+# ==============================================================================
+
+def testDefaultBackendSearchesInParallel(clipModel, monkeypatch):
+
+	''' Workers of the default API backend search the stop distances, ANSA API runs in the main thread. '''
+
+	geomType = clipModel.geomType('Standard')
+	assert geomType.parentClip.projectionBackend().NAME == 'API'
+	assert geomType._canSearchInParallel()
+
+	searchThreads = list()
+	getStopDistancePoints = comp_items.StandardGeomType._getStopDistancePoints
+	def recordedGetStopDistancePoints(self, *args, **kwargs):
+		searchThreads.append(threading.current_thread())
+		return getStopDistancePoints(self, *args, **kwargs)
+	monkeypatch.setattr(comp_items.StandardGeomType, '_getStopDistancePoints', recordedGetStopDistancePoints)
+
+	apiThreads = set()
+	projectPointDirectional = base.ProjectPointDirectional
+	def recordedProjectPointDirectional(*args, **kwargs):
+		apiThreads.add(threading.current_thread())
+		return projectPointDirectional(*args, **kwargs)
+	monkeypatch.setattr(base, 'ProjectPointDirectional', recordedProjectPointDirectional)
+
+	geomType.setStopDistances()
+
+	assert threading.main_thread() not in searchThreads
+	assert apiThreads == set([threading.main_thread()])
+	assert [getattr(geomType, stopDistName) for stopDistName in STOP_DISTANCE_NAMES] == STANDARD_STOP_DISTANCES
+	assert not comp_items.projection.API_CALLS.serving
+
+# ==============================================================================
+
+def testFailedWorkersKeepModelCaches(clipModel, monkeypatch):
+
+	''' Searches failing in the workers are repeated in the main thread, only the main thread drops the caches. '''
+
+	geomType = clipModel.geomType('Standard', 'Mesh')
+	snapshot = geomType.parentClip.snapshot
+
+	faceNodeCoords = snapshot.faceNodeCoords
+	def workerFaceNodeCoords(faces):
+		if comp_items.isMainThread():
+			return faceNodeCoords(faces)
+		return np.zeros((0, 3))
+	monkeypatch.setattr(snapshot, 'faceNodeCoords', workerFaceNodeCoords)
+
+	invalidated = list()
+	monkeypatch.setattr(model_data.FACE_ATTRIBUTES, 'invalidate', lambda faces: invalidated.append(faces))
+	monkeypatch.setattr(model_data.MODEL_INDEX, 'invalidateEntities', lambda faces: invalidated.append(faces))
+
+	geomType.setStopDistances()
+
+	assert invalidated == []
+	assert [getattr(geomType, stopDistName) for stopDistName in STOP_DISTANCE_NAMES] == STANDARD_STOP_DISTANCES
+
+# ==============================================================================
+
+def testParallelSearchPolled(clipModel, monkeypatch):
+
+	''' The generator yields while the workers search, the workers read the shared face tree. '''
+
+	geomType = clipModel.geomType('Standard', 'Mesh')
+	assert geomType._canSearchInParallel()
+
+	faceTreeShared = list()
+	getStopDistancePoints = comp_items.StandardGeomType._getStopDistancePoints
+	def slowGetStopDistancePoints(self, *args, **kwargs):
+		faceTreeShared.append(self.parentClip.projectionBackend().faceTreeShared)
+		time.sleep(0.2)
+		return getStopDistancePoints(self, *args, **kwargs)
+	monkeypatch.setattr(comp_items.StandardGeomType, '_getStopDistancePoints', slowGetStopDistancePoints)
+
+	steps = list(geomType.iterStopDistances(False))
+
+	assert steps.count(None) > 1
+	assert steps[-len(STOP_DISTANCE_NAMES):] == geomType.STOP_DISTANCE_NAMES
+	assert faceTreeShared == [True]*len(STOP_DISTANCE_NAMES)
+	assert not geomType.parentClip.projectionBackend().faceTreeShared
+	assert [getattr(geomType, stopDistName) for stopDistName in STOP_DISTANCE_NAMES] == STANDARD_STOP_DISTANCES
+
+# ==============================================================================
+
+def testParallelSearchCancelled(clipModel, monkeypatch):
+
+	geomType = clipModel.geomType('Standard', 'Mesh')
+
+	getStopDistancePoints = comp_items.StandardGeomType._getStopDistancePoints
+	def slowGetStopDistancePoints(self, *args, **kwargs):
+		for step in range(40):
+			time.sleep(0.05)
+			self.stopDistanceProgress.checkCancelled()
+		return getStopDistancePoints(self, *args, **kwargs)
+	monkeypatch.setattr(comp_items.StandardGeomType, '_getStopDistancePoints', slowGetStopDistancePoints)
+
+	progress = comp_items.StopDistanceProgress()
+	steps = list()
+	start = time.time()
+	with pytest.raises(comp_items.StopDistanceCancelledException):
+		for stopDistName in geomType.iterStopDistances(False, progress):
+			steps.append(stopDistName)
+			if len(steps) == 2:
+				progress.cancel()
+
+	# workers stop at their next check, no stop distance is set
+	assert steps == [None, None]
+	assert time.time() - start < 1.0
+	assert geomType.stopDistanceProgress is None
+	assert not geomType.parentClip.projectionBackend().faceTreeShared
+	assert geomType.xLow == -1000
+
+def testSerialSearchYieldsAfterFaceBatches(clipModel, monkeypatch):
+
+	''' Searched in the main thread the generator yields after each projected face batch. '''
+
+	geomType = clipModel.geomType('Standard', 'Mesh', faceCount=3)
+	monkeypatch.setattr(geomType, 'STOP_DISTANCE_WORKERS', 1)
+	monkeypatch.setattr(geomType, 'PROJECTION_FACE_BATCH', 1)
+	assert not geomType._canSearchInParallel()
+
+	backend = geomType.parentClip.projectionBackend()
+	projectPoints = backend.projectPoints
+	batches = list()
+	def countedProjectPoints(*args, **kwargs):
+		batches.append(len(args[0]))
+		return projectPoints(*args, **kwargs)
+	monkeypatch.setattr(backend, 'projectPoints', countedProjectPoints)
+
+	steps = list(geomType.iterStopDistances(False))
+
+	assert len(batches) > len(STOP_DISTANCE_NAMES)
+	assert batches == [1]*len(batches)
+	assert steps.count(None) == len(batches)
+	assert [step for step in steps if step is not None] == geomType.STOP_DISTANCE_NAMES
+	assert [getattr(geomType, stopDistName) for stopDistName in STOP_DISTANCE_NAMES] == STANDARD_STOP_DISTANCES
+
+# ==============================================================================
+
+def testSerialSearchCancelled(clipModel, monkeypatch):
+
+	geomType = clipModel.geomType('Standard', 'Mesh')
+	monkeypatch.setattr(geomType, 'STOP_DISTANCE_WORKERS', 1)
+	monkeypatch.setattr(geomType, 'PROJECTION_FACE_BATCH', 1)
+
+	progress = comp_items.StopDistanceProgress()
+	steps = list()
+	with pytest.raises(comp_items.StopDistanceCancelledException):
+		for stopDistName in geomType.iterStopDistances(False, progress):
+			steps.append(stopDistName)
+			if len(steps) == 1:
+				progress.cancel()
+
+	# cancelled within the first stop distance search
+	assert steps == [None]
+	assert geomType.stopDistanceProgress is None
+	assert [getattr(geomType, stopDistName) for stopDistName in STOP_DISTANCE_NAMES] == [-1000, 1000, -1000, 1000, -1000, 1000]
+
+# ==============================================================================
+
+def testDominantPid(clipModel, monkeypatch):
+
+	''' PID of the element sharing the most of the selected nodes, the snapshot answers
+	the node to element incidences without any API call. '''
+
+	clipModel.load('Standard')
+	shells = getShells(clip_geometry.FE_PIDS[0])[:3] + getShells(clip_geometry.FE_PIDS[1])[:1]
+	# all nodes of the last shell, a single node of the others
+	nodes = base.CollectEntities(constants.ABAQUS, shells[3:], "NODE") + base.CollectEntities(constants.ABAQUS, shells[:1], "NODE")[:1]
+
+	nodesToElements = base.NodesToElements
+	nodesToElementsCalls = list()
+	def countedNodesToElements(nodes):
+		nodesToElementsCalls.append(nodes)
+		return nodesToElements(nodes)
+	monkeypatch.setattr(base, 'NodesToElements', countedNodesToElements)
+
+	resolver = comp_items.ElementPropertyResolver()
+	assert resolver.pidCounts(shells).most_common(1)[0][0] == clip_geometry.FE_PIDS[0]
+	assert resolver.dominantPid(shells, nodes) == clip_geometry.FE_PIDS[1]
+	assert resolver.dominantPid(shells, base.CollectEntities(constants.ABAQUS, shells[:3], "NODE")) == clip_geometry.FE_PIDS[0]
+	assert resolver.dominantPid([], []) is None
+	assert len(nodesToElementsCalls) == 3
+
+	snapshot = model_data.ClipNeighbourhoodSnapshot([], getShells(clip_geometry.FE_PIDS[0]) + getShells(clip_geometry.FE_PIDS[1]))
+	resolver = comp_items.ElementPropertyResolver(snapshot)
+	assert resolver.dominantPid(shells, nodes) == clip_geometry.FE_PIDS[1]
+	assert snapshot.shellNodeCounts(nodes)[shells[3]] == len(base.CollectEntities(constants.ABAQUS, shells[3:], "NODE"))
+	assert len(nodesToElementsCalls) == 3
+
+	# elements out of the snapshot
+	snapshot = model_data.ClipNeighbourhoodSnapshot([], shells[:3])
+	resolver = comp_items.ElementPropertyResolver(snapshot)
+	assert resolver.dominantPid(shells, nodes) == clip_geometry.FE_PIDS[1]
+	assert len(nodesToElementsCalls) == 4
+
+# ==============================================================================
+
+def testPasteElementsEndNodes(clipModel):
+
+	''' End nodes are the beam nodes out of the connectors, they are pasted to the shell nodes only. '''
+
+	model, job = clipModel.load('Standard')
+	tolerance = comp_items.SymmetricalClip.PASTE_TOLERANCE
+	shellNodes = [base.CollectEntities(constants.ABAQUS, getShells(pid)[:1], "NODE")[0] for pid in clip_geometry.FE_PIDS]
+	shellNodeCoords, otherShellNodeCoords = [np.array(model_data.getEntityCoords(node)) for node in shellNodes]
+
+	# the connector node near the shell node is not an end node
+	centerNode = createNode(shellNodeCoords + [0, 0, 20])
+	connectorNode = createNode(otherShellNodeCoords + [0, 0, tolerance/2])
+	connector = base.CreateEntity(constants.ABAQUS, "CONNECTOR", {'G1': centerNode._id, 'G2': connectorNode._id})
+
+	# the end node near the shell node, the end node near the node of another beam only
+	endNodes = [createNode(shellNodeCoords + [0, 0, tolerance/2]), createNode(shellNodeCoords + [0, 0, 60])]
+	beamNode = createNode(shellNodeCoords + [0, 0, 60 + tolerance/2])
+	otherBeam = base.CreateEntity(constants.ABAQUS, "BEAM", {'PID': 999, 'NODE1': centerNode._id, 'NODE2': beamNode._id})
+	beams = [base.CreateEntity(constants.ABAQUS, "BEAM", {'PID': 999, 'NODE1': centerNode._id, 'NODE2': endNode._id})
+		for endNode in endNodes + [connectorNode]]
+
+	assert comp_items.pasteElementsEndNodes(beams, [connector], tolerance) == 1
+
+	nodeIds = [base.GetEntityCardValues(constants.ABAQUS, beam, ('NODE1', 'NODE2')) for beam in beams + [otherBeam]]
+	assert nodeIds[1:] == [
+		{'NODE1': centerNode._id, 'NODE2': endNodes[1]._id},
+		{'NODE1': centerNode._id, 'NODE2': connectorNode._id},
+		{'NODE1': centerNode._id, 'NODE2': beamNode._id}]
+	assert base.GetEntityCardValues(constants.ABAQUS, connector, ('G1', 'G2')) == {'G1': centerNode._id, 'G2': connectorNode._id}
+
+	# coincident shell nodes may be the paste target
+	pastedNode = base.GetEntity(constants.ABAQUS, "NODE", nodeIds[0]['NODE2'])
+	assert nodeIds[0]['NODE1'] == centerNode._id
+	assert pastedNode is not endNodes[0]
+	assert model_data.getEntityCoords(pastedNode) == pytest.approx(shellNodeCoords)
+
+	assert comp_items.pasteElementsEndNodes([], [connector], tolerance) == 0
@@ -0,0 +1,289 @@
+# PYTHON script
+
+'''
+Clip neighbourhood snapshot, model and local spatial index - the exact neighbourhood distance.
+'''
+
+import numpy as np
+
+from ansa import base, constants
+
+import clip_geometry
+from conftest import Modules
+
+model_data = Modules.model_data
+spatial = Modules.spatial
+
+# ==============================================================================
+
+def getEntities(typeName, pid=None):
+
+	entities = sorted(base.CollectEntities(constants.ABAQUS, None, typeName), key=lambda entity: entity._id)
+	if pid is None:
+		return entities
+
+	return [entity for entity in entities if base.GetEntityCardValues(constants.ABAQUS, entity, ('PID',))['PID'] == pid]
+
+# ==============================================================================
+
+def neighbourhoodIds(entities, radius):
+
+	faces, shells = model_data.MODEL_INDEX.neighbourhood(entities, radius)
+
+	return sorted(face._id for face in faces), sorted(shell._id for shell in shells)
+
+# ==============================================================================
+
+def rebuiltNeighbourhoodIds(entities, radius):
+
+	model_data.MODEL_INDEX.invalidate()
+
+	return neighbourhoodIds(entities, radius)
+
+# ==============================================================================
+
+def createShell(pid, nodesCoords):
+
+	nodes = [base.CreateEntity(constants.ABAQUS, "NODE", {'X': x, 'Y': y, 'Z': z}) for x, y, z in nodesCoords]
+	fields = {'PID': pid}
+	fields.update(('G%s' % (index + 1), node._id) for index, node in enumerate(nodes))
+
+	return base.CreateEntity(constants.NASTRAN, "SHELL", fields)
+
+# ==============================================================================
+
+def testSnapshotMatchesModel(clipModel):
+
+	''' Snapshot geometry is the model geometry, the snapshot is queried without any API call. '''
+
+	model, job = clipModel.load('Standard', clutter=5, meshSize=2.0)
+	faces = getEntities("FACE", clip_geometry.CONTRA_PID)
+	shells = getEntities("SHELL", clip_geometry.FE_PIDS[0])[:4]
+
+	faceNodes = base.CollectEntities(constants.ABAQUS, faces[:2], "NODE")
+	otherShell = getEntities("SHELL", clip_geometry.FE_PIDS[1])[0]
+	clipFace = getEntities("FACE", clip_geometry.CLIP_PID)[0]
+
+	snapshot = model_data.ClipNeighbourhoodSnapshot(faces, shells)
+	statistics = dict(model.statistics)
+
+	for face in faces:
+		assert np.array_equal(snapshot.faceTriangles(face), model.faceTriangles(face))
+	shellsTriangles, shellIndexes = snapshot.shellsTriangles(shells)
+	assert np.array_equal(shellsTriangles, np.concatenate([model.elementTriangles(shell) for shell in shells]))
+	assert shellIndexes.tolist() == [index for index, shell in enumerate(shells) for triangle in model.elementTriangles(shell)]
+
+	assert sorted(map(tuple, snapshot.faceNodeCoords(faces[:2]))) == sorted(tuple(model.nodeCoords(node)) for node in faceNodes)
+	assert snapshot.shellPidCounts(shells) == {clip_geometry.FE_PIDS[0]: 4}
+	assert snapshot.facePids.tolist() == len(faces)*[clip_geometry.CONTRA_PID]
+
+	# entities out of the snapshot
+	assert snapshot.shellPidCounts(shells + [otherShell]) is None
+	assert not snapshot.containsFaces([clipFace])
+	assert dict(model.statistics) == statistics
+
+# ==============================================================================
+
+def testNeighbourhoodExactDistance(clipModel):
+
+	''' Candidates found by their boxes are refined by the distance of their triangles. '''
+
+	model, job = clipModel.load('Standard', faceCount=2, clutter=20, meshSize=2.0)
+	largeFace = base.GetEntity(constants.ABAQUS, "FACE", 1)
+	largeFaceTriangles = model.faceTriangles(largeFace)
+	radius = 10.0
+
+	def distance(triangles):
+		return spatial.trianglesDistances(np.repeat(triangles, len(largeFaceTriangles), axis=0),
+			np.tile(largeFaceTriangles, (len(triangles), 1, 1))).min()
+
+	faces, shells = model_data.MODEL_INDEX.neighbourhood([largeFace], radius)
+
+	# faces out of the box grown by the radius are not found
+	boxMin = largeFaceTriangles.min(axis=(0, 1)) - radius
+	boxMax = largeFaceTriangles.max(axis=(0, 1)) + radius
+	boxFaces = [face for face in getEntities("FACE") if np.all(model.faceTriangles(face).min(axis=(0, 1)) <= boxMax) and
+		np.all(model.faceTriangles(face).max(axis=(0, 1)) >= boxMin)]
+	assert set(faces) <= set(boxFaces)
+
+	# some faces overlap the box, but they are too far
+	farFaces = [face for face in boxFaces if distance(model.faceTriangles(face)) > radius]
+	assert len(farFaces) > 0
+	assert set(faces) == set(boxFaces) - set(farFaces)
+
+	assert len(shells) > 0
+	assert all(distance(model.elementTriangles(shell)) <= radius for shell in shells)
+
+# ==============================================================================
+
+def testLocalIndexNeighbourhood(clipModel):
+
+	''' The local index finds the same neighbourhood as the model index, its build does not depend on
+	the parts far from the clip. '''
+
+	statistics = list()
+	for farParts in [0, 10]:
+		model, job = clipModel.load('Standard', faceCount=2, clutter=20, meshSize=2.0, farParts=farParts)
+		largeFace = base.GetEntity(constants.ABAQUS, "FACE", 1)
+
+		before = dict(model.statistics)
+		localIndex = model_data.getSpatialIndex([largeFace], 10.0)
+		statistics.append(dict((name, count - before.get(name, 0)) for name, count in model.statistics.items()))
+		faces, shells = localIndex.neighbourhood([largeFace], 10.0)
+
+		assert not model_data.MODEL_INDEX.isBuilt()
+		assert (sorted(face._id for face in faces), sorted(shell._id for shell in shells)) == neighbourhoodIds([largeFace], 10.0)
+		assert localIndex.statistics()['entities'] < model_data.MODEL_INDEX.statistics()['entities']
+		assert all(localIndex.pid(shell) == model_data.MODEL_INDEX.pid(shell) for shell in shells)
+
+		# the built model index is used
+		assert model_data.getSpatialIndex([largeFace], 10.0) is model_data.MODEL_INDEX
+
+	assert statistics[0]['NearElements'] == 1
+	assert statistics[0] == statistics[1]
+
+# ==============================================================================
+
+def testCleanUpdateMakesNoApiCall(clipModel):
+
+	model, job = clipModel.load('Standard', clutter=5)
+	largeFace = base.GetEntity(constants.ABAQUS, "FACE", 1)
+
+	expected = neighbourhoodIds([largeFace], 10.0)
+	collectCount = model.statistics['CollectEntities']
+	cardCount = model.statistics['GetEntityCardValues']
+
+	assert neighbourhoodIds([largeFace], 10.0) == expected
+	assert model.statistics['CollectEntities'] == collectCount
+	assert model.statistics['GetEntityCardValues'] == cardCount
+	assert model_data.MODEL_INDEX.statistics()['updates'] == 1
+
+# ==============================================================================
+
+def testDeletedEntitiesDropped(clipModel):
+
+	model, job = clipModel.load('Standard', clutter=5)
+	largeFace = base.GetEntity(constants.ABAQUS, "FACE", 1)
+	neighbourhoodIds([largeFace], 10.0)
+
+	shells = getEntities("SHELL", clip_geometry.FE_PIDS[0])[:5]
+	model_data.deleteEntities(shells)
+	collectCount = model.statistics['CollectEntities']
+
+	found = neighbourhoodIds([largeFace], 10.0)
+	assert not set(shell._id for shell in shells) & set(found[1])
+	# shells are dropped without reading the whole model
+	assert model.statistics['CollectEntities'] == collectCount
+	assert model_data.MODEL_INDEX.statistics()['deleted'] == 5
+
+	assert found == rebuiltNeighbourhoodIds([largeFace], 10.0)
+
+# ==============================================================================
+
+def testDeletedFaceSynchronised(clipModel):
+
+	''' Face mesh may be deleted with the face, the whole model is read again. '''
+
+	model, job = clipModel.load('Standard', clutter=5)
+	largeFace = base.GetEntity(constants.ABAQUS, "FACE", 1)
+	neighbourhoodIds([largeFace], 10.0)
+
+	face = getEntities("FACE", clip_geometry.CONTRA_PID)[0]
+	model_data.deleteEntities(face)
+	assert model_data.MODEL_INDEX.modified
+
+	found = neighbourhoodIds([largeFace], 10.0)
+	assert face._id not in found[0]
+	assert not model_data.MODEL_INDEX.modified
+	assert found == rebuiltNeighbourhoodIds([largeFace], 10.0)
+
+# ==============================================================================
+
+def testCreatedEntitiesTracked(clipModel):
+
+	model, job = clipModel.load('Standard')
+	largeFace = base.GetEntity(constants.ABAQUS, "FACE", 1)
+	neighbourhoodIds([largeFace], 10.0)
+	entityCount = model_data.MODEL_INDEX.statistics()['entities']
+
+	# a shell not created in the tracked block is not found
+	untrackedShell = createShell(clip_geometry.FE_PIDS[1], [(0.1, 0.1, 0.0), (0.6, 0.1, 0.0), (0.6, 0.6, 0.0)])
+	with model_data.MODEL_INDEX.trackChanges():
+		shell = createShell(clip_geometry.FE_PIDS[1], [(0.2, 0.2, 0.0), (0.7, 0.2, 0.0), (0.7, 0.7, 0.0), (0.2, 0.7, 0.0)])
+
+	collectCount = model.statistics['CollectEntities']
+	faces, shells = model_data.MODEL_INDEX.neighbourhood([shell], 0.0)
+	assert shell in shells
+	assert untrackedShell not in shells
+	assert model.statistics['CollectEntities'] == collectCount
+	assert model_data.MODEL_INDEX.statistics()['entities'] == entityCount + 1
+	assert model_data.MODEL_INDEX.pid(shell) == clip_geometry.FE_PIDS[1]
+
+	# kept aside of the tree until there are too many of them
+	assert model_data.MODEL_INDEX.treeSize == entityCount
+
+	model_data.MODEL_INDEX.markModified()
+	assert untrackedShell in model_data.MODEL_INDEX.neighbourhood([shell], 0.0)[1]
+
+# ==============================================================================
+
+def testTreeRebuiltWithPendingEntities(clipModel, monkeypatch):
+
+	model, job = clipModel.load('Standard')
+	model_data.MODEL_INDEX.update()
+	monkeypatch.setattr(model_data.MODEL_INDEX, 'REBUILD_MIN_SIZE', 2)
+	monkeypatch.setattr(model_data.MODEL_INDEX, 'REBUILD_RATIO', 0.0)
+
+	with model_data.MODEL_INDEX.trackChanges():
+		shells = [createShell(clip_geometry.FE_PIDS[1], [(x, 0.0, 0.0), (x + 0.5, 0.0, 0.0), (x, 0.5, 0.0)])
+			for x in (0.0, 1.0, 2.0)]
+
+	faces, foundShells = model_data.MODEL_INDEX.neighbourhood(shells, 0.0)
+	assert set(shells) <= set(foundShells)
+	assert model_data.MODEL_INDEX.treeSize == len(model_data.MODEL_INDEX.entities)
+	assert model_data.MODEL_INDEX.statistics()['builds'] == 2
+
+# ==============================================================================
+
+def testNotMeshedFaces(clipModel):
+
+	''' Faces without mesh are flagged, they have no box. '''
+
+	model, job = clipModel.load('Standard')
+	face = getEntities("FACE", clip_geometry.CONTRA_PID)[0]
+	shells = base.CollectEntities(constants.ABAQUS, [face], "SHELL")
+	model_data.deleteEntities(shells)
+	model_data.MODEL_INDEX.markModified()
+
+	model_data.MODEL_INDEX.update()
+	boxMins, boxMaxs, indexed = model_data.MODEL_INDEX.boundingBoxes([face, base.GetEntity(constants.ABAQUS, "FACE", 1)])
+
+	assert indexed.tolist() == [False, True]
+	assert np.isnan(boxMins[0]).all()
+	assert model_data.MODEL_INDEX.statistics()['notMeshed'] == 1
+
+# ==============================================================================
+
+def testRemeshedFaceIndexedAgain(clipModel):
+
+	''' Face mesh deleted and created again - the face is found by its new mesh. '''
+
+	model, job = clipModel.load('Standard')
+	model_data.MODEL_INDEX.update()
+	face = getEntities("FACE", clip_geometry.CONTRA_PID)[0]
+	model_data.deleteEntities(base.CollectEntities(constants.ABAQUS, [face], "SHELL"))
+	assert model_data.MODEL_INDEX.modified
+
+	with model_data.MODEL_INDEX.trackChanges():
+		shell = createShell(clip_geometry.CONTRA_PID, [(500.0, 0.0, 0.0), (501.0, 0.0, 0.0), (500.0, 1.0, 0.0)])
+		model.faceShells[face].append(shell)
+
+	model_data.MODEL_INDEX.update()
+	boxMins, boxMaxs, indexed = model_data.MODEL_INDEX.boundingBoxes([face])
+	assert indexed.tolist() == [True]
+	assert boxMins[0].tolist() == [500.0, 0.0, 0.0]
+	assert boxMaxs[0].tolist() == [501.0, 1.0, 0.0]
+
+	found = neighbourhoodIds([shell], 0.0)
+	assert face._id in found[0]
+	assert found == rebuiltNeighbourhoodIds([shell], 0.0)
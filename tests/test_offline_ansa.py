@@ -0,0 +1,80 @@
+# PYTHON script
+
+'''
+In-memory ANSA stand-in - entity collection, visibility, near elements and the API call statistics.
+'''
+
+from ansa import base, constants
+
+import clip_geometry
+
+# ==============================================================================
+
+def getFaces():
+
+	return sorted(base.CollectEntities(constants.ABAQUS, None, "FACE"), key=lambda face: face._id)
+
+# ==============================================================================
+
+def testCollectEntities(clipModel):
+
+	model, job = clipModel.load('Standard')
+	faces = getFaces()
+	con = base.GetEntity(constants.ABAQUS, "CONS", job['con_id'])
+
+	assert set(base.GetFacesOfCons([con])) <= set(faces)
+	assert base.GetEntityCardValues(constants.ABAQUS, faces[0], ('PID',))['PID'] == clip_geometry.CLIP_PID
+
+	shells = base.CollectEntities(constants.ABAQUS, faces[:1], "SHELL")
+	nodes = base.CollectEntities(constants.ABAQUS, shells, "NODE")
+	assert len(shells) > 0
+	assert len(nodes) == len(set(nodes))
+	assert model.statistics['CollectEntities'] == 3
+
+# ==============================================================================
+
+def testVisibility(clipModel):
+
+	''' Or shows just the given entities, Not hides them. '''
+
+	model, job = clipModel.load('Standard')
+	faces = getFaces()
+
+	base.Or(faces[:3], constants.ABAQUS)
+	base.Not(faces[:1], constants.ABAQUS)
+
+	assert model.visible == set(faces[1:3])
+	assert set(base.CollectEntities(constants.ABAQUS, None, "FACE", filter_visible=True)) == set(faces[1:3])
+
+# ==============================================================================
+
+def testNearElements(clipModel):
+
+	model, job = clipModel.load('Standard', meshSize=2.0)
+	shell = base.CollectEntities(constants.ABAQUS, getFaces()[:1], "SHELL")[0]
+	center = model.elementTriangles(shell).mean(axis=(0, 1))
+
+	nearElements = base.NearElements(coordinates=[center.tolist(), [1000.0, 0.0, 0.0]], tolerance=0.1)
+	assert shell in nearElements[0]
+	assert nearElements[1] == []
+
+	assert base.NearElements(coordinates=[[1000.0, 0.0, 0.0]], tolerance=0.1) is None
+	assert model.statistics['NearElements'] == 2
+
+# ==============================================================================
+
+def testNewEntitiesCollected(clipModel):
+
+	model, job = clipModel.load('Standard')
+	node = base.CollectEntities(constants.ABAQUS, getFaces()[:1], "NODE")[0]
+
+	collector = base.CollectNewModelEntities(constants.ABAQUS, ["NODE", "BEAM"])
+	newNode = base.CreateEntity(constants.ABAQUS, "NODE", {'X': 1.0, 'Y': 2.0, 'Z': 3.0})
+	beam = base.CreateEntity(constants.ABAQUS, "BEAM", {'PID': 999, 'NODE1': node._id, 'NODE2': newNode._id})
+
+	assert set(collector.report()) == set([newNode, beam])
+
+	base.DeleteEntity([beam, newNode])
+	assert collector.report() == []
+	assert not model.isAlive(beam)
+	assert model.isAlive(node)
@@ -0,0 +1,237 @@
+# PYTHON script
+
+'''
+Mesh projection backend (ray - triangle intersection) compared to the API backend.
+'''
+
+import threading
+
+import numpy as np
+import pytest
+
+import ansa
+from ansa import base, constants
+
+import clip_geometry
+from conftest import Modules
+
+projection = Modules.projection
+model_data = Modules.model_data
+
+DIRECTIONS = [[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0.3, -0.2, -1]]
+
+# ==============================================================================
+
+def getFaces(pid):
+
+	faces = base.CollectEntities(constants.ABAQUS, None, "FACE")
+
+	return [face for face in faces if model_data.FACE_ATTRIBUTES.pid(face) == pid]
+
+# ==============================================================================
+
+def getClipPoints(step=5):
+
+	''' Returns centres of clip face triangles, the points projected to the contra part. '''
+
+	model = ansa.model.getModel()
+	triangles = np.concatenate([model.faceTriangles(face) for face in getFaces(clip_geometry.CLIP_PID)])
+
+	return triangles.mean(axis=1)[::step].tolist()
+
+# ==============================================================================
+
+@pytest.mark.parametrize('geomTypeName', ['Standard', 'Reversed'])
+def testMeshBackendProjectPointMatchesApi(clipModel, geomTypeName):
+
+	clipModel.load(geomTypeName, faceCount=2, meshSize=2.0)
+	contraFaces = getFaces(clip_geometry.CONTRA_PID)
+	apiBackend = projection.PROJECTION_BACKENDS['API']()
+	meshBackend = projection.PROJECTION_BACKENDS['Mesh']()
+
+	projectionCount = 0
+	for pointCoords in getClipPoints():
+		for vector in DIRECTIONS:
+			for minDist in (True, False):
+				apiFace, apiCoords = apiBackend.projectPoint(contraFaces, pointCoords, vector, minDist=minDist)
+				meshFace, meshCoords = meshBackend.projectPoint(contraFaces, pointCoords, vector, minDist=minDist)
+
+				assert meshFace is apiFace
+				if apiFace is not None:
+					assert meshCoords == pytest.approx(apiCoords, abs=1e-6)
+					projectionCount += 1
+
+	assert projectionCount > 0
+
+# ==============================================================================
+
+def testMeshBackendProjectPointsMatchesApi(clipModel):
+
+	model, job = clipModel.load('Standard', faceCount=2, clutter=5, meshSize=2.0)
+	contraFaces = getFaces(clip_geometry.CONTRA_PID)
+	apiBackend = projection.PROJECTION_BACKENDS['API']()
+	meshBackend = projection.PROJECTION_BACKENDS['Mesh']()
+
+	pointsCoords = getClipPoints(step=2)
+	for vector in DIRECTIONS:
+		for tolerance in (1.0, 50):
+			apiPoints, apiFace = apiBackend.projectPoints(contraFaces, pointsCoords, vector, tolerance)
+			meshPoints, meshFace = meshBackend.projectPoints(contraFaces, pointsCoords, vector, tolerance)
+
+			if apiFace is None:
+				assert meshFace is None
+				continue
+
+			# other points of the same distance may be projected to other faces
+			assert np.linalg.norm(np.subtract(*meshPoints)) == pytest.approx(np.linalg.norm(np.subtract(*apiPoints)))
+			faceDistances = Modules.spatial.pointTrianglesDistances(meshPoints[1], model.faceTriangles(meshFace))
+			assert faceDistances.min() == pytest.approx(0.0, abs=1e-6)
+
+	assert meshBackend.projectPoints(contraFaces, [], DIRECTIONS[0]) == (None, None)
+
+# ==============================================================================
+
+def testMeshBackendNotMeshedFaces(clipModel):
+
+	''' Faces without mesh are projected by the API. '''
+
+	model, job = clipModel.load('Standard')
+	contraFaces = getFaces(clip_geometry.CONTRA_PID)
+	meshBackend = projection.PROJECTION_BACKENDS['Mesh']()
+	apiBackend = projection.PROJECTION_BACKENDS['API']()
+
+	expected = [apiBackend.projectPoint(contraFaces, pointCoords, [0, 0, 1]) for pointCoords in getClipPoints()]
+
+	meshBackend.prepare(contraFaces)
+	meshBackend.faceTriangles[contraFaces[0]] = None
+	meshBackend.prepare(contraFaces)
+
+	apiCallCount = model.statistics['ProjectPointDirectional']
+	for pointCoords, (face, projectedPointCoords) in zip(getClipPoints(), expected):
+		meshFace, meshCoords = meshBackend.projectPoint(contraFaces, pointCoords, [0, 0, 1])
+		assert meshFace is face
+		if face is not None:
+			assert meshCoords == pytest.approx(projectedPointCoords, abs=1e-6)
+
+	assert model.statistics['ProjectPointDirectional'] > apiCallCount
+
+# ==============================================================================
+
+def testApiBackendCulledFaces(clipModel):
+
+	''' Faces which box is not crossed by the ray are not projected, the result is the same
+	as of the projection to all faces in the same order. '''
+
+	model, job = clipModel.load('Standard', faceCount=2, clutter=5, meshSize=2.0)
+	faces = getFaces(clip_geometry.CONTRA_PID) + getFaces(clip_geometry.CLUTTER_PID)
+	apiBackend = projection.PROJECTION_BACKENDS['API']()
+	apiBackend.prepare(faces)
+
+	def projectAll(pointsCoords, vector, tolerance):
+		found = None, None
+		minDistance = None
+		for face in faces:
+			for pointCoords in pointsCoords:
+				projectedPointCoords = base.ProjectPointDirectional(face, pointCoords[0], pointCoords[1], pointCoords[2],
+					vector[0], vector[1], vector[2], tolerance, project_on="faces")
+				if projectedPointCoords is None:
+					continue
+				distance = np.linalg.norm(np.subtract(pointCoords, projectedPointCoords))
+				if minDistance is None or distance < minDistance:
+					found = [pointCoords, projectedPointCoords], face
+					minDistance = distance
+		return found
+
+	pointsCoords = getClipPoints(step=4)
+	for vector in DIRECTIONS:
+		for tolerance in (1.0, 50):
+			expected = projectAll(pointsCoords, vector, tolerance)
+			allCallCount = len(faces)*len(pointsCoords)
+
+			callCount = model.statistics['ProjectPointDirectional']
+			assert apiBackend.projectPoints(faces, pointsCoords, vector, tolerance) == expected
+			assert model.statistics['ProjectPointDirectional'] - callCount < allCallCount
+
+	# not meshed faces are projected for all points
+	notMeshedFace = faces[0]
+	apiBackend.faceTriangles[notMeshedFace] = None
+	apiBackend.prepare(faces)
+	pointIndexes, candidateFaces = apiBackend.faceTree.rayFaces(pointsCoords, [0, 0, 1], 1.0, faces)
+	assert candidateFaces[:len(pointsCoords)] == len(pointsCoords)*[notMeshedFace]
+	assert pointIndexes[:len(pointsCoords)] == list(range(len(pointsCoords)))
+
+# ==============================================================================
+
+def testSharedFaceTree(clipModel):
+
+	clipModel.load('Standard')
+	contraFaces = getFaces(clip_geometry.CONTRA_PID)
+	clipFaces = getFaces(clip_geometry.CLIP_PID)
+	meshBackend = projection.PROJECTION_BACKENDS['Mesh']()
+
+	with meshBackend.sharedFaceTree(contraFaces) as faceTree:
+		assert meshBackend.isThreadSafe(contraFaces)
+		meshBackend.projectPoint(contraFaces[:2], [0, 0, 0], [0, 0, 1])
+		assert meshBackend.faceTree is faceTree
+
+		# the tree read by worker threads must not be rebuilt
+		with pytest.raises(projection.ProjectionBackendException):
+			meshBackend.projectPoint(clipFaces, [0, 0, 0], [0, 0, 1])
+
+	# rebuilt out of the block
+	meshBackend.projectPoint(clipFaces, [0, 0, 0], [0, 0, 1])
+	assert meshBackend.faceTree.contains(clipFaces + contraFaces)
+
+# ==============================================================================
+
+def testWorkerApiCallsServedByMainThread():
+
+	apiCalls = projection.MainThreadApiCalls()
+	callThreads = list()
+	def apiFunction(value):
+		callThreads.append(threading.current_thread())
+		if value is None:
+			raise ValueError('No value')
+		return 2*value
+
+	results = list()
+	def worker(value):
+		try:
+			results.append(apiCalls.call(apiFunction, value))
+		except Exception as e:
+			results.append(type(e))
+
+	# not served calls fail
+	thread = threading.Thread(target=worker, args=(1,))
+	thread.start()
+	thread.join()
+	assert results == [projection.ProjectionBackendException]
+
+	with apiCalls.served():
+		threads = [threading.Thread(target=worker, args=(value,)) for value in [2, None]]
+		for thread in threads:
+			thread.start()
+		while len(results) < 3:
+			apiCalls.serve(0.05)
+		for thread in threads:
+			thread.join()
+
+	assert sorted(results[1:], key=str) == sorted([4, ValueError], key=str)
+	assert callThreads == [threading.main_thread()]*2
+	assert apiCalls.call(apiFunction, 3) == 6
+
+# ==============================================================================
+
+def testAbstractBackendRefused():
+
+	class IncompleteBackend(projection.BaseProjectionBackend):
+
+		NAME = 'Incomplete'
+
+		def projectPoint(self, faces, pointCoords, vector, tolerance=50, minDist=True):
+			return None, None
+
+	with pytest.raises(TypeError):
+		projection.registerBackend(IncompleteBackend)
+
+	assert 'Incomplete' not in projection.PROJECTION_BACKENDS
@@ -0,0 +1,136 @@
+# PYTHON script
+
+'''
+Redraw batches and the order of visibility changes and visibility dependent API calls.
+'''
+
+import ansa
+from ansa import base, constants
+
+import clip_geometry
+from conftest import Modules
+
+redraw = Modules.redraw
+comp_items = Modules.comp_items
+
+# ==============================================================================
+
+def getFaces():
+
+	return sorted(base.CollectEntities(constants.ABAQUS, None, "FACE"), key=lambda face: face._id)
+
+# ==============================================================================
+
+def testRedrawBatch(clipModel):
+
+	model, job = clipModel.load('Standard')
+	faces = getFaces()
+	base.Or(faces[:2], constants.ABAQUS)
+	statistics = dict(model.statistics)
+
+	with redraw.redrawBatch() as batch:
+		assert model.redrawsBlocked
+		redraw.hide(faces[:1])
+		redraw.hide(faces[1:2])
+		redraw.show(faces[2:4])
+		# And sets the visibility as a whole, the last one applies
+		redraw.show(faces[1:3])
+		redraw.redrawAll()
+
+		# nested batch joins the outer one
+		with redraw.redrawBatch() as nestedBatch:
+			assert nestedBatch is batch
+			redraw.hide(faces[3:4])
+
+		assert model.visible == set(faces[:2])
+
+	assert not model.redrawsBlocked
+	assert model.visible == set(faces[1:3])
+	# consecutive hides are merged
+	assert model.statistics['Not'] - statistics.get('Not', 0) == 2
+	assert model.statistics['And'] - statistics.get('And', 0) == 2
+	assert model.statistics['redraws'] - statistics.get('redraws', 0) == 1
+
+# ==============================================================================
+
+def testShowThenHideReplayed(clipModel):
+
+	''' Visibility set in the batch is the same as without the batch. '''
+
+	model, job = clipModel.load('Standard')
+	faces = getFaces()
+
+	redraw.show(faces[:2])
+	redraw.show(faces[2:4])
+	redraw.hide(faces[3:4])
+	expected = set(model.visible)
+
+	base.Or(faces, constants.ABAQUS)
+	with redraw.redrawBatch():
+		redraw.show(faces[:2])
+		redraw.show(faces[2:4])
+		redraw.hide(faces[3:4])
+
+	assert model.visible == expected == set(faces[2:3])
+
+# ==============================================================================
+
+def testFlushVisibility(clipModel):
+
+	model, job = clipModel.load('Standard')
+	faces = getFaces()
+	base.Or(faces, constants.ABAQUS)
+
+	with redraw.redrawBatch():
+		redraw.hide(faces[:3])
+		redraw.flushVisibility()
+
+		assert model.redrawsBlocked
+		assert set(base.CollectEntities(constants.ABAQUS, None, "FACE", filter_visible=True)) == set(faces[3:])
+
+	# out of the batch there is nothing to apply
+	redraw.flushVisibility()
+	assert model.visible == set(faces[3:])
+
+# ==============================================================================
+
+def testHideAllFacesInBatch(clipModel):
+
+	''' Faces shown in the batch so far are visible for the filter_visible collection. '''
+
+	model, job = clipModel.load('Standard')
+	faces = getFaces()
+	base.Or(faces[:2], constants.ABAQUS)
+
+	with redraw.redrawBatch():
+		redraw.show(faces[2:])
+		comp_items.hideAllFaces()
+
+	assert model.visible == set()
+
+# ==============================================================================
+
+def testShowNearElementsHidesFacesBeforePaste(clipModel, monkeypatch):
+
+	''' AutoPaste of visible entities must not see the geometry hidden in the same batch. '''
+
+	model, job = clipModel.load('Standard')
+	shells = base.CollectEntities(constants.ABAQUS, None, "SHELL")
+	connectors = [shell for shell in shells
+		if base.GetEntityCardValues(constants.ABAQUS, shell, ('PID',))['PID'] == clip_geometry.FE_PIDS[0]][:1]
+
+	visibleAtPaste = list()
+	autoPaste = ansa.mesh.AutoPaste
+	def spyAutoPaste(*args, **kwargs):
+		visibleAtPaste.append(set(entity for entity in model.visible if entity._ansaType == 'FACE'))
+		return autoPaste(*args, **kwargs)
+	monkeypatch.setattr(ansa.mesh, 'AutoPaste', spyAutoPaste)
+
+	symmetricalClip = comp_items.SymmetricalClip.__new__(comp_items.SymmetricalClip)
+	symmetricalClip.newConnectors = connectors
+
+	with redraw.redrawBatch():
+		symmetricalClip.showNearElements()
+
+	assert visibleAtPaste == [set()]
+	assert len(model.visible) > 0
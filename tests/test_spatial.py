@@ -0,0 +1,202 @@
+# PYTHON script
+
+'''
+Bounding volume tree queries and point - triangle distances compared to the brute force.
+'''
+
+import numpy as np
+import pytest
+
+from conftest import Modules
+
+spatial = Modules.spatial
+
+# ==============================================================================
+
+def randomBoxes(count, seed=0):
+
+	random = np.random.RandomState(seed)
+	boxMins = random.uniform(-50, 50, (count, 3))
+	boxMaxs = boxMins + random.uniform(0, 5, (count, 3))
+
+	return boxMins, boxMaxs
+
+# ==============================================================================
+
+def randomTriangles(count, seed=0, size=3.0, spread=20.0):
+
+	random = np.random.RandomState(seed)
+	origins = random.uniform(-spread, spread, (count, 1, 3))
+
+	return origins + random.uniform(-size, size, (count, 3, 3))
+
+# ==============================================================================
+
+def boxDistances(point, boxMins, boxMaxs):
+
+	return np.linalg.norm(np.maximum(np.maximum(boxMins - point, point - boxMaxs), 0.0), axis=1)
+
+# ==============================================================================
+
+def sampledTrianglesDistance(triangle, otherTriangle, count=40):
+
+	''' Upper estimate of the triangles distance by their barycentric samples. '''
+
+	params = [(u, v) for u in np.linspace(0, 1, count) for v in np.linspace(0, 1, count) if u + v <= 1]
+	weights = np.array([(1 - u - v, u, v) for u, v in params])
+	points = np.dot(weights, triangle)
+	otherPoints = np.dot(weights, otherTriangle)
+
+	return min(np.linalg.norm(otherPoints - point, axis=1).min() for point in points)
+
+# ==============================================================================
+
+@pytest.mark.parametrize('leafSize', [1, 8])
+def testAabbTreeQueryBox(leafSize):
+
+	boxMins, boxMaxs = randomBoxes(500)
+	tree = spatial.AabbTree(boxMins, boxMaxs, leafSize)
+	assert len(tree) == 500
+
+	random = np.random.RandomState(1)
+	for queryMin in random.uniform(-60, 40, (20, 3)):
+		queryMax = queryMin + 15.0
+		expected = np.flatnonzero(np.all(boxMins <= queryMax, axis=1) & np.all(boxMaxs >= queryMin, axis=1))
+
+		assert sorted(tree.queryBox(queryMin, queryMax)) == expected.tolist()
+
+# ==============================================================================
+
+def testAabbTreeQueryRadius():
+
+	boxMins, boxMaxs = randomBoxes(500)
+	tree = spatial.AabbTree(boxMins, boxMaxs)
+
+	random = np.random.RandomState(2)
+	for point in random.uniform(-50, 50, (20, 3)):
+		expected = np.flatnonzero(boxDistances(point, boxMins, boxMaxs) <= 8.0)
+
+		assert sorted(tree.queryRadius(point, 8.0)) == expected.tolist()
+
+# ==============================================================================
+
+def testAabbTreeQueryNearestTriangle():
+
+	triangles = randomTriangles(300)
+	tree = spatial.AabbTree(*spatial.trianglesBoxes(triangles))
+
+	random = np.random.RandomState(3)
+	for point in random.uniform(-25, 25, (20, 3)):
+		distances = spatial.pointTrianglesDistances(point, triangles)
+		index, distance = tree.queryNearest(point,
+			lambda indexes: spatial.pointTrianglesDistances(point, triangles[indexes]))
+
+		assert distance == pytest.approx(distances.min())
+		assert distances[index] == pytest.approx(distances.min())
+
+	# nothing within the maximal distance
+	assert tree.queryNearest([1000.0, 0.0, 0.0], maxDistance=10.0) == (None, None)
+
+# ==============================================================================
+
+def testAabbTreeQueryRays():
+
+	triangles = randomTriangles(300)
+	boxMins, boxMaxs = spatial.trianglesBoxes(triangles)
+	tree = spatial.AabbTree(boxMins, boxMaxs)
+
+	random = np.random.RandomState(4)
+	origins = random.uniform(-25, 25, (30, 3))
+	vector = np.array([0.3, -0.5, 0.8])/np.linalg.norm([0.3, -0.5, 0.8])
+	rayIndexes, primitiveIndexes = tree.queryRays(origins, vector, 10.0)
+	found = set(zip(rayIndexes.tolist(), primitiveIndexes.tolist()))
+
+	# segment samples inside a box must be reported
+	for rayIndex, origin in enumerate(origins):
+		samples = origin + np.linspace(-10, 10, 201)[:, None]*vector
+		for primitiveIndex in range(len(triangles)):
+			inside = np.all((samples >= boxMins[primitiveIndex]) & (samples <= boxMaxs[primitiveIndex]), axis=1)
+			if inside.any():
+				assert (rayIndex, primitiveIndex) in found
+
+# ==============================================================================
+
+def testKdTreeQueryKNearest():
+
+	random = np.random.RandomState(5)
+	points = random.uniform(-10, 10, (400, 3))
+	tree = spatial.KdTree(points)
+
+	for point in random.uniform(-12, 12, (20, 3)):
+		distances = np.linalg.norm(points - point, axis=1)
+		indexes, foundDistances = tree.queryKNearest(point, 5)
+
+		assert indexes.tolist() == np.argsort(distances)[:5].tolist()
+		assert foundDistances == pytest.approx(np.sort(distances)[:5])
+
+		indexes, foundDistances = tree.queryKNearest(point, 400, maxDistance=3.0)
+		assert sorted(indexes.tolist()) == np.flatnonzero(distances <= 3.0).tolist()
+
+# ==============================================================================
+
+def testPointTrianglesDistances():
+
+	triangles = np.array([
+		[[0, 0, 0], [1, 0, 0], [0, 1, 0]],
+		# degenerated triangle has no inside, its edges are the nearest
+		[[0, 0, 0], [2, 0, 0], [1, 0, 0]]], dtype=float)
+
+	assert spatial.pointTrianglesDistances([0.2, 0.2, 3.0], triangles) == pytest.approx([3.0, np.hypot(0.2, 3.0)])
+	assert spatial.pointTrianglesDistances([-1.0, 0.0, 0.0], triangles) == pytest.approx([1.0, 1.0])
+
+	# paired points
+	points = np.array([[0.2, 0.2, -2.0], [1.0, 1.0, 0.0]])
+	assert spatial.pointTrianglesDistances(points, triangles) == pytest.approx([2.0, 1.0])
+
+# ==============================================================================
+
+def testSegmentsDistances():
+
+	p0 = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]], dtype=float)
+	p1 = np.array([[1, 0, 0], [1, 0, 0], [1, 0, 0], [0, 0, 0]], dtype=float)
+	q0 = np.array([[0.5, -1, 1], [2, 1, 0], [0, 1, 0], [3, 0, 4]], dtype=float)
+	q1 = np.array([[0.5, 1, 1], [3, 1, 0], [1, 1, 0], [3, 0, 4]], dtype=float)
+
+	# crossing, apart along the line, parallel, points
+	expected = [1.0, np.sqrt(2), 1.0, 5.0]
+
+	assert spatial.segmentsDistances(p0, p1, q0, q1) == pytest.approx(expected)
+
+# ==============================================================================
+
+def testTrianglesDistances():
+
+	triangles = randomTriangles(40, seed=6, spread=5.0)
+	otherTriangles = randomTriangles(40, seed=7, spread=5.0)
+	distances = spatial.trianglesDistances(triangles, otherTriangles)
+
+	for triangle, otherTriangle, distance in zip(triangles, otherTriangles, distances):
+		sampledDistance = sampledTrianglesDistance(triangle, otherTriangle)
+		# samples are 1/40 of the triangle size apart
+		assert distance <= sampledDistance + 1e-9
+		assert distance >= sampledDistance - 0.3
+
+	# the edge piercing the other triangle
+	triangle = np.array([[[0, 0, 0], [2, 0, 0], [0, 2, 0]]], dtype=float)
+	piercing = np.array([[[0.5, 0.5, -1], [0.5, 0.5, 1], [5, 5, 5]]], dtype=float)
+	assert spatial.trianglesDistances(triangle, piercing) == pytest.approx([0.0])
+	assert spatial.trianglesDistances(piercing, triangle) == pytest.approx([0.0])
+
+# ==============================================================================
+
+@pytest.mark.parametrize('chunkSize', [7, 2**20])
+def testTrianglesWithinDistance(chunkSize):
+
+	triangles = randomTriangles(60, seed=8)
+	otherTriangles = randomTriangles(20, seed=9)
+
+	expected = [spatial.trianglesDistances(np.repeat(triangle[None], len(otherTriangles), axis=0), otherTriangles).min() <= 4.0
+		for triangle in triangles]
+
+	assert spatial.trianglesWithinDistance(triangles, otherTriangles, 4.0, chunkSize).tolist() == expected
+	assert not spatial.trianglesWithinDistance(triangles, np.zeros((0, 3, 3)), 4.0).any()
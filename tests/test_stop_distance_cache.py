@@ -0,0 +1,194 @@
+# PYTHON script
+
+'''
+Clip frame transformations, fingerprint matching and the stop distance reuse.
+'''
+
+import numpy as np
+import pytest
+
+from conftest import Modules
+
+stop_distance_cache = Modules.stop_distance_cache
+batch_items = Modules.batch_items
+comp_items = Modules.comp_items
+
+STANDARD_STOP_DISTANCES = [-1.5, 1.0, -2.0, 2.5, 0.5, 1.8]
+
+# ==============================================================================
+
+def rotation(angle, axis):
+
+	''' Returns the rotation matrix by Rodrigues formula. '''
+
+	axis = np.array(axis, dtype=float)/np.linalg.norm(axis)
+	crossMatrix = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+
+	return np.eye(3) + np.sin(angle)*crossMatrix + (1 - np.cos(angle))*np.dot(crossMatrix, crossMatrix)
+
+# ==============================================================================
+
+def neighbourhood(seed=0):
+
+	random = np.random.RandomState(seed)
+	clipCoords = random.uniform(-5, 5, (40, 3))
+	contraCoords = np.concatenate([random.uniform(-6, 6, (60, 3)), random.uniform(100, 110, (10, 3))])
+
+	return clipCoords, contraCoords
+
+# ==============================================================================
+
+def transformedFingerprint(clipCoords, contraCoords, matrix, shift, radius=5.0):
+
+	frame = stop_distance_cache.ClipFrame(shift, np.dot(matrix, [1, 0, 0]), np.dot(matrix, [0, 0, 1]))
+	clipCoords = np.dot(clipCoords, matrix.T) + shift
+	contraCoords = np.dot(contraCoords, matrix.T) + shift
+
+	return frame, stop_distance_cache.ClipFingerprint('Standard', frame, clipCoords, contraCoords, radius)
+
+# ==============================================================================
+
+def stopDistances(report):
+
+	return [report[stopDistName] for stopDistName in batch_items.STOP_DISTANCE_NAMES]
+
+# ==============================================================================
+
+def testClipFrame():
+
+	frame = stop_distance_cache.ClipFrame([1, 2, 3], [1, 1, 0.2], [0, 0, 2])
+
+	# orthonormal right-handed axes, x axis made perpendicular to z axis
+	assert np.dot(frame.axes, frame.axes.T) == pytest.approx(np.eye(3))
+	assert np.linalg.det(frame.axes) == pytest.approx(1.0)
+	assert frame.axes[2] == pytest.approx([0, 0, 1])
+	assert frame.axes[0] == pytest.approx([np.sqrt(0.5), np.sqrt(0.5), 0])
+
+	coords = np.random.RandomState(0).uniform(-10, 10, (20, 3))
+	assert frame.toGlobal(frame.toLocal(coords)) == pytest.approx(coords)
+	assert frame.toLocal([1, 2, 3]) == pytest.approx(np.zeros((1, 3)))
+	assert frame.toGlobal([0, 0, 4]) == pytest.approx(np.array([[1, 2, 7]]))
+
+# ==============================================================================
+
+def testFingerprintMatchesTransformedCopy():
+
+	clipCoords, contraCoords = neighbourhood()
+	frame, fingerprint = transformedFingerprint(clipCoords, contraCoords, np.eye(3), np.zeros(3))
+	otherFrame, otherFingerprint = transformedFingerprint(
+		clipCoords[::-1], contraCoords[::-1], rotation(0.7, [1, -2, 0.5]), np.array([100.0, -50.0, 20.0]))
+
+	# the far contra nodes are out of the radius
+	assert len(fingerprint.contraCoords) == 60
+	assert fingerprint.key() == otherFingerprint.key()
+	assert fingerprint.matches(otherFingerprint)
+	assert otherFingerprint.matches(fingerprint)
+
+# ==============================================================================
+
+def testFingerprintMismatch():
+
+	clipCoords, contraCoords = neighbourhood()
+	frame, fingerprint = transformedFingerprint(clipCoords, contraCoords, np.eye(3), np.zeros(3))
+
+	# a contra node moved over the tolerance
+	movedContraCoords = contraCoords.copy()
+	movedContraCoords[5] += [0, 0, 10*stop_distance_cache.FINGERPRINT_TOLERANCE]
+	assert not fingerprint.matches(transformedFingerprint(clipCoords, movedContraCoords, np.eye(3), np.zeros(3))[1])
+
+	# the same neighbourhood mirrored is another clip site
+	mirror = np.diag([1.0, -1.0, 1.0])
+	assert not fingerprint.matches(transformedFingerprint(np.dot(clipCoords, mirror), np.dot(contraCoords, mirror), np.eye(3), np.zeros(3))[1])
+
+	# another geom type
+	otherFingerprint = stop_distance_cache.ClipFingerprint('Reversed', frame, clipCoords, contraCoords, 5.0)
+	assert otherFingerprint.key() != fingerprint.key()
+	assert not fingerprint.matches(otherFingerprint)
+
+# ==============================================================================
+
+def testStopDistanceCache():
+
+	clipCoords, contraCoords = neighbourhood()
+	frame, fingerprint = transformedFingerprint(clipCoords, contraCoords, np.eye(3), np.zeros(3))
+	matrix = rotation(2.0, [0.2, 1, 0.3])
+	shift = np.array([-30.0, 5.0, 12.0])
+	otherFrame, otherFingerprint = transformedFingerprint(clipCoords, contraCoords, matrix, shift)
+
+	cache = stop_distance_cache.StopDistanceCache()
+	assert cache.find(fingerprint) is None
+
+	stopDistancesPoints = {'xLow': [[-1.5, 0, 0]], 'zUp': [[0, 0, 1.8], [0, 0, 1.8]]}
+	cache.add(fingerprint, frame, {'xLow': -1.5, 'zUp': 1.8}, stopDistancesPoints)
+	# the matching entry is replaced
+	cache.add(fingerprint, frame, {'xLow': -1.5, 'zUp': 1.8}, stopDistancesPoints)
+	assert len(cache.entries[fingerprint.key()]) == 1
+
+	entry = cache.find(otherFingerprint)
+	assert entry is not None
+	assert entry.stopDistances == {'xLow': -1.5, 'zUp': 1.8}
+
+	# points transformed to the frame of the other clip
+	points = entry.getStopDistancesPoints(otherFrame)
+	assert np.array(points['xLow']) == pytest.approx(np.dot(matrix, [-1.5, 0, 0])[None] + shift)
+	assert len(points['zUp']) == 2
+
+	assert dict(cache.statistics) == {'hits': 1, 'misses': 1}
+
+	cache.invalidate()
+	assert cache.find(otherFingerprint) is None
+
+# ==============================================================================
+
+def testStopDistancesReusedInBatch(clipModel):
+
+	model, jobs = clipModel.loadCopies('Standard')
+	reports = batch_items.ClipBatch([batch_items.ClipJob.fromRow(dict(job, beam_type='AUDI', mirror=False))
+		for job in jobs]).run()
+
+	assert [report['status'] for report in reports] == ['OK', 'OK']
+	assert [report['stops_reused'] for report in reports] == [False, True]
+	assert stopDistances(reports[0]) == STANDARD_STOP_DISTANCES
+	assert stopDistances(reports[1]) == STANDARD_STOP_DISTANCES
+
+# ==============================================================================
+
+def testStopDistancesNotReused(clipModel):
+
+	''' Stop distances are recomputed if not allowed by the batch or by the job. '''
+
+	model, jobs = clipModel.loadCopies('Standard')
+	reports = batch_items.ClipBatch([batch_items.ClipJob.fromRow(dict(job, beam_type='AUDI', mirror=False))
+		for job in jobs], reuseStopDistances=False).run()
+
+	assert [report['stops_reused'] for report in reports] == [False, False]
+
+	comp_items.invalidateModelCaches()
+	reports = batch_items.ClipBatch([batch_items.ClipJob.fromRow(dict(job, beam_type='AUDI', mirror=False, recompute_stops=recompute))
+		for job, recompute in zip(jobs, ['no', 'yes'])]).run()
+
+	assert [report['stops_reused'] for report in reports] == [False, False]
+	assert stopDistances(reports[1]) == STANDARD_STOP_DISTANCES
+
+# ==============================================================================
+
+def testModelCachesInvalidation(clipModel):
+
+	''' Cached stop distances are dropped with the other model caches unless kept explicitly. '''
+
+	clipCoords, contraCoords = neighbourhood()
+	frame, fingerprint = transformedFingerprint(clipCoords, contraCoords, np.eye(3), np.zeros(3))
+	cache = stop_distance_cache.STOP_DISTANCE_CACHE
+
+	cache.add(fingerprint, frame, {'xLow': -1.5}, {'xLow': [[-1.5, 0, 0]]})
+	comp_items.invalidateModelCaches(keepStopDistances=True)
+	assert cache.find(fingerprint) is not None
+
+	comp_items.invalidateModelCaches()
+	assert cache.find(fingerprint) is None
+
+	# the model loaded by the batch must not reuse stop distances of the previous one
+	model, job = clipModel.load('Standard')
+	cache.add(fingerprint, frame, {'xLow': -1.5}, {'xLow': [[-1.5, 0, 0]]})
+	batch_items.ClipBatch([batch_items.ClipJob.fromRow(dict(job, beam_type='AUDI', mirror=False))]).run()
+	assert cache.find(fingerprint) is None